@@ -17,3 +17,15 @@ class ApiConfig(AppConfig):
         import api.signals_presupuesto_digital  # noqa: F401
         # importa y registra los signals de flujo clínico (Paso 2)
         import api.signals_flujo_clinico  # noqa: F401
+        # importa y registra los signals de derivados de imagen (miniaturas)
+        import api.signals_derivados  # noqa: F401
+        # importa y registra la liberación de referencias a blobs deduplicados
+        import api.signals_blobs  # noqa: F401
+        # importa y registra la invalidación de la caché HTTP de catálogos
+        import api.signals_catalogos  # noqa: F401
+        # importa y registra los tombstones de la sincronización incremental
+        import api.signals_sincronizacion  # noqa: F401
+        # importa y registra la revocación de la caché de tokens
+        import api.signals_tokens  # noqa: F401
+        # registra el contador de conexiones nuevas a la DB (métricas del pool)
+        import api.services.db_pool  # noqa: F401
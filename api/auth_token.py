@@ -0,0 +1,38 @@
+# api/auth_token.py
+"""
+Autenticación por token de DRF con caché de tokens validados.
+- Mismo header y mismos errores que TokenAuthentication ("Authorization: Token <key>").
+- Un token ya validado se resuelve desde el LRU del proceso o la caché
+  compartida, sin JOIN Token + User (ver api/services/cache_tokens.py).
+- Rechaza además a los usuarios con un BloqueoUsuario vigente en la empresa
+  del request (request.tenant), como el login.
+"""
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from api.services.cache_tokens import esta_bloqueado, guardar_token, token_cacheado
+
+
+class CachedTokenAuth(TokenAuthentication):
+    """
+    TokenAuthentication que cachea los tokens validados. La revocación
+    (logout, reset de contraseña, bloqueos) la hacen los signals de
+    api/signals_tokens.py.
+    """
+
+    empresa = None
+
+    def authenticate(self, request):
+        # DRF crea las clases de autenticación por request
+        self.empresa = getattr(request, 'tenant', None)
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        token = token_cacheado(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            guardar_token(token)
+        if esta_bloqueado(token.bloqueos, self.empresa):
+            raise exceptions.AuthenticationFailed('Usuario bloqueado.')
+        return token.user, token
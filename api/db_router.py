@@ -0,0 +1,233 @@
+"""
+Enrutamiento de lecturas a la réplica de PostgreSQL.
+
+Las escrituras van siempre al primario. Las lecturas van a la réplica solo
+dentro de un contexto marcado (`lecturas_en_replica`, `LecturaReplicaMixin`)
+y mientras el retraso de replicación esté por debajo de
+REPLICA_MAX_LAG_SECONDS; si la réplica no responde o va atrasada se lee del
+primario. Tras una mutación propia el usuario queda fijado al primario
+REPLICA_READ_YOUR_WRITES_SECONDS (ver `ReplicaStickinessMiddleware`), para que
+vea lo que acaba de escribir.
+
+Sin alias `replica` en DATABASES todo se lee del primario.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+ALIAS_REPLICA = 'replica'
+
+MODO_REPLICA = 'replica'
+MODO_PRIMARIO = 'primario'
+
+# Modo de lectura del contexto actual: None (primario), MODO_REPLICA o
+# MODO_PRIMARIO (fijado: los contextos anidados no vuelven a la réplica).
+_modo_lectura = ContextVar('modo_lectura', default=None)
+# Si el request en curso escribió en la base (lo marca db_for_write)
+_hubo_escritura = ContextVar('hubo_escritura', default=False)
+
+# Retraso en segundos: 0 si la réplica está al día (o no es PostgreSQL)
+SQL_LAG_POSTGRES = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+# ----------------------------------------------------------------------
+# Estado de la réplica (por proceso, se vuelve a medir cada
+# REPLICA_LAG_CHECK_INTERVAL segundos)
+# ----------------------------------------------------------------------
+_lock = threading.Lock()
+_estado = {'medido': None, 'lag': None, 'disponible': False}
+
+
+def replica_configurada() -> bool:
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+def medir_lag() -> Optional[float]:
+    """Retraso de replicación en segundos, o None si la réplica no responde."""
+    conexion = connections[ALIAS_REPLICA]
+    try:
+        if conexion.vendor != 'postgresql':
+            conexion.ensure_connection()
+            return 0.0
+        with conexion.cursor() as cursor:
+            cursor.execute(SQL_LAG_POSTGRES)
+            return float(cursor.fetchone()[0])
+    except Exception as e:
+        logger.warning("[Replica] No se pudo medir el retraso: %s", e)
+        return None
+
+
+def replica_disponible() -> bool:
+    if not replica_configurada():
+        return False
+    ahora = time.monotonic()
+    with _lock:
+        medido = _estado['medido']
+        if medido is not None and ahora - medido < settings.REPLICA_LAG_CHECK_INTERVAL:
+            return _estado['disponible']
+        # Un solo hilo mide; los demás usan el último valor mientras tanto
+        _estado['medido'] = ahora
+
+    lag = medir_lag()
+    disponible = lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+    if lag is not None and not disponible:
+        logger.warning("[Replica] Retraso de %.1fs; se lee del primario", lag)
+    with _lock:
+        _estado.update(lag=lag, disponible=disponible, medido=time.monotonic())
+    return disponible
+
+
+def estado_replica() -> dict:
+    with _lock:
+        medido = _estado['medido']
+        return {
+            'configurada': replica_configurada(),
+            'disponible': _estado['disponible'],
+            'lag_segundos': _estado['lag'],
+            'lag_maximo_segundos': getattr(settings, 'REPLICA_MAX_LAG_SECONDS', None),
+            'segundos_desde_medicion': (
+                round(time.monotonic() - medido, 1) if medido is not None else None
+            ),
+        }
+
+
+def reiniciar_estado_replica():
+    """Fuerza una nueva medición en la próxima lectura."""
+    with _lock:
+        _estado.update(medido=None, lag=None, disponible=False)
+
+
+# ----------------------------------------------------------------------
+# Read-your-writes
+# ----------------------------------------------------------------------
+def _clave_escritura(user_id) -> str:
+    return f"replica:escritura:{user_id}"
+
+
+def registrar_escritura(user):
+    """Fija al usuario al primario durante REPLICA_READ_YOUR_WRITES_SECONDS."""
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return
+    cache.set(_clave_escritura(user.pk), 1, settings.REPLICA_READ_YOUR_WRITES_SECONDS)
+
+
+def escribio_recientemente(user) -> bool:
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return False
+    return cache.get(_clave_escritura(user.pk)) is not None
+
+
+@contextmanager
+def seguimiento_escrituras():
+    """Contexto de un request: `hubo_escritura()` indica si escribió en la base."""
+    token = _hubo_escritura.set(False)
+    try:
+        yield
+    finally:
+        _hubo_escritura.reset(token)
+
+
+def hubo_escritura() -> bool:
+    return _hubo_escritura.get()
+
+
+# ----------------------------------------------------------------------
+# Contextos de lectura
+# ----------------------------------------------------------------------
+def activar_lectura_replica(user=None):
+    """
+    Marca las lecturas del contexto actual para la réplica (o las fija al
+    primario si `user` escribió hace poco). Devuelve el token para
+    `desactivar_lectura_replica`.
+    """
+    if _modo_lectura.get() == MODO_PRIMARIO or escribio_recientemente(user):
+        return _modo_lectura.set(MODO_PRIMARIO)
+    return _modo_lectura.set(MODO_REPLICA)
+
+
+def desactivar_lectura_replica(token):
+    _modo_lectura.reset(token)
+
+
+@contextmanager
+def lecturas_en_replica(user=None):
+    """
+    Context manager / decorador para código de solo lectura:
+
+        with lecturas_en_replica(request.user):
+            datos = generar_reporte(...)
+    """
+    token = activar_lectura_replica(user)
+    try:
+        yield
+    finally:
+        desactivar_lectura_replica(token)
+
+
+def lectura_replica(vista):
+    """Decorador para vistas función: lecturas a la réplica salvo read-your-writes."""
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        with lecturas_en_replica(getattr(request, 'user', None)):
+            return vista(request, *args, **kwargs)
+    return envoltura
+
+
+def modo_lectura() -> Optional[str]:
+    return _modo_lectura.get()
+
+
+def _en_transaccion_propia(alias=DEFAULT_DB_ALIAS) -> bool:
+    """
+    Dentro de un atomic() las lecturas deben ver las escrituras de la misma
+    transacción. Se ignoran los bloques que abre TestCase (como hace Django
+    con `durable`).
+    """
+    conexion = connections[alias]
+    return conexion.in_atomic_block and any(
+        not getattr(bloque, '_from_testcase', False) for bloque in conexion.atomic_blocks
+    )
+
+
+class ReplicaRouter:
+    """Router de DATABASE_ROUTERS: primario para escrituras, réplica opcional para lecturas."""
+
+    def db_for_read(self, model, **hints):
+        if _modo_lectura.get() != MODO_REPLICA:
+            return None
+        if _en_transaccion_propia() or not replica_disponible():
+            return None
+        return ALIAS_REPLICA
+
+    def db_for_write(self, model, **hints):
+        _hubo_escritura.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica es una copia del primario: mismas filas
+        alias = {DEFAULT_DB_ALIAS, ALIAS_REPLICA}
+        if obj1._state.db in alias and obj2._state.db in alias:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == ALIAS_REPLICA:
+            return False
+        return None
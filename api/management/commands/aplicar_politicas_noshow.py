@@ -0,0 +1,59 @@
+# api/management/commands/aplicar_politicas_noshow.py
+"""
+Aplica por lotes las políticas de no-show a las consultas que cambiaron de
+estado en una ventana (Consulta.fecha_cambio_estado, que escribe save(); los
+queryset.update() del estado deben fijarla a mano): multas con un
+bulk_create por lote y un bloqueo por paciente. Es idempotente (multas y
+bloqueos se registran por consulta/política; un bloqueo levantado a mano no
+se recrea), así que puede correr al cierre del día aunque la evaluación en
+línea (NO_SHOW_EVALUACION_EN_LINEA) siga activa.
+
+    python manage.py aplicar_politicas_noshow [--horas 24] [--desde 2026-01-31] [--hasta 2026-02-01]
+                                              [--empresa norte] [--lote 1000]
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api.models import Empresa
+from no_show_policies.services import aplicar_politicas_en_ventana
+
+
+def _instante(valor, opcion):
+    fecha = parse_date(valor)
+    if fecha is None:
+        raise CommandError(f'{opcion} debe tener el formato AAAA-MM-DD')
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+class Command(BaseCommand):
+    help = 'Aplica las políticas de no-show a las consultas que cambiaron de estado en una ventana'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=int, default=24, help='Ventana hacia atrás desde ahora (por defecto 24)')
+        parser.add_argument('--desde', help='Inicio de la ventana (AAAA-MM-DD); reemplaza --horas')
+        parser.add_argument('--hasta', help='Fin de la ventana, exclusivo (AAAA-MM-DD). Por defecto: ahora')
+        parser.add_argument('--empresa', help='Subdominio de la empresa (por defecto todas)')
+        parser.add_argument('--lote', type=int, default=1000, help='Consultas por lote')
+
+    def handle(self, *args, **options):
+        hasta = _instante(options['hasta'], '--hasta') if options['hasta'] else timezone.now()
+        if options['desde']:
+            desde = _instante(options['desde'], '--desde')
+        else:
+            desde = hasta - timedelta(hours=options['horas'])
+
+        empresa = None
+        if options['empresa']:
+            try:
+                empresa = Empresa.objects.get(subdomain=options['empresa'])
+            except Empresa.DoesNotExist:
+                raise CommandError(f"No existe la empresa '{options['empresa']}'")
+
+        resumen = aplicar_politicas_en_ventana(desde, hasta, empresa=empresa, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Consultas evaluadas: {resumen['consultas']}, multas creadas: {resumen['multas']}, "
+            f"bloqueos creados o extendidos: {resumen['bloqueos']}"
+        ))
@@ -0,0 +1,91 @@
+# api/management/commands/archivar_consultas.py
+"""
+Archiva por lotes las consultas pasadas de cada tenant en consulta_archivada
+(api/services/archivo_consultas.py), mostrando el avance lote a lote. Un
+trabajo interrumpido se retoma desde su último lote.
+
+Procesar lo programado desde el endpoint (y lo abandonado):
+
+    python manage.py archivar_consultas
+
+Programar y ejecutar para uno o todos los tenants:
+
+    python manage.py archivar_consultas --empresa norte [--antes-de 2026-01-01] [--lote 500]
+    python manage.py archivar_consultas --todas
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api.models import Empresa, TrabajoArchivoConsultas
+from api.services.archivo_consultas import procesar_trabajo, trabajos_por_procesar
+
+
+class Command(BaseCommand):
+    help = 'Archiva por lotes las consultas pasadas (reanudable)'
+
+    def add_arguments(self, parser):
+        destino = parser.add_mutually_exclusive_group()
+        destino.add_argument('--empresa', help='Subdominio del tenant a archivar')
+        destino.add_argument('--todas', action='store_true', help='Archivar todos los tenants activos')
+        parser.add_argument('--antes-de', help='Archivar consultas anteriores a esta fecha (AAAA-MM-DD). Por defecto: hoy')
+        parser.add_argument('--lote', type=int, help='Consultas por lote (por defecto CONSULTAS_ARCHIVO_LOTE)')
+
+    def handle(self, *args, **options):
+        fecha_corte = timezone.now().date()
+        if options['antes_de']:
+            fecha_corte = parse_date(options['antes_de'])
+            if fecha_corte is None:
+                raise CommandError('--antes-de debe tener el formato AAAA-MM-DD')
+
+        if options['empresa']:
+            try:
+                empresas = [Empresa.objects.get(subdomain=options['empresa'])]
+            except Empresa.DoesNotExist:
+                raise CommandError(f"No existe la empresa '{options['empresa']}'")
+        elif options['todas']:
+            empresas = list(Empresa.objects.filter(activo=True).order_by('id'))
+        else:
+            empresas = []
+
+        for empresa in empresas:
+            self._programar(empresa, fecha_corte)
+
+        trabajos = list(trabajos_por_procesar().values_list('pk', flat=True))
+        if not trabajos:
+            self.stdout.write('No hay trabajos de archivado pendientes')
+            return
+
+        for trabajo_id in trabajos:
+            trabajo = procesar_trabajo(trabajo_id, lote=options['lote'], progreso=self._progreso)
+            if trabajo is None:
+                self.stdout.write(f'Trabajo #{trabajo_id}: lo está procesando otro proceso')
+            elif trabajo.estado == TrabajoArchivoConsultas.ESTADO_FALLIDO:
+                self.stderr.write(f'Trabajo #{trabajo.pk} falló: {trabajo.ultimo_error}')
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Trabajo #{trabajo.pk} ({trabajo.empresa.subdomain}) completado: '
+                    f'{trabajo.archivadas} archivadas, {trabajo.retenidas} retenidas por referencias'
+                ))
+
+    def _programar(self, empresa, fecha_corte):
+        """Reutiliza el trabajo abierto o fallido del tenant (se retoma) o crea uno."""
+        trabajo = TrabajoArchivoConsultas.objects.filter(
+            empresa=empresa,
+            estado__in=[
+                TrabajoArchivoConsultas.ESTADO_PENDIENTE,
+                TrabajoArchivoConsultas.ESTADO_EN_CURSO,
+                TrabajoArchivoConsultas.ESTADO_FALLIDO,
+            ],
+        ).first()
+        if trabajo is None:
+            TrabajoArchivoConsultas.objects.create(empresa=empresa, fecha_corte=fecha_corte)
+        elif trabajo.estado == TrabajoArchivoConsultas.ESTADO_FALLIDO:
+            trabajo.estado = TrabajoArchivoConsultas.ESTADO_PENDIENTE
+            trabajo.save(update_fields=['estado', 'actualizado_en'])
+
+    def _progreso(self, trabajo):
+        self.stdout.write(
+            f'  #{trabajo.pk} {trabajo.empresa.subdomain}: {trabajo.archivadas} archivadas, '
+            f'{trabajo.retenidas} retenidas (hasta id {trabajo.ultimo_id})'
+        )
@@ -0,0 +1,68 @@
+# api/management/commands/benchmark_auth_tokens.py
+"""
+Benchmark del costo de autenticación por request: TokenAuthentication de DRF
+(JOIN Token + User en cada request) contra CachedTokenAuth
+(api/auth_token.py) con el token ya en el LRU del proceso y solo en la caché
+compartida (otro proceso, LRU vacío).
+
+Crea un usuario y su token dentro de una transacción que se revierte al
+terminar: no deja datos.
+
+    python manage.py benchmark_auth_tokens --repeticiones 2000
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.auth_token import CachedTokenAuth
+from api.services.cache_tokens import cache_local, revocar_token
+
+
+class Command(BaseCommand):
+    help = 'Compara consultas y latencia por request de TokenAuthentication contra CachedTokenAuth'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=2000)
+
+    def _medir(self, funcion, repeticiones, antes=None):
+        funcion()  # calentamiento: el primer request de la variante cacheada va a la base
+        if antes:
+            antes()
+        with CaptureQueriesContext(connection) as consultas:
+            funcion()
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            if antes:
+                antes()
+            funcion()
+        return len(consultas.captured_queries), (time.perf_counter() - inicio) * 1_000_000 / repeticiones
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        with transaction.atomic():
+            user = User.objects.create_user(username='benchmark@auth.local', email='benchmark@auth.local')
+            token = Token.objects.create(user=user)
+            request = APIRequestFactory().get('/api/consultas/', HTTP_AUTHORIZATION=f'Token {token.key}')
+
+            drf, cacheada = TokenAuthentication(), CachedTokenAuth()
+            escenarios = [
+                ('TokenAuthentication', lambda: drf.authenticate(request), None),
+                ('cacheada, LRU', lambda: cacheada.authenticate(request), None),
+                ('cacheada, compartida', lambda: cacheada.authenticate(request),
+                 lambda: cache_local().descartar(token.key)),
+            ]
+            self.stdout.write(f"{'autenticación':<24}{'consultas':>10}{'µs/request':>12}{'x':>8}")
+            base = None
+            for nombre, funcion, antes in escenarios:
+                consultas, us = self._medir(funcion, repeticiones, antes)
+                base = base or us
+                self.stdout.write(f"{nombre:<24}{consultas:>10}{us:>12.1f}{base / us:>8.1f}")
+
+            revocar_token(token.key)
+            transaction.set_rollback(True)
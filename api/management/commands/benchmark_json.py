@@ -0,0 +1,114 @@
+# api/management/commands/benchmark_json.py
+"""
+Microbenchmark del renderer/parser JSON: DRF (json de la stdlib) contra
+orjson (api/renderers.py) sobre payloads representativos de reportes y
+detalle de planes de tratamiento. No toca la base de datos.
+
+    python manage.py benchmark_json --filas 2000 --repeticiones 20
+"""
+import time
+import uuid
+from datetime import date, time as hora, timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import ORJSONParser, ORJSONRenderer, orjson
+
+
+def payload_reporte(filas):
+    """Como ReporteViewSet.list / ConsultaReporteSerializer: filas planas."""
+    base = timezone.now()
+    return [
+        {
+            'id': i,
+            'fecha': date(2026, 1, 1) + timedelta(days=i % 365),
+            'estado': 'confirmada',
+            'paciente_nombre': 'María José',
+            'paciente_apellido': 'Fernández',
+            'paciente_rut': f'{10000000 + i}-K',
+            'odontologo_nombre': 'Andrés',
+            'odontologo_apellido': 'Núñez',
+            'hora_inicio': hora(9 + i % 8, 30),
+            'tipo_consulta': 'Control',
+            'costo_consulta': Decimal('150.50') + i,
+            'created_at': base - timedelta(minutes=i),
+            'observaciones': 'Paciente con sensibilidad dental; revisar en 2 semanas.',
+        }
+        for i in range(filas)
+    ]
+
+
+def payload_plan(items):
+    """Como el detalle de un plan de tratamiento: anidado, con Decimals y UUIDs."""
+    ahora = timezone.now()
+    return {
+        'id': 1,
+        'codigo': uuid.uuid4(),
+        'estado_display': _('Activo'),
+        'fecha_creacion': ahora,
+        'costo_total': Decimal('12500.00'),
+        'resumen': {'total_pagado': Decimal('4200.00'), 'saldo': Decimal('8300.00')},
+        'items': [
+            {
+                'id': i,
+                'servicio': 'Endodoncia molar',
+                'costo_final': Decimal('850.00'),
+                'pagado': Decimal('300.00'),
+                'progreso': Decimal('45.50'),
+                'comprobante': uuid.uuid4(),
+                'ultima_sesion': ahora - timedelta(days=i),
+                'fecha_objetivo': date(2026, 6, 1),
+            }
+            for i in range(items)
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compara el renderer/parser JSON de DRF con el de orjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=2000, help='Filas del payload de reporte')
+        parser.add_argument('--items', type=int, default=200, help='Ítems del payload de plan')
+        parser.add_argument('--repeticiones', type=int, default=20)
+
+    def _medir(self, funcion, repeticiones):
+        funcion()  # calentamiento
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson no está instalado: ambos renderers usan json'))
+
+        repeticiones = options['repeticiones']
+        payloads = {
+            f"reporte ({options['filas']} filas)": payload_reporte(options['filas']),
+            f"plan ({options['items']} ítems)": payload_plan(options['items']),
+        }
+        drf, rapido = JSONRenderer(), ORJSONRenderer()
+        parser_drf, parser_rapido = JSONParser(), ORJSONParser()
+
+        self.stdout.write(f"{'payload':<24}{'operación':<10}{'DRF ms':>10}{'orjson ms':>12}{'x':>8}{'KB':>9}")
+        for nombre, datos in payloads.items():
+            cuerpo = drf.render(datos)
+            mediciones = [
+                ('render', lambda: drf.render(datos), lambda: rapido.render(datos)),
+                ('parse', lambda: parser_drf.parse(BytesIO(cuerpo)),
+                 lambda: parser_rapido.parse(BytesIO(cuerpo))),
+            ]
+            for operacion, base, alternativa in mediciones:
+                ms_base = self._medir(base, repeticiones)
+                ms_alt = self._medir(alternativa, repeticiones)
+                self.stdout.write(
+                    f"{nombre:<24}{operacion:<10}{ms_base:>10.2f}{ms_alt:>12.2f}"
+                    f"{ms_base / ms_alt:>8.1f}{len(cuerpo) / 1024:>9.0f}"
+                )
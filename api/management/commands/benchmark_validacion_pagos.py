@@ -0,0 +1,121 @@
+# api/management/commands/benchmark_validacion_pagos.py
+"""
+Benchmark de la validación de creación de pagos de plan: las validaciones
+encadenadas de api/validators_pagos.py (cada una vuelve a leer plan, items y
+pagos) contra ValidadorComplejoPagos sobre un ContextoValidacionPago.
+
+Crea un tenant, un plan con `--items` ítems y pagos previos dentro de una
+transacción que se revierte al terminar: no deja datos.
+
+    python manage.py benchmark_validacion_pagos --items 20 --repeticiones 50
+"""
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.models import (
+    DetallePagoItem, Empresa, Estado, Itemplandetratamiento, Odontologo, PagoEnLinea, Paciente,
+    Plandetratamiento, Servicio, Tipodeusuario, Usuario,
+)
+from api.validators_pagos import (
+    ValidadorComplejoPagos, validar_distribucion_pago, validar_estado_origen, validar_items_plan,
+    validar_metodo_pago_disponible, validar_monto_no_excede_saldo, validar_pago_duplicado,
+)
+
+
+def validar_encadenado(plan_id, monto, items_ids, metodo_pago, empresa):
+    """Las reglas una por una, cada función con sus propias consultas."""
+    origen = 'plan_completo' if not items_ids else 'items_individuales'
+    validar_estado_origen(origen, plan_id, empresa)
+    validar_items_plan(items_ids, plan_id, empresa)
+    validar_monto_no_excede_saldo(monto, origen, plan_id, empresa)
+    validar_distribucion_pago(monto, items_ids, plan_id, empresa)
+    validar_metodo_pago_disponible(metodo_pago, empresa)
+    validar_pago_duplicado(origen, plan_id, monto, empresa)
+
+
+class Command(BaseCommand):
+    help = 'Compara consultas y latencia de la validación de pagos encadenada contra la de contexto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=20, help='Ítems del plan de prueba')
+        parser.add_argument('--repeticiones', type=int, default=50)
+
+    def _datos(self, cantidad_items):
+        empresa = Empresa.objects.create(nombre='Benchmark pagos', subdomain='benchmark-pagos', activo=True)
+        rol_paciente = Tipodeusuario.objects.create(rol='Paciente', empresa=empresa)
+        rol_odontologo = Tipodeusuario.objects.create(rol='Odontologo', empresa=empresa)
+        usuario = Usuario.objects.create(
+            nombre='Paciente', apellido='Benchmark', correoelectronico='paciente@benchmark.local',
+            idtipousuario=rol_paciente, empresa=empresa
+        )
+        odontologo = Odontologo.objects.get(codusuario=Usuario.objects.create(
+            nombre='Odontologo', apellido='Benchmark', correoelectronico='odontologo@benchmark.local',
+            idtipousuario=rol_odontologo, empresa=empresa
+        ))
+        estado = Estado.objects.create(estado='Benchmark')
+        plan = Plandetratamiento.objects.create(
+            codpaciente=Paciente.objects.get(codusuario=usuario), cododontologo=odontologo,
+            idestado=estado, fechaplan=date.today(), empresa=empresa,
+        )
+        servicio = Servicio.objects.create(nombre='Resina', costobase=Decimal('100.00'), empresa=empresa)
+        items = Itemplandetratamiento.objects.bulk_create([
+            Itemplandetratamiento(
+                idplantratamiento=plan, idservicio=servicio, idestado=estado,
+                empresa=empresa, costofinal=Decimal('100.00'), orden=i,
+            )
+            for i in range(cantidad_items)
+        ])
+        Plandetratamiento.objects.filter(pk=plan.pk).update(
+            estado_plan=Plandetratamiento.ESTADO_PLAN_APROBADO,
+            montototal=Decimal('100.00') * cantidad_items,
+        )
+        # Un pago aprobado parcial por ítem y uno pendiente reciente
+        for item in items:
+            pago = PagoEnLinea.objects.create(
+                empresa=empresa, usuario=usuario, plan_tratamiento=plan, origen_tipo='items_individuales',
+                monto=Decimal('10.00'), monto_original=Decimal('100.00'), estado='aprobado',
+                metodo_pago='transferencia',
+            )
+            DetallePagoItem.objects.create(
+                pago=pago, item_plan=item, monto_item_total=Decimal('100.00'),
+                monto_pagado_ahora=Decimal('10.00'), monto_pagado_total=Decimal('10.00'),
+                saldo_restante=Decimal('90.00'),
+            )
+        PagoEnLinea.objects.create(
+            empresa=empresa, usuario=usuario, plan_tratamiento=plan, origen_tipo='plan_completo',
+            monto=Decimal('1.00'), monto_original=Decimal('100.00'), estado='pendiente',
+            metodo_pago='transferencia',
+        )
+        return empresa, plan, [item.pk for item in items]
+
+    def _medir(self, funcion, repeticiones):
+        with CaptureQueriesContext(connection) as consultas:
+            funcion()
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        return len(consultas.captured_queries), (time.perf_counter() - inicio) * 1000 / repeticiones
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        with transaction.atomic():
+            empresa, plan, items_ids = self._datos(options['items'])
+            monto = Decimal('50.00')
+
+            self.stdout.write(f"{'escenario':<22}{'consultas':>12}{'contexto':>10}{'ms':>10}{'ms ctx':>10}{'x':>7}")
+            for nombre, ids in (('plan completo', None), (f"{len(items_ids)} ítems", items_ids)):
+                argumentos = (plan.pk, monto, ids, 'transferencia', empresa)
+                consultas, ms = self._medir(lambda: validar_encadenado(*argumentos), repeticiones)
+                consultas_ctx, ms_ctx = self._medir(
+                    lambda: ValidadorComplejoPagos.validar_crear_pago_plan(*argumentos), repeticiones
+                )
+                self.stdout.write(
+                    f"{nombre:<22}{consultas:>12}{consultas_ctx:>10}{ms:>10.2f}{ms_ctx:>10.2f}{ms / ms_ctx:>7.1f}"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,50 @@
+# api/management/commands/caducar_vencidos.py
+"""
+Caducidad nocturna de presupuestos digitales emitidos y planes de tratamiento
+aprobados cuya vigencia ya terminó: un UPDATE ... RETURNING por modelo, la
+bitácora en un bulk_create y los avisos a pacientes en lote.
+
+    python manage.py caducar_vencidos [--fecha 2026-01-31] [--empresa norte]
+                                      [--solo presupuestos|planes] [--sin-notificar]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.models import Empresa
+from api.services.caducidad import ejecutar_caducidad
+
+
+class Command(BaseCommand):
+    help = 'Caduca presupuestos y planes vencidos y avisa a los pacientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Caducar lo vencido antes de esta fecha (AAAA-MM-DD). Por defecto: hoy')
+        parser.add_argument('--empresa', help='Subdominio de la empresa (por defecto todas)')
+        parser.add_argument('--solo', choices=['presupuestos', 'planes'])
+        parser.add_argument('--sin-notificar', action='store_true', help='No encolar avisos a los pacientes')
+
+    def handle(self, *args, **options):
+        hoy = None
+        if options['fecha']:
+            hoy = parse_date(options['fecha'])
+            if hoy is None:
+                raise CommandError('--fecha debe tener el formato AAAA-MM-DD')
+
+        empresa = None
+        if options['empresa']:
+            try:
+                empresa = Empresa.objects.get(subdomain=options['empresa'])
+            except Empresa.DoesNotExist:
+                raise CommandError(f"No existe la empresa '{options['empresa']}'")
+
+        resumen = ejecutar_caducidad(
+            hoy=hoy,
+            empresa=empresa,
+            presupuestos=options['solo'] in (None, 'presupuestos'),
+            planes=options['solo'] in (None, 'planes'),
+            notificar=not options['sin_notificar'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Presupuestos caducados: {resumen['presupuestos']}, planes caducados: {resumen['planes']}, "
+            f"avisos encolados: {resumen['notificaciones']}"
+        ))
@@ -10,7 +10,11 @@ class Command(BaseCommand):
         # Cerrar todas las conexiones de base de datos
         for alias in connections:
             try:
-                connections[alias].close()
+                conexion = connections[alias]
+                conexion.close()
+                if conexion.settings_dict.get('OPTIONS', {}).get('pool'):
+                    # Con pool de psycopg, close() solo devuelve la conexión al pool
+                    conexion.close_pool()
                 self.stdout.write(
                     self.style.SUCCESS(f'Conexión "{alias}" cerrada exitosamente')
                 )
@@ -0,0 +1,33 @@
+# api/management/commands/generar_derivados.py
+from django.core.management.base import BaseCommand
+
+from api.models import DocumentoClinico, Evidencia
+from api.services.derivados_imagen import procesar_derivados, requiere_derivados
+
+
+class Command(BaseCommand):
+    help = 'Genera miniaturas y versiones web de evidencias y documentos clínicos que aún no las tienen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help='Solo la empresa (tenant) indicada')
+        parser.add_argument('--limite', type=int, default=500, help='Máximo de registros por modelo')
+
+    def handle(self, *args, **options):
+        for modelo in (Evidencia, DocumentoClinico):
+            qs = modelo.objects.filter(derivados={})
+            if options['empresa']:
+                qs = qs.filter(empresa_id=options['empresa'])
+
+            revisados = generados = 0
+            for obj in qs.iterator(chunk_size=100):
+                if not requiere_derivados(obj):
+                    continue
+                if revisados >= options['limite']:
+                    break
+                revisados += 1
+                if procesar_derivados(modelo, obj.pk):
+                    generados += 1
+
+            self.stdout.write(
+                self.style.SUCCESS(f'{modelo.__name__}: {generados}/{revisados} registros con derivados generados')
+            )
@@ -0,0 +1,55 @@
+# api/management/commands/mantener_historicos.py
+"""
+Retención nocturna de la bitácora, el historial de notificaciones y los
+mensajes del chatbot: exporta a .jsonl.gz y borra por lotes los meses
+completos que quedaron fuera de la retención de cada tenant.
+
+    python manage.py mantener_historicos [--fecha 2026-01-31] [--empresa norte]
+                                         [--historico bitacora] [--sin-exportar]
+                                         [--lote 2000] [--vacuum]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.models import Empresa
+from api.services.retencion_historicos import HISTORICOS, aplicar_retencion, vacuum
+
+
+class Command(BaseCommand):
+    help = 'Exporta y borra los meses de históricos fuera de la retención de cada tenant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Calcular la retención respecto de esta fecha (AAAA-MM-DD). Por defecto: hoy')
+        parser.add_argument('--empresa', help='Subdominio de la empresa (por defecto todas)')
+        parser.add_argument('--historico', action='append', choices=list(HISTORICOS),
+                            help='Histórico a mantener (repetible; por defecto todos)')
+        parser.add_argument('--sin-exportar', action='store_true', help='Borrar sin exportar los meses vencidos')
+        parser.add_argument('--lote', type=int, default=None, help='Filas por DELETE (por defecto RETENCION_HISTORICOS_LOTE)')
+        parser.add_argument('--vacuum', action='store_true', help='VACUUM ANALYZE de las tablas compactadas (PostgreSQL)')
+
+    def handle(self, *args, **options):
+        hoy = None
+        if options['fecha']:
+            hoy = parse_date(options['fecha'])
+            if hoy is None:
+                raise CommandError('--fecha debe tener el formato AAAA-MM-DD')
+
+        empresa = None
+        if options['empresa']:
+            try:
+                empresa = Empresa.objects.get(subdomain=options['empresa'])
+            except Empresa.DoesNotExist:
+                raise CommandError(f"No existe la empresa '{options['empresa']}'")
+
+        resumen = aplicar_retencion(
+            hoy=hoy,
+            historicos=options['historico'],
+            empresa=empresa,
+            exportar=not options['sin_exportar'],
+            lote=options['lote'],
+        )
+        for nombre, datos in resumen.items():
+            self.stdout.write(f"{nombre}: {datos['meses']} meses, {datos['filas']} filas retiradas")
+            if options['vacuum'] and datos['filas'] and vacuum(HISTORICOS[nombre]):
+                self.stdout.write(f"{nombre}: VACUUM ANALYZE")
+        self.stdout.write(self.style.SUCCESS('Retención de históricos aplicada'))
@@ -0,0 +1,58 @@
+# api/management/commands/procesar_webhooks_stripe.py
+"""
+Worker de la bandeja de webhooks de Stripe: procesa los eventos pendientes,
+los reintentos vencidos y las reservas expiradas, en orden por Payment Intent.
+
+    python manage.py procesar_webhooks_stripe [--limite 100] [--continuo --intervalo 5]
+
+Reproceso manual (vuelve a poner en cola y procesa):
+
+    python manage.py procesar_webhooks_stripe --reprocesar evt_123 evt_456
+    python manage.py procesar_webhooks_stripe --reprocesar-fallidos [--desde 2026-01-31]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api.models import EventoWebhookStripe
+from api.services.webhooks_stripe import procesar_pendientes, reprocesar
+
+
+class Command(BaseCommand):
+    help = 'Procesa (o reprocesa) los eventos de la bandeja de webhooks de Stripe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=100, help='Máximo de eventos por pasada')
+        parser.add_argument('--origen', choices=[o for o, _ in EventoWebhookStripe.ORIGEN_CHOICES])
+        parser.add_argument('--continuo', action='store_true', help='Seguir procesando hasta interrumpir (Ctrl+C)')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre pasadas con --continuo')
+        parser.add_argument('--reprocesar', nargs='+', metavar='EVENT_ID', help='Event IDs de Stripe a reprocesar')
+        parser.add_argument('--reprocesar-fallidos', action='store_true', help='Reprocesar los eventos fallidos')
+        parser.add_argument('--desde', help='Con --reprocesar-fallidos: solo recibidos desde esta fecha (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        eventos = EventoWebhookStripe.objects.all()
+        if options['origen']:
+            eventos = eventos.filter(origen=options['origen'])
+
+        if options['reprocesar']:
+            encolados = reprocesar(eventos.filter(event_id__in=options['reprocesar']))
+            self.stdout.write(f'{encolados} eventos puestos en cola nuevamente')
+        elif options['reprocesar_fallidos']:
+            fallidos = eventos.filter(estado=EventoWebhookStripe.ESTADO_FALLIDO)
+            if options['desde']:
+                desde = parse_date(options['desde'])
+                if desde is None:
+                    raise CommandError('--desde debe tener el formato AAAA-MM-DD')
+                fallidos = fallidos.filter(recibido_en__date__gte=desde)
+            self.stdout.write(f'{reprocesar(fallidos)} eventos fallidos puestos en cola nuevamente')
+
+        while True:
+            resumen = procesar_pendientes(options['limite'], origen=options['origen'])
+            if resumen:
+                detalle = ', '.join(f'{estado}: {cantidad}' for estado, cantidad in sorted(resumen.items()))
+                self.stdout.write(self.style.SUCCESS(f'Eventos procesados ({detalle})'))
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
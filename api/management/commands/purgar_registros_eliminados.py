@@ -0,0 +1,22 @@
+# api/management/commands/purgar_registros_eliminados.py
+"""
+Purga los tombstones de la sincronización incremental más viejos que la
+retención (SYNC_RETENCION_DIAS). Los clientes con una marca de agua anterior
+resincronizan desde cero.
+
+    python manage.py purgar_registros_eliminados [--dias 90]
+"""
+from django.core.management.base import BaseCommand
+
+from api.services.sincronizacion import purgar_eliminados
+
+
+class Command(BaseCommand):
+    help = 'Borra los registros eliminados (tombstones) fuera de la retención de sincronización'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None, help='Retención en días (por defecto SYNC_RETENCION_DIAS)')
+
+    def handle(self, *args, **options):
+        borrados = purgar_eliminados(options['dias'])
+        self.stdout.write(self.style.SUCCESS(f'{borrados} registros eliminados purgados'))
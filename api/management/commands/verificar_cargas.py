@@ -0,0 +1,45 @@
+# api/management/commands/verificar_cargas.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import CargaDirecta
+from api.services.cargas_directas import verificar_hash
+
+
+class Command(BaseCommand):
+    help = 'Calcula el hash de las cargas directas en verificación (multipart) y las deja verificadas o rechazadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help='Solo la empresa (tenant) indicada')
+        parser.add_argument('--limite', type=int, default=50, help='Máximo de cargas a verificar')
+        parser.add_argument(
+            '--minutos', type=int, default=None,
+            help='Solo cargas encoladas hace al menos N minutos (por defecto 30 si hay workers, 0 si no)'
+        )
+
+    def handle(self, *args, **options):
+        minutos = options['minutos']
+        if minutos is None:
+            # Con workers, las recientes las está procesando el pool: solo se
+            # retoman las que quedaron colgadas (p. ej. reinicio del proceso).
+            minutos = 30 if settings.DIRECT_UPLOAD_VERIFICATION_WORKERS > 0 else 0
+
+        qs = CargaDirecta.objects.filter(
+            estado=CargaDirecta.ESTADO_VERIFICANDO,
+            fecha_verificacion__lte=timezone.now() - timedelta(minutes=minutos),
+        ).order_by('fecha_verificacion')
+        if options['empresa']:
+            qs = qs.filter(empresa_id=options['empresa'])
+
+        resultados = {CargaDirecta.ESTADO_VERIFICADA: 0, CargaDirecta.ESTADO_RECHAZADA: 0, None: 0}
+        for carga_id in qs.values_list('id', flat=True)[:options['limite']]:
+            resultados[verificar_hash(carga_id)] += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultados[CargaDirecta.ESTADO_VERIFICADA]} verificadas, "
+            f"{resultados[CargaDirecta.ESTADO_RECHAZADA]} rechazadas, "
+            f"{resultados[None]} pendientes de reintento"
+        ))
@@ -40,15 +40,13 @@ def get_usuario_from_request(request):
         # Verificar si hay token en el header
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         if auth_header.startswith('Token '):
-            from rest_framework.authtoken.models import Token
-            token_key = auth_header.split(' ')[1]
-            try:
-                token = Token.objects.select_related('user').get(key=token_key)
-                request.user = token.user
-                print(f"[Token] Usuario autenticado: {token.user}")
-            except Token.DoesNotExist:
+            from .services.cache_tokens import token_valido
+            token = token_valido(auth_header.split(' ')[1], getattr(request, 'tenant', None))
+            if token is None:
                 print("[Token] Token no encontrado")
                 return None
+            request.user = token.user
+            print(f"[Token] Usuario autenticado: {token.user}")
 
         if hasattr(request, 'user') and request.user.is_authenticated:
             print(f"[Auth] Usuario autenticado: {request.user}")
@@ -0,0 +1,31 @@
+# api/middleware_replica.py
+"""
+Read-your-writes para la réplica de lectura (ver api/db_router.py).
+"""
+from .db_router import hubo_escritura, registrar_escritura, replica_configurada, seguimiento_escrituras
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Si un request de mutación (POST/PUT/PATCH/DELETE) escribió en la base, el
+    usuario queda fijado al primario unos segundos: sus lecturas siguientes no
+    van a una réplica que quizá aún no tiene esos cambios.
+
+    Las escrituras de un GET (bitácora, last_login...) no cuentan, así los
+    reportes no quedan fijados al primario por su propio registro de acceso.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configurada() or request.method in METODOS_SEGUROS:
+            return self.get_response(request)
+
+        with seguimiento_escrituras():
+            response = self.get_response(request)
+            if hubo_escritura():
+                # DRF deja en request.user el usuario autenticado por token
+                registrar_escritura(getattr(request, 'user', None))
+        return response
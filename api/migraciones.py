@@ -0,0 +1,33 @@
+"""
+Operaciones de migración para índices sobre tablas grandes (consulta,
+bitacora, pago_en_linea, historialnotificacion...).
+
+En PostgreSQL crean y borran el índice con CONCURRENTLY: no bloquean las
+escrituras de la tabla mientras se construye, a cambio de correr fuera de
+una transacción (la migración debe declarar `atomic = False`). En otros
+motores (SQLite en los tests) se comportan como AddIndex/RemoveIndex.
+"""
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db.migrations.operations import AddIndex, RemoveIndex
+
+
+class _SoloEnPostgres:
+    operacion_bloqueante = None
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return self.operacion_bloqueante.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return self.operacion_bloqueante.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class AgregarIndiceConcurrente(_SoloEnPostgres, AddIndexConcurrently):
+    operacion_bloqueante = AddIndex
+
+
+class QuitarIndiceConcurrente(_SoloEnPostgres, RemoveIndexConcurrently):
+    operacion_bloqueante = RemoveIndex
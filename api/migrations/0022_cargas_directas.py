@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:53
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_add_timestamps_to_consulta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CargaDirecta',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('destino', models.CharField(choices=[('documento_clinico', 'Documento Clínico'), ('evidencia', 'Evidencia')], max_length=30)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('completada', 'Completada'), ('rechazada', 'Rechazada')], default='pendiente', max_length=20)),
+                ('s3_key', models.CharField(max_length=500, unique=True)),
+                ('nombre_original', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=100)),
+                ('tamanio_declarado', models.PositiveBigIntegerField()),
+                ('sha256', models.CharField(help_text='Hash SHA-256 (hex) declarado por el cliente', max_length=64)),
+                ('metadatos', models.JSONField(blank=True, default=dict, help_text='Datos para crear el registro final')),
+                ('registro_id', models.CharField(blank=True, help_text='ID del registro creado', max_length=64, null=True)),
+                ('motivo_rechazo', models.CharField(blank=True, max_length=255, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_expiracion', models.DateTimeField()),
+                ('fecha_completado', models.DateTimeField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cargas_directas', to='api.empresa')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cargas_directas', to='api.usuario')),
+            ],
+            options={
+                'verbose_name': 'Carga Directa',
+                'verbose_name_plural': 'Cargas Directas',
+                'db_table': 'carga_directa',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['empresa', 'estado', '-fecha_creacion'], name='carga_direc_empresa_203f30_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_cargas_directas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cargadirecta',
+            name='tamanio_parte',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cargadirecta',
+            name='upload_id',
+            field=models.CharField(blank=True, help_text='UploadId del multipart upload en S3 (solo cargas por partes)', max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_cargas_multipart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentoclinico',
+            name='derivados',
+            field=models.JSONField(blank=True, default=dict, help_text='Keys S3 de las variantes generadas (miniatura, web, web_jpeg)'),
+        ),
+        migrations.AddField(
+            model_name='evidencia',
+            name='derivados',
+            field=models.JSONField(blank=True, default=dict, help_text='Keys de las variantes generadas (miniatura, web, web_jpeg)'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_derivados_imagen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlobAlmacenado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('ubicacion', models.CharField(choices=[('s3', 'S3'), ('local', 'Storage local')], default='s3', max_length=10)),
+                ('key', models.CharField(max_length=500, unique=True)),
+                ('tamanio', models.PositiveBigIntegerField()),
+                ('content_type', models.CharField(max_length=100)),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blobs', to='api.empresa')),
+            ],
+            options={
+                'verbose_name': 'Blob Almacenado',
+                'verbose_name_plural': 'Blobs Almacenados',
+                'db_table': 'blob_almacenado',
+            },
+        ),
+        migrations.AddField(
+            model_name='cargadirecta',
+            name='blob',
+            field=models.ForeignKey(blank=True, help_text='Contenido ya almacenado con el mismo hash (carga sin transferencia)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.blobalmacenado'),
+        ),
+        migrations.AddField(
+            model_name='documentoclinico',
+            name='blob',
+            field=models.ForeignKey(blank=True, help_text='Contenido compartido (deduplicado por SHA-256)', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documentos', to='api.blobalmacenado'),
+        ),
+        migrations.AddField(
+            model_name='evidencia',
+            name='blob',
+            field=models.ForeignKey(blank=True, help_text='Contenido compartido (deduplicado por SHA-256)', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='evidencias', to='api.blobalmacenado'),
+        ),
+        migrations.AddConstraint(
+            model_name='blobalmacenado',
+            constraint=models.UniqueConstraint(fields=('empresa', 'sha256', 'ubicacion'), name='blob_unico_por_empresa_hash'),
+        ),
+    ]
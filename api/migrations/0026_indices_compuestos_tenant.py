@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:22
+
+from django.db import migrations, models
+
+from api.migraciones import AgregarIndiceConcurrente, QuitarIndiceConcurrente
+
+
+class Migration(migrations.Migration):
+    # Índices sobre tablas con escrituras constantes: CONCURRENTLY (api/migraciones.py)
+    atomic = False
+
+    dependencies = [
+        ('api', '0025_blobs_deduplicados'),
+    ]
+
+    operations = [
+        QuitarIndiceConcurrente(
+            model_name='sesiontratamiento',
+            name='sesion_trat_item_pl_f07435_idx',
+        ),
+        AgregarIndiceConcurrente(
+            model_name='bitacora',
+            index=models.Index(fields=['empresa', '-timestamp'], name='idx_bitacora_empresa_ts'),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='consulta',
+            index=models.Index(fields=['empresa', 'fecha'], name='idx_consulta_empresa_fecha'),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='consulta',
+            index=models.Index(fields=['empresa', 'estado', 'fecha'], name='idx_consulta_emp_estado'),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='consulta',
+            index=models.Index(fields=['cododontologo', 'fecha'], name='idx_consulta_odont_fecha'),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='consulta',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'confirmada'])), fields=['fecha'], name='idx_consulta_abiertas'),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='historialnotificacion',
+            index=models.Index(fields=['estado', 'id'], name='idx_hist_notif_estado_id'),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='pagoenlinea',
+            index=models.Index(fields=['empresa', 'estado'], name='idx_pago_empresa_estado'),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='sesiontratamiento',
+            index=models.Index(fields=['item_plan', '-fecha_sesion', '-hora_inicio'], name='idx_sesion_item_fecha'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:40
+
+import django.db.models.deletion
+import django.db.models.functions.datetime
+import django.utils.timezone
+from django.db import migrations, models
+
+from api.migraciones import AgregarIndiceConcurrente
+
+
+class Migration(migrations.Migration):
+    # Índices sobre tablas con escrituras constantes: CONCURRENTLY (api/migraciones.py)
+    atomic = False
+
+    dependencies = [
+        ('api', '0026_indices_compuestos_tenant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entidad', models.CharField(help_text="Nombre de la entidad sincronizable (p. ej. 'consultas').", max_length=40)),
+                ('objeto_id', models.BigIntegerField()),
+                ('codusuario', models.BigIntegerField(blank=True, help_text='Usuario dueño del registro (paciente o destinatario), para filtrar por usuario.', null=True)),
+                ('eliminado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Registro eliminado',
+                'verbose_name_plural': 'Registros eliminados',
+                'db_table': 'registro_eliminado',
+            },
+        ),
+        migrations.AddField(
+            model_name='historialnotificacion',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, db_default=django.db.models.functions.datetime.Now()),
+        ),
+        migrations.AddField(
+            model_name='plandetratamiento',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, db_default=django.db.models.functions.datetime.Now(), help_text='Última modificación del plan (marca de agua de la sincronización).'),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='consulta',
+            index=models.Index(fields=['empresa', 'updated_at', 'id'], name='idx_consulta_emp_modif'),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='historialnotificacion',
+            index=models.Index(fields=['usuario', 'fecha_modificacion', 'id'], name='idx_hist_notif_usr_modif'),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='plandetratamiento',
+            index=models.Index(fields=['empresa', 'fecha_modificacion', 'id'], name='idx_plan_emp_modif'),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='sesiontratamiento',
+            index=models.Index(fields=['empresa', 'fecha_modificacion', 'id'], name='idx_sesion_emp_modif'),
+        ),
+        migrations.AddField(
+            model_name='registroeliminado',
+            name='empresa',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.empresa'),
+        ),
+        migrations.AddIndex(
+            model_name='registroeliminado',
+            index=models.Index(fields=['empresa', 'entidad', 'eliminado_en'], name='idx_eliminado_emp_ent'),
+        ),
+        migrations.AddIndex(
+            model_name='registroeliminado',
+            index=models.Index(fields=['codusuario', 'entidad', 'eliminado_en'], name='idx_eliminado_usr_ent'),
+        ),
+        migrations.AddIndex(
+            model_name='registroeliminado',
+            index=models.Index(fields=['eliminado_en'], name='idx_eliminado_fecha'),
+        ),
+    ]
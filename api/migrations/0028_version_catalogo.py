@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_sincronizacion_incremental'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('catalogo', models.CharField(max_length=40)),
+                ('version', models.PositiveBigIntegerField(default=1)),
+                ('modificado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.empresa')),
+            ],
+            options={
+                'verbose_name': 'Versión de catálogo',
+                'verbose_name_plural': 'Versiones de catálogos',
+                'db_table': 'version_catalogo',
+                'constraints': [models.UniqueConstraint(fields=('catalogo', 'empresa'), name='uniq_version_catalogo_empresa')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:54
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_version_catalogo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoWebhookStripe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255)),
+                ('tipo', models.CharField(max_length=100)),
+                ('origen', models.CharField(choices=[('pagos', 'Pagos de tratamientos y consultas'), ('suscripciones', 'Suscripciones SaaS')], default='pagos', max_length=20)),
+                ('payment_intent_id', models.CharField(blank=True, help_text='Payment Intent del evento; los eventos de un mismo intent se procesan en orden.', max_length=255, null=True)),
+                ('payload', models.JSONField()),
+                ('creado_stripe', models.DateTimeField(help_text='Campo `created` del evento en Stripe.')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('procesado', 'Procesado'), ('reintentar', 'Reintentar'), ('fallido', 'Fallido'), ('ignorado', 'Ignorado')], default='pendiente', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True, default='')),
+                ('recibido_en', models.DateTimeField(auto_now_add=True)),
+                ('procesado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de webhook de Stripe',
+                'verbose_name_plural': 'Eventos de webhooks de Stripe',
+                'db_table': 'evento_webhook_stripe',
+                'ordering': ['creado_stripe', 'id'],
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='idx_webhook_estado_prox'), models.Index(fields=['payment_intent_id', 'creado_stripe'], name='idx_webhook_intent')],
+                'constraints': [models.UniqueConstraint(fields=('origen', 'event_id'), name='uniq_webhook_origen_evento')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:21
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_evento_webhook_stripe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultaArchivada',
+            fields=[
+                ('id', models.IntegerField(help_text='Mismo id que tenía en la tabla consulta.', primary_key=True, serialize=False)),
+                ('codpaciente', models.IntegerField(help_text='codusuario del paciente.')),
+                ('cododontologo', models.IntegerField(blank=True, null=True)),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(blank=True, default='', max_length=20)),
+                ('datos', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Fila completa de la consulta al archivarla.')),
+                ('archivada_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.empresa')),
+            ],
+            options={
+                'verbose_name': 'Consulta archivada',
+                'verbose_name_plural': 'Consultas archivadas',
+                'db_table': 'consulta_archivada',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['empresa', 'fecha'], name='idx_consulta_arch_emp_fecha'), models.Index(fields=['codpaciente', 'fecha'], name='idx_consulta_arch_pac_fecha')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrabajoArchivoConsultas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_corte', models.DateField(help_text='Se archivan las consultas con fecha anterior a esta.')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=20)),
+                ('ultimo_id', models.BigIntegerField(default=0, help_text='Última consulta revisada (cursor del avance).')),
+                ('archivadas', models.PositiveIntegerField(default=0)),
+                ('retenidas', models.PositiveIntegerField(default=0, help_text='Consultas vencidas que siguen en la tabla porque otros registros las referencian.')),
+                ('ultimo_error', models.TextField(blank=True, default='')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('finalizado_en', models.DateTimeField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_archivo_consultas', to='api.empresa')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.usuario')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de archivado de consultas',
+                'verbose_name_plural': 'Trabajos de archivado de consultas',
+                'db_table': 'trabajo_archivo_consultas',
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['estado', 'actualizado_en'], name='idx_archivo_estado')],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from api.migraciones import AgregarIndiceConcurrente
+
+
+class Migration(migrations.Migration):
+    # Índices sobre tablas con escrituras constantes: CONCURRENTLY (api/migraciones.py)
+    atomic = False
+
+    dependencies = [
+        ('api', '0030_archivo_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PoliticaRetencion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('historico', models.CharField(choices=[('bitacora', 'Bitácora'), ('notificaciones', 'Historial de notificaciones'), ('chatbot', 'Mensajes del chatbot')], max_length=20)),
+                ('dias', models.PositiveIntegerField(help_text='Se retiran los meses completos más viejos que estos días.')),
+                ('exportar', models.BooleanField(default=True, help_text='Exportar a .jsonl.gz antes de borrar.')),
+            ],
+            options={
+                'verbose_name': 'Política de retención',
+                'verbose_name_plural': 'Políticas de retención',
+                'db_table': 'politica_retencion',
+            },
+        ),
+        migrations.CreateModel(
+            name='SegmentoHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('historico', models.CharField(choices=[('bitacora', 'Bitácora'), ('notificaciones', 'Historial de notificaciones'), ('chatbot', 'Mensajes del chatbot')], max_length=20)),
+                ('mes', models.DateField(help_text='Primer día del mes retirado.')),
+                ('filas', models.PositiveIntegerField(default=0)),
+                ('archivo', models.CharField(blank=True, default='', help_text='Ruta en el storage; vacío si no se exportó.', max_length=255)),
+                ('estado', models.CharField(choices=[('exportado', 'Exportado'), ('compactado', 'Compactado')], default='exportado', max_length=20)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('compactado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Segmento histórico',
+                'verbose_name_plural': 'Segmentos históricos',
+                'db_table': 'segmento_historico',
+                'ordering': ['historico', '-mes'],
+            },
+        ),
+        AgregarIndiceConcurrente(
+            model_name='historialnotificacion',
+            index=models.Index(fields=['usuario', 'fecha_creacion'], name='idx_hist_notif_usr_fecha'),
+        ),
+        migrations.AddField(
+            model_name='politicaretencion',
+            name='empresa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='politicas_retencion', to='api.empresa'),
+        ),
+        migrations.AddField(
+            model_name='segmentohistorico',
+            name='empresa',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.empresa'),
+        ),
+        migrations.AddConstraint(
+            model_name='politicaretencion',
+            constraint=models.UniqueConstraint(fields=('empresa', 'historico'), name='uniq_politica_retencion'),
+        ),
+        migrations.AddConstraint(
+            model_name='segmentohistorico',
+            constraint=models.UniqueConstraint(fields=('historico', 'empresa', 'mes'), name='uniq_segmento_historico'),
+        ),
+    ]
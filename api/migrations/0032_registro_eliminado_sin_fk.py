@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_retencion_historicos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registroeliminado',
+            name='empresa',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.empresa'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:37
+
+from django.db import migrations, models
+
+from api.migraciones import AgregarIndiceConcurrente, QuitarIndiceConcurrente
+
+
+class Migration(migrations.Migration):
+    # Índices sobre tablas con escrituras constantes: CONCURRENTLY (api/migraciones.py)
+    atomic = False
+
+    dependencies = [
+        ('api', '0032_registro_eliminado_sin_fk'),
+    ]
+
+    operations = [
+        # Primero el nuevo, para no dejar la bitácora sin índice entretanto
+        AgregarIndiceConcurrente(
+            model_name='bitacora',
+            index=models.Index(fields=['empresa', '-timestamp', '-id'], name='idx_bitacora_emp_ts_id'),
+        ),
+        QuitarIndiceConcurrente(
+            model_name='bitacora',
+            name='idx_bitacora_empresa_ts',
+        ),
+    ]
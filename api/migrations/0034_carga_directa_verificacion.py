@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_indice_bitacora_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cargadirecta',
+            name='fecha_verificacion',
+            field=models.DateTimeField(blank=True, help_text='Cuándo se encoló el cálculo del hash en segundo plano', null=True),
+        ),
+        migrations.AlterField(
+            model_name='cargadirecta',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('verificando', 'Verificando'), ('verificada', 'Verificada'), ('completada', 'Completada'), ('rechazada', 'Rechazada')], default='pendiente', max_length=20),
+        ),
+    ]
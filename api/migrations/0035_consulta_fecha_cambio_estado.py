@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:43
+
+from django.db import migrations, models
+
+from api.migraciones import AgregarIndiceConcurrente
+
+
+class Migration(migrations.Migration):
+    # Índices sobre tablas con escrituras constantes: CONCURRENTLY (api/migraciones.py)
+    atomic = False
+
+    dependencies = [
+        ('api', '0034_carga_directa_verificacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consulta',
+            name='fecha_cambio_estado',
+            field=models.DateTimeField(blank=True, help_text='Último cambio de idestadoconsulta (lo escribe save(); las políticas de no-show lo usan)', null=True),
+        ),
+        AgregarIndiceConcurrente(
+            model_name='consulta',
+            index=models.Index(fields=['empresa', 'fecha_cambio_estado'], name='idx_consulta_emp_cambio'),
+        ),
+    ]
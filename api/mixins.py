@@ -0,0 +1,262 @@
+# api/mixins.py
+"""
+Mixins reutilizables para los ViewSets y serializers de la API.
+"""
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+from .db_router import activar_lectura_replica, desactivar_lectura_replica
+from .services.cache_catalogos import cache_respuestas, etag, version_catalogo
+
+PARAMETRO_CAMPOS = 'fields'
+PARAMETRO_EXPANDIR = 'expand'
+METODOS_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+
+
+def forma_solicitada(request):
+    """
+    Campos pedidos con `?fields=` y relaciones pedidas con `?expand=` como
+    conjuntos (None si el parámetro no vino). Solo en lecturas: en escrituras
+    devuelve (None, None) y la respuesta no cambia.
+    """
+    if request is None or request.method not in METODOS_LECTURA:
+        return None, None
+    params = getattr(request, 'query_params', request.GET)
+
+    def lista(nombre):
+        if nombre not in params:
+            return None
+        return {campo.strip() for campo in params.get(nombre, '').split(',') if campo.strip()}
+
+    return lista(PARAMETRO_CAMPOS), lista(PARAMETRO_EXPANDIR)
+
+
+class ProyeccionListaMixin:
+    """
+    Perfil de proyección de columnas para las acciones de listado.
+
+    En `list` se difieren las columnas pesadas (`campos_diferidos_lista`) o se
+    restringe el SELECT a `campos_lista` (excluyentes entre sí), y se usa
+    `list_serializer_class` si está definido. Las demás acciones (retrieve,
+    descargas, exportaciones) siguen cargando la fila completa.
+
+    Uso:
+        class ConsentimientoViewSet(ProyeccionListaMixin, ModelViewSet):
+            list_serializer_class = ConsentimientoListSerializer
+            campos_diferidos_lista = ('texto_contenido', 'firma_base64', 'pdf_firmado')
+    """
+    list_serializer_class = None
+    campos_diferidos_lista = ()
+    campos_lista = ()
+
+    def es_accion_lista(self):
+        return getattr(self, 'action', None) == 'list'
+
+    def aplicar_proyeccion_lista(self, queryset):
+        if self.campos_lista:
+            return queryset.only(*self.campos_lista)
+        if self.campos_diferidos_lista:
+            return queryset.defer(*self.campos_diferidos_lista)
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.es_accion_lista():
+            queryset = self.aplicar_proyeccion_lista(queryset)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.es_accion_lista() and self.list_serializer_class is not None:
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+
+class LecturaReplicaMixin:
+    """
+    Envía las lecturas de las acciones en `acciones_replica` a la réplica
+    (api/db_router.py), con vuelta al primario si la réplica va atrasada o si
+    el usuario acaba de escribir. Solo para acciones de solo lectura.
+
+    Uso:
+        class ReporteViewSet(LecturaReplicaMixin, ViewSet):
+            acciones_replica = ('list', 'estadisticas')
+    """
+    acciones_replica = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Después de autenticar: hace falta request.user para read-your-writes
+        if getattr(self, 'action', None) in self.acciones_replica:
+            self._token_lectura_replica = activar_lectura_replica(request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_token_lectura_replica', None)
+        if token is not None:
+            self._token_lectura_replica = None
+            desactivar_lectura_replica(token)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class CamposDinamicosSerializerMixin:
+    """
+    Respuesta con la forma que pide el cliente.
+
+    - `?fields=id,fecha` devuelve solo esos campos; los demás (incluidos los
+      SerializerMethodField) no se calculan.
+    - `?expand=codpaciente` devuelve anidadas las relaciones de
+      `campos_expandibles` indicadas (y las incluye aunque no estén en
+      `fields`). Cuando se usa cualquiera de los dos parámetros, las
+      relaciones expandibles no expandidas se devuelven como id.
+
+    Sin parámetros la respuesta es la completa de siempre. Solo aplica al
+    serializer raíz de una lectura (los anidados no reciben el request).
+
+    Uso:
+        class ConsultaSerializer(CamposDinamicosSerializerMixin, ModelSerializer):
+            campos_expandibles = ('codpaciente', 'cododontologo')
+    """
+    campos_expandibles = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos, expandir = forma_solicitada(self.context.get('request'))
+        if campos is None and expandir is None:
+            return
+        expandir = expandir or set()
+        if campos is not None:
+            for nombre in set(self.fields) - campos - expandir:
+                self.fields.pop(nombre)
+        for nombre in self.campos_expandibles:
+            if nombre in self.fields and nombre not in expandir:
+                self.fields[nombre] = self.campo_id(self.fields[nombre])
+
+    @staticmethod
+    def campo_id(campo):
+        """Reemplazo de una relación anidada por su clave primaria."""
+        kwargs = {'read_only': True}
+        if campo.source != campo.field_name:
+            kwargs['source'] = campo.source
+        if isinstance(campo, serializers.ListSerializer):
+            kwargs['many'] = True
+        return serializers.PrimaryKeyRelatedField(**kwargs)
+
+
+class CamposDinamicosViewMixin:
+    """
+    Carga de relaciones según `?fields=` / `?expand=` (ver
+    CamposDinamicosSerializerMixin): a la carga anticipada que ya define el
+    `get_queryset` de la vista se suman las relaciones que necesitan los
+    campos que se van a serializar (p. ej. un `?expand=` que la vista no
+    carga por defecto). Nunca se quita la existente: otros campos o
+    propiedades del serializer pueden depender de ella y caerían en N+1.
+
+    Uso:
+        class ConsultaViewSet(CamposDinamicosViewMixin, ModelViewSet):
+            select_related_campos = {'codpaciente': ('codpaciente__codusuario',)}
+            prefetch_related_campos = {'items': ('items_presupuesto',)}
+    """
+    select_related_campos = {}
+    prefetch_related_campos = {}
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        campos, expandir = forma_solicitada(self.request)
+        if campos is None and expandir is None:
+            return queryset
+        expandir = expandir or set()
+        expandibles = set(getattr(self.get_serializer_class(), 'campos_expandibles', ()))
+
+        def se_serializa_anidado(campo):
+            if campos is not None and campo not in campos and campo not in expandir:
+                return False
+            return campo not in expandibles or campo in expandir
+
+        select = [
+            ruta for campo, rutas in self.select_related_campos.items()
+            if se_serializa_anidado(campo) for ruta in rutas
+        ]
+        prefetch = [
+            ruta for campo, rutas in self.prefetch_related_campos.items()
+            if se_serializa_anidado(campo) for ruta in rutas
+        ]
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+def _datos_planos(datos):
+    """Copia de `response.data` sin las referencias al serializer (ReturnList/ReturnDict)."""
+    if isinstance(datos, dict):
+        return {clave: _datos_planos(valor) for clave, valor in datos.items()}
+    if isinstance(datos, list):
+        return [_datos_planos(valor) for valor in datos]
+    return datos
+
+
+class CacheCatalogoMixin:
+    """
+    Caché HTTP por tenant para catálogos que cambian poco
+    (api/services/cache_catalogos.py).
+
+    En `list` y `retrieve`: ETag y Last-Modified según la versión del
+    catálogo, 304 ante un `If-None-Match` vigente sin ejecutar el queryset, y
+    cuerpo servido desde el LRU del proceso mientras la versión no cambie. Los
+    permisos se verifican antes, como en cualquier GET.
+
+    El único validador es el ETag: `If-Modified-Since` tiene resolución de un
+    segundo y dos escrituras en el mismo segundo devolverían un 304 obsoleto.
+    Last-Modified se envía solo como dato informativo.
+
+    Uso:
+        class HorarioViewSet(CacheCatalogoMixin, ReadOnlyModelViewSet):
+            catalogo = 'horarios'
+    """
+    catalogo = None
+
+    def list(self, request, *args, **kwargs):
+        return self.responder_catalogo(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.responder_catalogo(request, super().retrieve, *args, **kwargs)
+
+    @staticmethod
+    def no_modificado(request, etiqueta):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if not if_none_match:
+            return False
+        etiquetas = {e.removeprefix('W/') for e in parse_etags(if_none_match)}
+        return '*' in etiquetas or etiqueta.removeprefix('W/') in etiquetas
+
+    def responder_catalogo(self, request, vista, *args, **kwargs):
+        empresa = getattr(request, 'tenant', None)
+        if not settings.CATALOGO_CACHE_ENABLED or empresa is None or self.catalogo is None:
+            return vista(request, *args, **kwargs)
+
+        version, modificado = version_catalogo(self.catalogo, empresa)
+        variante = f'{request.get_full_path()}|{request.accepted_media_type}'
+        etiqueta = etag(self.catalogo, empresa, version, variante)
+
+        if self.no_modificado(request, etiqueta):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            clave = (self.catalogo, empresa.pk, version, variante)
+            datos = cache_respuestas().obtener(clave)
+            if datos is None:
+                response = vista(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache_respuestas().guardar(clave, _datos_planos(response.data))
+            else:
+                response = Response(datos)
+
+        response['ETag'] = etiqueta
+        if modificado:
+            response['Last-Modified'] = http_date(modificado.timestamp())
+        patch_cache_control(response, private=True, must_revalidate=True, max_age=settings.CATALOGO_CACHE_MAX_AGE)
+        patch_vary_headers(response, ('Authorization', 'X-Tenant-Subdomain'))
+        return response
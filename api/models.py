@@ -1,10 +1,27 @@
 from django.db import models
+from django.db.models.functions import Now
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 import uuid
 
 
+class ModificacionRastreadaMixin:
+    """
+    Mantiene al día el campo auto_now `campo_modificacion` también en los
+    save(update_fields=[...]), que de otro modo no lo escriben. Es la marca de
+    agua de la sincronización incremental (api/services/sincronizacion.py).
+    """
+    campo_modificacion = 'fecha_modificacion'
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields and self.campo_modificacion not in update_fields:
+            kwargs['update_fields'] = [*update_fields, self.campo_modificacion]
+        super().save(*args, **kwargs)
+
+
 # +++ NUEVO MODELO EMPRESA +++
 class Empresa(models.Model):
     """Representa a un cliente (una clínica dental) en el sistema SaaS."""
@@ -92,7 +109,7 @@ class Recepcionista(models.Model):
         db_table = 'recepcionista'
 
 
-class Consulta(models.Model):
+class Consulta(ModificacionRastreadaMixin, models.Model):
     fecha = models.DateField()
     codpaciente = models.ForeignKey(Paciente, models.DO_NOTHING, db_column='codpaciente')
     cododontologo = models.ForeignKey(Odontologo, models.DO_NOTHING, db_column='cododontologo', blank=True, null=True)
@@ -289,12 +306,60 @@ class Consulta(models.Model):
         auto_now=True,
         help_text="Fecha y hora de última actualización"
     )
+    campo_modificacion = 'updated_at'  # ModificacionRastreadaMixin
+    fecha_cambio_estado = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Último cambio de idestadoconsulta (lo escribe save(); las políticas de no-show lo usan)"
+    )
 
     class Meta:
         db_table = 'consulta'
         indexes = [
             models.Index(fields=['plan_tratamiento'], name='idx_consulta_plan'),
+            # Agenda y reportes del tenant por rango de fechas
+            models.Index(fields=['empresa', 'fecha'], name='idx_consulta_empresa_fecha'),
+            models.Index(fields=['empresa', 'estado', 'fecha'], name='idx_consulta_emp_estado'),
+            # Horarios ocupados del odontólogo en un día
+            models.Index(fields=['cododontologo', 'fecha'], name='idx_consulta_odont_fecha'),
+            # Sincronización incremental de la app móvil (marca de agua updated_at)
+            models.Index(fields=['empresa', 'updated_at', 'id'], name='idx_consulta_emp_modif'),
+            # Evaluación por lotes de las políticas de no-show
+            models.Index(fields=['empresa', 'fecha_cambio_estado'], name='idx_consulta_emp_cambio'),
+            # Jobs sobre citas abiertas (recordatorios, no-show): índice parcial
+            models.Index(
+                fields=['fecha'],
+                condition=models.Q(estado__in=['pendiente', 'confirmada']),
+                name='idx_consulta_abiertas',
+            ),
         ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Estado con el que se cargó (o se creó) la fila: save() detecta su
+        # cambio sin releerla. None si el campo quedó diferido (.only()).
+        self._estado_consulta_original = self.__dict__.get('idestadoconsulta_id')
+
+    def _cambia_estado(self, update_fields):
+        if self._state.adding or self.pk is None:
+            return False
+        if update_fields is not None and not {'idestadoconsulta', 'idestadoconsulta_id'} & set(update_fields):
+            return False
+        original = self._estado_consulta_original
+        if original is None:
+            original = type(self).objects.filter(pk=self.pk).values_list('idestadoconsulta_id', flat=True).first()
+        return original is not None and original != self.idestadoconsulta_id
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Marca del cambio de estado (el pre_save de no_show_policies la lee)
+        self._cambio_de_estado = self._cambia_estado(update_fields)
+        if self._cambio_de_estado:
+            self.fecha_cambio_estado = timezone.now()
+            if update_fields is not None and 'fecha_cambio_estado' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'fecha_cambio_estado']
+        super().save(*args, **kwargs)
+        self._estado_consulta_original = self.idestadoconsulta_id
     
     # SP3-T009: Métodos para gestión de pagos de consultas
     def calcular_costo_prepago(self):
@@ -1126,7 +1191,7 @@ class Imtemreceta(models.Model):
         db_table = 'itemreceta'
 
 
-class Plandetratamiento(models.Model):
+class Plandetratamiento(ModificacionRastreadaMixin, models.Model):
     """
     Plan de tratamiento / Presupuesto dental.
     
@@ -1293,6 +1358,11 @@ class Plandetratamiento(models.Model):
         blank=True,
         help_text="Firma digital del paciente en formato JSON. Incluye timestamp, IP, user agent, etc."
     )
+    fecha_modificacion = models.DateTimeField(
+        auto_now=True,
+        db_default=Now(),
+        help_text="Última modificación del plan (marca de agua de la sincronización)."
+    )
     
     class Meta:
         db_table = 'plandetratamiento'
@@ -1302,6 +1372,7 @@ class Plandetratamiento(models.Model):
         indexes = [
             models.Index(fields=['consulta_diagnostico'], name='idx_plan_consulta'),
             models.Index(fields=['estado_tratamiento'], name='idx_plan_estado_trat'),
+            models.Index(fields=['empresa', 'fecha_modificacion', 'id'], name='idx_plan_emp_modif'),
         ]
     
     def __str__(self):
@@ -1469,6 +1540,7 @@ class Plandetratamiento(models.Model):
         Marca items con pagos aprobados como 'bloqueados' para edición.
         """
         from decimal import Decimal
+        from api.services.recalculo_diferido import recalculo_diferido
         
         # Obtener items con pagos aprobados
         items_con_pagos = self.itemplandetratamiento_set.filter(
@@ -1476,16 +1548,18 @@ class Plandetratamiento(models.Model):
         ).distinct()
         
         # Marcar como no editables (via notas_item o campo futuro)
-        for item in items_con_pagos:
-            monto_pagado = item.calcular_monto_pagado()
-            if monto_pagado > Decimal('0'):
-                # Actualizar notas para indicar bloqueo por pagos
-                nota_bloqueo = f"[BLOQUEADO POR PAGO: ${monto_pagado}]"
-                if not item.notas_item:
-                    item.notas_item = nota_bloqueo
-                elif nota_bloqueo not in item.notas_item:
-                    item.notas_item = f"{nota_bloqueo}\n{item.notas_item}"
-                item.save(update_fields=['notas_item'])
+        # Los signals de cada ítem se agrupan en un solo recálculo del plan
+        with recalculo_diferido():
+            for item in items_con_pagos:
+                monto_pagado = item.calcular_monto_pagado()
+                if monto_pagado > Decimal('0'):
+                    # Actualizar notas para indicar bloqueo por pagos
+                    nota_bloqueo = f"[BLOQUEADO POR PAGO: ${monto_pagado}]"
+                    if not item.notas_item:
+                        item.notas_item = nota_bloqueo
+                    elif nota_bloqueo not in item.notas_item:
+                        item.notas_item = f"{nota_bloqueo}\n{item.notas_item}"
+                    item.save(update_fields=['notas_item'])
         
         return items_con_pagos.count()
     
@@ -2293,7 +2367,7 @@ class Itemplandetratamiento(models.Model):
         return timezone.now() - self.fecha_ejecucion
 
 
-class SesionTratamiento(models.Model):
+class SesionTratamiento(ModificacionRastreadaMixin, models.Model):
     """
     Sesión de avance/procedimiento clínico realizado sobre un ítem del plan de tratamiento.
     Implementa SP3-T008: Registrar procedimiento clínico (web)
@@ -2415,9 +2489,11 @@ class SesionTratamiento(models.Model):
             )
         ]
         indexes = [
-            models.Index(fields=['item_plan', 'fecha_sesion']),
+            # Última sesión del ítem (ORDER BY -fecha_sesion, -hora_inicio)
+            models.Index(fields=['item_plan', '-fecha_sesion', '-hora_inicio'], name='idx_sesion_item_fecha'),
             models.Index(fields=['consulta']),
             models.Index(fields=['empresa', 'fecha_sesion']),
+            models.Index(fields=['empresa', 'fecha_modificacion', 'id'], name='idx_sesion_emp_modif'),
         ]
     
     def __str__(self):
@@ -2741,6 +2817,10 @@ class Bitacora(models.Model):
         db_table = 'bitacora'
         verbose_name = 'Bitácora'
         verbose_name_plural = 'Bitácoras'
+        indexes = [
+            # Con el id para que el cursor (-timestamp, -id) lea en el orden del índice
+            models.Index(fields=['empresa', '-timestamp', '-id'], name='idx_bitacora_emp_ts_id'),
+        ]
 
     def __str__(self):
         usuario_nombre = self.usuario.nombre if self.usuario else "Sistema"
@@ -2829,6 +2909,19 @@ class DocumentoClinico(models.Model):
     )
     fecha_documento = models.DateField(help_text="Fecha del documento médico")
     notas = models.TextField(blank=True, null=True)
+    derivados = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Keys S3 de las variantes generadas (miniatura, web, web_jpeg)"
+    )
+    blob = models.ForeignKey(
+        'BlobAlmacenado',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='documentos',
+        help_text="Contenido compartido (deduplicado por SHA-256)"
+    )
 
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
@@ -3467,6 +3560,19 @@ class Evidencia(models.Model):
         blank=True,
         help_text="IP desde donde se subió el archivo"
     )
+    derivados = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Keys de las variantes generadas (miniatura, web, web_jpeg)"
+    )
+    blob = models.ForeignKey(
+        'BlobAlmacenado',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='evidencias',
+        help_text="Contenido compartido (deduplicado por SHA-256)"
+    )
     
     class Meta:
         db_table = 'evidencias'
@@ -3491,7 +3597,18 @@ class Evidencia(models.Model):
     
     def delete(self, *args, **kwargs):
         """Eliminar archivo físico al borrar registro"""
-        if self.archivo:
+        from api.services.cargas_directas import esta_en_s3
+        from api.services.derivados_imagen import eliminar_derivados
+        if self.blob_id:
+            # Contenido compartido: la referencia la libera el post_delete
+            # (api/signals_blobs.py), también en borrados en cascada
+            return super().delete(*args, **kwargs)
+        eliminar_derivados(self)
+        if self.archivo and esta_en_s3(self.archivo.name):
+            # Subida directa: el objeto vive en S3
+            from api.services.storage_gateway import get_storage_gateway
+            get_storage_gateway().eliminar(self.archivo.name)
+        elif self.archivo:
             # Eliminar archivo físico del storage
             self.archivo.delete(save=False)
         super().delete(*args, **kwargs)
@@ -3506,6 +3623,148 @@ class Evidencia(models.Model):
         return f"{size:.2f} TB"
 
 
+# ============================================================================
+# ALMACENAMIENTO DEDUPLICADO (contenido direccionado por SHA-256)
+# ============================================================================
+class BlobAlmacenado(models.Model):
+    """
+    Contenido único de un archivo dentro de un tenant. Evidencias y documentos
+    con el mismo SHA-256 apuntan al mismo blob; `referencias` cuenta cuántos
+    registros lo usan y el objeto físico se elimina al liberar el último.
+    """
+    UBICACION_S3 = 's3'
+    UBICACION_LOCAL = 'local'
+    UBICACION_CHOICES = [
+        (UBICACION_S3, 'S3'),
+        (UBICACION_LOCAL, 'Storage local'),
+    ]
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='blobs')
+    sha256 = models.CharField(max_length=64)
+    ubicacion = models.CharField(max_length=10, choices=UBICACION_CHOICES, default=UBICACION_S3)
+    key = models.CharField(max_length=500, unique=True)
+    tamanio = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100)
+    referencias = models.PositiveIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'blob_almacenado'
+        verbose_name = 'Blob Almacenado'
+        verbose_name_plural = 'Blobs Almacenados'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['empresa', 'sha256', 'ubicacion'],
+                name='blob_unico_por_empresa_hash'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:12]}… ({self.referencias} ref.)"
+
+
+# ============================================================================
+# CARGAS DIRECTAS A S3 (presigned POST)
+# ============================================================================
+class CargaDirecta(models.Model):
+    """
+    Carga de archivo en dos fases: la API emite un presigned POST, el cliente
+    sube el archivo directo a S3 y luego llama a "completar", que valida el
+    objeto (tamaño, tipo y hash) y crea el DocumentoClinico/Evidencia.
+    Si el hash debe calcularse leyendo el objeto (multipart), la carga pasa a
+    "verificando" hasta que un worker lo compruebe y queda "verificada".
+    """
+    DESTINO_DOCUMENTO = 'documento_clinico'
+    DESTINO_EVIDENCIA = 'evidencia'
+    DESTINO_CHOICES = [
+        (DESTINO_DOCUMENTO, 'Documento Clínico'),
+        (DESTINO_EVIDENCIA, 'Evidencia'),
+    ]
+
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_VERIFICANDO = 'verificando'
+    ESTADO_VERIFICADA = 'verificada'
+    ESTADO_COMPLETADA = 'completada'
+    ESTADO_RECHAZADA = 'rechazada'
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_VERIFICANDO, 'Verificando'),
+        (ESTADO_VERIFICADA, 'Verificada'),
+        (ESTADO_COMPLETADA, 'Completada'),
+        (ESTADO_RECHAZADA, 'Rechazada'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='cargas_directas')
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='cargas_directas'
+    )
+    destino = models.CharField(max_length=30, choices=DESTINO_CHOICES)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default=ESTADO_PENDIENTE)
+
+    s3_key = models.CharField(max_length=500, unique=True)
+    nombre_original = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    tamanio_declarado = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64, help_text="Hash SHA-256 (hex) declarado por el cliente")
+    metadatos = models.JSONField(default=dict, blank=True, help_text="Datos para crear el registro final")
+
+    # Carga reanudable por partes (S3 multipart upload)
+    upload_id = models.CharField(
+        max_length=255, null=True, blank=True,
+        help_text="UploadId del multipart upload en S3 (solo cargas por partes)"
+    )
+    tamanio_parte = models.PositiveIntegerField(null=True, blank=True)
+    blob = models.ForeignKey(
+        BlobAlmacenado,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Contenido ya almacenado con el mismo hash (carga sin transferencia)"
+    )
+
+    registro_id = models.CharField(max_length=64, null=True, blank=True, help_text="ID del registro creado")
+    motivo_rechazo = models.CharField(max_length=255, null=True, blank=True)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_expiracion = models.DateTimeField()
+    fecha_verificacion = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Cuándo se encoló el cálculo del hash en segundo plano"
+    )
+    fecha_completado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'carga_directa'
+        verbose_name = 'Carga Directa'
+        verbose_name_plural = 'Cargas Directas'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['empresa', 'estado', '-fecha_creacion']),
+        ]
+
+    def __str__(self):
+        return f"{self.destino} - {self.nombre_original} ({self.estado})"
+
+    def esta_vigente(self):
+        return self.estado == self.ESTADO_PENDIENTE and self.fecha_expiracion > timezone.now()
+
+    @property
+    def es_multipart(self):
+        return bool(self.upload_id)
+
+    @property
+    def total_partes(self):
+        if not self.tamanio_parte:
+            return 1
+        return -(-self.tamanio_declarado // self.tamanio_parte)
+
+
 # ============================================================================
 # SISTEMA DE PAGOS EN LÍNEA - SP3-T009
 # ============================================================================
@@ -3759,6 +4018,7 @@ class PagoEnLinea(models.Model):
         indexes = [
             models.Index(fields=['empresa', '-fecha_creacion']),
             models.Index(fields=['estado', '-fecha_creacion']),
+            models.Index(fields=['empresa', 'estado'], name='idx_pago_empresa_estado'),
             models.Index(fields=['usuario', '-fecha_creacion']),
             models.Index(fields=['plan_tratamiento']),
             models.Index(fields=['consulta']),
@@ -4121,9 +4381,279 @@ class ComprobanteDigital(models.Model):
         
         # Crear comprobante
         comprobante = cls.objects.create(
+            empresa=pago.empresa,
             pago=pago,
             estado=cls.ESTADO_ACTIVO,
             datos_comprobante=datos_comprobante
         )
         
         return comprobante
+
+
+class RegistroEliminado(models.Model):
+    """
+    Tombstone de un registro borrado, para que la sincronización incremental
+    de la app móvil (api/services/sincronizacion.py) informe las bajas. Se
+    crea desde post_delete (api/signals_sincronizacion.py) y se purga con
+    `purgar_registros_eliminados`.
+    """
+    entidad = models.CharField(max_length=40, help_text="Nombre de la entidad sincronizable (p. ej. 'consultas').")
+    objeto_id = models.BigIntegerField()
+    # Sin restricción FK: los post_delete de la cascada al eliminar una empresa
+    # crean tombstones de esa misma empresa. Se purgan con la retención.
+    empresa = models.ForeignKey(
+        Empresa, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    codusuario = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="Usuario dueño del registro (paciente o destinatario), para filtrar por usuario."
+    )
+    eliminado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'registro_eliminado'
+        verbose_name = 'Registro eliminado'
+        verbose_name_plural = 'Registros eliminados'
+        indexes = [
+            models.Index(fields=['empresa', 'entidad', 'eliminado_en'], name='idx_eliminado_emp_ent'),
+            models.Index(fields=['codusuario', 'entidad', 'eliminado_en'], name='idx_eliminado_usr_ent'),
+            models.Index(fields=['eliminado_en'], name='idx_eliminado_fecha'),
+        ]
+
+    def __str__(self):
+        return f"{self.entidad} #{self.objeto_id} eliminado {self.eliminado_en:%Y-%m-%d %H:%M}"
+
+
+class VersionCatalogo(models.Model):
+    """
+    Versión de un catálogo por tenant (tipos de consulta, estados, horarios,
+    servicios...). Se incrementa en cada escritura del catálogo y es la base
+    del ETag/Last-Modified de sus endpoints (api/services/cache_catalogos.py).
+    `empresa` nulo es la versión de las filas globales del catálogo.
+    """
+    catalogo = models.CharField(max_length=40)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True)
+    version = models.PositiveBigIntegerField(default=1)
+    modificado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'version_catalogo'
+        verbose_name = 'Versión de catálogo'
+        verbose_name_plural = 'Versiones de catálogos'
+        constraints = [
+            models.UniqueConstraint(fields=['catalogo', 'empresa'], name='uniq_version_catalogo_empresa'),
+        ]
+
+    def __str__(self):
+        return f"{self.catalogo} (empresa {self.empresa_id}) v{self.version}"
+
+
+class EventoWebhookStripe(models.Model):
+    """
+    Bandeja de entrada de webhooks de Stripe. El endpoint solo verifica la
+    firma, guarda el evento (event_id único por endpoint: los reintentos de
+    Stripe no se duplican) y responde; el procesamiento lo hace
+    api/services/webhooks_stripe.py en orden por Payment Intent, con
+    reintentos y reproceso manual (`procesar_webhooks_stripe`).
+    """
+    ORIGEN_PAGOS = 'pagos'
+    ORIGEN_SUSCRIPCIONES = 'suscripciones'
+
+    ORIGEN_CHOICES = [
+        (ORIGEN_PAGOS, 'Pagos de tratamientos y consultas'),
+        (ORIGEN_SUSCRIPCIONES, 'Suscripciones SaaS'),
+    ]
+
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_PROCESANDO = 'procesando'
+    ESTADO_PROCESADO = 'procesado'
+    ESTADO_REINTENTAR = 'reintentar'
+    ESTADO_FALLIDO = 'fallido'
+    ESTADO_IGNORADO = 'ignorado'
+
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_PROCESANDO, 'Procesando'),
+        (ESTADO_PROCESADO, 'Procesado'),
+        (ESTADO_REINTENTAR, 'Reintentar'),
+        (ESTADO_FALLIDO, 'Fallido'),
+        (ESTADO_IGNORADO, 'Ignorado'),
+    ]
+
+    event_id = models.CharField(max_length=255)
+    tipo = models.CharField(max_length=100)
+    origen = models.CharField(max_length=20, choices=ORIGEN_CHOICES, default=ORIGEN_PAGOS)
+    payment_intent_id = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="Payment Intent del evento; los eventos de un mismo intent se procesan en orden."
+    )
+    payload = models.JSONField()
+    creado_stripe = models.DateTimeField(help_text="Campo `created` del evento en Stripe.")
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default=ESTADO_PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True, default='')
+    recibido_en = models.DateTimeField(auto_now_add=True)
+    procesado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'evento_webhook_stripe'
+        ordering = ['creado_stripe', 'id']
+        verbose_name = 'Evento de webhook de Stripe'
+        verbose_name_plural = 'Eventos de webhooks de Stripe'
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento'], name='idx_webhook_estado_prox'),
+            models.Index(fields=['payment_intent_id', 'creado_stripe'], name='idx_webhook_intent'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['origen', 'event_id'], name='uniq_webhook_origen_evento'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} {self.event_id} ({self.estado})"
+
+
+class ConsultaArchivada(models.Model):
+    """
+    Consulta pasada movida fuera de la tabla `consulta` por el archivado por
+    lotes (api/services/archivo_consultas.py). Conserva el mismo id y una
+    copia completa de la fila en `datos`; las columnas sueltas son las que se
+    usan para consultar el historial.
+    """
+    id = models.IntegerField(primary_key=True, help_text="Mismo id que tenía en la tabla consulta.")
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True)
+    codpaciente = models.IntegerField(help_text="codusuario del paciente.")
+    cododontologo = models.IntegerField(null=True, blank=True)
+    fecha = models.DateField()
+    estado = models.CharField(max_length=20, blank=True, default='')
+    datos = models.JSONField(encoder=DjangoJSONEncoder, help_text="Fila completa de la consulta al archivarla.")
+    archivada_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'consulta_archivada'
+        ordering = ['-fecha', '-id']
+        verbose_name = 'Consulta archivada'
+        verbose_name_plural = 'Consultas archivadas'
+        indexes = [
+            models.Index(fields=['empresa', 'fecha'], name='idx_consulta_arch_emp_fecha'),
+            models.Index(fields=['codpaciente', 'fecha'], name='idx_consulta_arch_pac_fecha'),
+        ]
+
+    def __str__(self):
+        return f"Consulta archivada #{self.id} ({self.fecha})"
+
+
+class TrabajoArchivoConsultas(models.Model):
+    """
+    Archivado de las consultas de un tenant anteriores a `fecha_corte`. Se
+    procesa por lotes (`archivar_consultas` o el pool que programa el
+    endpoint) y guarda el avance: `ultimo_id` es el cursor para retomarlo
+    si se interrumpe.
+    """
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_EN_CURSO = 'en_curso'
+    ESTADO_COMPLETADO = 'completado'
+    ESTADO_FALLIDO = 'fallido'
+
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_EN_CURSO, 'En curso'),
+        (ESTADO_COMPLETADO, 'Completado'),
+        (ESTADO_FALLIDO, 'Fallido'),
+    ]
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='trabajos_archivo_consultas')
+    fecha_corte = models.DateField(help_text="Se archivan las consultas con fecha anterior a esta.")
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default=ESTADO_PENDIENTE)
+    ultimo_id = models.BigIntegerField(default=0, help_text="Última consulta revisada (cursor del avance).")
+    archivadas = models.PositiveIntegerField(default=0)
+    retenidas = models.PositiveIntegerField(
+        default=0,
+        help_text="Consultas vencidas que siguen en la tabla porque otros registros las referencian."
+    )
+    solicitado_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True)
+    ultimo_error = models.TextField(blank=True, default='')
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+    finalizado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'trabajo_archivo_consultas'
+        ordering = ['-creado_en']
+        verbose_name = 'Trabajo de archivado de consultas'
+        verbose_name_plural = 'Trabajos de archivado de consultas'
+        indexes = [
+            models.Index(fields=['estado', 'actualizado_en'], name='idx_archivo_estado'),
+        ]
+
+    def __str__(self):
+        return f"Archivo de consultas {self.empresa_id} < {self.fecha_corte} ({self.estado})"
+
+
+class PoliticaRetencion(models.Model):
+    """
+    Retención de un histórico de solo-inserción (bitácora, notificaciones,
+    mensajes del chatbot) para un tenant. Sin política se usa
+    RETENCION_HISTORICOS_DIAS. La aplica `mantener_historicos`
+    (api/services/retencion_historicos.py).
+    """
+    HISTORICO_CHOICES = [
+        ('bitacora', 'Bitácora'),
+        ('notificaciones', 'Historial de notificaciones'),
+        ('chatbot', 'Mensajes del chatbot'),
+    ]
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='politicas_retencion')
+    historico = models.CharField(max_length=20, choices=HISTORICO_CHOICES)
+    dias = models.PositiveIntegerField(help_text="Se retiran los meses completos más viejos que estos días.")
+    exportar = models.BooleanField(default=True, help_text="Exportar a .jsonl.gz antes de borrar.")
+
+    class Meta:
+        db_table = 'politica_retencion'
+        verbose_name = 'Política de retención'
+        verbose_name_plural = 'Políticas de retención'
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'historico'], name='uniq_politica_retencion'),
+        ]
+
+    def __str__(self):
+        return f"{self.historico} de {self.empresa_id}: {self.dias} días"
+
+
+class SegmentoHistorico(models.Model):
+    """
+    Un mes de un histórico de un tenant retirado de la tabla: la "partición"
+    vencida. Se registra al exportarla y pasa a 'compactado' cuando ya se
+    borraron sus filas, así una ejecución interrumpida no la exporta dos veces.
+    """
+    ESTADO_EXPORTADO = 'exportado'
+    ESTADO_COMPACTADO = 'compactado'
+
+    ESTADO_CHOICES = [
+        (ESTADO_EXPORTADO, 'Exportado'),
+        (ESTADO_COMPACTADO, 'Compactado'),
+    ]
+
+    historico = models.CharField(max_length=20, choices=PoliticaRetencion.HISTORICO_CHOICES)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True)
+    mes = models.DateField(help_text="Primer día del mes retirado.")
+    filas = models.PositiveIntegerField(default=0)
+    archivo = models.CharField(max_length=255, blank=True, default='', help_text="Ruta en el storage; vacío si no se exportó.")
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default=ESTADO_EXPORTADO)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    compactado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'segmento_historico'
+        ordering = ['historico', '-mes']
+        verbose_name = 'Segmento histórico'
+        verbose_name_plural = 'Segmentos históricos'
+        constraints = [
+            models.UniqueConstraint(fields=['historico', 'empresa', 'mes'], name='uniq_segmento_historico'),
+        ]
+
+    def __str__(self):
+        return f"{self.historico} {self.empresa_id} {self.mes:%Y-%m} ({self.estado})"
@@ -1,6 +1,7 @@
 # api/models_notifications.py
 from django.db import models
-from .models import Usuario
+from django.db.models.functions import Now
+from .models import ModificacionRastreadaMixin, Usuario
 
 
 class TipoNotificacion(models.Model):
@@ -87,7 +88,7 @@ class DispositivoMovil(models.Model):
         return f"{self.usuario.nombre} - {self.plataforma} - {self.modelo_dispositivo}"
 
 
-class HistorialNotificacion(models.Model):
+class HistorialNotificacion(ModificacionRastreadaMixin, models.Model):
     """
     Registro de notificaciones enviadas
     """
@@ -117,12 +118,22 @@ class HistorialNotificacion(models.Model):
 
     error_mensaje = models.TextField(blank=True, null=True)
     intentos = models.IntegerField(default=0)
+    # db_default: la tabla también la escribe HistorialNotificacionMN (no gestionado)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_default=Now())
 
     class Meta:
         db_table = 'historialnotificacion'
         verbose_name = 'Historial de Notificación'
         verbose_name_plural = 'Historial de Notificaciones'
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Cola del worker: estado='PENDING' ORDER BY id
+            models.Index(fields=['estado', 'id'], name='idx_hist_notif_estado_id'),
+            # Sincronización incremental de la app móvil
+            models.Index(fields=['usuario', 'fecha_modificacion', 'id'], name='idx_hist_notif_usr_modif'),
+            # Listados por rango reciente y retención por mes (mantener_historicos)
+            models.Index(fields=['usuario', 'fecha_creacion'], name='idx_hist_notif_usr_fecha'),
+        ]
 
     def __str__(self):
         return f"{self.usuario.nombre} - {self.titulo} - {self.estado}"
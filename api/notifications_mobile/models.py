@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Now
 from django.contrib.postgres.fields import JSONField  # Django <3.1; si usas 3.2+ usa models.JSONField
 from django.conf import settings
 
@@ -95,6 +96,7 @@ class HistorialNotificacionMN(models.Model):
     idtiponotificacion = models.BigIntegerField()
     idcanalnotificacion = models.BigIntegerField()
     iddispositivomovil = models.BigIntegerField(null=True)
+    fecha_modificacion = models.DateTimeField(db_default=Now())  # auto_now en HistorialNotificacion
 
     class Meta:
         managed = False
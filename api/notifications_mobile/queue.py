@@ -94,3 +94,49 @@ def enqueue_notif_for_user_devices(
     if rows:
         HistorialNotificacionMN.objects.bulk_create(rows, batch_size=500)
     return rows
+
+@transaction.atomic
+def enqueue_notif_batch(
+    *,
+    tipo_nombre: str,
+    avisos: Iterable[Mapping[str, Any]],
+) -> list[HistorialNotificacionMN]:
+    """
+    Encola muchas notificaciones del mismo tipo de una vez: una fila por
+    dispositivo activo de cada usuario, con una sola consulta de dispositivos
+    y un solo bulk_create.
+    Cada aviso: {"usuario_codigo", "titulo", "mensaje", "data"}.
+    """
+    avisos = list(avisos)
+    if not avisos:
+        return []
+    tipo, canal = _ensure_catalog(tipo_nombre, DEFAULT_CANAL)
+    dispositivos: dict[int, list[int]] = {}
+    for disp_id, codusuario in DispositivoMovilMN.objects.filter(
+        codusuario__in={a["usuario_codigo"] for a in avisos}, activo=True
+    ).values_list("id", "codusuario"):
+        dispositivos.setdefault(codusuario, []).append(disp_id)
+
+    rows: list[HistorialNotificacionMN] = []
+    now = timezone.now()
+    for aviso in avisos:
+        for disp_id in dispositivos.get(aviso["usuario_codigo"], []):
+            rows.append(HistorialNotificacionMN(
+                titulo=aviso["titulo"],
+                mensaje=aviso["mensaje"],
+                datos_adicionales=dict(aviso.get("data") or {}),
+                estado="PENDING",
+                fecha_creacion=now,
+                fecha_envio=None,
+                fecha_entrega=None,
+                fecha_lectura=None,
+                error_mensaje=None,
+                intentos=0,
+                codusuario=aviso["usuario_codigo"],
+                idtiponotificacion=tipo.id,
+                idcanalnotificacion=canal.id,
+                iddispositivomovil=disp_id,
+            ))
+    if rows:
+        HistorialNotificacionMN.objects.bulk_create(rows, batch_size=500)
+    return rows
@@ -227,6 +227,7 @@ def mobile_dispatch_notification(request, pk: int):
             estado="ENVIADO",
             fecha_entrega=now,
             intentos=F("intentos") + 1,
+            fecha_modificacion=timezone.now(),
             error_mensaje="",
             iddispositivomovil=device_id,   # <<< guarda el dispositivo usado
         )
@@ -235,6 +236,7 @@ def mobile_dispatch_notification(request, pk: int):
         HistorialNotificacionMN.objects.filter(id=obj.id).update(
             estado="ERROR",
             intentos=F("intentos") + 1,
+            fecha_modificacion=timezone.now(),
             error_mensaje=str(e)[:1000],
         )
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -282,6 +284,7 @@ def mobile_dispatch_due(request):
             HistorialNotificacionMN.objects.filter(id=obj.id).update(
                 estado="ERROR",
                 intentos=F("intentos") + 1,
+                fecha_modificacion=timezone.now(),
                 error_mensaje="sin tokens activos",
             )
             continue
@@ -293,6 +296,7 @@ def mobile_dispatch_due(request):
                 estado="ENVIADO",
                 fecha_entrega=now,
                 intentos=F("intentos") + 1,
+                fecha_modificacion=timezone.now(),
                 error_mensaje="",
                 iddispositivomovil=device_id,   # <<< guarda el dispositivo usado
             )
@@ -302,6 +306,7 @@ def mobile_dispatch_due(request):
             HistorialNotificacionMN.objects.filter(id=obj.id).update(
                 estado="ERROR",
                 intentos=F("intentos") + 1,
+                fecha_modificacion=timezone.now(),
                 error_mensaje=str(e)[:1000],
             )
 
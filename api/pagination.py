@@ -0,0 +1,250 @@
+# api/pagination.py
+"""
+Paginación para listados de alto volumen.
+
+Por defecto se comporta como PageNumberPagination (`?page=N`). Con
+`?paginacion=cursor` usa keyset pagination sobre el orden de la vista
+(`orden_cursor`, p. ej. ('-fecha', '-id')): cada página filtra por los valores
+de la última fila en vez de usar OFFSET, así que cuesta lo mismo sin importar
+cuán atrás se navegue. Las páginas siguientes se piden con el link `next`
+(`?cursor=...`).
+
+En modo cursor el total no se calcula salvo que se pida con `?conteo=`:
+  - `estimado`: filas estimadas por el planner (PostgreSQL; en otros motores
+    se cuenta).
+  - `exacto`: COUNT(*).
+
+Los campos de `orden_cursor` deben ser columnas del modelo y el último debe
+ser único y no nulo (normalmente `id`) para desempatar. En un campo anulable
+(p. ej. `Bitacora.timestamp`) el NULL cuenta como mayor que cualquier valor,
+como en los índices B-tree de PostgreSQL: primero en orden descendente y
+último en ascendente. Así el ORDER BY coincide con un índice `(empresa,
+-timestamp, -id)` en ambos sentidos y el filtro del cursor es un rango sobre él.
+"""
+import base64
+import json
+
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+CONTEO_NINGUNO = 'no'
+CONTEO_ESTIMADO = 'estimado'
+CONTEO_EXACTO = 'exacto'
+
+
+def conteo_estimado(queryset):
+    """Filas estimadas por el planner de PostgreSQL, o None en otros motores."""
+    conexion = connections[queryset.db]
+    if conexion.vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class PaginacionHibrida(PageNumberPagination):
+    """
+    Página numerada por defecto; keyset con `?paginacion=cursor` en las vistas
+    que declaran `orden_cursor`.
+
+    Uso:
+        class BitacoraViewSet(ReadOnlyModelViewSet):
+            pagination_class = PaginacionHibrida
+            orden_cursor = ('-timestamp', '-id')
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    modo_query_param = 'paginacion'
+    cursor_query_param = 'cursor'
+    conteo_query_param = 'conteo'
+
+    modo_cursor = False
+
+    # ------------------------------------------------------------------
+    # Selección de modo
+    # ------------------------------------------------------------------
+    def usa_cursor(self, request, view):
+        if not getattr(view, 'orden_cursor', None):
+            return False
+        return (
+            request.query_params.get(self.modo_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.modo_cursor = self.usa_cursor(request, view)
+        if not self.modo_cursor:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginar_por_cursor(queryset, request, tuple(view.orden_cursor))
+
+    def get_paginated_response(self, data):
+        if not self.modo_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.total,
+            'count_estimado': self.total_estimado,
+            'next': self.enlace_siguiente,
+            'previous': self.enlace_anterior,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        respuesta = super().get_paginated_response_schema(schema)
+        respuesta['properties']['count']['nullable'] = True
+        respuesta['properties']['count_estimado'] = {'type': 'boolean'}
+        return respuesta
+
+    # ------------------------------------------------------------------
+    # Keyset
+    # ------------------------------------------------------------------
+    def paginar_por_cursor(self, queryset, request, orden):
+        self.request = request
+        self.campos = self.campos_de(queryset, orden)
+        tamanio = self.get_page_size(request)
+        valores, atras = self.decodificar_cursor(request)
+
+        self.total, self.total_estimado = self.contar(queryset, request)
+
+        filas = list(self.consulta_cursor(queryset, orden, valores, atras)[:tamanio + 1])
+        nulos = self.consulta_nulos(queryset, orden, valores, atras)
+        if nulos is not None and len(filas) <= tamanio:
+            filas += list(nulos[:tamanio + 1 - len(filas)])
+        hay_mas = len(filas) > tamanio
+        filas = filas[:tamanio]
+        if atras:
+            filas.reverse()
+
+        hay_siguiente = hay_mas if not atras else valores is not None
+        hay_anterior = hay_mas if atras else valores is not None
+        self.enlace_siguiente = (
+            self.enlace(filas[-1], atras=False) if filas and hay_siguiente else None
+        )
+        self.enlace_anterior = (
+            self.enlace(filas[0], atras=True) if filas and hay_anterior else None
+        )
+        return filas
+
+    @staticmethod
+    def campos_de(queryset, orden):
+        return [queryset.model._meta.get_field(campo.lstrip('-')) for campo in orden]
+
+    def consulta_cursor(self, queryset, orden, valores=None, atras=False):
+        """
+        Queryset de la página (sin el LIMIT): orden del cursor y filtro desde
+        `valores`. Si el primer campo es anulable y va en orden ascendente,
+        deja fuera los NULL que siguen al rango (ver consulta_nulos).
+        """
+        self.campos = self.campos_de(queryset, orden)
+        orden_consulta = self.invertir(orden) if atras else orden
+        qs = queryset.order_by(*self.expresiones_orden(orden_consulta))
+        if valores is not None:
+            qs = qs.filter(self.filtro_posterior(orden_consulta, valores))
+        return qs
+
+    def consulta_nulos(self, queryset, orden, valores, atras):
+        """
+        Filas con NULL en el primer campo que van después de la página de
+        consulta_cursor, o None si no hay. Solo pasa en orden ascendente desde
+        un valor no nulo: un `a >= va OR a IS NULL` no sería un rango del
+        índice, así que los NULL (al final del orden) se piden aparte cuando
+        la página no se llena con el rango.
+        """
+        orden_consulta = self.invertir(orden) if atras else orden
+        campo = orden_consulta[0]
+        if valores is None or valores[0] is None or campo.startswith('-') or not self.campos[0].null:
+            return None
+        return queryset.filter(**{f'{campo}__isnull': True}).order_by(*self.expresiones_orden(orden_consulta))
+
+    @staticmethod
+    def invertir(orden):
+        return tuple(campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden)
+
+    def expresiones_orden(self, orden):
+        """ORDER BY de `orden` con los NULL donde los pone el índice B-tree."""
+        expresiones = []
+        for campo, modelo in zip(orden, self.campos):
+            if not modelo.null:
+                expresiones.append(campo)
+            elif campo.startswith('-'):
+                expresiones.append(F(campo[1:]).desc(nulls_first=True))
+            else:
+                expresiones.append(F(campo).asc(nulls_last=True))
+        return expresiones
+
+    def filtro_posterior(self, orden, valores):
+        """
+        Filas estrictamente después de `valores` en `orden`:
+        (a < va) OR (a = va AND b < vb) ... para orden descendente, con el
+        NULL como mayor que cualquier valor. Se agrega además el rango del
+        primer campo (`a <= va`) para que el índice acote el recorrido desde
+        el inicio; los NULL que siguen a un primer campo ascendente quedan
+        para consulta_nulos.
+        """
+        filtro = Q()
+        igualdad = Q()
+        for posicion, (campo, modelo, valor) in enumerate(zip(orden, self.campos, valores)):
+            nombre = campo.lstrip('-')
+            descendente = campo.startswith('-')
+            if valor is None:
+                # Tras un NULL solo vienen valores en orden descendente
+                posterior = Q(**{f'{nombre}__isnull': False}) if descendente else None
+                igual = Q(**{f'{nombre}__isnull': True})
+            else:
+                posterior = Q(**{f'{nombre}__{"lt" if descendente else "gt"}': valor})
+                if modelo.null and not descendente and posicion > 0:
+                    posterior |= Q(**{f'{nombre}__isnull': True})
+                igual = Q(**{nombre: valor})
+            if posterior is not None:
+                filtro |= igualdad & posterior
+            igualdad &= igual
+        return self.rango_inicial(orden, valores) & filtro
+
+    def rango_inicial(self, orden, valores):
+        campo, valor = orden[0], valores[0]
+        nombre = campo.lstrip('-')
+        if valor is None:
+            # Desde un NULL: en descendente es el inicio del índice; en
+            # ascendente solo quedan los NULL
+            return Q() if campo.startswith('-') else Q(**{f'{nombre}__isnull': True})
+        return Q(**{f'{nombre}__{"lte" if campo.startswith("-") else "gte"}': valor})
+
+    def contar(self, queryset, request):
+        modo = request.query_params.get(self.conteo_query_param, CONTEO_NINGUNO)
+        if modo == CONTEO_EXACTO:
+            return queryset.count(), False
+        if modo == CONTEO_ESTIMADO:
+            estimado = conteo_estimado(queryset)
+            if estimado is not None:
+                return estimado, True
+            return queryset.count(), False
+        return None, False
+
+    # ------------------------------------------------------------------
+    # Codificación del cursor
+    # ------------------------------------------------------------------
+    def codificar_cursor(self, fila, atras):
+        valores = [getattr(fila, campo.attname) for campo in self.campos]
+        # str() conserva los microsegundos (DjangoJSONEncoder los trunca)
+        datos = json.dumps({'v': valores, 'a': atras}, default=str)
+        return base64.urlsafe_b64encode(datos.encode()).decode()
+
+    def decodificar_cursor(self, request):
+        crudo = request.query_params.get(self.cursor_query_param)
+        if not crudo:
+            return None, False
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(crudo.encode()).decode())
+            valores = [campo.to_python(v) for campo, v in zip(self.campos, datos['v'], strict=True)]
+            return valores, bool(datos.get('a'))
+        except Exception:
+            raise NotFound('Cursor inválido.')
+
+    def enlace(self, fila, atras):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        url = replace_query_param(url, self.modo_query_param, 'cursor')
+        return replace_query_param(url, self.cursor_query_param, self.codificar_cursor(fila, atras))
@@ -0,0 +1,71 @@
+# api/renderers.py
+"""
+Renderer y parser JSON sobre orjson (opcional).
+
+Producen el mismo JSON que JSONRenderer/JSONParser de DRF: Decimal como
+número, datetime ISO 8601 con 'Z' para UTC, UUID y textos traducibles
+(lazy) como string, claves no string convertidas. Los tipos que orjson no
+conoce pasan por el encoder de DRF. Si orjson no está instalado, si se pide
+indentación o si orjson no puede representar el dato (p. ej. enteros de más
+de 64 bits), se usa la implementación de DRF.
+"""
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+OPCIONES_ORJSON = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+_encoder_drf = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer de DRF con serialización en orjson."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_encoder_drf.default, option=OPCIONES_ORJSON)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Igual que DRF: U+2028/U+2029 escapados para poder incrustar el JSON en <script>
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser de DRF con decodificación en orjson."""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            contenido = stream.read()
+            if codecs.lookup(encoding).name != 'utf-8':
+                contenido = contenido.decode(encoding).encode('utf-8')
+            return orjson.loads(contenido)
+        except (ValueError, UnicodeError) as exc:
+            # orjson.JSONDecodeError es subclase de ValueError
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -7,9 +7,11 @@ from .models import (
     Tipodeusuario,   # ← roles
     Historialclinico,  # ← NUEVO: HCE
     Consentimiento, # <-- NUEVO: Consentimiento
+    ConsultaArchivada,
 )
 from .models import Estadodeconsulta
 from rest_framework.validators import UniqueTogetherValidator
+from .mixins import CamposDinamicosSerializerMixin
 
 # --------- Usuarios / Pacientes ---------
 
@@ -189,7 +191,12 @@ class ReprogramarConsultaSerializer(serializers.Serializer):
 
 # --------- Consulta ---------
 
-class ConsultaSerializer(serializers.ModelSerializer):
+class ConsultaSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
+    campos_expandibles = (
+        'codpaciente', 'cododontologo', 'codrecepcionista',
+        'idhorario', 'idtipoconsulta', 'idestadoconsulta',
+    )
+
     codpaciente = PacienteMiniSerializer(read_only=True)
     cododontologo = OdontologoMiniSerializer(read_only=True)
     codrecepcionista = RecepcionistaMiniSerializer(read_only=True)
@@ -215,6 +222,15 @@ class ConsultaSerializer(serializers.ModelSerializer):
         return obj.get_tiempo_espera()
 
 
+class ConsultaArchivadaSerializer(serializers.ModelSerializer):
+    """Consulta movida al archivo; `datos` es la fila tal como estaba."""
+
+    class Meta:
+        model = ConsultaArchivada
+        fields = ['id', 'fecha', 'estado', 'codpaciente', 'cododontologo', 'datos', 'archivada_en']
+        read_only_fields = fields
+
+
 class ConsultaAgendamientoWebSerializer(serializers.ModelSerializer):
     """
     Serializer específico para agendamiento web de consultas por pacientes.
@@ -704,6 +720,40 @@ class ConsentimientoSerializer(serializers.ModelSerializer):
             print(f"Datos validados: {validated_data}")
             raise
 
+
+class ConsentimientoListSerializer(serializers.ModelSerializer):
+    """
+    Versión liviana para listados: omite `texto_contenido`, `firma_base64` y
+    `pdf_firmado`, que solo se cargan en el detalle o en la descarga del PDF.
+    """
+    paciente_nombre = serializers.CharField(source='paciente.codusuario.nombre', read_only=True)
+    paciente_apellido = serializers.CharField(source='paciente.codusuario.apellido', read_only=True)
+    fecha_creacion_formateada = serializers.DateTimeField(source='fecha_creacion', format="%d/%m/%Y %H:%M", read_only=True)
+    validado_por_nombre = serializers.CharField(source='validado_por.nombre', read_only=True)
+    validado_por_apellido = serializers.CharField(source='validado_por.apellido', read_only=True)
+
+    class Meta:
+        model = Consentimiento
+        fields = (
+            'id',
+            'paciente',
+            'consulta',
+            'plan_tratamiento',
+            'titulo',
+            'paciente_nombre',
+            'paciente_apellido',
+            'fecha_creacion',
+            'fecha_creacion_formateada',
+            'ip_creacion',
+            'empresa',
+            'fecha_hora_sello',
+            'hash_documento',
+            'fecha_validacion',
+            'validado_por_nombre',
+            'validado_por_apellido',
+        )
+        read_only_fields = fields
+
 # =====================================
 # REGISTRO PÚBLICO DE EMPRESAS (SaaS)
 # =====================================
@@ -879,6 +929,17 @@ class BitacoraSerializer(serializers.ModelSerializer):
         return None
 
 
+class BitacoraListSerializer(BitacoraSerializer):
+    """Listado de bitácora sin los JSON de `valores_anteriores`/`valores_nuevos`."""
+
+    class Meta(BitacoraSerializer.Meta):
+        fields = [
+            'id', 'accion', 'tabla_afectada', 'registro_id',
+            'timestamp', 'timestamp_formatted', 'usuario', 'usuario_nombre',
+            'ip_address', 'user_agent'
+        ]
+
+
 # Función auxiliar para crear registros de bitácora manualmente
 def crear_registro_bitacora(accion, usuario=None, ip_address='127.0.0.1', 
                             tabla_afectada=None, registro_id=None, 
@@ -916,6 +977,7 @@ def crear_registro_bitacora(accion, usuario=None, ip_address='127.0.0.1',
 # ============================================================================
 from .models import DocumentoClinico
 from django.core.validators import FileExtensionValidator
+import os
 
 class DocumentoClinicoSerializer(serializers.ModelSerializer):
     """Serializer para listar y detallar documentos clínicos"""
@@ -923,6 +985,8 @@ class DocumentoClinicoSerializer(serializers.ModelSerializer):
     paciente_nombre = serializers.SerializerMethodField()
     tamanio_mb = serializers.SerializerMethodField()
     url_firmada = serializers.SerializerMethodField()  # ← NUEVO: URL firmada temporal
+    url_miniatura = serializers.SerializerMethodField()
+    url_web = serializers.SerializerMethodField()
 
     class Meta:
         model = DocumentoClinico
@@ -931,7 +995,8 @@ class DocumentoClinicoSerializer(serializers.ModelSerializer):
             'tipo_documento', 'nombre_archivo', 'url_s3', 'tamanio_bytes',
             'tamanio_mb', 'extension', 'profesional_carga', 'profesional_nombre',
             'paciente_nombre', 'fecha_documento', 'notas', 'fecha_creacion',
-            'url_firmada'  # ← NUEVO
+            'url_firmada',  # ← NUEVO
+            'url_miniatura', 'url_web'
         ]
         read_only_fields = [
             'id', 'url_s3', 's3_key', 'tamanio_bytes', 'extension',
@@ -954,30 +1019,38 @@ class DocumentoClinicoSerializer(serializers.ModelSerializer):
         return round(obj.tamanio_bytes / (1024 * 1024), 2)
 
     def get_url_firmada(self, obj):
-        """Genera URL firmada válida por 1 hora para acceso seguro"""
+        """
+        URL firmada válida por 1 hora para acceso seguro.
+        Usa el cliente S3 compartido y reutiliza la URL cacheada mientras siga vigente.
+        """
         try:
-            import boto3
-            from django.conf import settings
-
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_S3_REGION_NAME
-            )
-
-            url = s3_client.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
-                    'Key': obj.s3_key
-                },
-                ExpiresIn=3600  # 1 hora
-            )
-            return url
-        except Exception as e:
+            from .services.storage_gateway import get_storage_gateway
+            return get_storage_gateway().url_firmada(obj.s3_key)
+        except Exception:
             return None
 
+    def get_url_miniatura(self, obj):
+        """Miniatura WebP para galerías (None mientras se genera o si no es imagen)."""
+        from .services.derivados_imagen import url_derivado
+        return url_derivado(obj, 'miniatura')
+
+    def get_url_web(self, obj):
+        from .services.derivados_imagen import url_derivado
+        return url_derivado(obj, 'web')
+
+
+class DocumentoClinicoListSerializer(DocumentoClinicoSerializer):
+    """Listado de documentos clínicos sin `notas` (se obtienen en el detalle)."""
+
+    class Meta(DocumentoClinicoSerializer.Meta):
+        fields = [
+            'id', 'codpaciente', 'idconsulta', 'idhistorialclinico',
+            'tipo_documento', 'nombre_archivo', 'url_s3', 'tamanio_bytes',
+            'tamanio_mb', 'extension', 'profesional_carga', 'profesional_nombre',
+            'paciente_nombre', 'fecha_documento', 'fecha_creacion',
+            'url_firmada', 'url_miniatura', 'url_web'
+        ]
+
 
 class DocumentoClinicoUploadSerializer(serializers.Serializer):
     """Serializer para validar la subida de documentos clínicos"""
@@ -1041,6 +1114,81 @@ class DocumentoClinicoUploadSerializer(serializers.Serializer):
         return attrs
 
 
+class DocumentoClinicoCargaDirectaSerializer(DocumentoClinicoUploadSerializer):
+    """
+    Fase 1 de la carga directa a S3: mismos datos que el upload clásico, pero
+    en lugar del archivo se declaran nombre, tipo MIME, tamaño y hash SHA-256.
+    """
+    EXTENSIONES_PERMITIDAS = ['pdf', 'jpg', 'jpeg', 'png', 'dcm', 'dicom']
+    CONTENT_TYPES_PERMITIDOS = ['application/pdf', 'image/jpeg', 'image/png', 'application/dicom']
+
+    archivo = None
+    # Los metadatos se validan aquí, contra la empresa (context['empresa']):
+    # completar la carga crea el documento con ellos sin volver a validar
+    codpaciente = serializers.PrimaryKeyRelatedField(queryset=Paciente.objects.none())
+    idconsulta = serializers.PrimaryKeyRelatedField(
+        queryset=Consulta.objects.none(), required=False, allow_null=True
+    )
+    idhistorialclinico = serializers.PrimaryKeyRelatedField(
+        queryset=Historialclinico.objects.none(), required=False, allow_null=True
+    )
+    nombre_archivo = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=100)
+    tamanio = serializers.IntegerField(min_value=1)
+    sha256 = serializers.CharField(min_length=64, max_length=64)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        empresa = self.context.get('empresa')
+        if empresa is not None:
+            self.fields['codpaciente'].queryset = Paciente.objects.filter(empresa=empresa)
+            self.fields['idconsulta'].queryset = Consulta.objects.filter(empresa=empresa)
+            self.fields['idhistorialclinico'].queryset = Historialclinico.objects.filter(empresa=empresa)
+
+    def validate_nombre_archivo(self, value):
+        ext = os.path.splitext(value)[1].lower().lstrip('.')
+        if ext not in self.EXTENSIONES_PERMITIDAS:
+            raise serializers.ValidationError(
+                f"Extensión .{ext} no permitida. Permitidas: {', '.join(self.EXTENSIONES_PERMITIDAS)}"
+            )
+        return value
+
+    def validate_content_type(self, value):
+        if value not in self.CONTENT_TYPES_PERMITIDOS:
+            raise serializers.ValidationError(
+                f"Tipo de archivo no permitido: {value}. Permitidos: {', '.join(self.CONTENT_TYPES_PERMITIDOS)}"
+            )
+        return value
+
+    def validate_codpaciente(self, value):
+        return value
+
+    def validate(self, attrs):
+        paciente = attrs['codpaciente']
+        consulta = attrs.get('idconsulta')
+        historial = attrs.get('idhistorialclinico')
+        if consulta and consulta.codpaciente_id != paciente.pk:
+            raise serializers.ValidationError("La consulta especificada no pertenece al paciente.")
+        if historial and historial.pacientecodigo_id != paciente.pk:
+            raise serializers.ValidationError("El historial clínico especificado no pertenece al paciente.")
+        return attrs
+
+
+class CompletarCargaDirectaSerializer(serializers.Serializer):
+    """Fase 2 de la carga directa: confirma que el archivo ya está en S3."""
+    carga_id = serializers.UUIDField()
+
+
+class PartesCargaMultipartSerializer(serializers.Serializer):
+    """Partes de una carga por partes para las que se piden URLs firmadas."""
+    carga_id = serializers.UUIDField()
+    partes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+
+
 # --------- Odontólogo (completo) ---------
 
 class OdontologoSerializer(serializers.ModelSerializer):
@@ -12,6 +12,8 @@ class EvidenciaSerializer(serializers.ModelSerializer):
     Serializer para listar/mostrar evidencias subidas.
     """
     url = serializers.SerializerMethodField()
+    url_miniatura = serializers.SerializerMethodField()
+    url_web = serializers.SerializerMethodField()
     tamanio_legible = serializers.SerializerMethodField()
     usuario_nombre = serializers.SerializerMethodField()
     
@@ -20,6 +22,8 @@ class EvidenciaSerializer(serializers.ModelSerializer):
         fields = [
             'id',
             'url',
+            'url_miniatura',
+            'url_web',
             'nombre_original',
             'tipo',
             'mimetype',
@@ -40,6 +44,11 @@ class EvidenciaSerializer(serializers.ModelSerializer):
     
     def get_url(self, obj):
         """Retorna URL absoluta del archivo"""
+        from .services.cargas_directas import esta_en_s3
+        if obj.archivo and esta_en_s3(obj.archivo.name):
+            # Subida directa a S3: URL firmada (cacheada por el gateway)
+            from .services.storage_gateway import get_storage_gateway
+            return get_storage_gateway().url_firmada(obj.archivo.name)
         if obj.archivo:
             request = self.context.get('request')
             if request:
@@ -47,6 +56,22 @@ class EvidenciaSerializer(serializers.ModelSerializer):
             return obj.archivo.url
         return None
     
+    def get_url_miniatura(self, obj):
+        """Miniatura para galerías; None mientras se genera (usar `url`)."""
+        return self._url_derivado(obj, 'miniatura')
+
+    def get_url_web(self, obj):
+        """Versión web optimizada; el original (`url`) se pide bajo demanda."""
+        return self._url_derivado(obj, 'web')
+
+    def _url_derivado(self, obj, variante):
+        from .services.derivados_imagen import url_derivado
+        url = url_derivado(obj, variante)
+        request = self.context.get('request')
+        if url and request and url.startswith('/'):
+            return request.build_absolute_uri(url)
+        return url
+
     def get_tamanio_legible(self, obj):
         """Retorna tamaño en formato legible"""
         return obj.get_tamanio_legible()
@@ -102,6 +127,44 @@ class EvidenciaUploadSerializer(serializers.Serializer):
         return value
 
 
+class EvidenciaCargaDirectaSerializer(serializers.Serializer):
+    """
+    Fase 1 de la carga directa a S3: se declara el archivo (nombre, tipo,
+    tamaño y hash SHA-256) en lugar de enviarlo a través de la API.
+    """
+    nombre_archivo = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=100)
+    tamanio = serializers.IntegerField(min_value=1)
+    sha256 = serializers.CharField(min_length=64, max_length=64)
+    tipo = serializers.ChoiceField(
+        choices=Evidencia.TIPO_CHOICES,
+        default='evidencia_sesion',
+        required=False
+    )
+
+    def validate_nombre_archivo(self, value):
+        from django.conf import settings
+        import os
+
+        ext = os.path.splitext(value)[1].lower().replace('.', '')
+        if ext not in settings.ALLOWED_UPLOAD_EXTENSIONS:
+            raise serializers.ValidationError(
+                f"Extensión .{ext} no permitida. "
+                f"Permitidas: {', '.join(settings.ALLOWED_UPLOAD_EXTENSIONS)}"
+            )
+        return value
+
+    def validate_content_type(self, value):
+        from django.conf import settings
+
+        if value not in settings.ALLOWED_UPLOAD_MIMETYPES:
+            raise serializers.ValidationError(
+                f"Tipo de archivo no permitido: {value}. "
+                f"Permitidos: {', '.join(settings.ALLOWED_UPLOAD_MIMETYPES)}"
+            )
+        return value
+
+
 class EvidenciaResponseSerializer(serializers.Serializer):
     """
     Serializer para la respuesta del endpoint de upload.
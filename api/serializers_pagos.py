@@ -11,10 +11,11 @@ from django.db import transaction
 
 from .models import (
     PagoEnLinea, DetallePagoItem, ComprobanteDigital,
-    Plandetratamiento, Itemplandetratamiento, Consulta,
+    Plandetratamiento, Consulta,
     Usuario, Empresa
 )
-from .services.calculador_pagos import CalculadorPagos
+from .services.calculador_pagos import CalculadorPagos, ESTRATEGIAS_DISTRIBUCION, cargar_saldos_items
+from .validators_pagos import ContextoValidacionPago
 
 
 # ==================== Serializers de Lectura ====================
@@ -318,6 +319,12 @@ class CrearPagoPlanSerializer(serializers.Serializer):
         allow_empty=True,
         help_text="IDs de items específicos a pagar (None = plan completo)"
     )
+    estrategia_distribucion = serializers.ChoiceField(
+        choices=ESTRATEGIAS_DISTRIBUCION,
+        required=False,
+        default='proporcional',
+        help_text="Cómo repartir el pago entre los items (proporcional, antiguedad, orden)"
+    )
     descripcion = serializers.CharField(
         max_length=500,
         required=False,
@@ -365,25 +372,23 @@ class CrearPagoPlanSerializer(serializers.Serializer):
         if not plan:
             return value
         
-        # Verificar que todos los items existan y pertenezcan al plan
-        items = Itemplandetratamiento.objects.filter(
-            id__in=value,
-            idplantratamiento=plan
-        ).exclude(estado_item='Cancelado')
+        # Saldos de los items en una consulta; se reutilizan en validate() y create()
+        saldos = cargar_saldos_items(plan, value)
         
-        if items.count() != len(value):
+        # Verificar que todos los items existan y pertenezcan al plan
+        if len(saldos) != len(set(value)):
             raise serializers.ValidationError(
                 "Algunos items no existen, no pertenecen al plan o están cancelados"
             )
         
-        # Verificar que los items pueden recibir pagos
-        for item in items:
-            puede_pagar, razon = item.puede_pagarse()
-            if not puede_pagar:
+        # Verificar que los items pueden recibir pagos (el plan ya se validó como aprobado)
+        for saldo in saldos:
+            if saldo.saldo_pendiente <= Decimal('0'):
                 raise serializers.ValidationError(
-                    f"Item {item.id} ({item.idservicio.nombre}): {razon}"
+                    f"Item {saldo.item_id} ({saldo.servicio_nombre}): El item ya está completamente pagado"
                 )
         
+        self.context['saldos_items'] = saldos
         return value
     
     def validate(self, attrs):
@@ -408,13 +413,13 @@ class CrearPagoPlanSerializer(serializers.Serializer):
                 raise serializers.ValidationError({'monto': mensaje})
         else:
             # Validar contra saldo de items seleccionados
-            items = Itemplandetratamiento.objects.filter(
-                id__in=items_seleccionados,
-                idplantratamiento=plan
-            )
+            saldos = self.context.get('saldos_items')
+            if saldos is None:
+                saldos = cargar_saldos_items(plan, items_seleccionados)
+                self.context['saldos_items'] = saldos
             
             saldo_total_items = sum(
-                item.calcular_saldo_pendiente() for item in items
+                (saldo.saldo_pendiente for saldo in saldos), Decimal('0')
             )
             
             if monto > saldo_total_items:
@@ -424,23 +429,57 @@ class CrearPagoPlanSerializer(serializers.Serializer):
         
         return attrs
     
+    @staticmethod
+    def _revalidar(contexto, monto, items_seleccionados):
+        """Repite las reglas de validate() sobre la foto del plan ya bloqueada."""
+        if contexto is None:
+            raise serializers.ValidationError({
+                'plan_tratamiento_id': "Plan de tratamiento no encontrado o no pertenece a esta empresa"
+            })
+        es_valido, mensaje = contexto.validar_estado()
+        if not es_valido:
+            raise serializers.ValidationError({'plan_tratamiento_id': mensaje})
+        es_valido, mensaje = contexto.validar_items(items_seleccionados)
+        if not es_valido:
+            raise serializers.ValidationError({'items_seleccionados': mensaje})
+        
+        if items_seleccionados:
+            saldo_total_items = sum(
+                (saldo.saldo_pendiente for saldo in contexto.saldos_de(items_seleccionados)), Decimal('0')
+            )
+            if monto > saldo_total_items:
+                raise serializers.ValidationError({
+                    'monto': f"El monto (${monto}) excede el saldo de los items seleccionados (${saldo_total_items})"
+                })
+        else:
+            es_valido, mensaje = contexto.validar_monto(monto)
+            if not es_valido:
+                raise serializers.ValidationError({'monto': mensaje})
+    
     @transaction.atomic
     def create(self, validated_data):
         """
         Crea el pago y sus detalles por item.
         Calcula automáticamente saldos y distribución.
+        
+        Los saldos se vuelven a leer aquí con la fila del plan bloqueada
+        (ContextoValidacionPago) y se revalidan: dos creaciones concurrentes
+        sobre el mismo plan se serializan y la segunda ve lo que dejó la primera.
         """
         request = self.context.get('request')
         empresa = getattr(request, 'tenant', None)
         usuario = getattr(request.user, 'usuario', None) if hasattr(request, 'user') else None
         
-        plan = self.context.get('plan_tratamiento')
         monto = validated_data['monto']
         origen_tipo = validated_data['origen_tipo']
         items_seleccionados = validated_data.get('items_seleccionados')
         
+        contexto = ContextoValidacionPago.cargar(validated_data['plan_tratamiento_id'], empresa)
+        self._revalidar(contexto, monto, items_seleccionados)
+        plan = contexto.plan
+        
         # Calcular saldos
-        saldo_anterior = plan.calcular_saldo_pendiente()
+        saldo_anterior = contexto.saldo_plan
         saldo_nuevo = saldo_anterior - monto
         
         # Crear el pago
@@ -462,32 +501,31 @@ class CrearPagoPlanSerializer(serializers.Serializer):
             numero_intentos=0
         )
         
-        # Calcular distribución del pago entre items
-        distribucion = CalculadorPagos.calcular_distribucion_pago(
-            plan, 
-            monto, 
-            items_seleccionados
+        # Calcular distribución del pago entre items (con los saldos de la foto bloqueada)
+        distribucion = contexto.calcular_distribucion(
+            monto,
+            items_seleccionados,
+            estrategia=validated_data.get('estrategia_distribucion', 'proporcional'),
         )
         
         # Crear detalles por item
+        detalles = []
         for detalle_dist in distribucion['distribucion']:
-            item = Itemplandetratamiento.objects.get(id=detalle_dist['item_id'])
-            
-            monto_pagado_anterior = item.calcular_monto_pagado()
+            monto_pagado_anterior = Decimal(str(detalle_dist['monto_pagado_anterior']))
             monto_pagado_ahora = Decimal(str(detalle_dist['monto_a_pagar']))
-            monto_pagado_total = monto_pagado_anterior + monto_pagado_ahora
             saldo_restante = Decimal(str(detalle_dist['saldo_resultante']))
             
-            DetallePagoItem.objects.create(
+            detalles.append(DetallePagoItem(
                 pago=pago,
-                item_plan=item,
-                monto_item_total=item.costofinal,
+                item_plan_id=detalle_dist['item_id'],
+                monto_item_total=Decimal(str(detalle_dist['costo_total'])),
                 monto_pagado_anterior=monto_pagado_anterior,
                 monto_pagado_ahora=monto_pagado_ahora,
-                monto_pagado_total=monto_pagado_total,
+                monto_pagado_total=monto_pagado_anterior + monto_pagado_ahora,
                 saldo_restante=saldo_restante,
                 item_completamente_pagado=(saldo_restante <= Decimal('0'))
-            )
+            ))
+        DetallePagoItem.objects.bulk_create(detalles)
         
         return pago
 
@@ -8,6 +8,8 @@ from django.utils import timezone
 from django.db import transaction
 from decimal import Decimal
 
+from .mixins import CamposDinamicosSerializerMixin
+from .services.recalculo_diferido import recalculo_diferido
 from .models import (
     Plandetratamiento,
     Itemplandetratamiento,
@@ -179,7 +181,7 @@ class ItemPlanListSerializer(serializers.ModelSerializer):
 # SERIALIZERS PARA PLAN DE TRATAMIENTO
 # ============================================================================
 
-class PlanTratamientoListSerializer(serializers.ModelSerializer):
+class PlanTratamientoListSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
     """Serializer simplificado para listado de planes."""
     paciente_nombre = serializers.SerializerMethodField()
     odontologo_nombre = serializers.SerializerMethodField()
@@ -233,8 +235,10 @@ class PlanTratamientoListSerializer(serializers.ModelSerializer):
         return obj.puede_editarse()
 
 
-class PlanTratamientoDetailSerializer(serializers.ModelSerializer):
+class PlanTratamientoDetailSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
     """Serializer detallado para ver un plan específico."""
+    campos_expandibles = ('items',)
+
     paciente = serializers.SerializerMethodField()
     odontologo = serializers.SerializerMethodField()
     items = ItemPlanTratamientoSerializer(source='itemplandetratamiento_set', many=True, read_only=True)
@@ -409,42 +413,41 @@ class CrearPlanTratamientoSerializer(serializers.ModelSerializer):
             subtotal_calculado=Decimal('0.00'),
         )
         
-        # Crear ítems iniciales
-        for item_data in items_data:
-            # Obtener servicio
-            servicio = item_data.get('idservicio')
+        # Crear ítems iniciales; los totales se calculan una vez al final
+        with recalculo_diferido() as pendiente:
+            pendiente.agregar_plan(plan)
+            for item_data in items_data:
+                # Obtener servicio
+                servicio = item_data.get('idservicio')
             
-            # Asignar estado automáticamente
-            try:
-                estado_pendiente = Estado.objects.get(
-                    empresa=empresa,
-                    estado='Pendiente'
-                )
-            except Estado.DoesNotExist:
-                # Crear estado Pendiente si no existe
-                estado_pendiente = Estado.objects.create(
+                # Asignar estado automáticamente
+                try:
+                    estado_pendiente = Estado.objects.get(
+                        empresa=empresa,
+                        estado='Pendiente'
+                    )
+                except Estado.DoesNotExist:
+                    # Crear estado Pendiente si no existe
+                    estado_pendiente = Estado.objects.create(
+                        empresa=empresa,
+                        estado='Pendiente'
+                    )
+            
+                # Crear el item directamente
+                Itemplandetratamiento.objects.create(
+                    idplantratamiento=plan,
                     empresa=empresa,
-                    estado='Pendiente'
+                    idestado=estado_pendiente,
+                    idservicio=servicio,
+                    idpiezadental=item_data.get('idpiezadental'),
+                    costofinal=item_data.get('costofinal') or servicio.costobase,
+                    costo_base_servicio=servicio.costobase,
+                    fecha_objetivo=item_data.get('fecha_objetivo'),
+                    tiempo_estimado=item_data.get('tiempo_estimado') or servicio.duracion,
+                    estado_item=item_data.get('estado_item', Itemplandetratamiento.ESTADO_PENDIENTE),
+                    notas_item=item_data.get('notas_item', ''),
+                    orden=item_data.get('orden', 0),
                 )
-            
-            # Crear el item directamente
-            Itemplandetratamiento.objects.create(
-                idplantratamiento=plan,
-                empresa=empresa,
-                idestado=estado_pendiente,
-                idservicio=servicio,
-                idpiezadental=item_data.get('idpiezadental'),
-                costofinal=item_data.get('costofinal') or servicio.costobase,
-                costo_base_servicio=servicio.costobase,
-                fecha_objetivo=item_data.get('fecha_objetivo'),
-                tiempo_estimado=item_data.get('tiempo_estimado') or servicio.duracion,
-                estado_item=item_data.get('estado_item', Itemplandetratamiento.ESTADO_PENDIENTE),
-                notas_item=item_data.get('notas_item', ''),
-                orden=item_data.get('orden', 0),
-            )
-        
-        # Calcular totales iniciales
-        plan.calcular_totales()
         
         return plan
 
@@ -13,6 +13,8 @@ from django.db import transaction
 from datetime import timedelta
 from decimal import Decimal
 
+from .mixins import CamposDinamicosSerializerMixin
+from .services.creacion_masiva import crear_items_presupuesto, notificar_odontologo
 from .models import (
     PresupuestoDigital,
     ItemPresupuestoDigital,
@@ -58,7 +60,7 @@ class ItemPresupuestoSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'precio_final']
 
 
-class ListarPresupuestosSerializer(serializers.ModelSerializer):
+class ListarPresupuestosSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
     """Serializer simplificado para listado de presupuestos digitales."""
     paciente_nombre = serializers.SerializerMethodField()
     odontologo_nombre = serializers.SerializerMethodField()
@@ -115,8 +117,10 @@ class ListarPresupuestosSerializer(serializers.ModelSerializer):
         return obj.puede_editarse()
 
 
-class DetallePresupuestoSerializer(serializers.ModelSerializer):
+class DetallePresupuestoSerializer(CamposDinamicosSerializerMixin, serializers.ModelSerializer):
     """Serializer detallado para ver un presupuesto específico."""
+    campos_expandibles = ('items',)
+
     paciente = serializers.SerializerMethodField()
     odontologo = serializers.SerializerMethodField()
     items = ItemPresupuestoSerializer(source='items_presupuesto', many=True, read_only=True)
@@ -367,23 +371,9 @@ class CrearPresupuestoSerializer(serializers.Serializer):
         items_config = validated_data.get('items_config', [])
         items_config_dict = {item['item_id']: item for item in items_config}
         
+        # Un solo INSERT de ítems y un solo recálculo de totales
         items_plan = Itemplandetratamiento.objects.filter(id__in=items_ids)
-        for orden, item_plan in enumerate(items_plan, start=1):
-            config = items_config_dict.get(item_plan.id, {})
-            
-            ItemPresupuestoDigital.objects.create(
-                presupuesto=presupuesto,
-                item_plan=item_plan,
-                precio_unitario=item_plan.costofinal,
-                descuento_item=config.get('descuento_item', 0),
-                permite_pago_parcial=config.get('permite_pago_parcial', False),
-                cantidad_cuotas=config.get('cantidad_cuotas'),
-                notas_item=config.get('notas_item', ''),
-                orden=orden,
-            )
-        
-        # Calcular totales
-        presupuesto.calcular_totales()
+        items_presupuesto = crear_items_presupuesto(presupuesto, items_plan, items_config_dict)
         
         # Registrar en bitácora
         from .models import Bitacora
@@ -396,13 +386,30 @@ class CrearPresupuestoSerializer(serializers.Serializer):
             valores_nuevos={
                 'codigo_presupuesto': presupuesto.codigo_presupuesto.hex[:8],
                 'plan_tratamiento_id': plan.id,
-                'items_count': len(items_ids),
+                'items_count': len(items_presupuesto),
+                'items_plan_ids': [item.item_plan_id for item in items_presupuesto],
                 'total': str(presupuesto.total)
             },
             ip_address='127.0.0.1',
             user_agent='API'
         )
         
+        notificar_odontologo(
+            plan.cododontologo,
+            titulo='📄 Presupuesto generado',
+            mensaje=(
+                f'Se generó el presupuesto {presupuesto.codigo_presupuesto.hex[:8]} del plan #{plan.id} '
+                f'con {len(items_presupuesto)} ítems. Total: ${presupuesto.total}'
+            ),
+            tipo_nombre='presupuesto_generado',
+            data={
+                'presupuesto_id': presupuesto.id,
+                'plan_id': plan.id,
+                'items_count': len(items_presupuesto),
+                'total': str(presupuesto.total),
+            },
+        )
+        
         return presupuesto
 
 
@@ -0,0 +1,225 @@
+"""
+Archivado por lotes de consultas pasadas.
+
+`ConsultaViewSet.eliminar_vencidas` borraba de una vez todas las consultas
+pasadas de todos los tenants: cargaba cada objeto para las cascadas y los
+signals, bloqueaba la tabla y se cortaba por timeout en tablas grandes (y
+arrastraba sesiones y multas en cascada). Ahora el endpoint solo programa un
+TrabajoArchivoConsultas del tenant, y el trabajo mueve las consultas a
+`consulta_archivada` en lotes de CONSULTAS_ARCHIVO_LOTE, cada uno en su
+propia transacción:
+
+1. Toma (con FOR UPDATE) los siguientes ids vencidos del tenant, por id.
+2. Deja en la tabla las que otros registros referencian (pagos, sesiones,
+   planes, documentos...): no se pierde nada clínico ni contable.
+3. Copia el resto a ConsultaArchivada, crea sus tombstones de sincronización
+   y las borra de `consulta`.
+4. Avanza el cursor `ultimo_id` del trabajo.
+
+Si el proceso se corta, el trabajo se retoma desde `ultimo_id` (ver
+`archivar_consultas`). El historial se consulta en ConsultaArchivada.
+"""
+import logging
+import operator
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import reduce
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from api.models import Bitacora, Consulta, ConsultaArchivada, RegistroEliminado, TrabajoArchivoConsultas
+from api.services.sincronizacion import ENTIDADES
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_ABIERTOS = (TrabajoArchivoConsultas.ESTADO_PENDIENTE, TrabajoArchivoConsultas.ESTADO_EN_CURSO)
+
+
+def programar_archivo(empresa, fecha_corte=None, usuario=None):
+    """
+    Crea el trabajo de archivado del tenant (o reutiliza el que ya esté
+    abierto) y lo encola al confirmar la transacción. Devuelve (trabajo, creado).
+    """
+    trabajo = TrabajoArchivoConsultas.objects.filter(empresa=empresa, estado__in=ESTADOS_ABIERTOS).first()
+    creado = trabajo is None
+    if creado:
+        trabajo = TrabajoArchivoConsultas.objects.create(
+            empresa=empresa,
+            fecha_corte=fecha_corte or timezone.now().date(),
+            solicitado_por=usuario,
+        )
+    programar_procesamiento(trabajo)
+    return trabajo, creado
+
+
+def _referenciada():
+    """Condición: algún registro apunta a la consulta (cualquier FK hacia Consulta)."""
+    return reduce(operator.or_, [
+        Exists(rel.related_model._base_manager.filter(**{rel.field.name: OuterRef('pk')}))
+        for rel in Consulta._meta.related_objects
+    ])
+
+
+def archivar_lote(trabajo, lote=None):
+    """
+    Procesa el siguiente lote del trabajo. Devuelve (archivadas, retenidas),
+    o None si ya no quedan consultas por revisar.
+    """
+    lote = lote or settings.CONSULTAS_ARCHIVO_LOTE
+    with transaction.atomic():
+        ventana = list(
+            Consulta.objects.select_for_update()
+            .filter(empresa_id=trabajo.empresa_id, fecha__lt=trabajo.fecha_corte, pk__gt=trabajo.ultimo_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:lote]
+        )
+        if not ventana:
+            return None
+
+        retenidas = set(
+            Consulta.objects.filter(Q(pk__in=ventana), _referenciada()).values_list('pk', flat=True)
+        )
+        filas = list(Consulta.objects.filter(pk__in=ventana).exclude(pk__in=retenidas).values())
+
+        ahora = timezone.now()
+        ConsultaArchivada.objects.bulk_create([
+            ConsultaArchivada(
+                id=fila['id'],
+                empresa_id=fila['empresa_id'],
+                codpaciente=fila['codpaciente_id'],
+                cododontologo=fila['cododontologo_id'],
+                fecha=fila['fecha'],
+                estado=fila['estado'] or '',
+                datos=fila,
+                archivada_en=ahora,
+            )
+            for fila in filas
+        ], ignore_conflicts=True)
+        # Los tombstones que crearía post_delete, en un solo INSERT
+        RegistroEliminado.objects.bulk_create([
+            RegistroEliminado(
+                entidad=ENTIDADES['consultas'].nombre,
+                objeto_id=fila['id'],
+                empresa_id=fila['empresa_id'],
+                codusuario=fila['codpaciente_id'],
+                eliminado_en=ahora,
+            )
+            for fila in filas
+        ])
+        # Sin referencias (y con las filas bloqueadas) no hay cascadas ni
+        # SET_NULL que resolver: DELETE directo, sin cargar los objetos.
+        Consulta.objects.filter(pk__in=[fila['id'] for fila in filas])._raw_delete(Consulta.objects.db)
+
+        trabajo.ultimo_id = ventana[-1]
+        trabajo.archivadas += len(filas)
+        trabajo.retenidas += len(retenidas)
+        trabajo.save(update_fields=['ultimo_id', 'archivadas', 'retenidas', 'actualizado_en'])
+    return len(filas), len(retenidas)
+
+
+def reclamar(trabajo_id):
+    """
+    Marca el trabajo 'en_curso' si está pendiente o si quedó en curso sin
+    avanzar más de CONSULTAS_ARCHIVO_RESERVA_SEGUNDOS (proceso caído).
+    Devuelve False si otro proceso lo tiene.
+    """
+    limite = timezone.now() - timedelta(seconds=settings.CONSULTAS_ARCHIVO_RESERVA_SEGUNDOS)
+    return bool(
+        TrabajoArchivoConsultas.objects.filter(pk=trabajo_id)
+        .filter(
+            Q(estado=TrabajoArchivoConsultas.ESTADO_PENDIENTE)
+            | Q(estado=TrabajoArchivoConsultas.ESTADO_EN_CURSO, actualizado_en__lt=limite)
+        )
+        .update(estado=TrabajoArchivoConsultas.ESTADO_EN_CURSO, actualizado_en=timezone.now())
+    )
+
+
+def procesar_trabajo(trabajo_id, lote=None, progreso=None):
+    """
+    Ejecuta el trabajo lote a lote hasta terminarlo. `progreso(trabajo)` se
+    llama después de cada lote. Devuelve el trabajo, o None si no se pudo reclamar.
+    """
+    if not reclamar(trabajo_id):
+        return None
+    trabajo = TrabajoArchivoConsultas.objects.get(pk=trabajo_id)
+    try:
+        while archivar_lote(trabajo, lote) is not None:
+            if progreso:
+                progreso(trabajo)
+    except Exception as e:
+        logger.exception("[Archivo consultas] Falló el trabajo #%s", trabajo.pk)
+        trabajo.estado = TrabajoArchivoConsultas.ESTADO_FALLIDO
+        trabajo.ultimo_error = str(e)
+        trabajo.save(update_fields=['estado', 'ultimo_error', 'actualizado_en'])
+        return trabajo
+
+    trabajo.estado = TrabajoArchivoConsultas.ESTADO_COMPLETADO
+    trabajo.finalizado_en = timezone.now()
+    trabajo.ultimo_error = ''
+    trabajo.save(update_fields=['estado', 'finalizado_en', 'ultimo_error', 'actualizado_en'])
+    Bitacora.objects.create(
+        empresa_id=trabajo.empresa_id,
+        usuario=trabajo.solicitado_por,
+        accion='ARCHIVAR_CITAS_VENCIDAS',
+        tabla_afectada='consulta',
+        registro_id=trabajo.pk,
+        valores_nuevos={
+            'fecha_corte': str(trabajo.fecha_corte),
+            'archivadas': trabajo.archivadas,
+            'retenidas': trabajo.retenidas,
+        },
+        ip_address='127.0.0.1',
+        user_agent='Scheduled Task',
+    )
+    return trabajo
+
+
+def trabajos_por_procesar():
+    """Pendientes y en curso abandonados, del más antiguo al más nuevo."""
+    limite = timezone.now() - timedelta(seconds=settings.CONSULTAS_ARCHIVO_RESERVA_SEGUNDOS)
+    return TrabajoArchivoConsultas.objects.filter(
+        Q(estado=TrabajoArchivoConsultas.ESTADO_PENDIENTE)
+        | Q(estado=TrabajoArchivoConsultas.ESTADO_EN_CURSO, actualizado_en__lt=limite)
+    ).order_by('creado_en')
+
+
+# ----------------------------------------------------------------------
+# Ejecución en segundo plano
+# ----------------------------------------------------------------------
+def _procesar_en_worker(trabajo_id):
+    close_old_connections()
+    try:
+        procesar_trabajo(trabajo_id)
+    except Exception:
+        logger.exception("[Archivo consultas] Error en el worker para el trabajo %s", trabajo_id)
+    finally:
+        connection.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.CONSULTAS_ARCHIVO_WORKERS,
+                    thread_name_prefix='archivo-consultas',
+                )
+    return _pool
+
+
+def programar_procesamiento(trabajo):
+    """Encola el trabajo cuando se confirme la transacción."""
+    trabajo_id = trabajo.pk
+    if settings.CONSULTAS_ARCHIVO_WORKERS <= 0:
+        transaction.on_commit(lambda: procesar_trabajo(trabajo_id))
+    else:
+        transaction.on_commit(lambda: _get_pool().submit(_procesar_en_worker, trabajo_id))
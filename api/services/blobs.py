@@ -0,0 +1,135 @@
+"""
+Almacenamiento deduplicado por contenido (SHA-256).
+
+Cada archivo subido se hashea mientras se recorre por chunks; si el tenant ya
+tiene un blob con ese hash, el registro nuevo lo reutiliza (sin transferir
+nada) y se incrementa su contador de referencias. `liberar_blob` elimina el
+objeto físico solo cuando deja de usarlo el último registro.
+"""
+
+import hashlib
+import logging
+import os
+from typing import Optional, Tuple
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from api.models import BlobAlmacenado
+from api.services.storage_gateway import get_storage_gateway
+
+logger = logging.getLogger(__name__)
+
+
+def hash_streaming(archivo) -> str:
+    """SHA-256 hex de un UploadedFile, leído por chunks (memoria acotada)."""
+    sha = hashlib.sha256()
+    for chunk in archivo.chunks():
+        sha.update(chunk)
+    archivo.seek(0)
+    return sha.hexdigest()
+
+
+def key_blob(empresa, sha256: str, ubicacion: str, extension: str = '') -> str:
+    extension = extension.lower()
+    if ubicacion == BlobAlmacenado.UBICACION_S3:
+        return f"tenants/{empresa.id}/blobs/{sha256[:2]}/{sha256}{extension}"
+    return f"evidencias/blobs/{empresa.id}/{sha256[:2]}/{sha256}{extension}"
+
+
+def buscar_blob(empresa, sha256: str,
+                ubicacion: str = BlobAlmacenado.UBICACION_S3) -> Optional[BlobAlmacenado]:
+    return BlobAlmacenado.objects.filter(empresa=empresa, sha256=sha256, ubicacion=ubicacion).first()
+
+
+def tomar_referencia(empresa, sha256: str,
+                     ubicacion: str = BlobAlmacenado.UBICACION_S3) -> Optional[BlobAlmacenado]:
+    """
+    Suma una referencia al blob del hash, si existe. Bloquea la fila para no
+    competir con un `liberar_blob` que esté eliminando la última referencia.
+    """
+    with transaction.atomic():
+        blob = BlobAlmacenado.objects.select_for_update().filter(
+            empresa=empresa, sha256=sha256, ubicacion=ubicacion
+        ).first()
+        if blob is not None:
+            blob.referencias = F('referencias') + 1
+            blob.save(update_fields=['referencias'])
+            blob.refresh_from_db(fields=['referencias'])
+        return blob
+
+
+def _eliminar_objeto(ubicacion: str, key: str):
+    try:
+        if ubicacion == BlobAlmacenado.UBICACION_S3:
+            get_storage_gateway().eliminar(key)
+        else:
+            default_storage.delete(key)
+    except Exception:
+        logger.exception("[Blobs] No se pudo eliminar %s", key)
+
+
+def registrar_blob(*, empresa, sha256: str, key: str, tamanio: int, content_type: str,
+                   ubicacion: str = BlobAlmacenado.UBICACION_S3) -> BlobAlmacenado:
+    """
+    Registra con una referencia el objeto ya almacenado en `key`. Si otra
+    carga concurrente registró el mismo hash primero, se reutiliza ese blob y
+    se descarta el objeto duplicado.
+    """
+    try:
+        with transaction.atomic():
+            return BlobAlmacenado.objects.create(
+                empresa=empresa, sha256=sha256, ubicacion=ubicacion, key=key,
+                tamanio=tamanio, content_type=content_type, referencias=1
+            )
+    except IntegrityError:
+        existente = tomar_referencia(empresa, sha256, ubicacion)
+        if existente is None:
+            raise
+        if existente.key != key:
+            _eliminar_objeto(ubicacion, key)
+        return existente
+
+
+def obtener_o_subir_blob(*, empresa, archivo, content_type: str,
+                         ubicacion: str = BlobAlmacenado.UBICACION_S3) -> Tuple[BlobAlmacenado, bool]:
+    """
+    Devuelve `(blob, duplicado)`. Si el contenido ya existe en el tenant no se
+    sube nada; si no, se guarda bajo su hash y se registra el blob.
+    """
+    sha256 = hash_streaming(archivo)
+    existente = tomar_referencia(empresa, sha256, ubicacion)
+    if existente is not None:
+        return existente, True
+
+    key = key_blob(empresa, sha256, ubicacion, os.path.splitext(archivo.name)[1])
+    if ubicacion == BlobAlmacenado.UBICACION_S3:
+        get_storage_gateway().subir_archivo(archivo, key, content_type=content_type)
+    else:
+        key = default_storage.save(key, archivo)
+
+    blob = registrar_blob(
+        empresa=empresa, sha256=sha256, key=key, tamanio=archivo.size,
+        content_type=content_type, ubicacion=ubicacion
+    )
+    return blob, False
+
+
+def liberar_blob(blob_id) -> bool:
+    """
+    Resta una referencia. Si era la última, elimina el blob y su objeto
+    físico (tras el commit) y devuelve True.
+    """
+    with transaction.atomic():
+        blob = BlobAlmacenado.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return False
+        if blob.referencias > 1:
+            blob.referencias -= 1
+            blob.save(update_fields=['referencias'])
+            return False
+        ubicacion, key = blob.ubicacion, blob.key
+        blob.delete()
+        transaction.on_commit(lambda: _eliminar_objeto(ubicacion, key))
+    return True
@@ -0,0 +1,122 @@
+"""
+Caché HTTP de los catálogos que cambian poco (tipos de consulta, estados,
+tipos de usuario, horarios, servicios).
+
+Cada catálogo tiene una versión por tenant (VersionCatalogo) que los signals
+de api/signals_catalogos.py incrementan en cada alta, cambio o baja. La fila
+se crea al leer la versión por primera vez, nunca desde un signal: una baja
+en cascada al eliminar la empresa volvería a insertar la fila de una empresa
+que se está borrando. Con esa versión:
+
+  - el endpoint responde ETag / Last-Modified / Cache-Control, y un
+    `If-None-Match` vigente se contesta con 304 sin tocar el queryset (el
+    ETag es el único validador: Last-Modified solo tiene segundos);
+  - el cuerpo serializado se guarda en un LRU en memoria del proceso, con la
+    versión en la clave: una escritura invalida todo lo anterior sin borrar
+    nada explícitamente.
+
+Las escrituras masivas que no disparan signals (queryset.update, bulk_create)
+deben llamar a `incrementar_version` a mano.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.models import Estadodeconsulta, Horario, Servicio, Tipodeconsulta, Tipodeusuario, VersionCatalogo
+
+CATALOGOS = {
+    'tipos_consulta': Tipodeconsulta,
+    'estados_consulta': Estadodeconsulta,
+    'tipos_usuario': Tipodeusuario,
+    'horarios': Horario,
+    'servicios': Servicio,
+}
+
+
+def incrementar_version(catalogo: str, empresa_id: Optional[int]):
+    """
+    Nueva versión del catálogo para el tenant (o para las filas globales).
+    Sin fila no hay nada que invalidar: nadie leyó todavía esa versión.
+    """
+    VersionCatalogo.objects.filter(catalogo=catalogo, empresa_id=empresa_id).update(
+        version=F('version') + 1, modificado_en=timezone.now()
+    )
+
+
+def version_catalogo(catalogo: str, empresa) -> Tuple[str, Optional[object]]:
+    """
+    (versión, última modificación) del catálogo visto por el tenant: combina
+    la versión del tenant y la de las filas globales en una sola consulta. La
+    primera lectura crea las filas que falten para que las escrituras
+    siguientes tengan qué incrementar.
+    """
+    consulta = VersionCatalogo.objects.filter(
+        Q(empresa=empresa) | Q(empresa__isnull=True), catalogo=catalogo
+    ).values_list('empresa_id', 'version', 'modificado_en')
+    filas = list(consulta)
+    faltantes = {empresa.pk, None} - {empresa_id for empresa_id, _, _ in filas}
+    if faltantes:
+        VersionCatalogo.objects.bulk_create(
+            [VersionCatalogo(catalogo=catalogo, empresa_id=empresa_id) for empresa_id in faltantes],
+            ignore_conflicts=True,
+        )
+        filas = list(consulta.all())
+    propia, globales, modificado = 0, 0, None
+    for empresa_id, version, modificado_en in filas:
+        if empresa_id is None:
+            globales = version
+        else:
+            propia = version
+        modificado = max(modificado, modificado_en) if modificado else modificado_en
+    return f'{propia}.{globales}', modificado
+
+
+def etag(catalogo: str, empresa, version: str, variante: str) -> str:
+    """ETag débil: versión del catálogo + hash de la variante (URL y formato)."""
+    resumen = hashlib.sha1(variante.encode()).hexdigest()[:12]
+    return f'W/"{catalogo}-{empresa.pk}-{version}-{resumen}"'
+
+
+class CacheRespuestas:
+    """LRU en memoria de cuerpos serializados (`response.data`), por proceso."""
+
+    def __init__(self, max_entradas: int = 1000):
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._datos = OrderedDict()
+
+    def obtener(self, clave):
+        with self._lock:
+            if clave not in self._datos:
+                return None
+            self._datos.move_to_end(clave)
+            return self._datos[clave]
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+_cache_respuestas = None
+
+
+def cache_respuestas() -> CacheRespuestas:
+    global _cache_respuestas
+    if _cache_respuestas is None:
+        _cache_respuestas = CacheRespuestas(settings.CATALOGO_CACHE_ENTRADAS)
+    return _cache_respuestas
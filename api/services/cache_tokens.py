@@ -0,0 +1,232 @@
+"""
+Caché de tokens validados para la autenticación por token de DRF.
+
+TokenAuthentication resuelve cada request autenticado con un JOIN
+Token + User. Aquí el token validado se guarda en dos niveles:
+
+  - un LRU en memoria del proceso, con vigencia TOKEN_AUTH_LRU_SEGUNDOS;
+  - la caché compartida de Django (clave con el hash del token, nunca el
+    token en claro), con vigencia TOKEN_AUTH_CACHE_SEGUNDOS.
+
+Se guarda solo lo mínimo (campos de identidad y permisos del User, fecha del
+token y bloqueos); ni la clave ni el hash de la contraseña. El User se
+reconstruye con el resto de campos diferidos: leerlos hace una consulta y
+save() solo escribe los cargados.
+
+Solo en un fallo de ambos se consulta la base. Ahí también se leen los
+BloqueoUsuario vigentes del usuario, que viajan con el token cacheado: como en
+el login, con tenant solo cuentan los de esa empresa y sin tenant cualquiera.
+
+La revocación es explícita (api/signals_tokens.py): al borrar un token
+(logout, reset de contraseña), al guardar el User y al guardar o borrar un
+bloqueo se descartan sus entradas en el proceso y en la caché compartida.
+Los demás procesos pueden seguir aceptando su copia local como mucho
+TOKEN_AUTH_LRU_SEGUNDOS.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.models import BloqueoUsuario, Usuario
+
+User = get_user_model()
+
+
+class CacheTokens:
+    """LRU en memoria de tokens validados con vencimiento, por proceso."""
+
+    def __init__(self, max_entradas: int = 10000, vigencia: float = 30):
+        self.max_entradas = max_entradas
+        self.vigencia = vigencia
+        self._lock = threading.Lock()
+        self._datos = OrderedDict()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            vence, valor = entrada
+            if vence < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.vigencia, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def descartar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+_cache_local = None
+
+
+def cache_local() -> CacheTokens:
+    global _cache_local
+    if _cache_local is None:
+        _cache_local = CacheTokens(settings.TOKEN_AUTH_LRU_ENTRADAS, settings.TOKEN_AUTH_LRU_SEGUNDOS)
+    return _cache_local
+
+
+def _clave_compartida(key: str) -> str:
+    return f"auth:token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def bloqueos_vigentes(user) -> dict:
+    """
+    Bloqueos vigentes del Usuario de negocio del User (por correo), como
+    {empresa_id: [fecha_fin, ...]} (None: indefinido).
+    """
+    email = (getattr(user, 'email', None) or getattr(user, 'username', '') or '').strip()
+    if not email:
+        return {}
+    bloqueos = {}
+    for empresa_id, fecha_fin in (
+        BloqueoUsuario.objects.filter(usuario__correoelectronico__iexact=email, activo=True)
+        .filter(Q(fecha_fin__isnull=True) | Q(fecha_fin__gt=timezone.now()))
+        .values_list('usuario__empresa_id', 'fecha_fin')
+    ):
+        bloqueos.setdefault(empresa_id, []).append(fecha_fin)
+    return bloqueos
+
+
+def esta_bloqueado(bloqueos: dict, empresa=None) -> bool:
+    """
+    Si alguno de `bloqueos` (ver bloqueos_vigentes) sigue vigente para la
+    empresa del request. Como en el login: con tenant solo cuentan los de esa
+    empresa; sin tenant, los de cualquiera.
+    """
+    if empresa is None:
+        fechas_fin = [fecha_fin for fechas in bloqueos.values() for fecha_fin in fechas]
+    else:
+        fechas_fin = bloqueos.get(getattr(empresa, 'pk', empresa), [])
+    # Los que vencen mientras el token sigue cacheado dejan de contar
+    ahora = timezone.now()
+    return any(fecha_fin is None or fecha_fin > ahora for fecha_fin in fechas_fin)
+
+
+# En el orden de los campos del modelo, como espera Model.from_db
+CAMPOS_USER = tuple(
+    campo.attname for campo in User._meta.concrete_fields
+    if campo.attname in {'id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser'}
+)
+
+
+def _datos_token(token: Token) -> dict:
+    return {
+        'user': [getattr(token.user, campo) for campo in CAMPOS_USER],
+        'created': token.created,
+        'bloqueos': token.bloqueos,
+    }
+
+
+def _token_desde_datos(key: str, datos: dict) -> Token:
+    # Instancias nuevas por request: el LRU lo comparten los hilos del proceso
+    user = User.from_db(router.db_for_read(User), CAMPOS_USER, datos['user'])
+    token = Token.from_db(router.db_for_read(Token), ['key', 'user_id', 'created'], [key, user.pk, datos['created']])
+    token.user = user
+    token.bloqueos = datos['bloqueos']
+    return token
+
+
+def token_cacheado(key: str) -> Optional[Token]:
+    """Token validado desde el LRU o la caché compartida; None si no está."""
+    local = cache_local()
+    datos = local.obtener(key)
+    if datos is None:
+        datos = cache.get(_clave_compartida(key))
+        if datos is None:
+            return None
+        local.guardar(key, datos)
+    return _token_desde_datos(key, datos)
+
+
+def guardar_token(token: Token):
+    """
+    Cachea un token ya validado (con `user` cargado) en ambos niveles, junto
+    con sus bloqueos vigentes (`token.bloqueos`, ver bloqueos_vigentes).
+    """
+    if not hasattr(token, 'bloqueos'):
+        token.bloqueos = bloqueos_vigentes(token.user)
+    datos = _datos_token(token)
+    cache.set(_clave_compartida(token.key), datos, settings.TOKEN_AUTH_CACHE_SEGUNDOS)
+    cache_local().guardar(token.key, datos)
+
+
+def token_valido(key: str, empresa=None) -> Optional[Token]:
+    """
+    Token (con `user` cargado) si la clave es válida, el usuario está activo
+    y no está bloqueado en `empresa`; None si no. Para código fuera de DRF
+    (middlewares).
+    """
+    if not key:
+        return None
+    token = token_cacheado(key)
+    if token is None:
+        token = Token.objects.select_related('user').filter(key=key).first()
+        if token is None or not token.user.is_active:
+            return None
+        guardar_token(token)
+    if esta_bloqueado(token.bloqueos, empresa):
+        return None
+    return token
+
+
+# ----------------------------------------------------------------------
+# Revocación
+# ----------------------------------------------------------------------
+def revocar_token(key: str):
+    """Descarta el token de este proceso y de la caché compartida."""
+    cache_local().descartar(key)
+    cache.delete(_clave_compartida(key))
+
+
+def revocar_tokens(keys: Iterable[str]):
+    keys = list(keys)
+    for key in keys:
+        cache_local().descartar(key)
+    cache.delete_many([_clave_compartida(key) for key in keys])
+
+
+def revocar_tokens_de_user(user_id):
+    """Tokens del User de Django (cambio de contraseña, desactivación...)."""
+    revocar_tokens(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+
+def revocar_tokens_de_usuarios(usuario_ids):
+    """Tokens de Usuarios de negocio (p. ej. al bloquearlos), resueltos por correo como en el login."""
+    emails = [
+        email.strip() for email in
+        Usuario.objects.filter(pk__in=list(usuario_ids)).values_list('correoelectronico', flat=True)
+        if email
+    ]
+    if not emails:
+        return
+    condicion = Q()
+    for email in emails:
+        condicion |= Q(user__email__iexact=email) | Q(user__username__iexact=email)
+    revocar_tokens(Token.objects.filter(condicion).values_list('key', flat=True))
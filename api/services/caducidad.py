@@ -0,0 +1,225 @@
+"""
+Caducidad por lotes de presupuestos digitales y planes de tratamiento.
+
+Antes, cada presupuesto vencido se caducaba con su propio save() (con sus
+signals pre_save/post_save) y su propio registro de bitácora, y los planes no
+tenían camino por lotes. Aquí cada modelo se caduca con un único
+UPDATE ... RETURNING, la bitácora se escribe con un bulk_create y los avisos a
+los pacientes se encolan con un solo bulk_create. El número de sentencias no
+depende de cuántos registros vencen.
+
+    from api.services.caducidad import ejecutar_caducidad
+    ejecutar_caducidad()  # {'presupuestos': 120, 'planes': 8, 'notificaciones': 95}
+
+Lo ejecuta cada noche `python manage.py caducar_vencidos`.
+"""
+import logging
+
+from django.db import connections, transaction
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
+
+from api.models import Bitacora, Plandetratamiento, PresupuestoDigital
+
+logger = logging.getLogger(__name__)
+
+# Motores que aceptan UPDATE ... RETURNING (SQLite desde 3.35)
+MOTORES_RETURNING = ('postgresql', 'sqlite')
+
+
+def actualizar_con_returning(queryset, valores, campos):
+    """
+    UPDATE de todas las filas de queryset con `valores` en una sola sentencia.
+    Devuelve las filas actualizadas como dicts con `campos` (ya convertidos a
+    Python). En motores sin RETURNING se lee antes con SELECT ... FOR UPDATE.
+    """
+    modelo = queryset.model
+    conexion = connections[queryset.db]
+    fields = [modelo._meta.get_field(campo) for campo in campos]
+
+    if conexion.vendor not in MOTORES_RETURNING:
+        with transaction.atomic(using=queryset.db):
+            filas = list(queryset.select_for_update().values(*[f.attname for f in fields]))
+            modelo._base_manager.using(queryset.db).filter(
+                pk__in=[fila[modelo._meta.pk.attname] for fila in filas]
+            ).update(**valores)
+        return [{campo: fila[f.attname] for campo, f in zip(campos, fields)} for fila in filas]
+
+    # El compilador del ORM arma el UPDATE (filtros y conversión de valores);
+    # solo se le agrega la cláusula RETURNING.
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(valores)
+    compilador = query.get_compiler(queryset.db)
+    compilador.pre_sql_setup()
+    sql, params = compilador.as_sql()
+    returning = ', '.join(conexion.ops.quote_name(f.column) for f in fields)
+    with conexion.cursor() as cursor:
+        cursor.execute(f'{sql} RETURNING {returning}', params)
+        filas = cursor.fetchall()
+    return [
+        {campo: f.to_python(valor) for campo, f, valor in zip(campos, fields, fila)}
+        for fila in filas
+    ]
+
+
+def caducar_presupuestos(hoy=None, empresa=None):
+    """Pasa a Caducado los presupuestos emitidos con vigencia anterior a `hoy`."""
+    hoy = hoy or timezone.now().date()
+    vencidos = PresupuestoDigital.objects.filter(
+        estado=PresupuestoDigital.ESTADO_EMITIDO,
+        fecha_vigencia__lt=hoy,
+    )
+    if empresa is not None:
+        vencidos = vencidos.filter(empresa=empresa)
+    return actualizar_con_returning(
+        vencidos,
+        {'estado': PresupuestoDigital.ESTADO_CADUCADO, 'fecha_actualizacion': timezone.now()},
+        ['id', 'empresa', 'plan_tratamiento', 'codigo_presupuesto', 'fecha_vigencia'],
+    )
+
+
+def caducar_planes(hoy=None, empresa=None):
+    """
+    Marca como caducados (y no editables) los planes aprobados cuya aceptación
+    sigue pendiente y cuya vigencia terminó antes de `hoy`; lo mismo que
+    Plandetratamiento.marcar_como_caducado() para cada uno.
+    """
+    hoy = hoy or timezone.now().date()
+    vencidos = Plandetratamiento.objects.filter(
+        estado_plan=Plandetratamiento.ESTADO_PLAN_APROBADO,
+        estado_aceptacion=Plandetratamiento.ESTADO_PENDIENTE,
+        fecha_vigencia__lt=hoy,
+    )
+    if empresa is not None:
+        vencidos = vencidos.filter(empresa=empresa)
+    return actualizar_con_returning(
+        vencidos,
+        {
+            'estado_aceptacion': Plandetratamiento.ESTADO_CADUCADO,
+            'es_editable': False,
+            'fecha_modificacion': timezone.now(),
+        },
+        ['id', 'empresa', 'codpaciente', 'fecha_vigencia'],
+    )
+
+
+def _bitacora_presupuestos(filas):
+    return [
+        Bitacora(
+            empresa_id=fila['empresa'],
+            usuario=None,
+            accion="PRESUPUESTO_CADUCADO_AUTO",
+            tabla_afectada="presupuesto_digital",
+            registro_id=fila['id'],
+            valores_anteriores={'estado': PresupuestoDigital.ESTADO_EMITIDO},
+            valores_nuevos={
+                'codigo_presupuesto': fila['codigo_presupuesto'].hex[:8],
+                'estado': PresupuestoDigital.ESTADO_CADUCADO,
+                'fecha_caducidad': str(fila['fecha_vigencia']),
+            },
+            ip_address='127.0.0.1',
+            user_agent='Scheduled Task',
+        )
+        for fila in filas
+    ]
+
+
+def _bitacora_planes(filas):
+    return [
+        Bitacora(
+            empresa_id=fila['empresa'],
+            usuario=None,
+            accion="PLAN_CADUCADO_AUTO",
+            tabla_afectada="plandetratamiento",
+            registro_id=fila['id'],
+            valores_anteriores={'estado_aceptacion': Plandetratamiento.ESTADO_PENDIENTE},
+            valores_nuevos={
+                'estado_aceptacion': Plandetratamiento.ESTADO_CADUCADO,
+                'fecha_caducidad': str(fila['fecha_vigencia']),
+            },
+            ip_address='127.0.0.1',
+            user_agent='Scheduled Task',
+        )
+        for fila in filas
+    ]
+
+
+def _avisos_presupuestos(filas):
+    # Paciente de cada presupuesto: una consulta para todos los planes
+    pacientes = dict(
+        Plandetratamiento.objects.filter(
+            pk__in={fila['plan_tratamiento'] for fila in filas}
+        ).values_list('id', 'codpaciente_id')
+    )
+    return [
+        {
+            'usuario_codigo': pacientes[fila['plan_tratamiento']],
+            'titulo': '⏰ Presupuesto vencido',
+            'mensaje': (
+                f"Tu presupuesto {fila['codigo_presupuesto'].hex[:8]} venció el {fila['fecha_vigencia']}. "
+                f"Contacta a la clínica si quieres renovarlo."
+            ),
+            'data': {
+                'presupuesto_id': fila['id'],
+                'plan_id': fila['plan_tratamiento'],
+                'fecha_vigencia': str(fila['fecha_vigencia']),
+            },
+        }
+        for fila in filas if fila['plan_tratamiento'] in pacientes
+    ]
+
+
+def _avisos_planes(filas):
+    return [
+        {
+            'usuario_codigo': fila['codpaciente'],
+            'titulo': '⏰ Plan de tratamiento vencido',
+            'mensaje': (
+                f"Tu plan de tratamiento #{fila['id']} venció el {fila['fecha_vigencia']} sin ser aceptado. "
+                f"Contacta a la clínica si quieres renovarlo."
+            ),
+            'data': {'plan_id': fila['id'], 'fecha_vigencia': str(fila['fecha_vigencia'])},
+        }
+        for fila in filas
+    ]
+
+
+def _notificar(tipo_nombre, avisos):
+    if not avisos:
+        return 0
+    try:
+        from api.notifications_mobile.queue import enqueue_notif_batch
+        return len(enqueue_notif_batch(tipo_nombre=tipo_nombre, avisos=avisos))
+    except ImportError:
+        logger.warning("Sistema de notificaciones no disponible")
+    except Exception as e:
+        logger.error(f"Error al encolar avisos {tipo_nombre}: {e}", exc_info=True)
+    return 0
+
+
+@transaction.atomic
+def ejecutar_caducidad(hoy=None, empresa=None, presupuestos=True, planes=True, notificar=True):
+    """
+    Caduca presupuestos y planes vencidos, registra la bitácora y avisa a los
+    pacientes. Devuelve {'presupuestos': n, 'planes': n, 'notificaciones': n}.
+    """
+    filas_presupuestos = caducar_presupuestos(hoy, empresa) if presupuestos else []
+    filas_planes = caducar_planes(hoy, empresa) if planes else []
+
+    Bitacora.objects.bulk_create(
+        _bitacora_presupuestos(filas_presupuestos) + _bitacora_planes(filas_planes),
+        batch_size=1000,
+    )
+
+    notificaciones = 0
+    if notificar:
+        notificaciones += _notificar('presupuesto_caducado', _avisos_presupuestos(filas_presupuestos))
+        notificaciones += _notificar('plan_caducado', _avisos_planes(filas_planes))
+
+    resumen = {
+        'presupuestos': len(filas_presupuestos),
+        'planes': len(filas_planes),
+        'notificaciones': notificaciones,
+    }
+    logger.info("Caducidad: %s", resumen)
+    return resumen
@@ -7,11 +7,124 @@ Este servicio proporciona métodos reutilizables para cálculos de pagos,
 validaciones y generación de resúmenes financieros.
 """
 
+from dataclasses import dataclass
 from decimal import Decimal
 from typing import Dict, List, Tuple, Optional
-from django.db.models import Sum, Q, F
+from django.db.models import DecimalField, Sum, Q, F, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from api.db_router import lecturas_en_replica
+
+
+ESTRATEGIAS_DISTRIBUCION = ('proporcional', 'antiguedad', 'orden')
+
+
+@dataclass(frozen=True)
+class SaldoItem:
+    """Foto del saldo de un item del plan al momento de cargarla."""
+    item_id: int
+    servicio_nombre: str
+    orden: int
+    costo_total: Decimal
+    monto_pagado: Decimal
+
+    @property
+    def saldo_pendiente(self) -> Decimal:
+        return max(self.costo_total - self.monto_pagado, Decimal('0'))
+
+
+def cargar_saldos_items(plan_tratamiento, items_ids: Optional[List[int]] = None) -> List[SaldoItem]:
+    """
+    Saldos de los items no cancelados del plan (o de `items_ids`) en una sola
+    consulta: el monto pagado se agrega sobre los detalles de pagos aprobados.
+    """
+    from api.models import Itemplandetratamiento
+
+    items = Itemplandetratamiento.objects.filter(
+        idplantratamiento=plan_tratamiento
+    ).exclude(estado_item='Cancelado')
+    if items_ids:
+        items = items.filter(id__in=items_ids)
+
+    filas = items.annotate(
+        pagado=Coalesce(
+            Sum('detalles_pago__monto_pagado_ahora', filter=Q(detalles_pago__pago__estado='aprobado')),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+    ).order_by('orden', 'id').values_list('id', 'idservicio__nombre', 'orden', 'costofinal', 'pagado')
+
+    return [
+        SaldoItem(
+            item_id=item_id,
+            servicio_nombre=servicio_nombre or 'Sin servicio',
+            orden=orden,
+            costo_total=Decimal(str(costo or 0)),
+            monto_pagado=Decimal(str(pagado or 0)),
+        )
+        for item_id, servicio_nombre, orden, costo, pagado in filas
+    ]
+
+
+def _a_centavos(monto: Decimal) -> int:
+    return int((Decimal(str(monto)) * 100).to_integral_value())
+
+
+def distribuir_pago(saldos: List[SaldoItem], monto_pago: Decimal,
+                    estrategia: str = 'proporcional') -> Tuple[List[Tuple[SaldoItem, Decimal]], Decimal]:
+    """
+    Reparte `monto_pago` entre los items con saldo, sin consultas.
+
+    Estrategias:
+      - 'proporcional': según el saldo de cada item, en centavos con el
+        método del mayor resto (la suma es exacta y ningún item supera su saldo);
+      - 'antiguedad': salda primero los items más antiguos (por id);
+      - 'orden': salda primero según `orden` del plan.
+
+    Devuelve ([(saldo_item, monto_asignado)], monto_sobrante). Los items que
+    no reciben nada no aparecen en la lista.
+    """
+    if estrategia not in ESTRATEGIAS_DISTRIBUCION:
+        raise ValueError(f"Estrategia de distribución no válida: {estrategia}")
+
+    pendientes = [saldo for saldo in saldos if saldo.saldo_pendiente > 0]
+    saldos_c = [_a_centavos(saldo.saldo_pendiente) for saldo in pendientes]
+    monto_c = _a_centavos(monto_pago)
+    total_c = sum(saldos_c)
+
+    secuencia = list(range(len(pendientes)))
+    if monto_c >= total_c:
+        # El pago cubre todo: cada item recibe su saldo
+        asignados = saldos_c
+    elif estrategia == 'proporcional':
+        asignados, restos = [], []
+        for i, saldo_c in enumerate(saldos_c):
+            cuota, resto = divmod(monto_c * saldo_c, total_c)
+            asignados.append(cuota)
+            restos.append((resto, i))
+        # Los centavos que faltan van a los mayores restos (empate: el primero)
+        faltan = monto_c - sum(asignados)
+        for _, i in sorted(restos, key=lambda r: (-r[0], r[1]))[:faltan]:
+            asignados[i] += 1
+    else:
+        if estrategia == 'antiguedad':
+            secuencia.sort(key=lambda i: pendientes[i].item_id)
+        else:
+            secuencia.sort(key=lambda i: (pendientes[i].orden, pendientes[i].item_id))
+        asignados, disponible = [0] * len(pendientes), monto_c
+        for i in secuencia:
+            asignados[i] = min(saldos_c[i], disponible)
+            disponible -= asignados[i]
+
+    distribucion = [
+        (pendientes[i], Decimal(asignados[i]).scaleb(-2))
+        for i in secuencia
+        if asignados[i] > 0
+    ]
+    sobrante = Decimal(max(monto_c - total_c, 0)).scaleb(-2)
+    return distribucion, sobrante
+
 
 class CalculadorPagos:
     """
@@ -134,7 +247,9 @@ class CalculadorPagos:
     
     @staticmethod
     def calcular_distribucion_pago(plan_tratamiento, monto_pago: Decimal, 
-                                   items_seleccionados: Optional[List[int]] = None) -> Dict:
+                                   items_seleccionados: Optional[List[int]] = None,
+                                   estrategia: str = 'proporcional',
+                                   saldos: Optional[List[SaldoItem]] = None) -> Dict:
         """
         Calcula cómo distribuir un pago entre los items del plan.
         
@@ -142,97 +257,36 @@ class CalculadorPagos:
             plan_tratamiento: Instancia de Plandetratamiento
             monto_pago: Monto total a distribuir
             items_seleccionados: Lista de IDs de items (None = todos los items)
+            estrategia: 'proporcional', 'antiguedad' u 'orden' (ver distribuir_pago)
+            saldos: Saldos ya cargados con cargar_saldos_items (evita volver a consultarlos)
         
         Returns:
             Dict con distribución del pago por item
         """
-        from decimal import ROUND_HALF_UP
-        
-        # Obtener items a pagar
-        if items_seleccionados:
-            items = plan_tratamiento.itemplandetratamiento_set.filter(
-                id__in=items_seleccionados
-            ).exclude(estado_item='Cancelado')
-        else:
-            items = plan_tratamiento.itemplandetratamiento_set.exclude(
-                estado_item='Cancelado'
-            )
-        
-        # Filtrar items que pueden recibir pagos
-        items_pendientes = [item for item in items if item.calcular_saldo_pendiente() > 0]
-        
-        if not items_pendientes:
-            return {
-                'distribucion': [],
-                'monto_distribuido': 0,
-                'monto_sobrante': float(monto_pago)
-            }
-        
-        # Calcular saldo total de items pendientes
-        saldo_total = sum(item.calcular_saldo_pendiente() for item in items_pendientes)
-        
-        # Si el pago es menor al saldo total, distribuir proporcionalmente
-        if monto_pago < saldo_total:
-            distribucion = []
-            monto_restante = monto_pago
-            
-            for i, item in enumerate(items_pendientes):
-                saldo_item = item.calcular_saldo_pendiente()
-                
-                # Calcular proporción
-                if i < len(items_pendientes) - 1:
-                    # Para todos excepto el último, calcular proporción
-                    proporcion = saldo_item / saldo_total
-                    monto_item = (monto_pago * proporcion).quantize(
-                        Decimal('0.01'), 
-                        rounding=ROUND_HALF_UP
-                    )
-                else:
-                    # El último item recibe el resto (evita errores de redondeo)
-                    monto_item = monto_restante
-                
-                # Asegurar que no excede el saldo del item
-                monto_item = min(monto_item, saldo_item)
-                
-                distribucion.append({
-                    'item_id': item.id,
-                    'servicio_nombre': item.idservicio.nombre if item.idservicio else 'Sin servicio',
-                    'saldo_pendiente': float(saldo_item),
-                    'monto_a_pagar': float(monto_item),
-                    'saldo_resultante': float(saldo_item - monto_item)
-                })
-                
-                monto_restante -= monto_item
-            
-            return {
-                'distribucion': distribucion,
-                'monto_distribuido': float(monto_pago),
-                'monto_sobrante': 0
-            }
+        if saldos is None:
+            saldos = cargar_saldos_items(plan_tratamiento, items_seleccionados)
+        
+        asignaciones, sobrante = distribuir_pago(saldos, Decimal(str(monto_pago)), estrategia)
+        
+        distribucion = []
+        monto_distribuido = Decimal('0')
+        for saldo_item, monto_item in asignaciones:
+            distribucion.append({
+                'item_id': saldo_item.item_id,
+                'servicio_nombre': saldo_item.servicio_nombre,
+                'costo_total': float(saldo_item.costo_total),
+                'monto_pagado_anterior': float(saldo_item.monto_pagado),
+                'saldo_pendiente': float(saldo_item.saldo_pendiente),
+                'monto_a_pagar': float(monto_item),
+                'saldo_resultante': float(saldo_item.saldo_pendiente - monto_item)
+            })
+            monto_distribuido += monto_item
         
-        # Si el pago cubre todo, pagar el saldo de cada item
-        else:
-            distribucion = []
-            monto_usado = Decimal('0')
-            
-            for item in items_pendientes:
-                saldo_item = item.calcular_saldo_pendiente()
-                
-                distribucion.append({
-                    'item_id': item.id,
-                    'servicio_nombre': item.idservicio.nombre if item.idservicio else 'Sin servicio',
-                    'saldo_pendiente': float(saldo_item),
-                    'monto_a_pagar': float(saldo_item),
-                    'saldo_resultante': 0.0
-                })
-                
-                monto_usado += saldo_item
-            
-            return {
-                'distribucion': distribucion,
-                'monto_distribuido': float(monto_usado),
-                'monto_sobrante': float(monto_pago - monto_usado)
-            }
+        return {
+            'distribucion': distribucion,
+            'monto_distribuido': float(monto_distribuido),
+            'monto_sobrante': float(sobrante)
+        }
     
     @staticmethod
     def calcular_historial_pagos(plan_tratamiento) -> List[Dict]:
@@ -330,9 +384,11 @@ class CalculadorPagos:
         return True, "Monto válido"
     
     @staticmethod
+    @lecturas_en_replica()
     def obtener_estadisticas_empresa(empresa) -> Dict:
         """
         Genera estadísticas de pagos para toda la empresa.
+        Solo lectura: usa la réplica si está configurada (api/db_router.py).
         
         Args:
             empresa: Instancia de Empresa
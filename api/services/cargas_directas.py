@@ -0,0 +1,452 @@
+"""
+Cargas directas a S3 en dos fases (presigned POST).
+
+1. `iniciar_carga` registra una CargaDirecta pendiente y devuelve el presigned
+   POST acotado al prefijo del tenant/paciente.
+2. El cliente sube el archivo directo a S3 (el worker nunca recibe los bytes).
+3. `verificar_carga` consulta el objeto con HEAD y valida tamaño, tipo y hash
+   antes de que la vista cree el DocumentoClinico/Evidencia.
+
+El hash solo se da por verificado con el ChecksumSHA256 que S3 comprobó al
+recibir el POST o, si S3 no lo reporta (multipart, checksum compuesto), con
+el SHA-256 que calcula el servidor leyendo el objeto. Nunca con lo declarado
+por el cliente ni con los metadatos del objeto, que firma el propio servidor.
+Leer un objeto de hasta 5GB no cabe en el timeout de un request: la carga
+pasa a "verificando", la vista responde 202 y un pool de hilos (o el comando
+`verificar_cargas`) calcula el hash; el cliente vuelve a llamar a
+"completar" cuando la carga está "verificada".
+Solo un contenido verificado se registra como blob; si el tenant ya tiene un
+blob con el hash declarado, la carga se enlaza a él y se completa sin
+transferencia (ver `api.services.blobs`).
+
+Para archivos grandes existe la variante reanudable por partes (S3 multipart):
+`iniciar_carga_multipart` crea el upload, `urls_partes` firma los PUT de cada
+parte (el cliente los sube en paralelo), `estado_partes` indica qué partes ya
+recibió S3 para reanudar, y `finalizar_carga` ensambla las partes en S3 antes
+de verificar.
+"""
+
+import base64
+import math
+import logging
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from api.models import BlobAlmacenado, CargaDirecta
+from api.services.blobs import buscar_blob, registrar_blob, tomar_referencia
+from api.services.storage_gateway import get_storage_gateway
+
+logger = logging.getLogger(__name__)
+
+SHA256_HEX = re.compile(r'^[0-9a-f]{64}$')
+
+# Las keys de cargas directas viven siempre en S3, con independencia del
+# storage por defecto configurado para los FileField.
+PREFIJO_S3 = 'tenants/'
+
+
+def esta_en_s3(key: Optional[str]) -> bool:
+    return bool(key) and key.startswith(PREFIJO_S3)
+
+
+class CargaDirectaError(Exception):
+    """Error de validación de una carga directa (se responde con 400)."""
+
+
+class CargaEnVerificacion(CargaDirectaError):
+    """El hash del objeto se está calculando en segundo plano (se responde con 202)."""
+
+
+def nombre_seguro(nombre: str) -> str:
+    base, ext = os.path.splitext(nombre)
+    return f"{uuid.uuid4().hex[:8]}_{slugify(base)[:50] or 'archivo'}{ext.lower()}"
+
+
+def construir_key(empresa, destino: str, nombre: str, codpaciente: Optional[int] = None) -> str:
+    """
+    Prefijo por tenant (y paciente, si aplica):
+      tenants/<empresa>/pacientes/<paciente>/documentos/<uuid>_<nombre>
+      tenants/<empresa>/evidencias/<yyyy>/<mm>/<dd>/<uuid>_<nombre>
+    """
+    if destino == CargaDirecta.DESTINO_DOCUMENTO:
+        return f"{PREFIJO_S3}{empresa.id}/pacientes/{codpaciente}/documentos/{nombre_seguro(nombre)}"
+    hoy = timezone.now()
+    return f"{PREFIJO_S3}{empresa.id}/evidencias/{hoy.year}/{hoy.month}/{hoy.day}/{nombre_seguro(nombre)}"
+
+
+def _validar_declaracion(sha256: str, tamanio: int, tamanio_maximo: int) -> str:
+    sha256 = sha256.lower()
+    if not SHA256_HEX.match(sha256):
+        raise CargaDirectaError("sha256 debe ser el hash SHA-256 en hexadecimal (64 caracteres)")
+    if tamanio > tamanio_maximo:
+        raise CargaDirectaError(
+            f"El archivo excede el máximo permitido ({tamanio_maximo / (1024 * 1024):.0f}MB)"
+        )
+    return sha256
+
+
+def iniciar_carga(*, empresa, usuario, destino: str, nombre: str, content_type: str,
+                  tamanio: int, sha256: str, metadatos: Dict,
+                  codpaciente: Optional[int] = None) -> Tuple[CargaDirecta, Dict]:
+    """
+    Crea la carga pendiente y devuelve `(carga, presigned_post)`. Si el tenant
+    ya tiene ese contenido, `presigned_post` es None: no hay nada que subir y
+    se puede completar de inmediato.
+    """
+    sha256 = _validar_declaracion(sha256, tamanio, settings.DIRECT_UPLOAD_MAX_BYTES)
+
+    expiracion = settings.DIRECT_UPLOAD_EXPIRATION
+    key = construir_key(empresa, destino, nombre, codpaciente)
+    blob = buscar_blob(empresa, sha256)
+    carga = CargaDirecta.objects.create(
+        empresa=empresa,
+        usuario=usuario,
+        destino=destino,
+        s3_key=key,
+        nombre_original=nombre,
+        content_type=content_type,
+        tamanio_declarado=tamanio,
+        sha256=sha256,
+        metadatos=metadatos,
+        blob=blob,
+        fecha_expiracion=timezone.now() + timedelta(seconds=expiracion),
+    )
+    if blob is not None:
+        return carga, None
+
+    post = get_storage_gateway().post_firmado(
+        key,
+        content_type=content_type,
+        tamanio_maximo=tamanio,
+        expiracion=expiracion,
+        campos={
+            'x-amz-meta-sha256': sha256,
+            'x-amz-checksum-sha256': base64.b64encode(bytes.fromhex(sha256)).decode(),
+        },
+    )
+    return carga, post
+
+
+def _obtener_carga(carga_id, empresa, destino: str) -> CargaDirecta:
+    try:
+        return CargaDirecta.objects.get(id=carga_id, empresa=empresa, destino=destino)
+    except CargaDirecta.DoesNotExist:
+        raise CargaDirectaError("Carga no encontrada")
+
+
+def obtener_carga_pendiente(carga_id, empresa, destino: str) -> CargaDirecta:
+    carga = _obtener_carga(carga_id, empresa, destino)
+    if carga.estado != CargaDirecta.ESTADO_PENDIENTE:
+        raise CargaDirectaError(f"La carga ya fue {carga.get_estado_display().lower()}")
+    if not carga.esta_vigente():
+        raise CargaDirectaError("La carga expiró; solicite una nueva")
+    return carga
+
+
+def obtener_carga_por_completar(carga_id, empresa, destino: str) -> CargaDirecta:
+    """
+    Carga sobre la que se puede llamar a "completar": pendiente y vigente, o
+    ya verificada en segundo plano. Si el hash aún se está calculando lanza
+    CargaEnVerificacion.
+    """
+    carga = _obtener_carga(carga_id, empresa, destino)
+    if carga.estado == CargaDirecta.ESTADO_VERIFICANDO:
+        raise CargaEnVerificacion("El archivo se está verificando; vuelva a intentarlo en unos segundos")
+    if carga.estado == CargaDirecta.ESTADO_VERIFICADA:
+        return carga
+    return obtener_carga_pendiente(carga_id, empresa, destino)
+
+
+def _checksum_completo(info: Dict) -> Optional[str]:
+    """
+    SHA-256 (hex) que S3 verificó al recibir el objeto, o None si solo hay un
+    checksum compuesto ("<b64>-<n>", multipart) o ninguno.
+    """
+    checksum = info.get('ChecksumSHA256')
+    if checksum and '-' not in checksum:
+        return base64.b64decode(checksum).hex()
+    return None
+
+
+def _rechazar(carga: CargaDirecta, gateway, errores: List[str]):
+    motivo = f"El archivo subido no coincide con lo declarado ({', '.join(errores)})"
+    logger.warning("[CargaDirecta] %s rechazada: %s", carga.id, motivo)
+    try:
+        gateway.eliminar(carga.s3_key)
+    except ClientError:
+        logger.exception("[CargaDirecta] No se pudo eliminar %s", carga.s3_key)
+    carga.estado = CargaDirecta.ESTADO_RECHAZADA
+    carga.motivo_rechazo = motivo
+    carga.save(update_fields=['estado', 'motivo_rechazo'])
+    raise CargaDirectaError(motivo)
+
+
+def verificar_carga(carga: CargaDirecta) -> Dict:
+    """
+    Valida el objeto subido contra lo declarado al iniciar. Si no coincide,
+    elimina el objeto, marca la carga como rechazada y lanza CargaDirectaError.
+    Si S3 no reporta el checksum del objeto completo, encola el cálculo del
+    hash y lanza CargaEnVerificacion.
+    """
+    gateway = get_storage_gateway()
+    try:
+        info = gateway.info_objeto(carga.s3_key)
+    except ClientError:
+        raise CargaDirectaError("El archivo aún no fue subido a S3")
+
+    errores = []
+    if info.get('ContentLength') != carga.tamanio_declarado:
+        errores.append("tamaño")
+    if (info.get('ContentType') or '').split(';')[0] != carga.content_type:
+        errores.append("tipo")
+    if errores:
+        _rechazar(carga, gateway, errores)
+
+    sha256 = _checksum_completo(info)
+    if sha256 is None:
+        programar_verificacion(carga)
+        raise CargaEnVerificacion("El archivo se está verificando; vuelva a intentarlo en unos segundos")
+    if sha256 != carga.sha256:
+        _rechazar(carga, gateway, ["hash"])
+    return info
+
+
+# ----------------------------------------------------------------------
+# Verificación del hash en segundo plano
+# ----------------------------------------------------------------------
+def verificar_hash(carga_id) -> Optional[str]:
+    """
+    Calcula el SHA-256 de una carga "verificando" leyendo el objeto en S3 y
+    la deja "verificada" o rechazada. Devuelve el estado final, o None si la
+    carga ya no estaba en verificación o S3 no respondió (queda para el
+    siguiente intento de `verificar_cargas`).
+    """
+    carga = CargaDirecta.objects.filter(id=carga_id, estado=CargaDirecta.ESTADO_VERIFICANDO).first()
+    if carga is None:
+        return None
+    gateway = get_storage_gateway()
+    try:
+        sha256 = gateway.hash_objeto(carga.s3_key)
+    except ClientError:
+        logger.exception("[CargaDirecta] No se pudo leer %s para verificar su hash", carga.s3_key)
+        return None
+
+    if sha256 != carga.sha256:
+        try:
+            _rechazar(carga, gateway, ["hash"])
+        except CargaDirectaError:
+            pass
+        return CargaDirecta.ESTADO_RECHAZADA
+    CargaDirecta.objects.filter(id=carga.id, estado=CargaDirecta.ESTADO_VERIFICANDO).update(
+        estado=CargaDirecta.ESTADO_VERIFICADA
+    )
+    logger.info("[CargaDirecta] %s verificada", carga.id)
+    return CargaDirecta.ESTADO_VERIFICADA
+
+
+def _verificar_en_worker(carga_id):
+    close_old_connections()
+    try:
+        verificar_hash(carga_id)
+    finally:
+        connection.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.DIRECT_UPLOAD_VERIFICATION_WORKERS,
+                    thread_name_prefix='verificacion-cargas',
+                )
+    return _pool
+
+
+def programar_verificacion(carga: CargaDirecta):
+    """
+    Marca la carga como "verificando" y encola el cálculo del hash cuando se
+    confirme la transacción. Sin workers, lo toma el comando `verificar_cargas`.
+    """
+    if carga.estado != CargaDirecta.ESTADO_VERIFICANDO:
+        carga.estado = CargaDirecta.ESTADO_VERIFICANDO
+        carga.fecha_verificacion = timezone.now()
+        carga.save(update_fields=['estado', 'fecha_verificacion'])
+    if settings.DIRECT_UPLOAD_VERIFICATION_WORKERS > 0:
+        carga_id = carga.id
+        transaction.on_commit(lambda: _get_pool().submit(_verificar_en_worker, carga_id))
+
+
+def blob_de_carga(carga: CargaDirecta) -> BlobAlmacenado:
+    """
+    Blob (con una referencia más) al que debe apuntar el registro creado:
+    el existente si la carga fue un duplicado, o uno nuevo para el objeto
+    subido. Llamar dentro de la transacción que crea el registro.
+    """
+    if carga.blob_id:
+        blob = tomar_referencia(carga.empresa, carga.sha256)
+        if blob is None:
+            raise CargaDirectaError("El archivo ya no está disponible; inicie una nueva carga")
+        return blob
+    return registrar_blob(
+        empresa=carga.empresa,
+        sha256=carga.sha256,
+        key=carga.s3_key,
+        tamanio=carga.tamanio_declarado,
+        content_type=carga.content_type,
+    )
+
+
+def marcar_completada(carga: CargaDirecta, registro_id):
+    carga.estado = CargaDirecta.ESTADO_COMPLETADA
+    carga.registro_id = str(registro_id)
+    carga.fecha_completado = timezone.now()
+    carga.save(update_fields=['estado', 'registro_id', 'fecha_completado'])
+
+
+# ----------------------------------------------------------------------
+# Cargas reanudables por partes (S3 multipart)
+# ----------------------------------------------------------------------
+S3_MAX_PARTES = 10000
+S3_TAMANIO_MINIMO_PARTE = 5 * 1024 * 1024
+
+
+def calcular_tamanio_parte(tamanio: int) -> int:
+    """Tamaño de parte configurado, ampliado si el archivo superaría 10.000 partes."""
+    tamanio_parte = max(settings.DIRECT_UPLOAD_PART_SIZE, S3_TAMANIO_MINIMO_PARTE)
+    return max(tamanio_parte, math.ceil(tamanio / S3_MAX_PARTES))
+
+
+def iniciar_carga_multipart(*, empresa, usuario, destino: str, nombre: str, content_type: str,
+                            tamanio: int, sha256: str, metadatos: Dict,
+                            codpaciente: Optional[int] = None) -> CargaDirecta:
+    """
+    Crea el multipart upload en S3 y la carga pendiente que lo rastrea. Si el
+    contenido ya existe en el tenant, la carga queda enlazada al blob y sin
+    upload en S3 (se completa sin transferir partes).
+    """
+    sha256 = _validar_declaracion(sha256, tamanio, settings.DIRECT_UPLOAD_MULTIPART_MAX_BYTES)
+
+    key = construir_key(empresa, destino, nombre, codpaciente)
+    blob = buscar_blob(empresa, sha256)
+    upload_id = None
+    if blob is None:
+        upload_id = get_storage_gateway().iniciar_multipart(
+            key, content_type=content_type, metadatos={'sha256': sha256}
+        )
+    return CargaDirecta.objects.create(
+        empresa=empresa,
+        usuario=usuario,
+        destino=destino,
+        s3_key=key,
+        nombre_original=nombre,
+        content_type=content_type,
+        tamanio_declarado=tamanio,
+        sha256=sha256,
+        metadatos=metadatos,
+        upload_id=upload_id,
+        blob=blob,
+        tamanio_parte=calcular_tamanio_parte(tamanio),
+        fecha_expiracion=timezone.now() + timedelta(seconds=settings.DIRECT_UPLOAD_MULTIPART_EXPIRATION),
+    )
+
+
+def _exigir_multipart(carga: CargaDirecta):
+    if not carga.es_multipart:
+        raise CargaDirectaError("La carga no es por partes")
+
+
+def urls_partes(carga: CargaDirecta, numeros: Iterable[int]) -> Dict[int, str]:
+    """URLs PUT firmadas para subir en paralelo las partes indicadas."""
+    _exigir_multipart(carga)
+    total = carga.total_partes
+    numeros = sorted(set(numeros))
+    invalidos = [n for n in numeros if n < 1 or n > total]
+    if invalidos:
+        raise CargaDirectaError(f"Números de parte fuera de rango (1-{total}): {invalidos}")
+
+    gateway = get_storage_gateway()
+    expiracion = settings.DIRECT_UPLOAD_EXPIRATION
+    return {n: gateway.url_parte(carga.s3_key, carga.upload_id, n, expiracion) for n in numeros}
+
+
+def estado_partes(carga: CargaDirecta) -> Dict:
+    """Partes ya recibidas por S3 y las que faltan, para reanudar la carga."""
+    _exigir_multipart(carga)
+    recibidas = get_storage_gateway().listar_partes(carga.s3_key, carga.upload_id)
+    numeros = {p['PartNumber'] for p in recibidas}
+    return {
+        'total_partes': carga.total_partes,
+        'tamanio_parte': carga.tamanio_parte,
+        'recibidas': [
+            {'numero': p['PartNumber'], 'tamanio': p['Size'], 'etag': p['ETag']}
+            for p in sorted(recibidas, key=lambda p: p['PartNumber'])
+        ],
+        'faltantes': [n for n in range(1, carga.total_partes + 1) if n not in numeros],
+    }
+
+
+def _ensamblar_partes(carga: CargaDirecta):
+    gateway = get_storage_gateway()
+    recibidas = sorted(
+        gateway.listar_partes(carga.s3_key, carga.upload_id),
+        key=lambda p: p['PartNumber']
+    )
+    faltantes = sorted(set(range(1, carga.total_partes + 1)) - {p['PartNumber'] for p in recibidas})
+    if faltantes:
+        raise CargaDirectaError(f"Faltan partes por subir: {faltantes[:20]}")
+
+    partes: List[Dict] = [{'PartNumber': p['PartNumber'], 'ETag': p['ETag']} for p in recibidas]
+    try:
+        gateway.completar_multipart(carga.s3_key, carga.upload_id, partes)
+    except ClientError as e:
+        # p. ej. EntityTooSmall: una parte intermedia menor al mínimo de S3
+        raise CargaDirectaError(f"S3 rechazó el ensamblado de las partes: {e}")
+
+
+def finalizar_carga(carga: CargaDirecta) -> Dict:
+    """
+    Ensambla las partes en S3 (si es multipart) y verifica el objeto final.
+    Lanza CargaEnVerificacion si el hash se calculará en segundo plano.
+    """
+    if carga.blob_id or carga.estado == CargaDirecta.ESTADO_VERIFICADA:
+        # Contenido ya almacenado o ya verificado: no queda nada que comprobar
+        return {}
+    if carga.es_multipart:
+        try:
+            get_storage_gateway().info_objeto(carga.s3_key)
+        except ClientError:
+            # Aún no ensamblado (un reintento de "completar" no debe repetirlo)
+            _ensamblar_partes(carga)
+    return verificar_carga(carga)
+
+
+def abortar_carga(carga: CargaDirecta):
+    """Cancela la carga: descarta las partes en S3 y la marca como rechazada."""
+    gateway = get_storage_gateway()
+    try:
+        if carga.es_multipart:
+            gateway.abortar_multipart(carga.s3_key, carga.upload_id)
+        else:
+            gateway.eliminar(carga.s3_key)
+    except ClientError:
+        logger.exception("[CargaDirecta] No se pudo abortar %s", carga.s3_key)
+    carga.estado = CargaDirecta.ESTADO_RECHAZADA
+    carga.motivo_rechazo = "Cancelada por el usuario"
+    carga.save(update_fields=['estado', 'motivo_rechazo'])
@@ -0,0 +1,97 @@
+"""
+Creación masiva de ítems al clonar planes y generar presupuestos.
+
+Clonar un plan o generar un presupuesto creaba los ítems con un save() cada
+uno, y cada save disparaba los signals de recálculo de totales y validación.
+Aquí los ítems se arman en memoria, se insertan con un bulk_create (que no
+dispara signals) y los totales se calculan una sola vez. Quien llama deja un
+solo registro de bitácora y un solo aviso al odontólogo por operación.
+
+Lo que hacían save() y los signals para estos ítems se replica a mano:
+ItemPresupuestoDigital.precio_final se calcula aquí, y los ítems clonados
+quedan pendientes y sin ejecución, así que los signals de flujo clínico no
+tendrían nada que hacer.
+"""
+import logging
+from decimal import Decimal
+
+from api.models import ItemPresupuestoDigital, Itemplandetratamiento
+
+logger = logging.getLogger(__name__)
+
+
+def clonar_items_plan(plan_original, plan_nuevo):
+    """
+    Copia los ítems no cancelados de plan_original en plan_nuevo, reseteando
+    estado y fecha objetivo. Devuelve los ítems creados.
+    """
+    items_originales = plan_original.itemplandetratamiento_set.exclude(
+        estado_item__in=['Cancelado', 'cancelado']
+    )
+    # Solo se copian las FK por id: no hace falta cargar servicio, pieza ni estado
+    items = Itemplandetratamiento.objects.bulk_create([
+        Itemplandetratamiento(
+            idplantratamiento=plan_nuevo,
+            idservicio_id=item.idservicio_id,
+            idpiezadental_id=item.idpiezadental_id,
+            idestado_id=item.idestado_id,
+            empresa=plan_nuevo.empresa,
+            costofinal=item.costofinal,
+            costo_base_servicio=item.costo_base_servicio,
+            fecha_objetivo=None,
+            tiempo_estimado=item.tiempo_estimado,
+            estado_item=Itemplandetratamiento.ESTADO_PENDIENTE,
+            notas_item=item.notas_item,
+            orden=item.orden,
+        )
+        for item in items_originales
+    ])
+    plan_nuevo.calcular_totales()
+    return items
+
+
+def crear_items_presupuesto(presupuesto, items_plan, items_config=None):
+    """
+    Crea un ItemPresupuestoDigital por ítem del plan, en el orden recibido.
+    items_config: {item_id: {descuento_item, permite_pago_parcial, cantidad_cuotas, notas_item}}.
+    """
+    items_config = items_config or {}
+    items = []
+    for orden, item_plan in enumerate(items_plan, start=1):
+        config = items_config.get(item_plan.id, {})
+        precio_unitario = item_plan.costofinal
+        descuento_item = config.get('descuento_item', 0)
+        items.append(ItemPresupuestoDigital(
+            presupuesto=presupuesto,
+            item_plan=item_plan,
+            precio_unitario=precio_unitario,
+            descuento_item=descuento_item,
+            # Lo mismo que ItemPresupuestoDigital.save(), que bulk_create no llama
+            precio_final=Decimal(str(precio_unitario)) - Decimal(str(descuento_item or 0)),
+            permite_pago_parcial=config.get('permite_pago_parcial', False),
+            cantidad_cuotas=config.get('cantidad_cuotas'),
+            notas_item=config.get('notas_item', ''),
+            orden=orden,
+        ))
+    items = ItemPresupuestoDigital.objects.bulk_create(items)
+    presupuesto.calcular_totales()
+    return items
+
+
+def notificar_odontologo(odontologo, titulo, mensaje, tipo_nombre, data):
+    """Una notificación push al odontólogo responsable; un fallo no aborta la operación."""
+    try:
+        from api.notifications_mobile.queue import enqueue_notif_for_user_devices
+
+        return enqueue_notif_for_user_devices(
+            usuario_codigo=odontologo.codusuario_id,
+            titulo=titulo,
+            mensaje=mensaje,
+            tipo_nombre=tipo_nombre,
+            data=data,
+        )
+    except ImportError:
+        logger.warning("Sistema de notificaciones no disponible")
+    except Exception as e:
+        logger.error(f"Error al notificar {tipo_nombre}: {e}", exc_info=True)
+    return []
@@ -0,0 +1,84 @@
+"""
+Métricas de las conexiones a la base de datos (por proceso de gunicorn).
+
+Con el pool de psycopg se reportan tamaño, conexiones en uso / ociosas,
+solicitudes en espera y tiempo de espera. Con conexiones persistentes
+(CONN_MAX_AGE) se reporta si la conexión del hilo sigue abierta. En ambos
+modos se cuentan las conexiones nuevas abiertas por el proceso: si crece con
+cada request, no se están reutilizando.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_lock = threading.Lock()
+_conexiones_creadas = defaultdict(int)
+_ultima_conexion = {}
+
+
+@receiver(connection_created)
+def contar_conexion_creada(sender, connection, **kwargs):
+    with _lock:
+        _conexiones_creadas[connection.alias] += 1
+        _ultima_conexion[connection.alias] = time.time()
+
+
+def usa_pool(conexion) -> bool:
+    return bool(conexion.settings_dict.get('OPTIONS', {}).get('pool'))
+
+
+def metricas_pool(pool) -> dict:
+    """Resumen de `psycopg_pool.ConnectionPool.get_stats()` (contadores acumulados)."""
+    stats = pool.get_stats()
+    tamanio = stats.get('pool_size', 0)
+    ociosas = stats.get('pool_available', 0)
+    solicitudes = stats.get('requests_num', 0)
+    espera_ms = stats.get('requests_wait_ms', 0)
+    return {
+        'modo': 'pool',
+        'minimo': stats.get('pool_min'),
+        'maximo': stats.get('pool_max'),
+        'tamanio': tamanio,
+        'en_uso': tamanio - ociosas,
+        'ociosas': ociosas,
+        'en_espera': stats.get('requests_waiting', 0),
+        'solicitudes': solicitudes,
+        'espera_total_ms': espera_ms,
+        'espera_promedio_ms': round(espera_ms / solicitudes, 2) if solicitudes else 0,
+        'errores_solicitud': stats.get('requests_errors', 0),
+        'errores_conexion': stats.get('connections_errors', 0),
+        'conexiones_perdidas': stats.get('connections_lost', 0),
+    }
+
+
+def metricas_conexiones() -> dict:
+    resultado = {
+        'pid': os.getpid(),
+        'workers_gunicorn': getattr(settings, 'GUNICORN_WORKERS', None),
+        'bases': {},
+    }
+    for alias in connections:
+        conexion = connections[alias]
+        if usa_pool(conexion):
+            datos = metricas_pool(conexion.pool)
+        else:
+            conn_max_age = conexion.settings_dict.get('CONN_MAX_AGE') or 0
+            datos = {
+                'modo': 'persistente' if conn_max_age else 'sin_reuso',
+                'conn_max_age': conn_max_age,
+                'health_checks': conexion.settings_dict.get('CONN_HEALTH_CHECKS', False),
+                'abierta': conexion.connection is not None,
+            }
+        with _lock:
+            datos['conexiones_creadas'] = _conexiones_creadas[alias]
+            ultima = _ultima_conexion.get(alias)
+        datos['segundos_desde_ultima_conexion'] = round(time.time() - ultima, 1) if ultima else None
+        resultado['bases'][alias] = datos
+    return resultado
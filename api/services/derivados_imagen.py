@@ -0,0 +1,201 @@
+"""
+Derivados de imagen para Evidencia y DocumentoClinico.
+
+Tras la subida (al confirmar la transacción) se encola el procesamiento en un
+pool de hilos: se genera una miniatura y versiones web (WebP y JPEG) con
+Pillow, se guardan junto al original y sus keys quedan en `derivados`. Las
+galerías cargan la miniatura y piden el original solo bajo demanda.
+"""
+
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from PIL import Image, ImageOps
+
+from api.services.storage_gateway import get_storage_gateway
+
+logger = logging.getLogger(__name__)
+
+# nombre -> (lado máximo en px, formato Pillow, extensión, content type, calidad)
+VARIANTES = {
+    'web': (1600, 'WEBP', 'webp', 'image/webp', 82),
+    'web_jpeg': (1600, 'JPEG', 'jpg', 'image/jpeg', 85),
+    'miniatura': (320, 'WEBP', 'webp', 'image/webp', 75),
+}
+
+MIMETYPES_IMAGEN = {'image/jpeg', 'image/png', 'image/webp', 'image/gif'}
+EXTENSIONES_IMAGEN = {'jpg', 'jpeg', 'png', 'webp', 'gif'}
+
+
+# ----------------------------------------------------------------------
+# Generación
+# ----------------------------------------------------------------------
+def generar_variantes(original: bytes) -> Iterator[Tuple[str, bytes, str, str]]:
+    """
+    Produce `(nombre, datos, extension, content_type)` por variante. Cada
+    variante se reduce a partir de la anterior (de mayor a menor), así la
+    imagen completa se decodifica una sola vez.
+    """
+    lado_mayor = max(v[0] for v in VARIANTES.values())
+    with Image.open(io.BytesIO(original)) as imagen:
+        # JPEG: decodifica directamente a una escala reducida cuando se puede
+        imagen.draft('RGB', (lado_mayor, lado_mayor))
+        base = ImageOps.exif_transpose(imagen)
+        base = base.convert('RGB') if base.mode not in ('RGB', 'L') else base
+
+    for nombre, (lado, formato, extension, content_type, calidad) in sorted(
+            VARIANTES.items(), key=lambda item: -item[1][0]):
+        if max(base.size) > lado:
+            base.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+        salida = io.BytesIO()
+        if formato == 'JPEG':
+            opciones = {'quality': calidad, 'optimize': True, 'progressive': True}
+        else:
+            opciones = {'quality': calidad, 'method': 4}
+        base.save(salida, formato, **opciones)
+        yield nombre, salida.getvalue(), extension, content_type
+
+
+# ----------------------------------------------------------------------
+# Almacenamiento (S3 para documentos y cargas directas; storage del
+# FileField para evidencias subidas por la API)
+# ----------------------------------------------------------------------
+def _key_original(obj) -> str:
+    return obj.archivo.name if hasattr(obj, 'archivo') else obj.s3_key
+
+
+def _usa_s3(obj) -> bool:
+    if not hasattr(obj, 'archivo'):
+        return True
+    from api.services.cargas_directas import esta_en_s3
+    return esta_en_s3(obj.archivo.name)
+
+
+def requiere_derivados(obj) -> bool:
+    if hasattr(obj, 'archivo'):
+        return bool(obj.archivo) and obj.mimetype in MIMETYPES_IMAGEN
+    return bool(obj.s3_key) and (obj.extension or '').lower() in EXTENSIONES_IMAGEN
+
+
+def _leer_original(obj) -> bytes:
+    if _usa_s3(obj):
+        return get_storage_gateway().descargar(_key_original(obj))
+    with obj.archivo.open('rb') as archivo:
+        return archivo.read()
+
+
+def _guardar(obj, key: str, datos: bytes, content_type: str) -> str:
+    if _usa_s3(obj):
+        get_storage_gateway().subir_archivo(io.BytesIO(datos), key, content_type)
+        return key
+    return obj.archivo.storage.save(key, ContentFile(datos))
+
+
+def url_derivado(obj, variante: str) -> Optional[str]:
+    """URL de la variante, o None si aún no se generó (usar el original)."""
+    key = (obj.derivados or {}).get(variante)
+    if not key:
+        return None
+    if _usa_s3(obj):
+        return get_storage_gateway().url_firmada(key)
+    return obj.archivo.storage.url(key)
+
+
+def eliminar_derivados(obj):
+    for key in (obj.derivados or {}).values():
+        try:
+            if _usa_s3(obj):
+                get_storage_gateway().eliminar(key)
+            else:
+                obj.archivo.storage.delete(key)
+        except Exception:
+            logger.exception("[Derivados] No se pudo eliminar %s", key)
+
+
+# ----------------------------------------------------------------------
+# Procesamiento fuera del request
+# ----------------------------------------------------------------------
+def _derivados_compartidos(obj) -> Dict[str, str]:
+    """Variantes ya generadas por otro registro que comparte el mismo blob."""
+    if not getattr(obj, 'blob_id', None):
+        return {}
+    from api.models import DocumentoClinico, Evidencia
+    for modelo in (Evidencia, DocumentoClinico):
+        derivados = (
+            modelo.objects.filter(blob_id=obj.blob_id)
+            .exclude(pk=obj.pk)
+            .exclude(derivados={})
+            .values_list('derivados', flat=True)
+            .first()
+        )
+        if derivados:
+            return derivados
+    return {}
+
+
+def procesar_derivados(modelo, pk) -> Dict[str, str]:
+    """Genera y guarda las variantes de `modelo(pk)`; devuelve {variante: key}."""
+    obj = modelo.objects.filter(pk=pk).first()
+    if obj is None or not requiere_derivados(obj):
+        return {}
+
+    compartidos = _derivados_compartidos(obj)
+    if compartidos:
+        modelo.objects.filter(pk=pk).update(derivados=compartidos)
+        return compartidos
+
+    base = os.path.splitext(_key_original(obj))[0]
+    derivados = {}
+    try:
+        for nombre, datos, extension, content_type in generar_variantes(_leer_original(obj)):
+            derivados[nombre] = _guardar(obj, f"{base}__{nombre}.{extension}", datos, content_type)
+    except Exception:
+        logger.exception("[Derivados] Error procesando %s %s", modelo.__name__, pk)
+        return {}
+
+    # update() para no volver a disparar post_save
+    modelo.objects.filter(pk=pk).update(derivados=derivados)
+    logger.info("[Derivados] %s %s: %s", modelo.__name__, pk, ', '.join(derivados))
+    return derivados
+
+
+def _procesar_en_worker(modelo, pk):
+    close_old_connections()
+    try:
+        procesar_derivados(modelo, pk)
+    finally:
+        connection.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_DERIVATIVES_WORKERS,
+                    thread_name_prefix='derivados-imagen',
+                )
+    return _pool
+
+
+def programar_derivados(obj):
+    """Encola la generación de derivados cuando se confirme la transacción."""
+    if not requiere_derivados(obj):
+        return
+    modelo, pk = type(obj), obj.pk
+    if settings.IMAGE_DERIVATIVES_WORKERS <= 0:
+        transaction.on_commit(lambda: procesar_derivados(modelo, pk))
+    else:
+        transaction.on_commit(lambda: _get_pool().submit(_procesar_en_worker, modelo, pk))
@@ -0,0 +1,123 @@
+"""
+Recálculo diferido de totales de planes y presupuestos.
+
+Los signals de Itemplandetratamiento e ItemPresupuestoDigital recalculan los
+totales del plan/presupuesto (y la completitud del plan) en cada save; al
+crear o editar muchos ítems seguidos eso es O(n²). Dentro de
+
+    with recalculo_diferido():
+        for ...:
+            Itemplandetratamiento.objects.create(...)
+
+los signals solo anotan qué plan o presupuesto quedó sucio, y al salir del
+bloque cada uno se recalcula una vez, en la misma transacción que los ítems
+(así la respuesta que se arma después ya ve los totales correctos). Si el
+bloque termina con una excepción no se recalcula nada. Los bloques anidados
+se suman al externo.
+
+Quien ya llamaba a calcular_totales() después del bucle registra la instancia
+con agregar_plan()/agregar_presupuesto() para que se recalcule igual aunque no
+se haya creado ningún ítem.
+
+Se reutiliza la instancia del plan/presupuesto que el ítem ya tenga en caché
+(la que pasó la vista), de modo que queda actualizada en memoria.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RecalculoPendiente:
+    """Planes y presupuestos sucios acumulados en un bloque recalculo_diferido()."""
+
+    def __init__(self):
+        self.instancias: Dict[tuple, object] = {}
+        # plan_id -> solo recalcular si el plan sigue siendo editable
+        self.totales_plan: Dict[int, bool] = {}
+        self.completitud_plan = set()
+        self.totales_presupuesto = set()
+
+    def _anotar(self, item, campo):
+        relacionado_id = getattr(item, f'{campo}_id')
+        field = item._meta.get_field(campo)
+        if field.is_cached(item):
+            self.instancias.setdefault((field.related_model, relacionado_id), getattr(item, campo))
+        return relacionado_id
+
+    def marcar_plan(self, item, solo_si_editable=True):
+        plan_id = self._anotar(item, 'idplantratamiento')
+        self.totales_plan[plan_id] = self.totales_plan.get(plan_id, True) and solo_si_editable
+
+    def marcar_completitud(self, item):
+        self.completitud_plan.add(self._anotar(item, 'idplantratamiento'))
+
+    def marcar_presupuesto(self, item):
+        self.totales_presupuesto.add(self._anotar(item, 'presupuesto'))
+
+    def agregar_plan(self, plan):
+        """Recalcula el plan al final del bloque aunque no se toque ningún ítem."""
+        self.instancias.setdefault((type(plan), plan.pk), plan)
+        self.totales_plan[plan.pk] = False
+
+    def agregar_presupuesto(self, presupuesto):
+        self.instancias.setdefault((type(presupuesto), presupuesto.pk), presupuesto)
+        self.totales_presupuesto.add(presupuesto.pk)
+
+    def _cargar(self, modelo, ids):
+        faltan = [pk for pk in ids if (modelo, pk) not in self.instancias]
+        for pk, obj in modelo.objects.in_bulk(faltan).items():
+            self.instancias[(modelo, pk)] = obj
+        return [self.instancias[(modelo, pk)] for pk in ids if (modelo, pk) in self.instancias]
+
+    def recalcular(self):
+        from api.models import Plandetratamiento, PresupuestoDigital
+
+        for plan in self._cargar(Plandetratamiento, list(self.totales_plan)):
+            try:
+                if not self.totales_plan[plan.pk] or plan.puede_editarse():
+                    plan.calcular_totales()
+            except Exception as e:
+                logger.error(f"Error al recalcular totales del plan #{plan.pk}: {e}", exc_info=True)
+
+        for plan in self._cargar(Plandetratamiento, sorted(self.completitud_plan)):
+            if plan.estado_tratamiento != 'En Ejecución':
+                continue
+            puede_completar, _ = plan.puede_completarse()
+            if puede_completar:
+                try:
+                    plan.marcar_completado()
+                    logger.info(f"✅ Plan #{plan.id} completado automáticamente. Todos los items fueron ejecutados.")
+                except Exception as e:
+                    logger.error(f"❌ Error al completar automáticamente plan #{plan.id}: {e}")
+
+        for presupuesto in self._cargar(PresupuestoDigital, sorted(self.totales_presupuesto)):
+            if presupuesto.puede_editarse():
+                presupuesto.calcular_totales()
+
+
+_pendiente: ContextVar[Optional[RecalculoPendiente]] = ContextVar('recalculo_pendiente', default=None)
+
+
+def recalculo_activo() -> Optional[RecalculoPendiente]:
+    """El acumulador del bloque recalculo_diferido() en curso, si lo hay."""
+    return _pendiente.get()
+
+
+@contextmanager
+def recalculo_diferido():
+    """Difiere los recálculos de los signals de ítems hasta el final del bloque."""
+    actual = _pendiente.get()
+    if actual is not None:
+        yield actual
+        return
+
+    pendiente = RecalculoPendiente()
+    token = _pendiente.set(pendiente)
+    try:
+        yield pendiente
+    finally:
+        _pendiente.reset(token)
+    pendiente.recalcular()
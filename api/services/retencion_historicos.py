@@ -0,0 +1,230 @@
+"""
+Retención por meses de los históricos de solo-inserción.
+
+La bitácora, el historial de notificaciones (HistorialNotificacion y su
+espejo HistorialNotificacionMN, misma tabla) y los mensajes del chatbot solo
+crecen y siempre se consultan por rangos recientes. En lugar de particiones
+nativas se usa un esquema equivalente por meses: cada (histórico, tenant, mes)
+es un segmento; cuando el mes completo queda fuera de la retención del tenant
+(PoliticaRetencion o RETENCION_HISTORICOS_DIAS) se exporta a
+`historicos/<histórico>/<empresa>/<AAAA-MM>.jsonl.gz` en el storage y se
+borra de la tabla en lotes de RETENCION_HISTORICOS_LOTE, cada uno en su
+propia transacción. SegmentoHistorico registra cada mes retirado; si la
+ejecución se corta después de exportar, la siguiente solo termina de borrar.
+
+Así las tablas quedan acotadas a la ventana de retención y los índices por
+(tenant o usuario, fecha) siguen siendo pequeños.
+
+    from api.services.retencion_historicos import aplicar_retencion
+    aplicar_retencion()  # {'bitacora': {'meses': 3, 'filas': 41210}, ...}
+
+Lo ejecuta cada noche `python manage.py mantener_historicos`.
+"""
+import gzip
+import json
+import logging
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import Bitacora, Empresa, PoliticaRetencion, RegistroEliminado, SegmentoHistorico
+from api.models_notifications import HistorialNotificacion
+from chatbot.models import MensajeChatbot
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Historico:
+    nombre: str
+    modelo: type
+    campo_fecha: str
+    # Ruta al tenant desde el modelo
+    campo_empresa: str
+    # Entidad de la sincronización incremental: sus bajas necesitan tombstone
+    entidad_sync: Optional[str] = None
+    campo_usuario: Optional[str] = None
+
+
+HISTORICOS: Dict[str, Historico] = {
+    historico.nombre: historico for historico in (
+        Historico('bitacora', Bitacora, 'timestamp', 'empresa_id'),
+        Historico(
+            'notificaciones', HistorialNotificacion, 'fecha_creacion', 'usuario__empresa_id',
+            entidad_sync='notificaciones', campo_usuario='usuario_id',
+        ),
+        Historico('chatbot', MensajeChatbot, 'created_at', 'conversacion__empresa_id'),
+    )
+}
+
+
+def inicio_de_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def mes_siguiente(mes):
+    return (mes + timedelta(days=32)).replace(day=1)
+
+
+def _instante(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def fecha_corte(hoy, dias):
+    """
+    Primer día del mes que contiene `hoy - dias`: todo lo anterior son meses
+    completos fuera de la retención.
+    """
+    return inicio_de_mes(hoy - timedelta(days=dias))
+
+
+def _filas(historico, empresa_id):
+    qs = historico.modelo._base_manager.all()
+    if empresa_id is None:
+        return qs.filter(**{f'{historico.campo_empresa}__isnull': True})
+    return qs.filter(**{historico.campo_empresa: empresa_id})
+
+
+def _filas_del_mes(historico, empresa_id, mes):
+    return _filas(historico, empresa_id).filter(**{
+        f'{historico.campo_fecha}__gte': _instante(mes),
+        f'{historico.campo_fecha}__lt': _instante(mes_siguiente(mes)),
+    })
+
+
+def meses_vencidos(historico, empresa_id, corte):
+    """Meses con filas anteriores a `corte`, del más viejo al más nuevo."""
+    return [
+        inicio.date()
+        for inicio in _filas(historico, empresa_id).filter(
+            **{f'{historico.campo_fecha}__lt': _instante(corte)}
+        ).datetimes(historico.campo_fecha, 'month')
+    ]
+
+
+def exportar_mes(historico, empresa_id, mes, lote):
+    """
+    Escribe las filas del mes como JSON por línea, comprimidas con gzip, sin
+    cargarlas todas en memoria. Devuelve (ruta en el storage, filas).
+    """
+    filas = 0
+    with tempfile.TemporaryFile() as temporal:
+        with gzip.GzipFile(fileobj=temporal, mode='wb') as comprimido:
+            for fila in _filas_del_mes(historico, empresa_id, mes).order_by('pk').values().iterator(chunk_size=lote):
+                comprimido.write(json.dumps(fila, cls=DjangoJSONEncoder).encode() + b'\n')
+                filas += 1
+        temporal.seek(0)
+        ruta = (
+            f"{settings.RETENCION_HISTORICOS_RUTA}/{historico.nombre}/"
+            f"{empresa_id or 'global'}/{mes:%Y-%m}.jsonl.gz"
+        )
+        ruta = default_storage.save(ruta, File(temporal))
+    return ruta, filas
+
+
+def _borrar_lote(historico, ids):
+    with transaction.atomic():
+        if historico.entidad_sync:
+            ahora = timezone.now()
+            RegistroEliminado.objects.bulk_create([
+                RegistroEliminado(
+                    entidad=historico.entidad_sync, objeto_id=pk, empresa_id=empresa_id,
+                    codusuario=usuario_id, eliminado_en=ahora,
+                )
+                for pk, empresa_id, usuario_id in historico.modelo._base_manager.filter(pk__in=ids).values_list(
+                    'pk', historico.campo_empresa, historico.campo_usuario
+                )
+            ])
+        # Nada referencia a estos históricos ni escucha sus borrados:
+        # DELETE directo, sin cargar los objetos.
+        historico.modelo._base_manager.filter(pk__in=ids)._raw_delete(historico.modelo._base_manager.db)
+
+
+def retirar_mes(historico, empresa_id, mes, exportar=True, lote=None):
+    """
+    Exporta (si corresponde) y borra por lotes las filas del mes. Devuelve
+    (segmento compactado, filas borradas).
+    """
+    lote = lote or settings.RETENCION_HISTORICOS_LOTE
+    segmento = SegmentoHistorico.objects.filter(historico=historico.nombre, empresa_id=empresa_id, mes=mes).first()
+    if segmento is None or segmento.estado == SegmentoHistorico.ESTADO_COMPACTADO:
+        # Mes nuevo, o filas que llegaron tarde a un mes ya compactado. Si el
+        # segmento quedó 'exportado' (ejecución cortada) solo falta borrar.
+        ruta = exportar_mes(historico, empresa_id, mes, lote)[0] if exportar else ''
+        if segmento is None:
+            segmento = SegmentoHistorico.objects.create(
+                historico=historico.nombre, empresa_id=empresa_id, mes=mes, archivo=ruta,
+            )
+        else:
+            segmento.estado = SegmentoHistorico.ESTADO_EXPORTADO
+            segmento.archivo = ruta or segmento.archivo
+            segmento.save(update_fields=['estado', 'archivo'])
+
+    qs = _filas_del_mes(historico, empresa_id, mes).order_by('pk')
+    borradas = 0
+    while True:
+        ids = list(qs.values_list('pk', flat=True)[:lote])
+        if not ids:
+            break
+        _borrar_lote(historico, ids)
+        borradas += len(ids)
+
+    segmento.filas += borradas
+    segmento.estado = SegmentoHistorico.ESTADO_COMPACTADO
+    segmento.compactado_en = timezone.now()
+    segmento.save(update_fields=['filas', 'estado', 'compactado_en'])
+    logger.info("[Retención] %s empresa=%s %s: %s filas -> %s", historico.nombre, empresa_id, f"{mes:%Y-%m}",
+                borradas, segmento.archivo or '(sin exportar)')
+    return segmento, borradas
+
+
+def vacuum(historico):
+    """VACUUM ANALYZE de la tabla (solo PostgreSQL; fuera de transacción)."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f'VACUUM (ANALYZE) {connection.ops.quote_name(historico.modelo._meta.db_table)}')
+    return True
+
+
+def aplicar_retencion(hoy=None, historicos=None, empresa=None, exportar=True, lote=None):
+    """
+    Retira los meses vencidos de cada histórico y tenant (o solo de
+    `empresa`). `exportar=False` borra sin exportar aunque la política pida
+    exportar. Devuelve {histórico: {'meses': n, 'filas': n}}.
+    """
+    hoy = hoy or timezone.localdate()
+    if empresa is not None:
+        empresas = [empresa.id]
+    else:
+        # None: filas sin tenant (acciones de sistema, usuarios sin empresa)
+        empresas = list(Empresa.objects.values_list('id', flat=True)) + [None]
+
+    politicas = {
+        (politica.empresa_id, politica.historico): politica
+        for politica in PoliticaRetencion.objects.filter(empresa_id__in=[e for e in empresas if e])
+    }
+
+    resumen = {}
+    for nombre in historicos or HISTORICOS:
+        historico = HISTORICOS[nombre]
+        meses = filas = 0
+        for empresa_id in empresas:
+            politica = politicas.get((empresa_id, nombre))
+            dias = politica.dias if politica else settings.RETENCION_HISTORICOS_DIAS[nombre]
+            exportar_tenant = exportar and (politica.exportar if politica else True)
+            for mes in meses_vencidos(historico, empresa_id, fecha_corte(hoy, dias)):
+                _, borradas = retirar_mes(historico, empresa_id, mes, exportar=exportar_tenant, lote=lote)
+                meses += 1
+                filas += borradas
+        resumen[nombre] = {'meses': meses, 'filas': filas}
+    logger.info("Retención de históricos: %s", resumen)
+    return resumen
@@ -0,0 +1,227 @@
+"""
+Sincronización incremental para la app móvil.
+
+En lugar de descargar listas completas en cada pantalla, la app guarda la
+marca de agua (`watermark`) de la última sincronización y pide solo lo que
+cambió desde entonces:
+
+    GET /api/sync/?entidades=consultas,notificaciones&watermark=<opaco>
+
+Cada entidad se recorre por su columna de modificación (auto_now, mantenida
+también en save(update_fields=...) por ModificacionRastreadaMixin) con
+keyset (columna, id) sobre un índice (tenant o usuario, columna, id). Las
+bajas se informan con los tombstones de RegistroEliminado.
+
+La marca de agua es un token opaco con la posición de cada entidad. Al
+terminar una entidad se retrocede SYNC_SOLAPE_SEGUNDOS desde el inicio de la
+consulta para no perder transacciones que confirman tarde: el cliente puede
+recibir un registro repetido y debe aplicar los cambios como upsert por id.
+Un token más viejo que la retención de tombstones obliga a resincronizar
+desde cero (`desde_cero: true`).
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from api.models import (
+    Consulta, Itemplandetratamiento, Paciente, Plandetratamiento, RegistroEliminado,
+    SesionTratamiento, Usuario,
+)
+from api.models_notifications import HistorialNotificacion
+
+
+class WatermarkInvalido(ValueError):
+    """El token de marca de agua no se pudo decodificar."""
+
+
+@dataclass(frozen=True)
+class ContextoSincronizacion:
+    empresa: object
+    usuario: Usuario
+    paciente: Optional[Paciente]  # Solo sus registros si el usuario es paciente
+
+
+@dataclass(frozen=True)
+class EntidadSincronizable:
+    nombre: str
+    modelo: type
+    campo_modificacion: str
+    serializer: str
+    queryset: Callable[[ContextoSincronizacion], object]
+    # Dueño del registro para el tombstone (codusuario del paciente o destinatario)
+    dueno: Callable[[object], Optional[int]]
+    # Los tombstones se filtran por dueño siempre (notificaciones) o solo para pacientes
+    por_usuario: bool = False
+
+
+def _consultas(ctx):
+    qs = Consulta.objects.filter(empresa=ctx.empresa).select_related(
+        'codpaciente__codusuario', 'cododontologo__codusuario', 'codrecepcionista__codusuario',
+        'idhorario', 'idtipoconsulta', 'idestadoconsulta',
+    )
+    return qs.filter(codpaciente=ctx.paciente) if ctx.paciente else qs
+
+
+def _notificaciones(ctx):
+    return HistorialNotificacion.objects.filter(usuario=ctx.usuario).select_related(
+        'tipo_notificacion', 'canal_notificacion', 'dispositivo_movil',
+    )
+
+
+def _planes(ctx):
+    qs = Plandetratamiento.objects.filter(empresa=ctx.empresa).select_related(
+        'codpaciente__codusuario', 'cododontologo__codusuario',
+    ).prefetch_related('itemplandetratamiento_set')
+    return qs.filter(codpaciente=ctx.paciente) if ctx.paciente else qs
+
+
+def _sesiones(ctx):
+    qs = SesionTratamiento.objects.filter(empresa=ctx.empresa).select_related(
+        'item_plan__idservicio', 'item_plan__idplantratamiento__codpaciente__codusuario',
+        'consulta', 'usuario_registro',
+    )
+    return qs.filter(item_plan__idplantratamiento__codpaciente=ctx.paciente) if ctx.paciente else qs
+
+
+def _dueno_sesion(sesion):
+    return Itemplandetratamiento.objects.filter(pk=sesion.item_plan_id).values_list(
+        'idplantratamiento__codpaciente_id', flat=True
+    ).first()
+
+
+ENTIDADES: Dict[str, EntidadSincronizable] = {
+    entidad.nombre: entidad for entidad in (
+        EntidadSincronizable(
+            'consultas', Consulta, 'updated_at', 'api.serializers.ConsultaSerializer',
+            _consultas, lambda consulta: consulta.codpaciente_id,
+        ),
+        EntidadSincronizable(
+            'notificaciones', HistorialNotificacion, 'fecha_modificacion',
+            'api.serializers_notifications.HistorialNotificacionSerializer',
+            _notificaciones, lambda notificacion: notificacion.usuario_id, por_usuario=True,
+        ),
+        EntidadSincronizable(
+            'planes', Plandetratamiento, 'fecha_modificacion',
+            'api.serializers_plan_tratamiento.PlanTratamientoListSerializer',
+            _planes, lambda plan: plan.codpaciente_id,
+        ),
+        EntidadSincronizable(
+            'sesiones', SesionTratamiento, 'fecha_modificacion',
+            'api.serializers_sesiones.SesionTratamientoListSerializer',
+            _sesiones, _dueno_sesion,
+        ),
+    )
+}
+
+
+# ----------------------------------------------------------------------
+# Marca de agua
+# ----------------------------------------------------------------------
+def codificar_watermark(emitido: datetime, posiciones: Dict[str, tuple]) -> str:
+    datos = {
+        't': emitido.isoformat(),
+        'p': {nombre: [fecha.isoformat(), pk] for nombre, (fecha, pk) in posiciones.items()},
+    }
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode()
+
+
+def decodificar_watermark(token: str):
+    """(emitido, {entidad: (fecha, id)}) del token."""
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+        emitido = datetime.fromisoformat(datos['t'])
+        posiciones = {
+            nombre: (datetime.fromisoformat(fecha), int(pk))
+            for nombre, (fecha, pk) in datos['p'].items()
+            if nombre in ENTIDADES
+        }
+    except (ValueError, KeyError, TypeError) as exc:
+        raise WatermarkInvalido(str(exc)) from exc
+    return emitido, posiciones
+
+
+# ----------------------------------------------------------------------
+# Sincronización
+# ----------------------------------------------------------------------
+def _eliminados(entidad, ctx, desde):
+    qs = RegistroEliminado.objects.filter(entidad=entidad.nombre, eliminado_en__gte=desde)
+    if entidad.por_usuario:
+        qs = qs.filter(codusuario=ctx.usuario.pk)
+    else:
+        qs = qs.filter(empresa=ctx.empresa)
+        if ctx.paciente:
+            qs = qs.filter(codusuario=ctx.paciente.pk)
+    return list(qs.order_by('objeto_id').values_list('objeto_id', flat=True).distinct())
+
+
+def sincronizar(ctx, nombres, watermark=None, limite=None, serializer_context=None) -> Dict:
+    """
+    Cambios y bajas de las entidades `nombres` desde `watermark`.
+
+    Devuelve {'watermark', 'desde_cero', 'completo', <entidad>: {'cambios',
+    'eliminados', 'completo'}}. Con `completo=False` el cliente debe volver a
+    llamar con el nuevo watermark hasta completar.
+    """
+    inicio = timezone.now()
+    limite = min(limite or settings.SYNC_MAX_REGISTROS, settings.SYNC_MAX_REGISTROS)
+    posiciones = {}
+    desde_cero = watermark is None
+    if watermark is not None:
+        emitido, posiciones = decodificar_watermark(watermark)
+        if emitido < inicio - timedelta(days=settings.SYNC_RETENCION_DIAS):
+            # Los tombstones de ese período pueden estar purgados
+            desde_cero, posiciones = True, {}
+
+    resultado = {'desde_cero': desde_cero, 'completo': True}
+    nuevas = dict(posiciones)
+    for nombre in nombres:
+        entidad = ENTIDADES[nombre]
+        campo = entidad.campo_modificacion
+        qs = entidad.queryset(ctx)
+        posicion = posiciones.get(nombre)
+        if posicion is not None:
+            fecha, pk = posicion
+            qs = qs.filter(Q(**{f'{campo}__gt': fecha}) | Q(**{campo: fecha, 'id__gt': pk}))
+        filas = list(qs.order_by(campo, 'id')[:limite + 1])
+        completo = len(filas) <= limite
+        filas = filas[:limite]
+
+        if completo:
+            nuevas[nombre] = (inicio - timedelta(seconds=settings.SYNC_SOLAPE_SEGUNDOS), 0)
+        else:
+            nuevas[nombre] = (getattr(filas[-1], campo), filas[-1].pk)
+            resultado['completo'] = False
+
+        serializer = import_string(entidad.serializer)
+        resultado[nombre] = {
+            'cambios': serializer(filas, many=True, context=serializer_context or {}).data,
+            'eliminados': _eliminados(entidad, ctx, posicion[0]) if posicion else [],
+            'completo': completo,
+        }
+
+    resultado['watermark'] = codificar_watermark(inicio, nuevas)
+    return resultado
+
+
+def registrar_eliminacion(entidad: EntidadSincronizable, instancia):
+    """Crea el tombstone de `instancia` (post_delete)."""
+    RegistroEliminado.objects.create(
+        entidad=entidad.nombre,
+        objeto_id=instancia.pk,
+        empresa_id=getattr(instancia, 'empresa_id', None),
+        codusuario=entidad.dueno(instancia),
+    )
+
+
+def purgar_eliminados(dias=None) -> int:
+    """Borra tombstones más viejos que la retención; devuelve cuántos."""
+    limite = timezone.now() - timedelta(days=dias or settings.SYNC_RETENCION_DIAS)
+    borrados, _ = RegistroEliminado.objects.filter(eliminado_en__lt=limite).delete()
+    return borrados
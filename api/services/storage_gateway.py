@@ -0,0 +1,237 @@
+"""
+Gateway de almacenamiento S3 compartido por todo el proceso.
+
+Mantiene un único cliente boto3 (thread-safe una vez creado) con un pool de
+conexiones ajustado, y una caché de URLs firmadas que reutiliza cada URL hasta
+poco antes de su expiración. Así, serializar N documentos cuesta como máximo N
+firmas HMAC locales, sin construir clientes ni resolver credenciales por fila.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import boto3
+from botocore.config import Config
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class S3StorageGateway:
+    """
+    Punto único de acceso a S3 para documentos clínicos y evidencias.
+
+    El cliente se crea de forma perezosa la primera vez que se necesita. Se
+    puede inyectar un cliente alternativo (p. ej. un stand-in local en tests).
+    """
+
+    def __init__(self, client=None, bucket: Optional[str] = None,
+                 expiracion_url: Optional[int] = None,
+                 margen_renovacion: Optional[int] = None,
+                 max_urls_cache: int = 5000):
+        self._client = client
+        self._bucket = bucket
+        self._lock = threading.Lock()
+        self._urls = OrderedDict()
+        self.expiracion_url = expiracion_url or getattr(settings, 'AWS_S3_PRESIGNED_EXPIRATION', 3600)
+        self.margen_renovacion = (
+            margen_renovacion if margen_renovacion is not None
+            else getattr(settings, 'AWS_S3_PRESIGNED_RENEW_MARGIN', 300)
+        )
+        self.max_urls_cache = max_urls_cache
+
+    # ------------------------------------------------------------------
+    # Cliente
+    # ------------------------------------------------------------------
+    @property
+    def bucket(self) -> str:
+        return self._bucket or settings.AWS_STORAGE_BUCKET_NAME
+
+    @property
+    def region(self) -> str:
+        return settings.AWS_S3_REGION_NAME
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._crear_cliente()
+        return self._client
+
+    def _crear_cliente(self):
+        config = Config(
+            signature_version='s3v4',
+            max_pool_connections=getattr(settings, 'AWS_S3_MAX_POOL_CONNECTIONS', 32),
+            retries={'max_attempts': 3, 'mode': 'standard'},
+            connect_timeout=5,
+            read_timeout=60,
+        )
+        session = boto3.session.Session(
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name=self.region,
+        )
+        logger.info("[S3StorageGateway] Cliente S3 creado (bucket=%s)", self.bucket)
+        return session.client('s3', config=config)
+
+    # ------------------------------------------------------------------
+    # URLs
+    # ------------------------------------------------------------------
+    def url_publica(self, key: str) -> str:
+        """URL canónica (no firmada) del objeto."""
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+
+    def url_firmada(self, key: str, expiracion: Optional[int] = None) -> str:
+        """
+        Devuelve una URL firmada GET para `key`, reutilizando la cacheada
+        mientras le queden más de `margen_renovacion` segundos de vigencia.
+        """
+        expiracion = expiracion or self.expiracion_url
+        ahora = time.monotonic()
+        cache_key = (self.bucket, key, expiracion)
+
+        with self._lock:
+            cacheada = self._urls.get(cache_key)
+            if cacheada and cacheada[1] - ahora > self.margen_renovacion:
+                self._urls.move_to_end(cache_key)
+                return cacheada[0]
+
+        url = self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': key},
+            ExpiresIn=expiracion,
+        )
+
+        with self._lock:
+            self._urls[cache_key] = (url, ahora + expiracion)
+            self._urls.move_to_end(cache_key)
+            while len(self._urls) > self.max_urls_cache:
+                self._urls.popitem(last=False)
+        return url
+
+    def invalidar_url(self, key: str):
+        """Descarta las URLs cacheadas de `key` (p. ej. tras eliminar el objeto)."""
+        with self._lock:
+            for cache_key in [k for k in self._urls if k[1] == key]:
+                del self._urls[cache_key]
+
+    def limpiar_cache(self):
+        with self._lock:
+            self._urls.clear()
+
+    # ------------------------------------------------------------------
+    # Operaciones sobre objetos
+    # ------------------------------------------------------------------
+    def subir_archivo(self, fileobj, key: str, content_type: Optional[str] = None):
+        extra_args = {'ContentType': content_type} if content_type else None
+        self.client.upload_fileobj(fileobj, self.bucket, key, ExtraArgs=extra_args)
+        return self.url_publica(key)
+
+    def descargar(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def eliminar(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        self.invalidar_url(key)
+
+    def info_objeto(self, key: str) -> dict:
+        """HEAD del objeto (incluye checksum SHA-256 si S3 lo registró)."""
+        return self.client.head_object(Bucket=self.bucket, Key=key, ChecksumMode='ENABLED')
+
+    def hash_objeto(self, key: str, tamanio_chunk: int = 1024 * 1024) -> str:
+        """SHA-256 hex del objeto, leído por chunks (memoria acotada)."""
+        sha = hashlib.sha256()
+        for chunk in self.client.get_object(Bucket=self.bucket, Key=key)['Body'].iter_chunks(tamanio_chunk):
+            sha.update(chunk)
+        return sha.hexdigest()
+
+    def post_firmado(self, key: str, content_type: str, tamanio_maximo: int,
+                     expiracion: int, campos: Optional[dict] = None) -> dict:
+        """
+        Presigned POST para que el cliente suba `key` directo a S3.
+        La política fija la key, el Content-Type, el rango de tamaño y los
+        campos extra (p. ej. metadatos y checksum), que S3 hace cumplir.
+        """
+        campos = dict(campos or {})
+        campos['Content-Type'] = content_type
+        condiciones = [{nombre: valor} for nombre, valor in campos.items()]
+        condiciones.append(['content-length-range', 1, tamanio_maximo])
+        return self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=key,
+            Fields=campos,
+            Conditions=condiciones,
+            ExpiresIn=expiracion,
+        )
+
+    # ------------------------------------------------------------------
+    # Multipart (cargas reanudables)
+    # ------------------------------------------------------------------
+    def iniciar_multipart(self, key: str, content_type: str, metadatos: Optional[dict] = None) -> str:
+        """Crea el multipart upload y devuelve su UploadId."""
+        respuesta = self.client.create_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+            ContentType=content_type,
+            Metadata=metadatos or {},
+        )
+        return respuesta['UploadId']
+
+    def url_parte(self, key: str, upload_id: str, numero: int, expiracion: int) -> str:
+        """URL firmada PUT para que el cliente suba la parte `numero` directo a S3."""
+        return self.client.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': self.bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': numero},
+            ExpiresIn=expiracion,
+        )
+
+    def listar_partes(self, key: str, upload_id: str) -> list:
+        """Partes ya recibidas por S3 (PartNumber, Size, ETag), paginando."""
+        partes = []
+        marcador = 0
+        while True:
+            respuesta = self.client.list_parts(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumberMarker=marcador
+            )
+            partes.extend(respuesta.get('Parts', []))
+            if not respuesta.get('IsTruncated'):
+                return partes
+            marcador = respuesta['NextPartNumberMarker']
+
+    def completar_multipart(self, key: str, upload_id: str, partes: list):
+        """Ensambla las partes en S3 (`partes`: [{'PartNumber', 'ETag'}, ...] ordenadas)."""
+        return self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': partes},
+        )
+
+    def abortar_multipart(self, key: str, upload_id: str):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_storage_gateway() -> S3StorageGateway:
+    """Devuelve el gateway S3 del proceso (lo crea en el primer uso)."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = S3StorageGateway()
+    return _gateway
+
+
+def set_storage_gateway(gateway: Optional[S3StorageGateway]):
+    """Reemplaza el gateway del proceso (útil en tests con un S3 local)."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
@@ -374,6 +374,10 @@ class StripePaymentService:
             except PagoEnLinea.DoesNotExist:
                 return False, f"Pago no encontrado para Payment Intent {payment_intent_id}"
             
+            # Idempotente: un evento repetido no vuelve a aprobar ni a emitir comprobante
+            if pago.estado == 'aprobado':
+                return True, f"Pago {pago.codigo_pago} ya estaba aprobado"
+            
             # Actualizar estado
             pago.estado = 'aprobado'
             pago.fecha_aprobacion = timezone.now()
@@ -0,0 +1,265 @@
+"""
+Ingesta asíncrona e idempotente de webhooks de Stripe.
+
+Los endpoints de webhook solo verifican la firma y llaman a
+`registrar_evento`, que guarda el evento en la bandeja (EventoWebhookStripe)
+y responde enseguida. Un evento repetido (Stripe reintenta si no recibe 2xx
+a tiempo) choca con la restricción única (origen, event_id) y no se vuelve
+a procesar.
+
+El procesamiento ocurre fuera del request:
+
+  - al confirmar la transacción se encola en un pool de hilos
+    (STRIPE_WEBHOOK_WORKERS; 0 = en línea al confirmar, para tests y
+    depuración);
+  - `manage.py procesar_webhooks_stripe` recoge lo pendiente, los
+    reintentos vencidos y los eventos que quedaron a medias, y permite
+    reprocesar eventos (`--reprocesar`, `--reprocesar-fallidos`).
+
+Los eventos de un mismo Payment Intent se procesan en orden de `created`:
+uno no se toma mientras haya otro anterior abierto. Cada evento se ejecuta
+en su propia transacción; si falla se reintenta con espera exponencial
+hasta STRIPE_WEBHOOK_MAX_INTENTOS y queda `fallido` (deja de bloquear a los
+siguientes). Mientras un worker lo procesa, el evento queda reservado
+STRIPE_WEBHOOK_RESERVA_SEGUNDOS; si el worker muere, otro lo retoma.
+"""
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.models import Empresa, EventoWebhookStripe
+from api.services.stripe_payment_service import StripePaymentService
+
+logger = logging.getLogger(__name__)
+
+ABIERTOS = (
+    EventoWebhookStripe.ESTADO_PENDIENTE,
+    EventoWebhookStripe.ESTADO_PROCESANDO,
+    EventoWebhookStripe.ESTADO_REINTENTAR,
+)
+
+
+class ErrorProcesamientoWebhook(Exception):
+    """El manejador del evento informó un fallo; se revierte y se reintenta."""
+
+
+# ----------------------------------------------------------------------
+# Manejadores
+# ----------------------------------------------------------------------
+def _suscripcion_cancelada(subscription: dict) -> Tuple[bool, str]:
+    """Desactiva la empresa cuando se cancela su suscripción."""
+    actualizadas = Empresa.objects.filter(stripe_subscription_id=subscription['id']).update(activo=False)
+    return True, f"Suscripción {subscription['id']} cancelada ({actualizadas} empresa(s) desactivadas)"
+
+
+def _solo_registrar(objeto: dict) -> Tuple[bool, str]:
+    return True, f"Evento registrado para {objeto.get('id')}"
+
+
+MANEJADORES: Dict[Tuple[str, str], Callable[[dict], Tuple[bool, str]]] = {
+    (EventoWebhookStripe.ORIGEN_PAGOS, 'payment_intent.succeeded'):
+        StripePaymentService.procesar_webhook_payment_intent_succeeded,
+    (EventoWebhookStripe.ORIGEN_PAGOS, 'payment_intent.payment_failed'):
+        StripePaymentService.procesar_webhook_payment_intent_failed,
+    (EventoWebhookStripe.ORIGEN_PAGOS, 'charge.refunded'):
+        StripePaymentService.procesar_webhook_charge_refunded,
+    (EventoWebhookStripe.ORIGEN_SUSCRIPCIONES, 'customer.subscription.deleted'): _suscripcion_cancelada,
+    (EventoWebhookStripe.ORIGEN_SUSCRIPCIONES, 'payment_intent.succeeded'): _solo_registrar,
+    (EventoWebhookStripe.ORIGEN_SUSCRIPCIONES, 'invoice.payment_failed'): _solo_registrar,
+}
+
+
+# ----------------------------------------------------------------------
+# Recepción
+# ----------------------------------------------------------------------
+def _payment_intent_de(tipo: str, objeto: dict) -> Optional[str]:
+    if tipo.startswith('payment_intent.'):
+        return objeto.get('id')
+    intent = objeto.get('payment_intent')
+    return intent if isinstance(intent, str) else None
+
+
+def registrar_evento(event: dict, origen: str) -> Tuple[EventoWebhookStripe, bool]:
+    """
+    Guarda el evento ya verificado y programa su procesamiento.
+    Devuelve (evento, creado); `creado=False` si Stripe ya lo había enviado.
+    """
+    objeto = event.get('data', {}).get('object', {})
+    creado = event.get('created')
+    try:
+        with transaction.atomic():
+            evento = EventoWebhookStripe.objects.create(
+                event_id=event['id'],
+                tipo=event['type'],
+                origen=origen,
+                payment_intent_id=_payment_intent_de(event['type'], objeto),
+                payload=event,
+                creado_stripe=(
+                    datetime.fromtimestamp(creado, tz=dt_timezone.utc) if creado else timezone.now()
+                ),
+            )
+    except IntegrityError:
+        return EventoWebhookStripe.objects.get(origen=origen, event_id=event['id']), False
+
+    programar_procesamiento(evento)
+    return evento, True
+
+
+# ----------------------------------------------------------------------
+# Procesamiento
+# ----------------------------------------------------------------------
+def _hay_anterior_abierto(evento) -> bool:
+    return EventoWebhookStripe.objects.filter(
+        Q(creado_stripe__lt=evento.creado_stripe) | Q(creado_stripe=evento.creado_stripe, id__lt=evento.id),
+        origen=evento.origen,
+        payment_intent_id=evento.payment_intent_id,
+        estado__in=ABIERTOS,
+    ).exists()
+
+
+def _reservar(evento) -> bool:
+    """Toma el evento para este worker (update condicional: uno solo gana)."""
+    ahora = timezone.now()
+    tomado = EventoWebhookStripe.objects.filter(
+        pk=evento.pk, estado__in=ABIERTOS, proximo_intento__lte=ahora
+    ).update(
+        estado=EventoWebhookStripe.ESTADO_PROCESANDO,
+        intentos=F('intentos') + 1,
+        proximo_intento=ahora + timedelta(seconds=settings.STRIPE_WEBHOOK_RESERVA_SEGUNDOS),
+    )
+    if tomado:
+        evento.intentos += 1
+    return bool(tomado)
+
+
+def _finalizar(evento, estado, error=''):
+    campos = {'estado': estado, 'ultimo_error': error}
+    if estado in (EventoWebhookStripe.ESTADO_PROCESADO, EventoWebhookStripe.ESTADO_IGNORADO):
+        campos['procesado_en'] = timezone.now()
+    elif estado == EventoWebhookStripe.ESTADO_REINTENTAR:
+        espera = settings.STRIPE_WEBHOOK_REINTENTO_SEGUNDOS * 2 ** (evento.intentos - 1)
+        campos['proximo_intento'] = timezone.now() + timedelta(seconds=espera)
+    EventoWebhookStripe.objects.filter(pk=evento.pk).update(**campos)
+    for campo, valor in campos.items():
+        setattr(evento, campo, valor)
+
+
+def procesar_evento(evento) -> str:
+    """
+    Procesa un evento de la bandeja; devuelve el estado resultante o
+    'en_espera' si todavía no le toca (evento anterior del mismo Payment
+    Intent abierto, o lo tomó otro worker).
+    """
+    if evento.payment_intent_id and _hay_anterior_abierto(evento):
+        return 'en_espera'
+    if not _reservar(evento):
+        return 'en_espera'
+
+    manejador = MANEJADORES.get((evento.origen, evento.tipo))
+    if manejador is None:
+        _finalizar(evento, EventoWebhookStripe.ESTADO_IGNORADO)
+        return evento.estado
+
+    try:
+        with transaction.atomic():
+            exito, mensaje = manejador(evento.payload['data']['object'])
+            if not exito:
+                raise ErrorProcesamientoWebhook(mensaje)
+    except Exception as exc:
+        agotado = evento.intentos >= settings.STRIPE_WEBHOOK_MAX_INTENTOS
+        _finalizar(
+            evento,
+            EventoWebhookStripe.ESTADO_FALLIDO if agotado else EventoWebhookStripe.ESTADO_REINTENTAR,
+            str(exc),
+        )
+        logger.warning("[Webhook Stripe] %s %s falló (intento %s): %s",
+                       evento.tipo, evento.event_id, evento.intentos, exc)
+        return evento.estado
+
+    _finalizar(evento, EventoWebhookStripe.ESTADO_PROCESADO)
+    logger.info("[Webhook Stripe] %s %s: %s", evento.tipo, evento.event_id, mensaje)
+    return evento.estado
+
+
+def procesar_pendientes(limite: int = 100, origen: Optional[str] = None,
+                        payment_intent_id: Optional[str] = None) -> Counter:
+    """
+    Procesa los eventos vencidos (pendientes, reintentos y reservas
+    expiradas) en orden de `created`. Devuelve un Counter por resultado.
+    """
+    eventos = EventoWebhookStripe.objects.filter(estado__in=ABIERTOS, proximo_intento__lte=timezone.now())
+    if origen:
+        eventos = eventos.filter(origen=origen)
+    if payment_intent_id:
+        eventos = eventos.filter(payment_intent_id=payment_intent_id)
+
+    resumen, bloqueados = Counter(), set()
+    for evento in eventos.order_by('creado_stripe', 'id')[:limite]:
+        clave = (evento.origen, evento.payment_intent_id)
+        if evento.payment_intent_id and clave in bloqueados:
+            resumen['en_espera'] += 1
+            continue
+        resultado = procesar_evento(evento)
+        resumen[resultado] += 1
+        if resultado not in (EventoWebhookStripe.ESTADO_PROCESADO, EventoWebhookStripe.ESTADO_IGNORADO):
+            bloqueados.add(clave)
+    return resumen
+
+
+def reprocesar(eventos) -> int:
+    """Vuelve a poner en cola los eventos del queryset; devuelve cuántos."""
+    return eventos.exclude(estado=EventoWebhookStripe.ESTADO_PROCESANDO).update(
+        estado=EventoWebhookStripe.ESTADO_PENDIENTE,
+        intentos=0,
+        proximo_intento=timezone.now(),
+        ultimo_error='',
+        procesado_en=None,
+    )
+
+
+def _procesar_en_worker(evento_id):
+    close_old_connections()
+    try:
+        evento = EventoWebhookStripe.objects.get(pk=evento_id)
+        if evento.payment_intent_id:
+            # Procesa también lo que estuviera esperando detrás en el mismo intent
+            procesar_pendientes(origen=evento.origen, payment_intent_id=evento.payment_intent_id)
+        else:
+            procesar_evento(evento)
+    except Exception:
+        logger.exception("[Webhook Stripe] Error en el worker para el evento %s", evento_id)
+    finally:
+        connection.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.STRIPE_WEBHOOK_WORKERS,
+                    thread_name_prefix='webhooks-stripe',
+                )
+    return _pool
+
+
+def programar_procesamiento(evento):
+    """Encola el procesamiento del evento cuando se confirme la transacción."""
+    evento_id = evento.pk
+    if settings.STRIPE_WEBHOOK_WORKERS <= 0:
+        transaction.on_commit(lambda: procesar_evento(EventoWebhookStripe.objects.get(pk=evento_id)))
+    else:
+        transaction.on_commit(lambda: _get_pool().submit(_procesar_en_worker, evento_id))
@@ -0,0 +1,23 @@
+"""
+Signals del contador de referencias de los blobs deduplicados
+(api/services/blobs.py).
+
+La referencia se libera en post_delete y no en `delete()`: así también se
+cuenta al borrar con `queryset.delete()` o en cascada (p. ej. al eliminar un
+paciente o una consulta), que no pasan por el método del modelo.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import DocumentoClinico, Evidencia
+from .services.blobs import liberar_blob
+from .services.derivados_imagen import eliminar_derivados
+
+
+@receiver(post_delete, sender=Evidencia)
+@receiver(post_delete, sender=DocumentoClinico)
+def liberar_referencia_blob(sender, instance, **kwargs):
+    """Si era la última referencia se eliminan el blob y, tras el commit, sus derivados."""
+    if instance.blob_id and liberar_blob(instance.blob_id):
+        transaction.on_commit(lambda: eliminar_derivados(instance))
@@ -0,0 +1,23 @@
+"""
+Signals que incrementan la versión de los catálogos cacheados
+(api/services/cache_catalogos.py) en cada alta, cambio o baja.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from .services.cache_catalogos import CATALOGOS, incrementar_version
+
+
+def _receptor(catalogo):
+    def invalidar(sender, instance, **kwargs):
+        incrementar_version(catalogo, instance.empresa_id)
+    return invalidar
+
+
+for _catalogo, _modelo in CATALOGOS.items():
+    for _signal in (post_save, post_delete):
+        _signal.connect(
+            _receptor(_catalogo),
+            sender=_modelo,
+            weak=False,
+            dispatch_uid=f'cache_catalogo_{_catalogo}_{_signal is post_save}',
+        )
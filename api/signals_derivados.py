@@ -0,0 +1,17 @@
+"""
+Signals para generar derivados de imagen (miniatura / versión web) de
+evidencias y documentos clínicos recién subidos.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import DocumentoClinico, Evidencia
+from .services.derivados_imagen import programar_derivados
+
+
+@receiver(post_save, sender=Evidencia)
+@receiver(post_save, sender=DocumentoClinico)
+def encolar_derivados(sender, instance, created, **kwargs):
+    """Solo en la creación: el procesamiento corre en el pool, fuera del request."""
+    if created:
+        programar_derivados(instance)
@@ -8,6 +8,7 @@ import logging
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from .models import Itemplandetratamiento, Plandetratamiento, Consulta
+from .services.recalculo_diferido import recalculo_activo
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,11 @@ def auto_verificar_completitud_plan(sender, instance, created, **kwargs):
     # Solo procesar si el item fue ejecutado (tiene fecha_ejecucion)
     if not instance.fecha_ejecucion:
         return
+
+    pendiente = recalculo_activo()
+    if pendiente is not None:
+        pendiente.marcar_completitud(instance)
+        return
     
     plan = instance.idplantratamiento
     
@@ -8,6 +8,7 @@ from django.dispatch import receiver
 import logging
 
 from .models import Itemplandetratamiento, Plandetratamiento
+from .services.recalculo_diferido import recalculo_activo
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +18,13 @@ def recalcular_totales_al_guardar_item(sender, instance, created, **kwargs):
     """
     Recalcula automáticamente los totales del plan cuando se guarda un ítem.
     Esto asegura que el total siempre esté actualizado.
+    Dentro de recalculo_diferido() solo se marca el plan.
     """
+    pendiente = recalculo_activo()
+    if pendiente is not None:
+        pendiente.marcar_plan(instance)
+        return
+
     try:
         plan = instance.idplantratamiento
         
@@ -41,6 +48,11 @@ def recalcular_totales_al_eliminar_item(sender, instance, **kwargs):
     """
     Recalcula automáticamente los totales del plan cuando se elimina un ítem.
     """
+    pendiente = recalculo_activo()
+    if pendiente is not None:
+        pendiente.marcar_plan(instance, solo_si_editable=False)
+        return
+
     try:
         plan = instance.idplantratamiento
         
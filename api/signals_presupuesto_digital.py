@@ -19,6 +19,7 @@ from .models import (
     ItemPresupuestoDigital,
     Bitacora,
 )
+from .services.recalculo_diferido import recalculo_activo
 
 
 @receiver(post_save, sender=ItemPresupuestoDigital)
@@ -27,6 +28,11 @@ def recalcular_totales_presupuesto(sender, instance, created, **kwargs):
     Recalcula automáticamente los totales del presupuesto cuando
     se crea o modifica un item.
     """
+    pendiente = recalculo_activo()
+    if pendiente is not None:
+        pendiente.marcar_presupuesto(instance)
+        return
+
     presupuesto = instance.presupuesto
     
     # Solo recalcular si el presupuesto es editable
@@ -39,6 +45,11 @@ def recalcular_totales_al_eliminar_item(sender, instance, **kwargs):
     """
     Recalcula totales cuando se elimina un item del presupuesto.
     """
+    pendiente = recalculo_activo()
+    if pendiente is not None:
+        pendiente.marcar_presupuesto(instance)
+        return
+
     presupuesto = instance.presupuesto
     
     # Solo recalcular si el presupuesto es editable
@@ -113,41 +124,16 @@ def marcar_presupuestos_caducados():
     Tarea periódica para marcar como caducados los presupuestos
     emitidos cuya fecha de vigencia ha expirado.
     
-    Esta función debe ser llamada por un cron job o tarea programada
-    (ej: Celery, Django-Q).
+    Se ejecuta por lotes con api.services.caducidad (un UPDATE y una
+    inserción de bitácora para todos); la tarea nocturna completa, con
+    planes y avisos a pacientes, es `python manage.py caducar_vencidos`.
     
     Uso:
-        # En un management command o tarea programada
         from api.signals_presupuesto_digital import marcar_presupuestos_caducados
         marcar_presupuestos_caducados()
     """
-    presupuestos_vencidos = PresupuestoDigital.objects.filter(
-        estado=PresupuestoDigital.ESTADO_EMITIDO,
-        fecha_vigencia__lt=timezone.now().date()
-    )
-    
-    count = 0
-    for presupuesto in presupuestos_vencidos:
-        presupuesto.marcar_caducado()
-        count += 1
-        
-        # Registrar en bitácora
-        Bitacora.objects.create(
-            empresa=presupuesto.empresa,
-            usuario=None,
-            accion="PRESUPUESTO_CADUCADO_AUTO",
-            tabla_afectada="presupuesto_digital",
-            registro_id=presupuesto.id,
-            valores_nuevos={
-                'codigo_presupuesto': presupuesto.codigo_presupuesto.hex[:8],
-                'estado': presupuesto.estado,
-                'fecha_caducidad': str(presupuesto.fecha_vencimiento)
-            },
-            ip_address='127.0.0.1',
-            user_agent='Scheduled Task'
-        )
-    
-    return count
+    from .services.caducidad import ejecutar_caducidad
+    return ejecutar_caducidad(planes=False, notificar=False)['presupuestos']
 
 
 def validar_items_presupuesto(presupuesto):
@@ -0,0 +1,22 @@
+"""
+Signals que registran tombstones (RegistroEliminado) al borrar registros de
+las entidades de la sincronización incremental de la app móvil.
+"""
+from django.db.models.signals import post_delete
+
+from .services.sincronizacion import ENTIDADES, registrar_eliminacion
+
+
+def _receptor(entidad):
+    def registrar(sender, instance, **kwargs):
+        registrar_eliminacion(entidad, instance)
+    return registrar
+
+
+for _entidad in ENTIDADES.values():
+    post_delete.connect(
+        _receptor(_entidad),
+        sender=_entidad.modelo,
+        weak=False,
+        dispatch_uid=f'sincronizacion_eliminado_{_entidad.nombre}',
+    )
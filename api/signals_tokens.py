@@ -0,0 +1,39 @@
+"""
+Revocación de la caché de tokens (api/services/cache_tokens.py): al borrar
+un token (logout, reset de contraseña), al guardar el User (contraseña,
+is_active) y al guardar o borrar un BloqueoUsuario (el token cacheado lleva
+los bloqueos vigentes del usuario).
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.authtoken.models import Token
+
+from .models import BloqueoUsuario
+from .services.cache_tokens import revocar_token, revocar_tokens_de_user, revocar_tokens_de_usuarios
+
+
+def _revocar(funcion, *args):
+    # Otra vez al confirmar: un request concurrente pudo volver a cachear
+    # el token antes de que el cambio fuera visible
+    funcion(*args)
+    transaction.on_commit(lambda: funcion(*args))
+
+
+def token_borrado(sender, instance, **kwargs):
+    _revocar(revocar_token, instance.key)
+
+
+def user_guardado(sender, instance, created, **kwargs):
+    if not created:
+        _revocar(revocar_tokens_de_user, instance.pk)
+
+
+def bloqueo_guardado(sender, instance, **kwargs):
+    _revocar(revocar_tokens_de_usuarios, [instance.usuario_id])
+
+
+post_delete.connect(token_borrado, sender=Token, dispatch_uid='cache_tokens_token_borrado')
+post_save.connect(user_guardado, sender=get_user_model(), dispatch_uid='cache_tokens_user_guardado')
+post_save.connect(bloqueo_guardado, sender=BloqueoUsuario, dispatch_uid='cache_tokens_bloqueo_guardado')
+post_delete.connect(bloqueo_guardado, sender=BloqueoUsuario, dispatch_uid='cache_tokens_bloqueo_borrado')
@@ -0,0 +1,135 @@
+"""
+Tests del archivado por lotes de consultas pasadas: el endpoint solo programa,
+el trabajo mueve por lotes, respeta referencias, es reanudable y el historial
+sigue consultable.
+"""
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import (
+    Consulta, ConsultaArchivada, Empresa, Estadodeconsulta, Horario, Paciente, PagoEnLinea,
+    RegistroEliminado, Tipodeconsulta, Tipodeusuario, TrabajoArchivoConsultas, Usuario,
+)
+from api.services.archivo_consultas import archivar_lote, procesar_trabajo, programar_archivo
+
+HOY = timezone.now().date()
+
+
+@override_settings(CONSULTAS_ARCHIVO_WORKERS=0, CONSULTAS_ARCHIVO_LOTE=3)
+class ArchivoConsultasTest(APITestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        self.otra = Empresa.objects.create(nombre="Clínica Sur", subdomain="sur", activo=True)
+        rol_admin = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        self.admin = Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com",
+            idtipousuario=rol_admin, empresa=self.empresa
+        )
+        self.usuario_paciente = Usuario.objects.create(
+            nombre="Ana", apellido="Test", correoelectronico="ana@test.com",
+            idtipousuario=rol_paciente, empresa=self.empresa
+        )
+        self.paciente = Paciente.objects.get(codusuario=self.usuario_paciente)
+        self.horario = Horario.objects.create(hora=time(9, 0))
+        self.tipo = Tipodeconsulta.objects.create(nombreconsulta="General")
+        self.estado = Estadodeconsulta.objects.create(estado="Pendiente")
+
+        self.vencidas = self.crear_consultas(7, HOY - timedelta(days=10))
+        self.futuras = self.crear_consultas(2, HOY + timedelta(days=3))
+        self.de_otra = self.crear_consultas(2, HOY - timedelta(days=10), empresa=self.otra)
+
+        user = User.objects.create_user(username='admin@test.com', password='testpass123', email='admin@test.com')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key)
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+
+    def crear_consultas(self, cantidad, fecha, empresa=None):
+        # bulk_create: sin los signals de notificación de citas
+        return Consulta.objects.bulk_create([
+            Consulta(
+                fecha=fecha, codpaciente=self.paciente, idhorario=self.horario, idtipoconsulta=self.tipo,
+                idestadoconsulta=self.estado, empresa=empresa or self.empresa,
+                costo_consulta=Decimal('150.00'), hora_consulta=time(9, 30),
+            )
+            for _ in range(cantidad)
+        ])
+
+    def test_endpoint_programa_y_archiva_solo_el_tenant(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete('/api/consultas/eliminar-vencidas/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, response.content)
+        self.assertEqual(response.data['cantidad'], 7)
+
+        trabajo = TrabajoArchivoConsultas.objects.get(pk=response.data['trabajo']['id'])
+        self.assertEqual(trabajo.estado, TrabajoArchivoConsultas.ESTADO_COMPLETADO)
+        self.assertEqual((trabajo.archivadas, trabajo.retenidas), (7, 0))
+        self.assertEqual(trabajo.solicitado_por, self.admin)
+
+        self.assertEqual(
+            set(Consulta.objects.values_list('pk', flat=True)),
+            {c.pk for c in self.futuras + self.de_otra},
+        )
+        archivada = ConsultaArchivada.objects.get(pk=self.vencidas[0].pk)
+        self.assertEqual(archivada.codpaciente, self.usuario_paciente.codigo)
+        self.assertEqual(archivada.datos['costo_consulta'], '150.00')
+        self.assertEqual(archivada.datos['hora_consulta'], '09:30:00')
+        self.assertEqual(RegistroEliminado.objects.filter(entidad='consultas').count(), 7)
+
+        historial = self.client.get('/api/consultas/archivadas/', {'codpaciente': self.usuario_paciente.codigo})
+        self.assertEqual(historial.status_code, status.HTTP_200_OK)
+        self.assertEqual(historial.data['count'], 7)
+        invalido = self.client.get('/api/consultas/archivadas/', {'codpaciente': 'abc'})
+        self.assertEqual(invalido.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retiene_consultas_referenciadas(self):
+        PagoEnLinea.objects.create(
+            empresa=self.empresa, usuario=self.usuario_paciente, consulta=self.vencidas[2], origen_tipo='consulta',
+            monto=Decimal('150.00'), monto_original=Decimal('150.00'), metodo_pago='tarjeta', estado='aprobado',
+        )
+        trabajo, _ = programar_archivo(self.empresa, fecha_corte=HOY)
+        trabajo = procesar_trabajo(trabajo.pk)
+
+        self.assertEqual((trabajo.archivadas, trabajo.retenidas), (6, 1))
+        self.assertTrue(Consulta.objects.filter(pk=self.vencidas[2].pk).exists())
+        self.assertFalse(ConsultaArchivada.objects.filter(pk=self.vencidas[2].pk).exists())
+
+    def test_lotes_acotados_y_reanudables(self):
+        trabajo = TrabajoArchivoConsultas.objects.create(empresa=self.empresa, fecha_corte=HOY)
+        with self.assertNumQueries(9):
+            self.assertEqual(archivar_lote(trabajo), (3, 0))
+        self.assertEqual(trabajo.ultimo_id, self.vencidas[2].pk)
+
+        # Proceso caído a mitad: el trabajo quedó 'en_curso' sin avanzar
+        TrabajoArchivoConsultas.objects.filter(pk=trabajo.pk).update(
+            estado=TrabajoArchivoConsultas.ESTADO_EN_CURSO,
+            actualizado_en=timezone.now() - timedelta(hours=1),
+        )
+        trabajo = procesar_trabajo(trabajo.pk)
+        self.assertEqual(trabajo.estado, TrabajoArchivoConsultas.ESTADO_COMPLETADO)
+        self.assertEqual(trabajo.archivadas, 7)
+        self.assertEqual(ConsultaArchivada.objects.count(), 7)
+
+    def test_trabajo_en_curso_no_se_duplica(self):
+        trabajo, creado = programar_archivo(self.empresa, fecha_corte=HOY)
+        self.assertTrue(creado)
+        TrabajoArchivoConsultas.objects.filter(pk=trabajo.pk).update(estado=TrabajoArchivoConsultas.ESTADO_EN_CURSO)
+        self.assertIsNone(procesar_trabajo(trabajo.pk))
+        self.assertEqual(programar_archivo(self.empresa)[0], trabajo)
+
+    def test_comando_con_todas_las_empresas(self):
+        call_command('archivar_consultas', '--todas', '--lote', '2', stdout=open('/dev/null', 'w'))
+        self.assertEqual(ConsultaArchivada.objects.count(), 9)
+        self.assertEqual(
+            set(TrabajoArchivoConsultas.objects.values_list('estado', flat=True)),
+            {TrabajoArchivoConsultas.ESTADO_COMPLETADO},
+        )
@@ -0,0 +1,94 @@
+"""
+Tests del endpoint de lote (POST /api/batch/) para el arranque de la app móvil.
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import Bitacora, Empresa, Estadodeconsulta, Tipodeusuario, Usuario
+
+
+class BatchTest(APITestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_admin = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        self.django_user = User.objects.create_user(
+            username='admin@test.com', password='testpass123', email='admin@test.com'
+        )
+        Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com",
+            idtipousuario=rol_admin, empresa=self.empresa
+        )
+        Estadodeconsulta.objects.create(estado="Pendiente", empresa=self.empresa)
+        for i in range(3):
+            Bitacora.objects.create(
+                accion=f'accion_{i}', empresa=self.empresa,
+                ip_address='127.0.0.1', user_agent='tests'
+            )
+        token = Token.objects.create(user=self.django_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+
+    def lote(self, solicitudes):
+        return self.client.post('/api/batch/', {'solicitudes': solicitudes}, format='json')
+
+    def test_respuestas_iguales_a_las_peticiones_individuales(self):
+        urls = {
+            'yo': '/api/auth/user/',
+            'estados': '/api/estadodeconsultas/',
+            'bitacora': '/api/bitacora/?page_size=2',
+        }
+        response = self.lote([{'id': id_, 'url': url} for id_, url in urls.items()])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        respuestas = {r['id']: r for r in response.json()['respuestas']}
+        self.assertEqual(list(respuestas), list(urls))
+        for id_, url in urls.items():
+            individual = self.client.get(url)
+            self.assertEqual(respuestas[id_]['estado'], individual.status_code, id_)
+            self.assertEqual(respuestas[id_]['cuerpo'], individual.json(), id_)
+        self.assertEqual(len(respuestas['bitacora']['cuerpo']['results']), 2)
+
+    def test_token_se_autentica_una_sola_vez(self):
+        original = TokenAuthentication.authenticate_credentials
+        with mock.patch.object(
+            TokenAuthentication, 'authenticate_credentials', autospec=True, side_effect=original
+        ) as autenticar:
+            response = self.lote([
+                {'id': 'a', 'url': '/api/estadodeconsultas/'},
+                {'id': 'b', 'url': '/api/bitacora/'},
+            ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(autenticar.call_count, 1)
+
+    def test_errores_por_sub_peticion(self):
+        response = self.lote([
+            {'id': 'inexistente', 'url': '/api/no-existe/'},
+            {'id': 'escritura', 'url': '/api/bitacora/', 'metodo': 'POST'},
+            {'id': 'recursivo', 'url': '/api/batch/'},
+            {'id': 'externo', 'url': '/admin/'},
+            {'id': 'ok', 'url': '/api/estadodeconsultas/'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        estados = {r['id']: r['estado'] for r in response.json()['respuestas']}
+        self.assertEqual(estados, {
+            'inexistente': 404, 'escritura': 405, 'recursivo': 400, 'externo': 400, 'ok': 200,
+        })
+
+    def test_permisos_de_cada_vista_se_aplican(self):
+        self.client.credentials()
+        response = self.lote([{'url': '/api/bitacora/'}])
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+    @override_settings(BATCH_MAX_SUBREQUESTS=2)
+    def test_limite_y_formato(self):
+        response = self.lote([{'url': '/api/estadodeconsultas/'}] * 3)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/batch/', {'otra': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,173 @@
+"""
+Tests del almacenamiento deduplicado por SHA-256 (BlobAlmacenado) para
+evidencias y documentos clínicos.
+"""
+import hashlib
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+from rest_framework.authtoken.models import Token
+from rest_framework import status
+
+from api.models import (
+    Empresa, Usuario, Tipodeusuario, Paciente, DocumentoClinico, Evidencia, BlobAlmacenado
+)
+from api.services.storage_gateway import S3StorageGateway, set_storage_gateway
+
+
+class S3Contador:
+    """Stand-in de S3 que cuenta las subidas reales."""
+
+    def __init__(self):
+        self.objetos = {}
+        self.subidas = 0
+
+    def upload_fileobj(self, fileobj, Bucket, Key, ExtraArgs=None):
+        self.subidas += 1
+        self.objetos[Key] = fileobj.read()
+
+    def delete_object(self, Bucket, Key):
+        self.objetos.pop(Key, None)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://local-s3/{Params['Key']}"
+
+    def generate_presigned_post(self, Bucket, Key, Fields, Conditions, ExpiresIn):
+        return {'url': f'https://{Bucket}.s3.amazonaws.com/', 'fields': dict(Fields, key=Key)}
+
+
+@override_settings(AWS_STORAGE_BUCKET_NAME='bucket-test', AWS_S3_REGION_NAME='us-east-2')
+class BlobsDeduplicadosTest(APITestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        ajustes = self.settings(MEDIA_ROOT=media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.s3 = S3Contador()
+        set_storage_gateway(S3StorageGateway(client=self.s3))
+        self.addCleanup(set_storage_gateway, None)
+
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_admin = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        django_user = User.objects.create_user(
+            username='admin@test.com', password='testpass123', email='admin@test.com'
+        )
+        Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com",
+            idtipousuario=rol_admin, empresa=self.empresa
+        )
+        usuario_paciente = Usuario.objects.create(
+            nombre="Ana", apellido="Pérez", correoelectronico="ana@test.com",
+            idtipousuario=rol_paciente, empresa=self.empresa
+        )
+        self.paciente = Paciente.objects.get(codusuario=usuario_paciente)
+
+        token = Token.objects.create(user=django_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+
+        self.contenido = b'%PDF-1.4 consentimiento firmado'
+
+    def _subir_documento(self):
+        return self.client.post('/api/documentos-clinicos/upload/', {
+            'archivo': SimpleUploadedFile('consentimiento.pdf', self.contenido, content_type='application/pdf'),
+            'codpaciente': self.paciente.codusuario_id,
+            'tipo_documento': 'consentimiento',
+            'fecha_documento': '2025-01-10',
+        }, format='multipart')
+
+    def test_documento_duplicado_no_se_vuelve_a_subir(self):
+        primero = self._subir_documento()
+        segundo = self._subir_documento()
+        self.assertEqual(primero.status_code, status.HTTP_201_CREATED, primero.data)
+        self.assertEqual(segundo.status_code, status.HTTP_201_CREATED, segundo.data)
+
+        self.assertEqual(self.s3.subidas, 1)
+        blob = BlobAlmacenado.objects.get()
+        self.assertEqual(blob.sha256, hashlib.sha256(self.contenido).hexdigest())
+        self.assertEqual(blob.referencias, 2)
+        self.assertEqual(blob.key, f'tenants/{self.empresa.id}/blobs/{blob.sha256[:2]}/{blob.sha256}.pdf')
+        self.assertEqual(DocumentoClinico.objects.filter(s3_key=blob.key).count(), 2)
+
+    def test_eliminar_libera_el_blob_con_la_ultima_referencia(self):
+        primero = self._subir_documento().data['id']
+        segundo = self._subir_documento().data['id']
+        key = BlobAlmacenado.objects.get().key
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/documentos-clinicos/{primero}/')
+        self.assertIn(key, self.s3.objetos)
+        self.assertEqual(BlobAlmacenado.objects.get().referencias, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/documentos-clinicos/{segundo}/')
+        self.assertNotIn(key, self.s3.objetos)
+        self.assertFalse(BlobAlmacenado.objects.exists())
+
+    def test_borrado_por_queryset_o_cascada_libera_referencias(self):
+        primero = self._subir_documento().data['id']
+        self._subir_documento()
+        key = BlobAlmacenado.objects.get().key
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DocumentoClinico.objects.filter(id=primero).delete()
+        self.assertEqual(BlobAlmacenado.objects.get().referencias, 1)
+
+        # Cascada desde el paciente: no pasa por DocumentoClinico.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paciente.delete()
+        self.assertFalse(BlobAlmacenado.objects.exists())
+        self.assertNotIn(key, self.s3.objetos)
+
+    def test_evidencia_duplicada_comparte_archivo_local(self):
+        ids = []
+        for _ in range(2):
+            response = self.client.post('/api/upload/evidencias/', {
+                'file': SimpleUploadedFile('informe.pdf', self.contenido, content_type='application/pdf'),
+            }, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+            ids.append(response.data['id'])
+
+        blob = BlobAlmacenado.objects.get(ubicacion=BlobAlmacenado.UBICACION_LOCAL)
+        self.assertEqual(blob.referencias, 2)
+        self.assertTrue(default_storage.exists(blob.key))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Evidencia.objects.get(id=ids[0]).delete()
+        self.assertTrue(default_storage.exists(blob.key))
+        with self.captureOnCommitCallbacks(execute=True):
+            Evidencia.objects.get(id=ids[1]).delete()
+        self.assertFalse(default_storage.exists(blob.key))
+
+    def test_carga_directa_duplicada_se_completa_sin_transferencia(self):
+        self._subir_documento()
+        iniciar = self.client.post('/api/documentos-clinicos/upload/iniciar/', {
+            'codpaciente': self.paciente.codusuario_id,
+            'tipo_documento': 'consentimiento',
+            'fecha_documento': '2025-02-01',
+            'nombre_archivo': 'copia.pdf',
+            'content_type': 'application/pdf',
+            'tamanio': len(self.contenido),
+            'sha256': hashlib.sha256(self.contenido).hexdigest(),
+        }, format='json')
+        self.assertEqual(iniciar.status_code, status.HTTP_201_CREATED, iniciar.data)
+        self.assertTrue(iniciar.data['duplicado'])
+        self.assertIsNone(iniciar.data['upload'])
+
+        completar = self.client.post(
+            '/api/documentos-clinicos/upload/completar/',
+            {'carga_id': iniciar.data['carga_id']}, format='json'
+        )
+        self.assertEqual(completar.status_code, status.HTTP_201_CREATED, completar.data)
+        self.assertEqual(BlobAlmacenado.objects.get().referencias, 2)
+        self.assertEqual(self.s3.subidas, 1)
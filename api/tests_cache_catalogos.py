@@ -0,0 +1,110 @@
+"""
+Tests de la caché HTTP de catálogos: ETag/Last-Modified, 304 y LRU por tenant.
+"""
+from datetime import time
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import Empresa, Estadodeconsulta, Horario, Tipodeusuario, Usuario, VersionCatalogo
+from api.services.cache_catalogos import cache_respuestas
+
+
+class CacheCatalogosTest(APITestCase):
+
+    def setUp(self):
+        cache_respuestas().limpiar()
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        self.otra = Empresa.objects.create(nombre="Clínica Sur", subdomain="sur", activo=True)
+        rol_admin = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        self.django_user = User.objects.create_user(
+            username='admin@test.com', password='testpass123', email='admin@test.com'
+        )
+        Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com",
+            idtipousuario=rol_admin, empresa=self.empresa
+        )
+        Estadodeconsulta.objects.create(estado="Pendiente", empresa=self.empresa)
+        Horario.objects.create(hora=time(9, 0), empresa=self.empresa)
+        Horario.objects.create(hora=time(10, 0), empresa=self.otra)
+
+        token = Token.objects.create(user=self.django_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+
+    def consultas_a(self, tabla, url, **headers):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, **headers)
+        return response, sum(f'"{tabla}"' in q['sql'] for q in consultas.captured_queries)
+
+    def test_headers_de_cache(self):
+        response = self.client.get('/api/estadodeconsultas/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['ETag'].startswith('W/"estados_consulta-'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertIn('X-Tenant-Subdomain', response['Vary'])
+
+    def test_if_none_match_responde_304_sin_queryset(self):
+        primera = self.client.get('/api/estadodeconsultas/')
+        response, consultas = self.consultas_a(
+            'estadodeconsulta', '/api/estadodeconsultas/', HTTP_IF_NONE_MATCH=primera['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(consultas, 0)
+        self.assertEqual(response['ETag'], primera['ETag'])
+
+    def test_if_modified_since_no_valida(self):
+        # Una segunda escritura en el mismo segundo no cambia Last-Modified: solo el ETag la refleja
+        primera = self.client.get('/api/horarios/')
+        Horario.objects.create(hora=time(11, 0), empresa=self.empresa)
+        response = self.client.get('/api/horarios/', HTTP_IF_MODIFIED_SINCE=primera['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_cuerpo_servido_desde_cache_del_proceso(self):
+        primera, _ = self.consultas_a('horario', '/api/horarios/')
+        segunda, consultas = self.consultas_a('horario', '/api/horarios/')
+        self.assertEqual(consultas, 0)
+        self.assertEqual(segunda.json(), primera.json())
+
+    def test_escritura_invalida_solo_el_tenant(self):
+        antes = self.client.get('/api/horarios/')
+        self.client.get('/api/horarios/', HTTP_X_TENANT_SUBDOMAIN='sur')
+        version_otra = VersionCatalogo.objects.get(catalogo='horarios', empresa=self.otra).version
+
+        Horario.objects.create(hora=time(11, 0), empresa=self.empresa)
+
+        response = self.client.get('/api/horarios/', HTTP_IF_NONE_MATCH=antes['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], antes['ETag'])
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertEqual(
+            VersionCatalogo.objects.get(catalogo='horarios', empresa=self.otra).version, version_otra
+        )
+
+    def test_variantes_por_url_y_tenant(self):
+        a = self.client.get('/api/horarios/')
+        b = self.client.get('/api/horarios/?page=1')
+        self.assertNotEqual(a['ETag'], b['ETag'])
+        sur = self.client.get('/api/horarios/', HTTP_X_TENANT_SUBDOMAIN='sur')
+        self.assertEqual([h['hora'] for h in sur.json()['results']], ['10:00:00'])
+
+    def test_eliminar_empresa_con_catalogos(self):
+        self.client.get('/api/horarios/', HTTP_X_TENANT_SUBDOMAIN='sur')
+        Tipodeusuario.objects.create(rol="Paciente", empresa=self.otra)
+        Estadodeconsulta.objects.create(estado="Confirmada", empresa=self.otra)
+
+        empresa_id = self.otra.pk
+        self.otra.delete()
+        self.assertFalse(Empresa.objects.filter(pk=empresa_id).exists())
+        self.assertFalse(VersionCatalogo.objects.filter(empresa_id=empresa_id).exists())
+
+    def test_acciones_no_catalogo_sin_cache(self):
+        response = self.client.get('/api/horarios/disponibles/?fecha=2026-03-02')
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,123 @@
+"""
+Tests de la autenticación por token cacheada: sin consultas al token en
+requests repetidos y revocación explícita en logout, reset de contraseña,
+bloqueo y desactivación del usuario.
+"""
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import BloqueoUsuario, Empresa, Tipodeusuario, Usuario
+from api.services.cache_tokens import CacheTokens, _clave_compartida, cache_local, token_cacheado
+
+
+class CacheTokensTest(APITestCase):
+
+    def setUp(self):
+        for limpiar in (cache.clear, cache_local().limpiar):
+            limpiar()
+            self.addCleanup(limpiar)
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        self.usuario = Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com", idtipousuario=rol, empresa=self.empresa
+        )
+        self.user = User.objects.create_user(username='admin@test.com', password='testpass123', email='admin@test.com')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+
+    def listar(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get('/api/consultas/')
+        return response, [q['sql'] for q in consultas.captured_queries]
+
+    def test_token_cacheado_no_consulta_la_base(self):
+        response, sql = self.listar()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue([q for q in sql if 'authtoken_token' in q])
+
+        response, sql = self.listar()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in sql if 'authtoken_token' in q])
+
+        # Otro proceso (LRU vacío) lo encuentra en la caché compartida
+        cache_local().limpiar()
+        response, sql = self.listar()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in sql if 'authtoken_token' in q])
+
+    def test_logout_revoca(self):
+        self.assertEqual(self.listar()[0].status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.listar()[0].status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reset_de_contrasena_revoca(self):
+        self.assertEqual(self.listar()[0].status_code, status.HTTP_200_OK)
+        response = APIClient().post('/api/auth/password-reset-confirm/', {
+            'uid': urlsafe_base64_encode(force_bytes(self.user.pk)),
+            'token': default_token_generator.make_token(self.user),
+            'new_password': 'nueva-clave-123',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(self.listar()[0].status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bloqueo_y_desactivacion_revocan(self):
+        self.assertEqual(self.listar()[0].status_code, status.HTTP_200_OK)
+        bloqueo = BloqueoUsuario.objects.create(usuario=self.usuario, motivo="No-show")
+        response = self.listar()[0]
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(str(response.data['detail']), 'Usuario bloqueado.')
+
+        bloqueo.activo = False
+        bloqueo.save()
+        self.assertEqual(self.listar()[0].status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.listar()[0].status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bloqueo_solo_en_su_empresa(self):
+        Empresa.objects.create(nombre="Clínica Sur", subdomain="sur", activo=True)
+        BloqueoUsuario.objects.create(usuario=self.usuario, motivo="No-show")
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'sur'
+        self.assertNotEqual(self.listar()[0].status_code, status.HTTP_401_UNAUTHORIZED)
+        # El token ya está cacheado: en su empresa se sigue rechazando
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+        self.assertEqual(self.listar()[0].status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cache_compartida_sin_clave_ni_contrasena(self):
+        self.assertEqual(self.listar()[0].status_code, status.HTTP_200_OK)
+        datos = cache.get(_clave_compartida(self.token.key))
+        self.assertNotIn(self.token.key, repr(datos))
+        self.assertNotIn(self.user.password, repr(datos))
+
+        token = token_cacheado(self.token.key)
+        self.assertEqual((token.user.pk, token.user.email), (self.user.pk, 'admin@test.com'))
+        # El resto de campos queda diferido: save() no pisa la contraseña
+        token.user.first_name = 'Ana'
+        token.user.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    def test_lru_con_vencimiento_y_limite(self):
+        lru = CacheTokens(max_entradas=2, vigencia=60)
+        lru.guardar('a', 1)
+        lru.guardar('b', 2)
+        lru.obtener('a')
+        lru.guardar('c', 3)
+        self.assertEqual((lru.obtener('a'), lru.obtener('b'), lru.obtener('c')), (1, None, 3))
+
+        vencido = CacheTokens(vigencia=-1)
+        vencido.guardar('a', 1)
+        self.assertIsNone(vencido.obtener('a'))
+        self.assertEqual(len(vencido), 0)
@@ -0,0 +1,145 @@
+"""
+Tests de la caducidad por lotes: un UPDATE ... RETURNING por modelo,
+bitácora y avisos en lote, consultas constantes.
+"""
+from datetime import date, timedelta
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.models import (
+    Bitacora, Empresa, Estado, Odontologo, Paciente, Plandetratamiento, PresupuestoDigital,
+    Tipodeusuario, Usuario,
+)
+from api.models_notifications import DispositivoMovil
+from api.notifications_mobile.models import HistorialNotificacionMN
+from api.services.caducidad import ejecutar_caducidad
+from api.signals_presupuesto_digital import marcar_presupuestos_caducados
+
+HOY = date(2026, 6, 15)
+VENCIDO = HOY - timedelta(days=1)
+
+
+class CaducidadTest(TestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        rol_odontologo = Tipodeusuario.objects.create(rol="Odontologo", empresa=self.empresa)
+        self.usuario_paciente = Usuario.objects.create(
+            nombre="Ana", apellido="Test", correoelectronico="ana@test.com",
+            idtipousuario=rol_paciente, empresa=self.empresa
+        )
+        self.paciente = Paciente.objects.get(codusuario=self.usuario_paciente)
+        self.odontologo = Odontologo.objects.get(codusuario=Usuario.objects.create(
+            nombre="Luis", apellido="Rojas", correoelectronico="luis@test.com",
+            idtipousuario=rol_odontologo, empresa=self.empresa
+        ))
+        self.estado = Estado.objects.create(estado="Activo")
+        self.plan = self.crear_plan(HOY + timedelta(days=30))
+
+    def crear_plan(self, fecha_vigencia, **campos):
+        campos.setdefault('estado_plan', Plandetratamiento.ESTADO_PLAN_APROBADO)
+        return Plandetratamiento.objects.create(
+            codpaciente=self.paciente, cododontologo=self.odontologo, idestado=self.estado,
+            fechaplan=date(2026, 1, 1), empresa=self.empresa, fecha_vigencia=fecha_vigencia, **campos
+        )
+
+    def crear_presupuestos(self, cantidad, fecha_vigencia=VENCIDO, estado=PresupuestoDigital.ESTADO_EMITIDO):
+        return PresupuestoDigital.objects.bulk_create([
+            PresupuestoDigital(
+                plan_tratamiento=self.plan, empresa=self.empresa,
+                fecha_vigencia=fecha_vigencia, estado=estado,
+            )
+            for _ in range(cantidad)
+        ])
+
+    def contar_consultas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resumen = ejecutar_caducidad(hoy=HOY)
+        return resumen, len(consultas.captured_queries)
+
+    def test_consultas_constantes(self):
+        # La primera pasada crea el catálogo de tipos de notificación
+        self.crear_presupuestos(1)
+        self.crear_plan(VENCIDO)
+        self.contar_consultas()
+
+        self.crear_presupuestos(3)
+        self.crear_plan(VENCIDO)
+        _, pocos = self.contar_consultas()
+
+        self.crear_presupuestos(40)
+        for _ in range(10):
+            self.crear_plan(VENCIDO)
+        resumen, muchos = self.contar_consultas()
+
+        self.assertEqual(resumen['presupuestos'], 40)
+        self.assertEqual(resumen['planes'], 10)
+        self.assertEqual(muchos, pocos)
+
+    def test_solo_caduca_lo_vencido(self):
+        vencidos = self.crear_presupuestos(2)
+        vigente = self.crear_presupuestos(1, fecha_vigencia=HOY)[0]
+        borrador = self.crear_presupuestos(1, estado=PresupuestoDigital.ESTADO_BORRADOR)[0]
+        plan_vencido = self.crear_plan(VENCIDO)
+        plan_aceptado = self.crear_plan(VENCIDO, estado_aceptacion=Plandetratamiento.ESTADO_ACEPTADO)
+        plan_borrador = self.crear_plan(VENCIDO, estado_plan=Plandetratamiento.ESTADO_PLAN_BORRADOR)
+        antes = Plandetratamiento.objects.get(pk=plan_vencido.pk).fecha_modificacion
+
+        resumen = ejecutar_caducidad(hoy=HOY, notificar=False)
+
+        self.assertEqual((resumen['presupuestos'], resumen['planes']), (2, 1))
+        self.assertEqual(
+            set(PresupuestoDigital.objects.filter(estado=PresupuestoDigital.ESTADO_CADUCADO).values_list('id', flat=True)),
+            {p.id for p in vencidos},
+        )
+        for presupuesto, estado in ((vigente, 'Emitido'), (borrador, 'Borrador')):
+            presupuesto.refresh_from_db()
+            self.assertEqual(presupuesto.estado, estado)
+
+        plan_vencido.refresh_from_db()
+        self.assertEqual(plan_vencido.estado_aceptacion, Plandetratamiento.ESTADO_CADUCADO)
+        self.assertFalse(plan_vencido.es_editable)
+        # La sincronización incremental ve el cambio
+        self.assertGreater(plan_vencido.fecha_modificacion, antes)
+        for plan in (plan_aceptado, plan_borrador):
+            plan.refresh_from_db()
+            self.assertNotEqual(plan.estado_aceptacion, Plandetratamiento.ESTADO_CADUCADO)
+
+        self.assertEqual(Bitacora.objects.filter(accion='PRESUPUESTO_CADUCADO_AUTO').count(), 2)
+        bitacora_plan = Bitacora.objects.get(accion='PLAN_CADUCADO_AUTO')
+        self.assertEqual((bitacora_plan.registro_id, bitacora_plan.empresa_id), (plan_vencido.id, self.empresa.id))
+
+        # Una segunda pasada no encuentra nada
+        self.assertEqual(ejecutar_caducidad(hoy=HOY)['presupuestos'], 0)
+
+    def test_avisos_en_lote_a_los_pacientes(self):
+        DispositivoMovil.objects.create(usuario=self.usuario_paciente, token_fcm='token-ana', plataforma='android')
+        self.crear_presupuestos(3)
+        self.crear_plan(VENCIDO)
+
+        resumen = ejecutar_caducidad(hoy=HOY)
+
+        self.assertEqual(resumen['notificaciones'], 4)
+        avisos = HistorialNotificacionMN.objects.filter(codusuario=self.usuario_paciente.codigo)
+        self.assertEqual(avisos.count(), 4)
+        self.assertEqual(avisos.filter(titulo='⏰ Plan de tratamiento vencido').count(), 1)
+
+    def test_comando_y_funcion_periodica(self):
+        self.crear_presupuestos(2, fecha_vigencia=date(2020, 1, 1))
+        self.assertEqual(marcar_presupuestos_caducados(), 2)
+
+        self.crear_plan(VENCIDO)
+        with self.assertRaises(CommandError):
+            call_command('caducar_vencidos', '--empresa', 'no-existe')
+        call_command(
+            'caducar_vencidos', '--fecha', str(HOY), '--empresa', 'norte', '--solo', 'planes',
+            '--sin-notificar', stdout=open('/dev/null', 'w'),
+        )
+        self.assertEqual(
+            Plandetratamiento.objects.filter(estado_aceptacion=Plandetratamiento.ESTADO_CADUCADO).count(), 1
+        )
@@ -0,0 +1,148 @@
+"""
+Tests de sparse fieldsets (`?fields=`) y control de expansión (`?expand=`).
+"""
+from datetime import date, time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import (
+    Consulta, Empresa, Estado, Estadodeconsulta, Horario, Itemplandetratamiento,
+    Odontologo, Paciente, Plandetratamiento, Servicio, Tipodeconsulta, Tipodeusuario, Usuario,
+)
+
+
+class CamposDinamicosTest(APITestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_admin = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        rol_odontologo = Tipodeusuario.objects.create(rol="Odontologo", empresa=self.empresa)
+        self.django_user = User.objects.create_user(
+            username='admin@test.com', password='testpass123', email='admin@test.com'
+        )
+        Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com",
+            idtipousuario=rol_admin, empresa=self.empresa
+        )
+        self.paciente = Paciente.objects.get(codusuario=Usuario.objects.create(
+            nombre="Ana", apellido="Pérez", correoelectronico="ana@test.com",
+            idtipousuario=rol_paciente, empresa=self.empresa
+        ))
+        self.odontologo = Odontologo.objects.get(codusuario=Usuario.objects.create(
+            nombre="Luis", apellido="Rojas", correoelectronico="luis@test.com",
+            idtipousuario=rol_odontologo, empresa=self.empresa
+        ))
+        horario = Horario.objects.create(hora=time(9, 0))
+        tipo = Tipodeconsulta.objects.create(nombreconsulta="General")
+        estado = Estadodeconsulta.objects.create(estado="Pendiente")
+        # bulk_create: sin los signals de notificación de citas
+        Consulta.objects.bulk_create([
+            Consulta(
+                fecha=date(2026, 3, dia), codpaciente=self.paciente, cododontologo=self.odontologo,
+                idhorario=horario, idtipoconsulta=tipo, idestadoconsulta=estado, empresa=self.empresa,
+            )
+            for dia in range(1, 4)
+        ])
+
+        estado_plan = Estado.objects.create(estado="Activo")
+        servicio = Servicio.objects.create(nombre="Limpieza", costobase=Decimal('100.00'))
+        for _ in range(3):
+            plan = Plandetratamiento.objects.create(
+                codpaciente=self.paciente, cododontologo=self.odontologo,
+                idestado=estado_plan, fechaplan=date(2026, 3, 1), empresa=self.empresa
+            )
+            for _ in range(2):
+                Itemplandetratamiento.objects.create(
+                    idplantratamiento=plan, idservicio=servicio, idestado=estado_plan,
+                    costofinal=Decimal('100.00')
+                )
+        self.plan = plan
+
+        token = Token.objects.create(user=self.django_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+
+    def consulta_de_listado(self, url):
+        """SQL de la consulta principal del listado de consultas."""
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sql = [q['sql'] for q in consultas.captured_queries
+               if 'FROM "consulta"' in q['sql'] and 'COUNT(' not in q['sql']]
+        return response, sql[-1]
+
+    def test_sin_parametros_la_respuesta_no_cambia(self):
+        response, sql = self.consulta_de_listado('/api/consultas/')
+        fila = response.data['results'][0]
+        self.assertIn('duracion_real', fila)
+        self.assertEqual(fila['codpaciente']['codusuario']['nombre'], 'Ana')
+        self.assertIn('"usuario"', sql)
+
+    def consultas_sql(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(consultas.captured_queries)
+
+    def test_fields_limita_campos_sin_perder_la_carga_anticipada(self):
+        url = '/api/consultas/?fields=id,fecha,estado,codpaciente,cododontologo'
+        self.consultas_sql(url)  # calienta la caché del token
+        response, pocas = self.consultas_sql(url)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'fecha', 'estado', 'codpaciente', 'cododontologo'})
+
+        # Sin N+1: el número de consultas no crece con las filas
+        consulta = Consulta.objects.first()
+        Consulta.objects.bulk_create([
+            Consulta(
+                fecha=date(2026, 4, dia), codpaciente=self.paciente, cododontologo=self.odontologo,
+                idhorario=consulta.idhorario, idtipoconsulta=consulta.idtipoconsulta,
+                idestadoconsulta=consulta.idestadoconsulta, empresa=self.empresa,
+            )
+            for dia in range(1, 6)
+        ])
+        _, muchas = self.consultas_sql(url)
+        self.assertEqual(muchas, pocas)
+
+    def test_relaciones_no_expandidas_como_id(self):
+        response, sql = self.consulta_de_listado(
+            '/api/consultas/?fields=id,codpaciente,cododontologo&expand=cododontologo'
+        )
+        fila = response.data['results'][0]
+        self.assertEqual(fila['codpaciente'], self.paciente.pk)
+        self.assertEqual(fila['cododontologo']['codusuario']['nombre'], 'Luis')
+        self.assertIn('"odontologo"', sql)
+
+    def test_expand_incluye_el_campo_aunque_no_este_en_fields(self):
+        response = self.client.get(f'/api/consultas/{Consulta.objects.first().pk}/?fields=id&expand=idhorario')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {'id', 'idhorario'})
+        self.assertEqual(response.data['idhorario']['hora'], '09:00:00')
+
+    def test_listado_de_planes_sin_campos_calculados_hace_menos_consultas(self):
+        with CaptureQueriesContext(connection) as completo:
+            self.client.get('/api/planes-tratamiento/')
+        with CaptureQueriesContext(connection) as reducido:
+            response = self.client.get('/api/planes-tratamiento/?fields=id,fechaplan,montototal')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'fechaplan', 'montototal'})
+        self.assertLess(len(reducido), len(completo))
+
+    def test_items_del_plan_como_ids_o_expandidos(self):
+        url = f'/api/planes-tratamiento/{self.plan.pk}/'
+        response = self.client.get(url + '?fields=id,items')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(response.data['items']),
+            sorted(self.plan.itemplandetratamiento_set.values_list('pk', flat=True)),
+        )
+        response = self.client.get(url + '?fields=id&expand=items')
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertIsInstance(response.data['items'][0], dict)
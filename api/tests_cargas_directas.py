@@ -0,0 +1,422 @@
+"""
+Tests de la carga directa a S3 en dos fases (presigned POST + completar)
+para documentos clínicos y evidencias. Usa un stand-in local de S3.
+"""
+import base64
+import hashlib
+import io
+from datetime import timedelta
+
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient
+from rest_framework.authtoken.models import Token
+from rest_framework import status
+
+from api.models import (
+    Empresa, Usuario, Tipodeusuario, Paciente, DocumentoClinico, Evidencia, CargaDirecta, BlobAlmacenado
+)
+from api.services.cargas_directas import calcular_tamanio_parte
+from api.services.storage_gateway import S3StorageGateway, set_storage_gateway
+
+
+class S3LocalStandIn:
+    """S3 en memoria: guarda los objetos "subidos" por el cliente y responde HEAD."""
+
+    def __init__(self):
+        self.objetos = {}
+        self.contenidos = {}
+        self.politicas = {}
+        self.multipart = {}
+        self.ensamblados = []
+
+    def generate_presigned_post(self, Bucket, Key, Fields, Conditions, ExpiresIn):
+        self.politicas[Key] = Conditions
+        return {'url': f'https://{Bucket}.s3.amazonaws.com/', 'fields': dict(Fields, key=Key)}
+
+    def subir_desde_cliente(self, key, contenido, content_type, sha256, checksum=True):
+        """Simula el POST multipart del navegador directo a S3."""
+        self.objetos[key] = {
+            'ContentLength': len(contenido),
+            'ContentType': content_type,
+            'Metadata': {'sha256': sha256},
+        }
+        if checksum:
+            self.objetos[key]['ChecksumSHA256'] = base64.b64encode(hashlib.sha256(contenido).digest()).decode()
+        self.contenidos[key] = contenido
+
+    def head_object(self, Bucket, Key, ChecksumMode=None):
+        if Key not in self.objetos:
+            raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        return self.objetos[Key]
+
+    def get_object(self, Bucket, Key):
+        contenido = self.contenidos[Key]
+        return {'Body': StreamingBody(io.BytesIO(contenido), len(contenido))}
+
+    def delete_object(self, Bucket, Key):
+        self.objetos.pop(Key, None)
+        self.contenidos.pop(Key, None)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        if operation == 'upload_part':
+            return f"https://local-s3/{Params['Key']}?partNumber={Params['PartNumber']}"
+        return f"https://local-s3/{Params['Key']}"
+
+    # Multipart
+    def create_multipart_upload(self, Bucket, Key, ContentType, Metadata):
+        upload_id = f'upload-{len(self.multipart) + 1}'
+        self.multipart[upload_id] = {'key': Key, 'ContentType': ContentType, 'Metadata': Metadata, 'partes': {}}
+        return {'UploadId': upload_id}
+
+    def subir_parte(self, upload_id, numero, contenido):
+        """Simula el PUT de una parte desde el cliente."""
+        self.multipart[upload_id]['partes'][numero] = {
+            'PartNumber': numero, 'Size': len(contenido), 'ETag': f'"etag-{numero}"', 'contenido': contenido
+        }
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker=0):
+        partes = sorted(self.multipart[UploadId]['partes'].values(), key=lambda p: p['PartNumber'])
+        return {
+            'Parts': [
+                {k: v for k, v in p.items() if k != 'contenido'}
+                for p in partes if p['PartNumber'] > PartNumberMarker
+            ],
+            'IsTruncated': False,
+        }
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        upload = self.multipart.pop(UploadId)
+        self.ensamblados.append([p['PartNumber'] for p in MultipartUpload['Parts']])
+        self.contenidos[Key] = b''.join(upload['partes'][p['PartNumber']]['contenido'] for p in MultipartUpload['Parts'])
+        self.objetos[Key] = {
+            'ContentLength': len(self.contenidos[Key]),
+            'ContentType': upload['ContentType'],
+            'Metadata': upload['Metadata'],
+            'ChecksumSHA256': 'Y29tcHVlc3Rv-3',
+        }
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.multipart.pop(UploadId, None)
+
+
+@override_settings(AWS_STORAGE_BUCKET_NAME='bucket-test', AWS_S3_REGION_NAME='us-east-2',
+                   DIRECT_UPLOAD_VERIFICATION_WORKERS=0)
+class CargaDirectaBaseTest(APITestCase):
+    """Tenant, admin autenticado, paciente y S3 local comunes a los tests de carga."""
+
+    def setUp(self):
+        self.s3 = S3LocalStandIn()
+        set_storage_gateway(S3StorageGateway(client=self.s3))
+        self.addCleanup(set_storage_gateway, None)
+
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_admin = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        django_user = User.objects.create_user(
+            username='admin@test.com', password='testpass123', email='admin@test.com'
+        )
+        self.usuario = Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com",
+            idtipousuario=rol_admin, empresa=self.empresa
+        )
+        usuario_paciente = Usuario.objects.create(
+            nombre="Ana", apellido="Pérez", correoelectronico="ana@test.com",
+            idtipousuario=rol_paciente, empresa=self.empresa
+        )
+        self.paciente = Paciente.objects.get(codusuario=usuario_paciente)
+
+        token = Token.objects.create(user=django_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+
+        self.contenido = b'\x89PNG' + b'0' * 2048
+        self.sha256 = hashlib.sha256(self.contenido).hexdigest()
+
+    def verificar_cargas(self):
+        """Hace el trabajo del worker: calcula el hash de las cargas en verificación."""
+        call_command('verificar_cargas', stdout=io.StringIO())
+
+
+
+class CargaDirectaAPITest(CargaDirectaBaseTest):
+
+    def _iniciar_documento(self, **extra):
+        datos = {
+            'codpaciente': self.paciente.codusuario_id,
+            'tipo_documento': 'radiografia',
+            'fecha_documento': '2025-01-10',
+            'nombre_archivo': 'Panorámica.png',
+            'content_type': 'image/png',
+            'tamanio': len(self.contenido),
+            'sha256': self.sha256,
+        }
+        datos.update(extra)
+        return self.client.post('/api/documentos-clinicos/upload/iniciar/', datos, format='json')
+
+    def test_flujo_completo_documento(self):
+        response = self._iniciar_documento()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        key = response.data['key']
+        self.assertTrue(key.startswith(
+            f'tenants/{self.empresa.id}/pacientes/{self.paciente.codusuario_id}/documentos/'
+        ))
+        self.assertEqual(response.data['upload']['fields']['x-amz-meta-sha256'], self.sha256)
+        self.assertIn(['content-length-range', 1, len(self.contenido)], self.s3.politicas[key])
+
+        self.s3.subir_desde_cliente(key, self.contenido, 'image/png', self.sha256)
+        completar = self.client.post(
+            '/api/documentos-clinicos/upload/completar/',
+            {'carga_id': response.data['carga_id']}, format='json'
+        )
+        self.assertEqual(completar.status_code, status.HTTP_201_CREATED, completar.data)
+
+        documento = DocumentoClinico.objects.get(s3_key=key)
+        self.assertEqual(documento.tamanio_bytes, len(self.contenido))
+        self.assertEqual(documento.extension, 'png')
+        self.assertEqual(documento.profesional_carga, self.usuario)
+        carga = CargaDirecta.objects.get(id=response.data['carga_id'])
+        self.assertEqual(carga.estado, CargaDirecta.ESTADO_COMPLETADA)
+        self.assertEqual(carga.registro_id, str(documento.id))
+
+    def test_completar_dos_veces_falla(self):
+        response = self._iniciar_documento()
+        self.s3.subir_desde_cliente(response.data['key'], self.contenido, 'image/png', self.sha256)
+        url = '/api/documentos-clinicos/upload/completar/'
+        self.client.post(url, {'carga_id': response.data['carga_id']}, format='json')
+        segunda = self.client.post(url, {'carga_id': response.data['carga_id']}, format='json')
+        self.assertEqual(segunda.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(DocumentoClinico.objects.count(), 1)
+
+    def test_completar_sin_objeto_en_s3(self):
+        response = self._iniciar_documento()
+        completar = self.client.post(
+            '/api/documentos-clinicos/upload/completar/',
+            {'carga_id': response.data['carga_id']}, format='json'
+        )
+        self.assertEqual(completar.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            CargaDirecta.objects.get(id=response.data['carga_id']).estado,
+            CargaDirecta.ESTADO_PENDIENTE
+        )
+
+    def test_hash_distinto_rechaza_y_elimina_objeto(self):
+        response = self._iniciar_documento()
+        key = response.data['key']
+        self.s3.subir_desde_cliente(key, b'otro contenido' + b'0' * 2038, 'image/png', self.sha256)
+        completar = self.client.post(
+            '/api/documentos-clinicos/upload/completar/',
+            {'carga_id': response.data['carga_id']}, format='json'
+        )
+        self.assertEqual(completar.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(key, self.s3.objetos)
+        self.assertEqual(
+            CargaDirecta.objects.get(id=response.data['carga_id']).estado,
+            CargaDirecta.ESTADO_RECHAZADA
+        )
+        self.assertFalse(DocumentoClinico.objects.exists())
+
+    def test_sin_checksum_de_s3_el_hash_se_calcula_en_el_servidor(self):
+        url = '/api/documentos-clinicos/upload/completar/'
+        falsa = self._iniciar_documento()
+        self.s3.subir_desde_cliente(falsa.data['key'], b'\x89PNG' + b'1' * 2048, 'image/png', self.sha256,
+                                    checksum=False)
+        self.assertEqual(self.client.post(url, {'carga_id': falsa.data['carga_id']}, format='json').status_code,
+                         status.HTTP_202_ACCEPTED)
+        self.verificar_cargas()
+        self.assertEqual(CargaDirecta.objects.get(id=falsa.data['carga_id']).estado, CargaDirecta.ESTADO_RECHAZADA)
+        self.assertNotIn(falsa.data['key'], self.s3.objetos)
+        self.assertEqual(self.client.post(url, {'carga_id': falsa.data['carga_id']}, format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(BlobAlmacenado.objects.exists())
+
+        real = self._iniciar_documento()
+        self.s3.subir_desde_cliente(real.data['key'], self.contenido, 'image/png', self.sha256, checksum=False)
+        self.assertEqual(self.client.post(url, {'carga_id': real.data['carga_id']}, format='json').status_code,
+                         status.HTTP_202_ACCEPTED)
+        self.verificar_cargas()
+        self.assertEqual(self.client.post(url, {'carga_id': real.data['carga_id']}, format='json').status_code,
+                         status.HTTP_201_CREATED)
+        self.assertEqual(BlobAlmacenado.objects.get().sha256, self.sha256)
+
+    def test_iniciar_rechaza_extension_y_hash_invalidos(self):
+        self.assertEqual(self._iniciar_documento(nombre_archivo='script.exe').status_code, 400)
+        self.assertEqual(self._iniciar_documento(sha256='z' * 64).status_code, 400)
+        self.assertEqual(self._iniciar_documento(content_type='text/html').status_code, 400)
+
+    def test_iniciar_rechaza_paciente_o_consulta_de_otra_empresa(self):
+        otra = Empresa.objects.create(nombre="Clínica Sur", subdomain="sur", activo=True)
+        rol = Tipodeusuario.objects.create(rol="Paciente", empresa=otra)
+        ajeno = Paciente.objects.get(codusuario=Usuario.objects.create(
+            nombre="Luis", apellido="Gómez", correoelectronico="luis@test.com", idtipousuario=rol, empresa=otra
+        ))
+        self.assertEqual(self._iniciar_documento(codpaciente=ajeno.pk).status_code, 400)
+        self.assertEqual(self._iniciar_documento(idconsulta=999999).status_code, 400)
+        self.assertFalse(CargaDirecta.objects.exists())
+
+    def test_flujo_completo_evidencia(self):
+        response = self.client.post('/api/upload/evidencias/iniciar/', {
+            'nombre_archivo': 'foto.png',
+            'content_type': 'image/png',
+            'tamanio': len(self.contenido),
+            'sha256': self.sha256,
+            'tipo': 'foto_clinica',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        key = response.data['key']
+        self.assertTrue(key.startswith(f'tenants/{self.empresa.id}/evidencias/'))
+
+        self.s3.subir_desde_cliente(key, self.contenido, 'image/png', self.sha256)
+        completar = self.client.post(
+            '/api/upload/evidencias/completar/', {'carga_id': response.data['carga_id']}, format='json'
+        )
+        self.assertEqual(completar.status_code, status.HTTP_201_CREATED, completar.data)
+        evidencia = Evidencia.objects.get(id=completar.data['id'])
+        self.assertEqual(evidencia.archivo.name, key)
+        self.assertEqual(evidencia.tipo, 'foto_clinica')
+        self.assertEqual(evidencia.usuario, self.usuario)
+
+    def test_evidencia_directa_usa_url_firmada_y_se_elimina_de_s3(self):
+        response = self.client.post('/api/upload/evidencias/iniciar/', {
+            'nombre_archivo': 'foto.png',
+            'content_type': 'image/png',
+            'tamanio': len(self.contenido),
+            'sha256': self.sha256,
+        }, format='json')
+        key = response.data['key']
+        self.s3.subir_desde_cliente(key, self.contenido, 'image/png', self.sha256)
+        completar = self.client.post(
+            '/api/upload/evidencias/completar/', {'carga_id': response.data['carga_id']}, format='json'
+        )
+        self.assertEqual(completar.data['url'], f'https://local-s3/{key}')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Evidencia.objects.get(id=completar.data['id']).delete()
+        self.assertNotIn(key, self.s3.objetos)
+
+
+MB = 1024 * 1024
+
+
+class CargaMultipartAPITest(CargaDirectaBaseTest):
+    """Carga reanudable por partes (S3 multipart)."""
+
+    URL = '/api/documentos-clinicos/upload/'
+
+    def setUp(self):
+        super().setUp()
+        self.escaneo = bytes(range(256)) * (20 * MB // 256)
+
+    def parte(self, numero):
+        return self.escaneo[(numero - 1) * 8 * MB:numero * 8 * MB]
+
+    def _iniciar_multipart(self, tamanio=20 * MB, sha256=None):
+        return self.client.post(self.URL + 'multipart/iniciar/', {
+            'codpaciente': self.paciente.codusuario_id,
+            'tipo_documento': 'radiografia',
+            'fecha_documento': '2025-01-10',
+            'nombre_archivo': 'escaneo.dcm',
+            'content_type': 'application/dicom',
+            'tamanio': tamanio,
+            'sha256': sha256 or hashlib.sha256(self.escaneo).hexdigest(),
+        }, format='json')
+
+    def test_reanudar_y_completar(self):
+        response = self._iniciar_multipart()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        carga_id = response.data['carga_id']
+        self.assertEqual(response.data['tamanio_parte'], 8 * MB)
+        self.assertEqual(response.data['total_partes'], 3)
+        upload_id = CargaDirecta.objects.get(id=carga_id).upload_id
+
+        urls = self.client.post(self.URL + 'multipart/partes/', {
+            'carga_id': carga_id, 'partes': [1, 2, 3]
+        }, format='json')
+        self.assertEqual(urls.status_code, status.HTTP_200_OK)
+        self.assertIn('partNumber=2', urls.data['urls']['2'])
+
+        # Corte de conexión: solo llegaron las partes 1 y 3
+        self.s3.subir_parte(upload_id, 1, self.parte(1))
+        self.s3.subir_parte(upload_id, 3, self.parte(3))
+        estado = self.client.get(self.URL + 'multipart/estado/', {'carga_id': carga_id})
+        self.assertEqual(estado.data['faltantes'], [2])
+        self.assertEqual([p['numero'] for p in estado.data['recibidas']], [1, 3])
+
+        incompleta = self.client.post(self.URL + 'completar/', {'carga_id': carga_id}, format='json')
+        self.assertEqual(incompleta.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.s3.subir_parte(upload_id, 2, self.parte(2))
+        completar = self.client.post(self.URL + 'completar/', {'carga_id': carga_id}, format='json')
+        self.assertEqual(completar.status_code, status.HTTP_202_ACCEPTED, completar.data)
+        self.assertEqual(completar.data['estado'], CargaDirecta.ESTADO_VERIFICANDO)
+        self.assertFalse(DocumentoClinico.objects.exists())
+
+        self.verificar_cargas()
+        completar = self.client.post(self.URL + 'completar/', {'carga_id': carga_id}, format='json')
+        self.assertEqual(completar.status_code, status.HTTP_201_CREATED, completar.data)
+        self.assertEqual(self.s3.ensamblados, [[1, 2, 3]])
+        self.assertEqual(DocumentoClinico.objects.get(id=completar.data['id']).tamanio_bytes, 20 * MB)
+
+    def test_hash_declarado_se_verifica_en_el_servidor(self):
+        # S3 solo reporta un checksum compuesto: el hash declarado no se acepta sin leer el objeto
+        response = self._iniciar_multipart(sha256=self.sha256)
+        carga_id = response.data['carga_id']
+        upload_id = CargaDirecta.objects.get(id=carga_id).upload_id
+        for numero in (1, 2, 3):
+            self.s3.subir_parte(upload_id, numero, self.parte(numero))
+
+        completar = self.client.post(self.URL + 'completar/', {'carga_id': carga_id}, format='json')
+        self.assertEqual(completar.status_code, status.HTTP_202_ACCEPTED)
+        self.verificar_cargas()
+        self.assertNotIn(response.data['key'], self.s3.objetos)
+        completar = self.client.post(self.URL + 'completar/', {'carga_id': carga_id}, format='json')
+        self.assertEqual(completar.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(BlobAlmacenado.objects.exists())
+
+    @override_settings(DIRECT_UPLOAD_VERIFICATION_WORKERS=1)
+    def test_el_hash_se_calcula_fuera_del_request(self):
+        carga_id = self._iniciar_multipart().data['carga_id']
+        upload_id = CargaDirecta.objects.get(id=carga_id).upload_id
+        for numero in (1, 2, 3):
+            self.s3.subir_parte(upload_id, numero, self.parte(numero))
+
+        with self.captureOnCommitCallbacks() as encoladas:
+            completar = self.client.post(self.URL + 'completar/', {'carga_id': carga_id}, format='json')
+        self.assertEqual(completar.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(encoladas), 1)
+
+        # Reintentar mientras el worker calcula no vuelve a encolar ni leer el objeto
+        with self.captureOnCommitCallbacks() as encoladas:
+            completar = self.client.post(self.URL + 'completar/', {'carga_id': carga_id}, format='json')
+        self.assertEqual(completar.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(encoladas, [])
+
+        # El comando solo retoma las que el pool dejó colgadas
+        self.verificar_cargas()
+        self.assertEqual(CargaDirecta.objects.get(id=carga_id).estado, CargaDirecta.ESTADO_VERIFICANDO)
+        CargaDirecta.objects.filter(id=carga_id).update(fecha_verificacion=timezone.now() - timedelta(hours=1))
+        self.verificar_cargas()
+        self.assertEqual(CargaDirecta.objects.get(id=carga_id).estado, CargaDirecta.ESTADO_VERIFICADA)
+
+    def test_parte_fuera_de_rango(self):
+        carga_id = self._iniciar_multipart().data['carga_id']
+        response = self.client.post(self.URL + 'multipart/partes/', {
+            'carga_id': carga_id, 'partes': [4]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_abortar_descarta_partes(self):
+        carga_id = self._iniciar_multipart().data['carga_id']
+        response = self.client.post(self.URL + 'abortar/', {'carga_id': carga_id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.s3.multipart, {})
+        self.assertEqual(CargaDirecta.objects.get(id=carga_id).estado, CargaDirecta.ESTADO_RECHAZADA)
+
+    def test_tamanio_parte_respeta_limite_de_partes_s3(self):
+        self.assertEqual(calcular_tamanio_parte(10 * MB), 8 * MB)
+        self.assertGreaterEqual(calcular_tamanio_parte(200 * 1024 * MB) * 10000, 200 * 1024 * MB)
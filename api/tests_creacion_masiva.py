@@ -0,0 +1,104 @@
+"""
+Tests de la creación masiva de ítems al clonar planes y generar presupuestos:
+consultas constantes, totales calculados una vez, una bitácora y un aviso.
+"""
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.models import (
+    Bitacora, Empresa, Estado, Itemplandetratamiento, Odontologo, Paciente, Plandetratamiento,
+    Servicio, Tipodeusuario, Usuario,
+)
+from api.serializers_presupuesto_digital import CrearPresupuestoSerializer
+from api.services.creacion_masiva import clonar_items_plan
+
+
+class CreacionMasivaTest(TestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        rol_odontologo = Tipodeusuario.objects.create(rol="Odontologo", empresa=self.empresa)
+        self.paciente = Paciente.objects.get(codusuario=Usuario.objects.create(
+            nombre="Ana", apellido="Test", correoelectronico="ana@test.com",
+            idtipousuario=rol_paciente, empresa=self.empresa
+        ))
+        self.usuario_odontologo = Usuario.objects.create(
+            nombre="Luis", apellido="Rojas", correoelectronico="luis@test.com",
+            idtipousuario=rol_odontologo, empresa=self.empresa
+        )
+        self.odontologo = Odontologo.objects.get(codusuario=self.usuario_odontologo)
+        self.estado = Estado.objects.create(estado="Activo")
+        self.servicio = Servicio.objects.create(nombre="Resina", costobase=Decimal('100.00'), empresa=self.empresa)
+
+    def crear_plan(self, cantidad_items, **campos):
+        plan = Plandetratamiento.objects.create(
+            codpaciente=self.paciente, cododontologo=self.odontologo,
+            idestado=self.estado, fechaplan=date(2026, 3, 1), empresa=self.empresa, **campos
+        )
+        Itemplandetratamiento.objects.bulk_create([
+            Itemplandetratamiento(
+                idplantratamiento=plan, idservicio=self.servicio, idestado=self.estado, empresa=self.empresa,
+                costofinal=Decimal('100.00') + i, orden=i, estado_item=Itemplandetratamiento.ESTADO_ACTIVO,
+            )
+            for i in range(cantidad_items)
+        ])
+        return plan
+
+    def clonar(self, plan_original):
+        plan_nuevo = Plandetratamiento.objects.create(
+            codpaciente=self.paciente, cododontologo=self.odontologo,
+            idestado=self.estado, fechaplan=date(2026, 4, 1), empresa=self.empresa,
+        )
+        with CaptureQueriesContext(connection) as consultas:
+            items = clonar_items_plan(plan_original, plan_nuevo)
+        return plan_nuevo, items, len(consultas.captured_queries)
+
+    def test_clonar_con_consultas_constantes(self):
+        _, _, consultas_pocos = self.clonar(self.crear_plan(3))
+        plan_nuevo, items, consultas_muchos = self.clonar(self.crear_plan(40))
+
+        self.assertEqual(consultas_muchos, consultas_pocos)
+        self.assertLessEqual(consultas_muchos, 6)
+        self.assertEqual(len(items), 40)
+        self.assertEqual(
+            set(plan_nuevo.itemplandetratamiento_set.values_list('estado_item', flat=True)),
+            {Itemplandetratamiento.ESTADO_PENDIENTE},
+        )
+        self.assertEqual(plan_nuevo.montototal, Decimal('4780.00'))
+        plan_nuevo.refresh_from_db()
+        self.assertEqual(plan_nuevo.montototal, Decimal('4780.00'))
+
+    @patch('api.notifications_mobile.queue.enqueue_notif_for_user_devices', return_value=[])
+    def test_generar_presupuesto_en_bloque(self, enqueue):
+        plan = self.crear_plan(40, estado_plan=Plandetratamiento.ESTADO_PLAN_APROBADO)
+        items_ids = list(plan.itemplandetratamiento_set.values_list('id', flat=True))
+        request = SimpleNamespace(tenant=self.empresa, user=SimpleNamespace(usuario=self.usuario_odontologo))
+
+        serializer = CrearPresupuestoSerializer(
+            data={
+                'plan_tratamiento_id': plan.id, 'items_ids': items_ids,
+                'items_config': [{'item_id': items_ids[0], 'descuento_item': '10.00', 'permite_pago_parcial': True}],
+            },
+            context={'request': request},
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        presupuesto = serializer.save()
+
+        items = list(presupuesto.items_presupuesto.order_by('orden'))
+        self.assertEqual(len(items), 40)
+        self.assertEqual(items[0].precio_final, Decimal('90.00'))
+        self.assertTrue(items[0].permite_pago_parcial)
+        self.assertEqual(items[1].precio_final, Decimal('101.00'))
+        self.assertEqual(presupuesto.total, Decimal('4780.00'))
+
+        bitacora = Bitacora.objects.get(accion='PRESUPUESTO_DIGITAL_CREADO')
+        self.assertEqual(bitacora.valores_nuevos['items_count'], 40)
+        enqueue.assert_called_once()
+        self.assertEqual(enqueue.call_args.kwargs['usuario_codigo'], self.usuario_odontologo.codigo)
@@ -0,0 +1,51 @@
+"""
+Tests de las métricas de conexiones a la DB (pool de psycopg / conexiones
+persistentes).
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.services.db_pool import metricas_pool, metricas_conexiones
+
+
+class PoolFalso:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def get_stats(self):
+        return self.stats
+
+
+class MetricasPoolTest(TestCase):
+
+    def test_en_uso_ociosas_y_espera_promedio(self):
+        metricas = metricas_pool(PoolFalso({
+            'pool_min': 1, 'pool_max': 10, 'pool_size': 4, 'pool_available': 1,
+            'requests_waiting': 2, 'requests_num': 40, 'requests_wait_ms': 100,
+            'connections_errors': 1,
+        }))
+        self.assertEqual(metricas['modo'], 'pool')
+        self.assertEqual(metricas['en_uso'], 3)
+        self.assertEqual(metricas['ociosas'], 1)
+        self.assertEqual(metricas['en_espera'], 2)
+        self.assertEqual(metricas['espera_promedio_ms'], 2.5)
+        self.assertEqual(metricas['errores_conexion'], 1)
+
+    def test_pool_sin_solicitudes(self):
+        self.assertEqual(metricas_pool(PoolFalso({}))['espera_promedio_ms'], 0)
+
+    def test_endpoint_reporta_conexion_persistente(self):
+        client = APIClient()
+        self.assertIn(client.get('/api/db/pool/').status_code, (401, 403))
+        client.force_authenticate(User.objects.create_user(username='ops@test.com', is_staff=False))
+        self.assertEqual(client.get('/api/db/pool/').status_code, 403)
+
+        client.force_authenticate(User.objects.create_user(username='admin@test.com', is_staff=True))
+        response = client.get('/api/db/pool/')
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        self.assertIn('default', datos['bases'])
+        self.assertIn(datos['bases']['default']['modo'], ('persistente', 'sin_reuso'))
+        self.assertIsInstance(datos['bases']['default']['conexiones_creadas'], int)
+        self.assertEqual(metricas_conexiones()['workers_gunicorn'], datos['workers_gunicorn'])
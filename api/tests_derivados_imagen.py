@@ -0,0 +1,129 @@
+"""
+Tests del pipeline de derivados de imagen (miniatura / versión web) para
+evidencias y documentos clínicos.
+"""
+import io
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api.models import Empresa, Usuario, Tipodeusuario, Paciente, DocumentoClinico, Evidencia
+from api.serializers import DocumentoClinicoListSerializer
+from api.serializers_evidencias import EvidenciaSerializer
+from api.services.derivados_imagen import generar_variantes
+from api.services.storage_gateway import S3StorageGateway, set_storage_gateway
+
+
+def imagen_jpeg(ancho=2400, alto=1800):
+    salida = io.BytesIO()
+    Image.new('RGB', (ancho, alto), (200, 120, 90)).save(salida, 'JPEG')
+    return salida.getvalue()
+
+
+class S3Memoria:
+    """Stand-in de S3 que guarda los bytes de cada objeto."""
+
+    def __init__(self):
+        self.objetos = {}
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.objetos[Key])}
+
+    def upload_fileobj(self, fileobj, Bucket, Key, ExtraArgs=None):
+        self.objetos[Key] = fileobj.read()
+
+    def delete_object(self, Bucket, Key):
+        self.objetos.pop(Key, None)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://local-s3/{Params['Key']}"
+
+
+class GenerarVariantesTest(TestCase):
+
+    def test_dimensiones_y_formatos(self):
+        variantes = {nombre: (datos, ct) for nombre, datos, _ext, ct in generar_variantes(imagen_jpeg())}
+        self.assertEqual(set(variantes), {'miniatura', 'web', 'web_jpeg'})
+
+        miniatura = Image.open(io.BytesIO(variantes['miniatura'][0]))
+        self.assertEqual(miniatura.format, 'WEBP')
+        self.assertEqual(max(miniatura.size), 320)
+        web_jpeg = Image.open(io.BytesIO(variantes['web_jpeg'][0]))
+        self.assertEqual(web_jpeg.format, 'JPEG')
+        self.assertEqual(max(web_jpeg.size), 1600)
+
+    def test_imagen_pequena_no_se_amplia(self):
+        for _nombre, datos, _ext, _ct in generar_variantes(imagen_jpeg(200, 100)):
+            self.assertEqual(Image.open(io.BytesIO(datos)).size, (200, 100))
+
+
+@override_settings(IMAGE_DERIVATIVES_WORKERS=0, AWS_STORAGE_BUCKET_NAME='bucket-test',
+                   AWS_S3_REGION_NAME='us-east-2')
+class DerivadosModelosTest(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.s3 = S3Memoria()
+        set_storage_gateway(S3StorageGateway(client=self.s3))
+        self.addCleanup(set_storage_gateway, None)
+
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        usuario = Usuario.objects.create(
+            nombre="Ana", apellido="Pérez", correoelectronico="ana@test.com",
+            idtipousuario=rol_paciente, empresa=self.empresa
+        )
+        self.paciente = Paciente.objects.get(codusuario=usuario)
+
+    def test_evidencia_genera_derivados_al_confirmar(self):
+        with self.settings(MEDIA_ROOT=self.media):
+            with self.captureOnCommitCallbacks(execute=True):
+                evidencia = Evidencia.objects.create(
+                    archivo=SimpleUploadedFile('foto.jpg', imagen_jpeg(), content_type='image/jpeg'),
+                    nombre_original='foto.jpg', mimetype='image/jpeg', tamanio=1, empresa=self.empresa
+                )
+            evidencia.refresh_from_db()
+            self.assertEqual(set(evidencia.derivados), {'miniatura', 'web', 'web_jpeg'})
+            self.assertTrue(evidencia.derivados['miniatura'].endswith('__miniatura.webp'))
+
+            datos = EvidenciaSerializer(evidencia).data
+            self.assertTrue(datos['url_miniatura'].endswith('__miniatura.webp'))
+            self.assertNotEqual(datos['url_miniatura'], datos['url'])
+
+            storage = evidencia.archivo.storage
+            miniatura = evidencia.derivados['miniatura']
+            evidencia.delete()
+            self.assertFalse(storage.exists(miniatura))
+
+    def test_pdf_no_genera_derivados(self):
+        with self.settings(MEDIA_ROOT=self.media):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                evidencia = Evidencia.objects.create(
+                    archivo=SimpleUploadedFile('informe.pdf', b'%PDF-1.4', content_type='application/pdf'),
+                    nombre_original='informe.pdf', mimetype='application/pdf', tamanio=8,
+                    empresa=self.empresa
+                )
+        self.assertEqual(callbacks, [])
+        evidencia.refresh_from_db()
+        self.assertEqual(evidencia.derivados, {})
+        self.assertIsNone(EvidenciaSerializer(evidencia).data['url_miniatura'])
+
+    def test_documento_clinico_en_s3(self):
+        key = f'clinica/{self.empresa.id}/panoramica.jpg'
+        self.s3.objetos[key] = imagen_jpeg()
+        with self.captureOnCommitCallbacks(execute=True):
+            documento = DocumentoClinico.objects.create(
+                codpaciente=self.paciente, tipo_documento='radiografia', nombre_archivo='panoramica.jpg',
+                url_s3='https://x', s3_key=key, tamanio_bytes=1, extension='jpg',
+                fecha_documento='2025-01-10', empresa=self.empresa
+            )
+        documento.refresh_from_db()
+        self.assertIn(f'clinica/{self.empresa.id}/panoramica__web.webp', self.s3.objetos)
+
+        datos = DocumentoClinicoListSerializer(documento).data
+        self.assertEqual(datos['url_miniatura'], f'https://local-s3/clinica/{self.empresa.id}/panoramica__miniatura.webp')
+        self.assertEqual(datos['url_firmada'], f'https://local-s3/{key}')
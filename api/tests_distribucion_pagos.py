@@ -0,0 +1,177 @@
+"""
+Tests del motor de distribución de pagos entre items del plan
+(api/services/calculador_pagos.py): centavos exactos, estrategias y
+cantidad de consultas.
+"""
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+
+from api.models import (
+    DetallePagoItem, Empresa, Estado, Itemplandetratamiento, Odontologo, PagoEnLinea, Paciente,
+    Plandetratamiento, Servicio, Tipodeusuario, Usuario,
+)
+from api.serializers_pagos import CrearPagoPlanSerializer
+from api.services.calculador_pagos import CalculadorPagos, SaldoItem, cargar_saldos_items, distribuir_pago
+from api.validators_pagos import validar_distribucion_pago
+
+
+def saldo(item_id, monto, orden=0):
+    return SaldoItem(item_id, 'Servicio', orden, Decimal(monto), Decimal('0'))
+
+
+class DistribuirPagoTest(TestCase):
+
+    def test_proporcional_suma_exacta_en_centavos(self):
+        saldos = [saldo(1, '100.00'), saldo(2, '100.00'), saldo(3, '100.00')]
+        asignaciones, sobrante = distribuir_pago(saldos, Decimal('100.00'))
+        montos = [monto for _, monto in asignaciones]
+        self.assertEqual(sum(montos), Decimal('100.00'))
+        # El centavo que sobra va al primero de los empatados
+        self.assertEqual(montos, [Decimal('33.34'), Decimal('33.33'), Decimal('33.33')])
+        self.assertEqual(sobrante, Decimal('0'))
+
+    def test_proporcional_mayor_resto_y_tope_por_saldo(self):
+        saldos = [saldo(1, '0.01'), saldo(2, '0.02'), saldo(3, '999.97')]
+        asignaciones, _ = distribuir_pago(saldos, Decimal('10.00'))
+        for saldo_item, monto in asignaciones:
+            self.assertLessEqual(monto, saldo_item.saldo_pendiente)
+        self.assertEqual(sum(monto for _, monto in asignaciones), Decimal('10.00'))
+        # Los items que no reciben nada no generan detalle
+        self.assertNotIn(1, [s.item_id for s, _ in asignaciones])
+
+    def test_estrategias_secuenciales(self):
+        saldos = [saldo(3, '50.00', orden=1), saldo(1, '50.00', orden=2), saldo(2, '50.00', orden=3)]
+        antiguedad, _ = distribuir_pago(saldos, Decimal('70.00'), 'antiguedad')
+        self.assertEqual([(s.item_id, m) for s, m in antiguedad], [(1, Decimal('50.00')), (2, Decimal('20.00'))])
+        por_orden, _ = distribuir_pago(saldos, Decimal('70.00'), 'orden')
+        self.assertEqual([(s.item_id, m) for s, m in por_orden], [(3, Decimal('50.00')), (1, Decimal('20.00'))])
+
+    def test_pago_que_cubre_todo_deja_sobrante(self):
+        saldos = [saldo(1, '40.00'), SaldoItem(2, 'Servicio', 0, Decimal('60.00'), Decimal('60.00'))]
+        asignaciones, sobrante = distribuir_pago(saldos, Decimal('50.00'))
+        self.assertEqual([(s.item_id, m) for s, m in asignaciones], [(1, Decimal('40.00'))])
+        self.assertEqual(sobrante, Decimal('10.00'))
+
+    def test_estrategia_invalida(self):
+        with self.assertRaises(ValueError):
+            distribuir_pago([], Decimal('1.00'), 'aleatoria')
+
+
+class DistribucionPagoPlanTest(TestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        rol_odontologo = Tipodeusuario.objects.create(rol="Odontologo", empresa=self.empresa)
+        self.usuario = Usuario.objects.create(
+            nombre="Ana", apellido="Test", correoelectronico="ana@test.com",
+            idtipousuario=rol_paciente, empresa=self.empresa
+        )
+        paciente = Paciente.objects.get(codusuario=self.usuario)
+        odontologo = Odontologo.objects.get(codusuario=Usuario.objects.create(
+            nombre="Luis", apellido="Rojas", correoelectronico="luis@test.com",
+            idtipousuario=rol_odontologo, empresa=self.empresa
+        ))
+        estado = Estado.objects.create(estado="Activo")
+        self.plan = Plandetratamiento.objects.create(
+            codpaciente=paciente, cododontologo=odontologo, idestado=estado,
+            fechaplan=date(2026, 3, 1), empresa=self.empresa,
+        )
+        self.items = [
+            Itemplandetratamiento.objects.create(
+                idplantratamiento=self.plan, idestado=estado, empresa=self.empresa, costofinal=Decimal(costo),
+                idservicio=Servicio.objects.create(nombre=nombre, costobase=Decimal(costo), empresa=self.empresa),
+            )
+            for nombre, costo in (("Limpieza", '100.00'), ("Resina", '100.00'), ("Endodoncia", '100.00'))
+        ]
+        Plandetratamiento.objects.filter(pk=self.plan.pk).update(
+            estado_plan=Plandetratamiento.ESTADO_PLAN_APROBADO, montototal=Decimal('300.00')
+        )
+        self.plan.refresh_from_db()
+
+        # Pago aprobado previo de 40 sobre el primer item
+        pago = PagoEnLinea.objects.create(
+            empresa=self.empresa, usuario=self.usuario, plan_tratamiento=self.plan, origen_tipo='items_individuales',
+            monto=Decimal('40.00'), monto_original=Decimal('300.00'), estado='aprobado',
+            metodo_pago='transferencia',
+        )
+        DetallePagoItem.objects.create(
+            pago=pago, item_plan=self.items[0], monto_item_total=Decimal('100.00'),
+            monto_pagado_ahora=Decimal('40.00'), monto_pagado_total=Decimal('40.00'),
+            saldo_restante=Decimal('60.00'),
+        )
+
+    def test_saldos_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            saldos = cargar_saldos_items(self.plan)
+        self.assertEqual(
+            [(s.servicio_nombre, s.monto_pagado, s.saldo_pendiente) for s in saldos],
+            [("Limpieza", Decimal('40.00'), Decimal('60.00')),
+             ("Resina", Decimal('0'), Decimal('100.00')),
+             ("Endodoncia", Decimal('0'), Decimal('100.00'))],
+        )
+
+    def test_distribucion_y_validacion_comparten_saldos(self):
+        saldos = cargar_saldos_items(self.plan)
+        with self.assertNumQueries(0):
+            distribucion = CalculadorPagos.calcular_distribucion_pago(self.plan, Decimal('100.00'), saldos=saldos)
+        self.assertEqual(distribucion['monto_distribuido'], 100.0)
+        self.assertEqual([d['monto_a_pagar'] for d in distribucion['distribucion']], [23.08, 38.46, 38.46])
+        self.assertEqual(distribucion['distribucion'][0]['monto_pagado_anterior'], 40.0)
+
+        with self.assertNumQueries(1):  # solo el plan
+            es_valido, _, validada = validar_distribucion_pago(
+                Decimal('100.00'), None, self.plan.pk, self.empresa, saldos=saldos
+            )
+        self.assertTrue(es_valido)
+        self.assertEqual(validada, distribucion)
+
+    def test_crear_pago_con_consultas_constantes(self):
+        def crear(items_ids):
+            request = SimpleNamespace(tenant=self.empresa, user=SimpleNamespace(usuario=self.usuario))
+            serializer = CrearPagoPlanSerializer(data={
+                'plan_tratamiento_id': self.plan.pk, 'monto': '30.00', 'metodo_pago': 'transferencia',
+                'items_seleccionados': items_ids, 'estrategia_distribucion': 'orden',
+            }, context={'request': request})
+            with CaptureQueriesContext(connection) as consultas:
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+                pago = serializer.save()
+            return pago, len(consultas.captured_queries)
+
+        pago_uno, consultas_uno = crear([self.items[1].pk])
+        pago_dos, consultas_dos = crear([self.items[1].pk, self.items[2].pk])
+        self.assertEqual(consultas_uno, consultas_dos)
+
+        detalle = pago_dos.detalles_items.get()
+        self.assertEqual(detalle.item_plan_id, self.items[1].pk)
+        self.assertEqual(detalle.monto_pagado_ahora, Decimal('30.00'))
+        self.assertEqual(detalle.monto_item_total, Decimal('100.00'))
+
+    def test_crear_pago_revalida_con_el_plan_bloqueado(self):
+        request = SimpleNamespace(tenant=self.empresa, user=SimpleNamespace(usuario=self.usuario))
+        serializer = CrearPagoPlanSerializer(data={
+            'plan_tratamiento_id': self.plan.pk, 'monto': '80.00', 'metodo_pago': 'transferencia',
+            'items_seleccionados': [self.items[1].pk],
+        }, context={'request': request})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        # Otra creación confirmada entre la validación y el save()
+        pago = PagoEnLinea.objects.create(
+            empresa=self.empresa, usuario=self.usuario, plan_tratamiento=self.plan, origen_tipo='items_individuales',
+            monto=Decimal('50.00'), monto_original=Decimal('300.00'), estado='aprobado', metodo_pago='transferencia',
+        )
+        DetallePagoItem.objects.create(
+            pago=pago, item_plan=self.items[1], monto_item_total=Decimal('100.00'),
+            monto_pagado_ahora=Decimal('50.00'), monto_pagado_total=Decimal('50.00'), saldo_restante=Decimal('50.00'),
+        )
+
+        with self.assertRaises(ValidationError) as error:
+            serializer.save()
+        self.assertIn('monto', error.exception.detail)
+        self.assertEqual(PagoEnLinea.objects.filter(estado='pendiente').count(), 0)
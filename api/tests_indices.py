@@ -0,0 +1,261 @@
+"""
+Regresión de planes de consulta (EXPLAIN) sobre los índices por tenant.
+
+Siembra tablas con varios tenants, ejecuta los querysets de los accesos
+principales bajo EXPLAIN y verifica que usen el índice diseñado para ese
+acceso y que no recorran la tabla completa. Si alguien quita un índice o
+cambia un filtro de forma que deje de usarlo, falla aquí y no en producción.
+
+Soporta PostgreSQL (EXPLAIN en JSON) y SQLite (EXPLAIN QUERY PLAN).
+"""
+import json
+import re
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import (
+    Bitacora, Consulta, Empresa, Estado, Estadodeconsulta, Horario, Itemplandetratamiento,
+    Odontologo, Paciente, PagoEnLinea, Plandetratamiento, Servicio, SesionTratamiento,
+    Tipodeconsulta, Tipodeusuario, Usuario,
+)
+from api.models_notifications import CanalNotificacion, HistorialNotificacion, TipoNotificacion
+from api.notifications_mobile.models import HistorialNotificacionMN
+from api.pagination import PaginacionHibrida
+from api.views import BitacoraViewSet
+
+TENANTS = 20
+FILAS_POR_TENANT = 150
+ODONTOLOGOS = 10
+ITEMS = 10
+
+
+def plan_de_consulta(queryset) -> dict:
+    """
+    Resumen del plan de `queryset`: índices usados, tablas recorridas
+    secuencialmente y si ordena aparte (Sort / TEMP B-TREE) en vez de leer
+    en el orden del índice.
+    """
+    indices, secuenciales, ordena = set(), set(), False
+    if connection.vendor == 'postgresql':
+        def recorrer(nodo):
+            nonlocal ordena
+            tipo = nodo.get('Node Type', '')
+            if tipo in ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan'):
+                indices.add(nodo['Index Name'])
+            elif tipo == 'Seq Scan':
+                secuenciales.add(nodo['Relation Name'])
+            elif tipo in ('Sort', 'Incremental Sort'):
+                ordena = True
+            for hijo in nodo.get('Plans', []):
+                recorrer(hijo)
+        plan = json.loads(queryset.explain(format='json'))
+        recorrer(plan[0]['Plan'])
+    elif connection.vendor == 'sqlite':
+        for linea in queryset.explain().splitlines():
+            if 'USE TEMP B-TREE FOR ORDER BY' in linea:
+                ordena = True
+                continue
+            uso = re.search(r'(?:SEARCH|SCAN) (\w+)(?: AS \w+)? USING (?:COVERING )?INDEX (\w+)', linea)
+            if uso:
+                indices.add(uso.group(2))
+                continue
+            recorrido = re.search(r'SCAN (\w+)', linea)
+            if recorrido:
+                secuenciales.add(recorrido.group(1))
+    else:
+        raise NotImplementedError(connection.vendor)
+    return {'indices': indices, 'secuenciales': secuenciales, 'ordena': ordena}
+
+
+class IndicesTenantExplainTest(TestCase):
+    """Cada acceso debe usar su índice y no recorrer la tabla sembrada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            return
+        cls.empresas = [
+            Empresa.objects.create(nombre=f"Clínica {i}", subdomain=f"clinica{i}", activo=True)
+            for i in range(TENANTS)
+        ]
+        cls.empresa = cls.empresas[0]
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=cls.empresa)
+        rol_odontologo = Tipodeusuario.objects.create(rol="Odontologo", empresa=cls.empresa)
+        usuario_paciente = Usuario.objects.create(
+            nombre="Ana", apellido="Pérez", correoelectronico="ana@test.com",
+            idtipousuario=rol_paciente, empresa=cls.empresa
+        )
+        paciente = Paciente.objects.get(codusuario=usuario_paciente)
+        # El perfil de odontólogo lo crea el signal del rol
+        cls.odontologos = [
+            Odontologo.objects.get(codusuario=Usuario.objects.create(
+                nombre=f"Dr {i}", apellido="Test", correoelectronico=f"dr{i}@test.com",
+                idtipousuario=rol_odontologo, empresa=cls.empresa
+            ))
+            for i in range(ODONTOLOGOS)
+        ]
+        horario = Horario.objects.create(hora=time(9, 0))
+        tipo = Tipodeconsulta.objects.create(nombreconsulta="General")
+        estado_consulta = Estadodeconsulta.objects.create(estado="Pendiente")
+
+        # Consultas repartidas en tenants, fechas, estados y odontólogos
+        cls.hoy = date(2026, 1, 1)
+        estados = [codigo for codigo, _ in Consulta.ESTADOS_CONSULTA]
+        total = TENANTS * FILAS_POR_TENANT
+        Consulta.objects.bulk_create([
+            Consulta(
+                empresa=cls.empresas[n % TENANTS],
+                fecha=cls.hoy + timedelta(days=n % 365),
+                estado=estados[n % len(estados)],
+                codpaciente=paciente,
+                cododontologo=cls.odontologos[n % ODONTOLOGOS],
+                idhorario=horario, idtipoconsulta=tipo, idestadoconsulta=estado_consulta,
+            )
+            for n in range(total)
+        ], batch_size=500)
+
+        Bitacora.objects.bulk_create([
+            Bitacora(
+                empresa=cls.empresas[n % TENANTS], accion='login',
+                ip_address='127.0.0.1', user_agent='tests',
+            )
+            for n in range(total)
+        ], batch_size=500)
+
+        estados_pago = [codigo for codigo, _ in PagoEnLinea.ESTADO_CHOICES]
+        PagoEnLinea.objects.bulk_create([
+            PagoEnLinea(
+                codigo_pago=f"PAG-{n:06d}", empresa=cls.empresas[n % TENANTS],
+                usuario=usuario_paciente, origen_tipo='plan', descripcion='Pago',
+                monto=Decimal('100.00'), monto_original=Decimal('100.00'),
+                estado=estados_pago[n % len(estados_pago)],
+            )
+            for n in range(total)
+        ], batch_size=500)
+
+        tipo_notif = TipoNotificacion.objects.create(nombre="Recordatorio")
+        canal = CanalNotificacion.objects.create(nombre="push")
+        HistorialNotificacion.objects.bulk_create([
+            HistorialNotificacion(
+                usuario=usuario_paciente, tipo_notificacion=tipo_notif, canal_notificacion=canal,
+                titulo="Aviso", mensaje="Mensaje",
+                estado='PENDING' if n % 20 == 0 else 'SENT',
+            )
+            for n in range(total)
+        ], batch_size=500)
+
+        estado_plan = Estado.objects.create(estado="Activo")
+        servicio = Servicio.objects.create(nombre="Limpieza", costobase=Decimal('100.00'))
+        plan = Plandetratamiento.objects.create(
+            codpaciente=paciente, cododontologo=cls.odontologos[0],
+            idestado=estado_plan, fechaplan=cls.hoy, empresa=cls.empresa
+        )
+        cls.items = Itemplandetratamiento.objects.bulk_create([
+            Itemplandetratamiento(
+                idplantratamiento=plan, idservicio=servicio, idestado=estado_plan,
+                costofinal=Decimal('100.00')
+            )
+            for _ in range(ITEMS)
+        ])
+        consultas = list(Consulta.objects.values_list('pk', flat=True))
+        SesionTratamiento.objects.bulk_create([
+            SesionTratamiento(
+                consulta_id=consulta_id, item_plan=cls.items[n % ITEMS], empresa=cls.empresa,
+                fecha_sesion=cls.hoy + timedelta(days=n % 365), hora_inicio=time(9, 0),
+                duracion_minutos=30, progreso_actual=Decimal('10.00'),
+                acciones_realizadas='Control',
+            )
+            for n, consulta_id in enumerate(consultas)
+        ], batch_size=500)
+
+        # Estadísticas actualizadas: sin ellas el planner no conoce el tamaño
+        tablas = ['consulta', 'bitacora', 'pago_en_linea', 'historialnotificacion', 'sesion_tratamiento']
+        with connection.cursor() as cursor:
+            for tabla in tablas:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(tabla)}')
+
+    def setUp(self):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            self.skipTest(f"EXPLAIN no soportado en {connection.vendor}")
+
+    def assertUsaIndice(self, queryset, indice, tabla, parcial=False):
+        plan = plan_de_consulta(queryset)
+        self.assertNotIn(tabla, plan['secuenciales'], f"Recorrido secuencial de {tabla}: {plan}")
+        # SQLite no usa índices parciales con parámetros enlazados (el
+        # WHERE del índice debe coincidir literalmente); allí solo se
+        # verifica que no haya recorrido secuencial.
+        if parcial and connection.vendor == 'sqlite':
+            return
+        self.assertIn(indice, plan['indices'], f"{queryset.query}\nPlan: {plan}")
+
+    def test_agenda_del_tenant_por_rango_de_fechas(self):
+        qs = Consulta.objects.filter(
+            empresa=self.empresa, fecha__range=(self.hoy, self.hoy + timedelta(days=7))
+        )
+        self.assertUsaIndice(qs, 'idx_consulta_empresa_fecha', 'consulta')
+
+    def test_consultas_del_tenant_por_estado(self):
+        qs = Consulta.objects.filter(
+            empresa=self.empresa, estado='confirmada', fecha__gte=self.hoy
+        ).order_by('fecha')
+        self.assertUsaIndice(qs, 'idx_consulta_emp_estado', 'consulta')
+
+    def test_horarios_ocupados_del_odontologo(self):
+        qs = Consulta.objects.filter(cododontologo=self.odontologos[3], fecha=self.hoy + timedelta(days=3))
+        self.assertUsaIndice(qs, 'idx_consulta_odont_fecha', 'consulta')
+
+    def test_citas_abiertas_del_dia_usan_indice_parcial(self):
+        qs = Consulta.objects.filter(
+            fecha=self.hoy + timedelta(days=1), estado__in=['pendiente', 'confirmada']
+        )
+        self.assertUsaIndice(qs, 'idx_consulta_abiertas', 'consulta', parcial=True)
+
+    def test_bitacora_reciente_del_tenant(self):
+        qs = Bitacora.objects.filter(empresa=self.empresa).order_by('-timestamp')[:50]
+        self.assertUsaIndice(qs, 'idx_bitacora_emp_ts_id', 'bitacora')
+
+    def test_pagina_por_cursor_de_la_bitacora(self):
+        paginacion = PaginacionHibrida()
+        orden = BitacoraViewSet.orden_cursor
+        ultima = Bitacora.objects.filter(empresa=self.empresa).order_by('-timestamp', '-id')[50]
+        for atras in (False, True):
+            with self.subTest(atras=atras):
+                qs = paginacion.consulta_cursor(
+                    Bitacora.objects.filter(empresa=self.empresa), orden, [ultima.timestamp, ultima.pk], atras
+                )[:51]
+                self.assertUsaIndice(qs, 'idx_bitacora_emp_ts_id', 'bitacora')
+                # PostgreSQL lee en el orden del índice (NULLS FIRST en DESC); SQLite
+                # pone los NULL al revés y ordena aparte
+                if connection.vendor == 'postgresql':
+                    self.assertFalse(plan_de_consulta(qs)['ordena'], qs.query)
+
+    def test_pagos_del_tenant_por_estado(self):
+        qs = PagoEnLinea.objects.filter(empresa=self.empresa, estado='aprobado')
+        self.assertUsaIndice(qs, 'idx_pago_empresa_estado', 'pago_en_linea')
+
+    def test_pagos_abiertos_vencidos(self):
+        qs = PagoEnLinea.objects.filter(
+            estado__in=['pendiente', 'procesando'],
+            fecha_creacion__lt=timezone.make_aware(datetime(2026, 1, 1)),
+        )
+        self.assertUsaIndice(qs, 'pago_en_lin_estado_a327d1_idx', 'pago_en_linea')
+
+    def test_cola_de_notificaciones_pendientes(self):
+        qs = HistorialNotificacionMN.objects.filter(estado='PENDING').order_by('id')[:100]
+        self.assertUsaIndice(qs, 'idx_hist_notif_estado_id', 'historialnotificacion')
+
+    def test_ultima_sesion_del_item(self):
+        qs = SesionTratamiento.objects.filter(
+            item_plan=self.items[2]
+        ).order_by('-fecha_sesion', '-hora_inicio')[:1]
+        self.assertUsaIndice(qs, 'idx_sesion_item_fecha', 'sesion_tratamiento')
+
+    def test_sincronizacion_incremental_de_consultas(self):
+        qs = Consulta.objects.filter(
+            empresa=self.empresa, updated_at__gt=timezone.now() - timedelta(hours=1)
+        ).order_by('updated_at', 'id')[:500]
+        self.assertUsaIndice(qs, 'idx_consulta_emp_modif', 'consulta')
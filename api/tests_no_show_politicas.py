@@ -0,0 +1,202 @@
+"""
+Tests de las políticas de no-show: caché de políticas por empresa con
+invalidación, aplicación por conjuntos y evaluación por lotes en una ventana.
+"""
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.models import (
+    BloqueoUsuario, Consulta, Empresa, Estadodeconsulta, Horario, Paciente, Tipodeconsulta, Tipodeusuario, Usuario,
+)
+from no_show_policies.models import BloqueoAplicado, Multa, PoliticaNoShow
+from no_show_policies.services import aplicar_politicas_en_ventana
+
+
+class PoliticasNoShowTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        self.rol = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        self.pacientes = [self.crear_paciente(i) for i in range(3)]
+        self.horario = Horario.objects.create(hora=time(9, 0))
+        self.tipo = Tipodeconsulta.objects.create(nombreconsulta="General")
+        self.pendiente = Estadodeconsulta.objects.create(estado="Pendiente", empresa=self.empresa)
+        self.no_asistio = Estadodeconsulta.objects.create(estado="No Asistió", empresa=self.empresa)
+        self.multa = PoliticaNoShow.objects.create(
+            empresa=self.empresa, estado_consulta=self.no_asistio, penalizacion_economica=Decimal('50.00'),
+            bloqueo_temporal=True, dias_bloqueo=3,
+        )
+        self.bloqueo = PoliticaNoShow.objects.create(
+            empresa=self.empresa, estado_consulta=self.no_asistio, penalizacion_economica=Decimal('20.00'),
+            bloqueo_temporal=True, dias_bloqueo=7,
+        )
+
+    def crear_paciente(self, i):
+        return Paciente.objects.get(codusuario=Usuario.objects.create(
+            nombre=f"Paciente {i}", apellido="Test", correoelectronico=f"p{i}@test.com",
+            idtipousuario=self.rol, empresa=self.empresa
+        ))
+
+    def crear_consultas(self, cantidad):
+        return Consulta.objects.bulk_create([
+            Consulta(
+                fecha=timezone.now().date(), codpaciente=self.pacientes[i % len(self.pacientes)],
+                idhorario=self.horario, idtipoconsulta=self.tipo, idestadoconsulta=self.pendiente,
+                empresa=self.empresa,
+            )
+            for i in range(cantidad)
+        ])
+
+    def marcar(self, consulta, estado):
+        consulta.idestadoconsulta = estado
+        with CaptureQueriesContext(connection) as consultas:
+            consulta.save()
+        return [q['sql'] for q in consultas.captured_queries]
+
+    def test_cambio_de_estado_aplica_multas_y_un_bloqueo(self):
+        consulta = self.crear_consultas(1)[0]
+        ahora = timezone.now()
+        self.marcar(consulta, self.no_asistio)
+
+        self.assertEqual(
+            sorted(Multa.objects.filter(consulta=consulta).values_list('monto', flat=True)),
+            [Decimal('20.00'), Decimal('50.00')],
+        )
+        bloqueo = BloqueoUsuario.objects.get(usuario_id=consulta.codpaciente_id)
+        self.assertGreaterEqual(bloqueo.fecha_fin, ahora + timedelta(days=7))
+        self.assertIn(f'#{self.bloqueo.pk}', bloqueo.motivo)
+
+        # Guardar sin cambio de estado no duplica nada
+        consulta.save()
+        self.assertEqual(Multa.objects.count(), 2)
+        self.assertEqual(BloqueoUsuario.objects.count(), 1)
+
+    def test_politicas_cacheadas_e_invalidadas(self):
+        primera, segunda, tercera = self.crear_consultas(3)
+        self.marcar(primera, self.no_asistio)
+
+        # Con la caché caliente no se vuelven a leer las políticas
+        sql = self.marcar(segunda, self.no_asistio)
+        self.assertFalse([q for q in sql if 'no_show_policies_politicanoshow' in q])
+        # Estado sin políticas: ni siquiera se lee el estado anterior
+        sql = self.marcar(primera, self.pendiente)
+        self.assertEqual(len(sql), 1)
+
+        self.multa.activo = False
+        self.multa.save()
+        self.bloqueo.delete()
+        self.marcar(tercera, self.no_asistio)
+        self.assertFalse(Multa.objects.filter(consulta=tercera).exists())
+
+    def test_bloqueo_indefinido_no_se_acorta(self):
+        BloqueoUsuario.objects.create(usuario_id=self.pacientes[0].pk, fecha_fin=None, motivo="Manual")
+        self.marcar(self.crear_consultas(1)[0], self.no_asistio)
+        bloqueo = BloqueoUsuario.objects.get(usuario_id=self.pacientes[0].pk)
+        self.assertIsNone(bloqueo.fecha_fin)
+
+    def evaluar_lote(self, cantidad):
+        consultas = self.crear_consultas(cantidad)
+        inicio = timezone.now()
+        # Marcado masivo sin signals (queryset.update): fija a mano la marca del cambio
+        Consulta.objects.filter(pk__in=[c.pk for c in consultas]).update(
+            idestadoconsulta=self.no_asistio, updated_at=timezone.now(), fecha_cambio_estado=timezone.now()
+        )
+        with CaptureQueriesContext(connection) as consultas_sql:
+            resumen = aplicar_politicas_en_ventana(inicio, timezone.now() + timedelta(seconds=1))
+        return resumen, len(consultas_sql.captured_queries)
+
+    @override_settings(NO_SHOW_EVALUACION_EN_LINEA=False)
+    def test_evaluacion_por_lotes_con_consultas_constantes(self):
+        # La primera pasada cachea las políticas y crea los bloqueos
+        self.evaluar_lote(3)
+        _, pocas = self.evaluar_lote(5)
+        resumen, muchas = self.evaluar_lote(30)
+
+        self.assertEqual(muchas, pocas)
+        self.assertEqual((resumen['consultas'], resumen['multas']), (30, 60))
+        # Los bloqueos se extienden, no se duplican
+        self.assertEqual(resumen['bloqueos'], 3)
+        self.assertEqual(Multa.objects.count(), 76)
+        self.assertEqual(BloqueoUsuario.objects.count(), 3)
+
+        # Idempotente
+        call_command('aplicar_politicas_noshow', '--horas', '1', stdout=open('/dev/null', 'w'))
+        self.assertEqual(Multa.objects.count(), 76)
+        self.assertEqual(BloqueoUsuario.objects.count(), 3)
+
+    @override_settings(NO_SHOW_EVALUACION_EN_LINEA=False)
+    def test_reevaluar_la_ventana_no_alarga_los_bloqueos(self):
+        inicio = timezone.now()
+        consultas = self.crear_consultas(3)
+        Consulta.objects.filter(pk__in=[c.pk for c in consultas]).update(
+            idestadoconsulta=self.no_asistio, updated_at=timezone.now(), fecha_cambio_estado=timezone.now()
+        )
+        fin = timezone.now() + timedelta(seconds=1)
+
+        aplicar_politicas_en_ventana(inicio, fin)
+        fechas_fin = dict(BloqueoUsuario.objects.values_list("usuario_id", "fecha_fin"))
+        resumen = aplicar_politicas_en_ventana(inicio, fin)
+
+        self.assertEqual(resumen['bloqueos'], 0)
+        self.assertEqual(dict(BloqueoUsuario.objects.values_list("usuario_id", "fecha_fin")), fechas_fin)
+
+    @override_settings(NO_SHOW_EVALUACION_EN_LINEA=False)
+    def test_editar_un_no_show_viejo_no_lo_vuelve_a_penalizar(self):
+        consulta = self.crear_consultas(1)[0]
+        consulta.idestadoconsulta = self.no_asistio
+        consulta.save()
+        self.assertIsNotNone(consulta.fecha_cambio_estado)
+        Consulta.objects.filter(pk=consulta.pk).update(fecha_cambio_estado=timezone.now() - timedelta(days=30))
+
+        # Editar las notas toca updated_at, no la marca del cambio de estado
+        inicio = timezone.now()
+        consulta = Consulta.objects.get(pk=consulta.pk)
+        consulta.notas_recepcion = "Llamó para disculparse"
+        consulta.save(update_fields=['notas_recepcion'])
+        consulta.refresh_from_db()
+        self.assertGreaterEqual(consulta.updated_at, inicio)
+        self.assertLess(consulta.fecha_cambio_estado, inicio)
+
+        resumen = aplicar_politicas_en_ventana(inicio, timezone.now() + timedelta(seconds=1))
+        self.assertEqual(resumen['consultas'], 0)
+        self.assertFalse(BloqueoUsuario.objects.exists())
+        self.assertFalse(Multa.objects.exists())
+
+    @override_settings(NO_SHOW_EVALUACION_EN_LINEA=False)
+    def test_bloqueo_levantado_no_se_recrea(self):
+        inicio = timezone.now()
+        primera, segunda = self.crear_consultas(2)
+        Consulta.objects.filter(pk=primera.pk).update(
+            idestadoconsulta=self.no_asistio, fecha_cambio_estado=timezone.now()
+        )
+        fin = timezone.now() + timedelta(seconds=1)
+        aplicar_politicas_en_ventana(inicio, fin)
+        bloqueo = BloqueoUsuario.objects.get(usuario_id=primera.codpaciente_id)
+        self.assertEqual(
+            set(BloqueoAplicado.objects.filter(consulta=primera).values_list('politica_id', 'bloqueo_id')),
+            {(self.multa.pk, bloqueo.pk), (self.bloqueo.pk, bloqueo.pk)},
+        )
+
+        # Recepción levanta el bloqueo; la corrida nocturna no lo vuelve a crear
+        bloqueo.activo = False
+        bloqueo.save()
+        self.assertEqual(aplicar_politicas_en_ventana(inicio, fin)['bloqueos'], 0)
+        BloqueoUsuario.objects.all().delete()
+        self.assertEqual(aplicar_politicas_en_ventana(inicio, fin)['bloqueos'], 0)
+        self.assertFalse(BloqueoUsuario.objects.exists())
+
+        # Un no-show nuevo del mismo paciente sí bloquea
+        Consulta.objects.filter(pk=segunda.pk).update(
+            idestadoconsulta=self.no_asistio, fecha_cambio_estado=timezone.now()
+        )
+        self.assertEqual(aplicar_politicas_en_ventana(inicio, timezone.now() + timedelta(seconds=1))['bloqueos'], 1)
+        self.assertTrue(BloqueoUsuario.objects.get(usuario_id=segunda.codpaciente_id).activo)
@@ -0,0 +1,115 @@
+"""
+Tests de la paginación por cursor (keyset) de listados de alto volumen.
+"""
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import Bitacora, Empresa, Tipodeusuario, Usuario
+
+
+class PaginacionCursorBitacoraTest(APITestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_admin = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        self.django_user = User.objects.create_user(
+            username='admin@test.com', password='testpass123', email='admin@test.com'
+        )
+        Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com",
+            idtipousuario=rol_admin, empresa=self.empresa
+        )
+        token = Token.objects.create(user=self.django_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+
+        # 7 registros; varios comparten timestamp para ejercitar el desempate por id
+        base = timezone.make_aware(datetime(2026, 3, 1, 10, 0, 0, 123456))
+        for i in range(7):
+            registro = Bitacora.objects.create(
+                accion=f'accion_{i}', empresa=self.empresa,
+                ip_address='127.0.0.1', user_agent='tests'
+            )
+            Bitacora.objects.filter(pk=registro.pk).update(timestamp=base + timedelta(minutes=i // 3))
+        self.orden_esperado = list(
+            Bitacora.objects.order_by('-timestamp', '-id').values_list('id', flat=True)
+        )
+
+    def test_recorre_todas_las_paginas_sin_repetir_ni_saltar(self):
+        ids, url = [], '/api/bitacora/?paginacion=cursor&page_size=3'
+        paginas = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+            paginas += 1
+        self.assertEqual(ids, self.orden_esperado)
+        self.assertEqual(paginas, 3)
+
+    def test_previous_devuelve_la_pagina_anterior(self):
+        primera = self.client.get('/api/bitacora/?paginacion=cursor&page_size=3')
+        self.assertIsNone(primera.data['previous'])
+        segunda = self.client.get(primera.data['next'])
+        anterior = self.client.get(segunda.data['previous'])
+        self.assertEqual(
+            [item['id'] for item in anterior.data['results']],
+            [item['id'] for item in primera.data['results']],
+        )
+        self.assertIsNotNone(anterior.data['next'])
+
+    def test_timestamps_nulos_primero_en_ambos_sentidos(self):
+        nulos = [
+            Bitacora.objects.create(accion=f'legado_{i}', empresa=self.empresa, ip_address='127.0.0.1')
+            for i in range(3)
+        ]
+        Bitacora.objects.filter(pk__in=[b.pk for b in nulos]).update(timestamp=None)
+        # El NULL cuenta como el mayor valor (como el índice B-tree): en -timestamp va primero
+        esperado = sorted((b.pk for b in nulos), reverse=True) + self.orden_esperado
+
+        ids, url, paginas = [], '/api/bitacora/?paginacion=cursor&page_size=2', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            paginas.append(response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, esperado)
+
+        # Hacia atrás desde cada página, incluidos cursores con timestamp nulo
+        # y la página cuya anterior termina en los NULL
+        for pagina, previa in zip(paginas[1:], paginas):
+            anterior = self.client.get(pagina['previous'])
+            self.assertEqual(
+                [item['id'] for item in anterior.data['results']],
+                [item['id'] for item in previa['results']],
+            )
+
+    def test_conteo_omitido_por_defecto_y_opcional(self):
+        response = self.client.get('/api/bitacora/?paginacion=cursor')
+        self.assertIsNone(response.data['count'])
+
+        response = self.client.get('/api/bitacora/?paginacion=cursor&conteo=exacto')
+        self.assertEqual(response.data['count'], 7)
+        self.assertFalse(response.data['count_estimado'])
+
+        # Fuera de PostgreSQL el estimado cae al conteo exacto
+        response = self.client.get('/api/bitacora/?paginacion=cursor&conteo=estimado')
+        self.assertIsNotNone(response.data['count'])
+
+    def test_cursor_invalido(self):
+        response = self.client.get('/api/bitacora/?cursor=no-es-un-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_paginacion_por_numero_sin_cambios(self):
+        response = self.client.get('/api/bitacora/?page=2&page_size=5')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn('next', response.data)
@@ -0,0 +1,103 @@
+"""
+Tests de proyección de columnas en listados (consentimientos, bitácora, documentos).
+Verifica que las columnas pesadas no se cargan en `list` pero sí en el detalle.
+"""
+from datetime import date
+
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase, APIClient
+from rest_framework.authtoken.models import Token
+from rest_framework import status
+
+from api.models import (
+    Empresa, Usuario, Tipodeusuario, Paciente, Consentimiento, Bitacora, DocumentoClinico
+)
+
+
+class ProyeccionListasTest(APITestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        self.rol_admin = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        self.rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+
+        self.django_user = User.objects.create_user(
+            username='admin@test.com', password='testpass123', email='admin@test.com'
+        )
+        self.admin = Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com",
+            idtipousuario=self.rol_admin, empresa=self.empresa
+        )
+        usuario_paciente = Usuario.objects.create(
+            nombre="Ana", apellido="Pérez", correoelectronico="ana@test.com",
+            idtipousuario=self.rol_paciente, empresa=self.empresa
+        )
+        self.paciente = Paciente.objects.get(codusuario=usuario_paciente)
+
+        self.token = Token.objects.create(user=self.django_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+
+        self.consentimiento = Consentimiento.objects.create(
+            paciente=self.paciente,
+            empresa=self.empresa,
+            titulo="Extracción",
+            texto_contenido="Texto legal " * 500,
+            firma_base64="data:image/png;base64," + "A" * 5000,
+            ip_creacion="127.0.0.1",
+            pdf_firmado=b"%PDF-1.4" + b"0" * 5000,
+        )
+
+    def test_listado_consentimientos_omite_columnas_pesadas(self):
+        response = self.client.get('/api/consentimientos/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data['results'][0]
+        self.assertEqual(item['titulo'], "Extracción")
+        self.assertNotIn('texto_contenido', item)
+        self.assertNotIn('firma_base64', item)
+
+    def test_detalle_consentimiento_incluye_texto_y_firma(self):
+        response = self.client.get(f'/api/consentimientos/{self.consentimiento.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('texto_contenido', response.data)
+        self.assertTrue(response.data['firma_base64'].startswith('data:image/png'))
+
+    def test_queryset_listado_difiere_columnas(self):
+        from api.views import ConsentimientoViewSet
+        view = ConsentimientoViewSet()
+        view.action = 'list'
+        qs = view.aplicar_proyeccion_lista(Consentimiento.objects.all())
+        obj = qs.get(pk=self.consentimiento.pk)
+        self.assertEqual(
+            obj.get_deferred_fields(),
+            {'texto_contenido', 'firma_base64', 'pdf_firmado'}
+        )
+
+    def test_listado_bitacora_omite_valores_json(self):
+        Bitacora.objects.create(
+            accion='EDICION', tabla_afectada='consulta', registro_id=1,
+            valores_anteriores={'estado': 'pendiente'}, valores_nuevos={'estado': 'confirmada'},
+            ip_address='127.0.0.1', user_agent='tests', empresa=self.empresa, usuario=self.admin
+        )
+        response = self.client.get('/api/bitacora/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data['results'][0]
+        self.assertNotIn('valores_anteriores', item)
+        self.assertNotIn('valores_nuevos', item)
+
+        detalle = self.client.get(f"/api/bitacora/{item['id']}/")
+        self.assertEqual(detalle.data['valores_nuevos'], {'estado': 'confirmada'})
+
+    def test_listado_documentos_omite_notas(self):
+        DocumentoClinico.objects.create(
+            codpaciente=self.paciente, tipo_documento='radiografia',
+            nombre_archivo='rx.png', url_s3='https://example.com/rx.png',
+            s3_key='documentos_clinicos/1/rx.png', tamanio_bytes=1024, extension='png',
+            fecha_documento=date.today(), notas='Notas extensas', empresa=self.empresa
+        )
+        response = self.client.get('/api/documentos-clinicos/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data['results'][0]
+        self.assertEqual(item['nombre_archivo'], 'rx.png')
+        self.assertNotIn('notas', item)
@@ -0,0 +1,104 @@
+"""
+Tests del recálculo diferido: dentro de recalculo_diferido() los signals de
+ítems solo marcan el plan/presupuesto y cada uno se recalcula una vez al salir.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import (
+    Empresa, Estado, ItemPresupuestoDigital, Itemplandetratamiento, Odontologo, Paciente,
+    Plandetratamiento, PresupuestoDigital, Servicio, Tipodeusuario, Usuario,
+)
+from api.services.recalculo_diferido import recalculo_activo, recalculo_diferido
+
+
+class RecalculoDiferidoTest(TestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        rol_odontologo = Tipodeusuario.objects.create(rol="Odontologo", empresa=self.empresa)
+        paciente = Paciente.objects.get(codusuario=Usuario.objects.create(
+            nombre="Ana", apellido="Test", correoelectronico="ana@test.com",
+            idtipousuario=rol_paciente, empresa=self.empresa
+        ))
+        odontologo = Odontologo.objects.get(codusuario=Usuario.objects.create(
+            nombre="Luis", apellido="Rojas", correoelectronico="luis@test.com",
+            idtipousuario=rol_odontologo, empresa=self.empresa
+        ))
+        self.estado = Estado.objects.create(estado="Activo")
+        self.plan = Plandetratamiento.objects.create(
+            codpaciente=paciente, cododontologo=odontologo,
+            idestado=self.estado, fechaplan=date(2026, 3, 1), empresa=self.empresa,
+        )
+        self.servicio = Servicio.objects.create(nombre="Resina", costobase=Decimal('100.00'), empresa=self.empresa)
+
+    def crear_items(self, cantidad):
+        return [
+            Itemplandetratamiento.objects.create(
+                idplantratamiento=self.plan, idservicio=self.servicio, idestado=self.estado,
+                empresa=self.empresa, costofinal=Decimal('100.00'),
+            )
+            for _ in range(cantidad)
+        ]
+
+    def contar_recalculos(self, modelo):
+        return patch.object(modelo, 'calcular_totales', autospec=True, side_effect=modelo.calcular_totales)
+
+    def test_un_recalculo_por_plan(self):
+        with self.contar_recalculos(Plandetratamiento) as calcular:
+            with recalculo_diferido():
+                self.crear_items(10)
+                self.assertEqual(calcular.call_count, 0)
+        self.assertEqual(calcular.call_count, 1)
+        # La instancia que usaron los ítems queda actualizada en memoria
+        self.assertEqual(self.plan.montototal, Decimal('1000.00'))
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.montototal, Decimal('1000.00'))
+
+    def test_sin_bloque_recalcula_en_cada_item(self):
+        with self.contar_recalculos(Plandetratamiento) as calcular:
+            self.crear_items(3)
+        self.assertEqual(calcular.call_count, 3)
+
+    def test_bloques_anidados_recalculan_al_salir_del_externo(self):
+        with self.contar_recalculos(Plandetratamiento) as calcular:
+            with recalculo_diferido() as externo:
+                with recalculo_diferido() as interno:
+                    self.assertIs(interno, externo)
+                    self.crear_items(2)
+                self.assertEqual(calcular.call_count, 0)
+                item = self.crear_items(1)[0]
+                item.delete()
+        self.assertEqual(calcular.call_count, 1)
+        self.assertIsNone(recalculo_activo())
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.montototal, Decimal('200.00'))
+
+    def test_excepcion_descarta_el_recalculo(self):
+        with self.contar_recalculos(Plandetratamiento) as calcular:
+            with self.assertRaises(ValueError):
+                with recalculo_diferido():
+                    self.crear_items(2)
+                    raise ValueError("fallo")
+        self.assertEqual(calcular.call_count, 0)
+        self.assertIsNone(recalculo_activo())
+
+    def test_un_recalculo_por_presupuesto(self):
+        items = self.crear_items(4)
+        presupuesto = PresupuestoDigital.objects.create(
+            plan_tratamiento=self.plan, empresa=self.empresa,
+            fecha_vigencia=timezone.now().date() + timedelta(days=30),
+        )
+        with self.contar_recalculos(PresupuestoDigital) as calcular:
+            with recalculo_diferido():
+                for orden, item in enumerate(items, start=1):
+                    ItemPresupuestoDigital.objects.create(
+                        presupuesto=presupuesto, item_plan=item, precio_unitario=item.costofinal, orden=orden,
+                    )
+        self.assertEqual(calcular.call_count, 1)
+        self.assertEqual(presupuesto.total, Decimal('400.00'))
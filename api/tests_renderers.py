@@ -0,0 +1,74 @@
+"""
+Tests del renderer/parser JSON sobre orjson: mismo resultado que los de DRF.
+"""
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+from unittest import skipIf
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.management.commands.benchmark_json import payload_plan, payload_reporte
+from api.renderers import ORJSONParser, ORJSONRenderer, orjson
+
+
+@skipIf(orjson is None, "orjson no está instalado")
+class ORJSONRendererTest(SimpleTestCase):
+
+    def assertMismoJSON(self, datos):
+        self.assertEqual(ORJSONRenderer().render(datos), JSONRenderer().render(datos))
+
+    def test_tipos_especiales_igual_que_drf(self):
+        self.assertMismoJSON({
+            'decimal': Decimal('150.50'),
+            'utc': datetime(2026, 3, 1, 10, 0, 0, 123456, tzinfo=dt_timezone.utc),
+            'offset': datetime(2026, 3, 1, 10, 0, tzinfo=dt_timezone(timedelta(hours=-4))),
+            'fecha': date(2026, 3, 1),
+            'hora': time(9, 30),
+            'duracion': timedelta(minutes=90),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'lazy': _('Activo'),
+            'bytes': b'abc',
+            'texto': 'Núñez\u2028fin\u2029',
+            1: 'clave entera',
+        })
+
+    def test_payloads_del_benchmark_igual_que_drf(self):
+        self.assertMismoJSON(payload_reporte(50))
+        self.assertMismoJSON(payload_plan(10))
+
+    def test_none_y_casos_de_respaldo(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        # Enteros de más de 64 bits e indentación: implementación de DRF
+        self.assertMismoJSON({'grande': 2 ** 70})
+        self.assertEqual(
+            ORJSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+            JSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+        )
+
+
+@skipIf(orjson is None, "orjson no está instalado")
+class ORJSONParserTest(SimpleTestCase):
+
+    def test_parsea_igual_que_drf(self):
+        cuerpo = JSONRenderer().render(payload_plan(5))
+        self.assertEqual(
+            ORJSONParser().parse(BytesIO(cuerpo)),
+            JSONParser().parse(BytesIO(cuerpo)),
+        )
+
+    def test_respeta_el_charset(self):
+        cuerpo = '{"nombre": "Núñez"}'.encode('latin-1')
+        datos = ORJSONParser().parse(BytesIO(cuerpo), parser_context={'encoding': 'latin-1'})
+        self.assertEqual(datos, {'nombre': 'Núñez'})
+
+    def test_json_invalido(self):
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"a": '))
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"a": NaN}'))
@@ -0,0 +1,180 @@
+"""
+Tests del router de réplica de lectura: acciones marcadas, vuelta al primario
+por retraso o transacción propia y read-your-writes tras una mutación.
+"""
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import db_router
+from api.db_router import (
+    ALIAS_REPLICA, MODO_PRIMARIO, MODO_REPLICA, ReplicaRouter,
+    activar_lectura_replica, desactivar_lectura_replica, lecturas_en_replica,
+    registrar_escritura, reiniciar_estado_replica,
+)
+from api.middleware_replica import ReplicaStickinessMiddleware
+from api.models import Bitacora, Empresa, Tipodeusuario, Usuario
+
+HAY_REPLICA = ALIAS_REPLICA in settings.DATABASES
+
+
+class ReplicaRouterTest(TestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.user = User.objects.create_user(username='admin@test.com', email='admin@test.com')
+        cache.clear()
+        reiniciar_estado_replica()
+        self.addCleanup(reiniciar_estado_replica)
+
+    def test_fuera_de_contexto_lee_del_primario(self):
+        with mock.patch.object(db_router, 'replica_disponible', return_value=True):
+            self.assertIsNone(self.router.db_for_read(Bitacora))
+
+    def test_lecturas_marcadas_van_a_la_replica_y_escrituras_al_primario(self):
+        with mock.patch.object(db_router, 'replica_disponible', return_value=True):
+            with lecturas_en_replica():
+                self.assertEqual(self.router.db_for_read(Bitacora), ALIAS_REPLICA)
+                self.assertEqual(self.router.db_for_write(Bitacora), 'default')
+
+    def test_transaccion_propia_lee_del_primario(self):
+        with mock.patch.object(db_router, 'replica_disponible', return_value=True):
+            with lecturas_en_replica(), transaction.atomic():
+                self.assertIsNone(self.router.db_for_read(Bitacora))
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=5, REPLICA_LAG_CHECK_INTERVAL=60)
+    def test_retraso_alto_o_replica_caida_vuelve_al_primario(self):
+        with mock.patch.object(db_router, 'replica_configurada', return_value=True):
+            with mock.patch.object(db_router, 'medir_lag', return_value=30.0):
+                self.assertFalse(db_router.replica_disponible())
+            reiniciar_estado_replica()
+            with mock.patch.object(db_router, 'medir_lag', return_value=None):
+                self.assertFalse(db_router.replica_disponible())
+            reiniciar_estado_replica()
+            with mock.patch.object(db_router, 'medir_lag', return_value=1.5) as medir:
+                self.assertTrue(db_router.replica_disponible())
+                self.assertTrue(db_router.replica_disponible())
+                # La medición se reutiliza dentro del intervalo
+                self.assertEqual(medir.call_count, 1)
+        self.assertEqual(db_router.estado_replica()['lag_segundos'], 1.5)
+
+    def test_sin_alias_replica_no_hay_replica(self):
+        if HAY_REPLICA:
+            self.skipTest("Hay una réplica configurada")
+        self.assertFalse(db_router.replica_disponible())
+
+    def test_escritura_reciente_fija_al_primario(self):
+        registrar_escritura(self.user)
+        token = activar_lectura_replica(self.user)
+        try:
+            self.assertEqual(db_router.modo_lectura(), MODO_PRIMARIO)
+            # Un contexto anidado sin usuario tampoco vuelve a la réplica
+            with lecturas_en_replica():
+                self.assertEqual(db_router.modo_lectura(), MODO_PRIMARIO)
+        finally:
+            desactivar_lectura_replica(token)
+
+        with lecturas_en_replica(AnonymousUser()):
+            self.assertEqual(db_router.modo_lectura(), MODO_REPLICA)
+        self.assertIsNone(db_router.modo_lectura())
+
+
+class ReplicaStickinessMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='admin@test.com', email='admin@test.com')
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        cache.clear()
+        patcher = mock.patch('api.middleware_replica.replica_configurada', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _procesar(self, metodo, escribe):
+        def vista(request):
+            request.user = self.user
+            if escribe:
+                self.empresa.save(update_fields=['nombre'])
+            else:
+                Empresa.objects.count()
+            return HttpResponse()
+        request = getattr(self.factory, metodo)('/api/algo/')
+        ReplicaStickinessMiddleware(vista)(request)
+
+    def test_mutacion_que_escribe_fija_al_usuario(self):
+        self._procesar('post', escribe=True)
+        self.assertTrue(db_router.escribio_recientemente(self.user))
+
+    def test_mutacion_sin_escritura_no_fija(self):
+        self._procesar('post', escribe=False)
+        self.assertFalse(db_router.escribio_recientemente(self.user))
+
+    def test_escritura_en_get_no_fija(self):
+        self._procesar('get', escribe=True)
+        self.assertFalse(db_router.escribio_recientemente(self.user))
+
+
+class LecturaReplicaAPITest(TestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_admin = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        self.django_user = User.objects.create_user(
+            username='admin@test.com', password='testpass123', email='admin@test.com'
+        )
+        Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com",
+            idtipousuario=rol_admin, empresa=self.empresa
+        )
+        token = Token.objects.create(user=self.django_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+        cache.clear()
+
+    def test_acciones_marcadas_consultan_la_replica(self):
+        # Réplica "atrasada": se consulta su estado y se lee del primario
+        with mock.patch.object(db_router, 'replica_disponible', return_value=False) as disponible:
+            response = self.client.get('/api/bitacora/estadisticas/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(disponible.called)
+        self.assertIsNone(db_router.modo_lectura())
+
+    def test_acciones_no_marcadas_no_consultan_la_replica(self):
+        registro = Bitacora.objects.create(accion='login', empresa=self.empresa, ip_address='127.0.0.1')
+        with mock.patch.object(db_router, 'replica_disponible', return_value=True) as disponible:
+            response = self.client.get(f'/api/bitacora/{registro.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(disponible.called)
+
+    def test_tras_escritura_propia_lee_del_primario(self):
+        registrar_escritura(self.django_user)
+        with mock.patch.object(db_router, 'replica_disponible', return_value=True) as disponible:
+            response = self.client.get('/api/reportes/estadisticas/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(disponible.called)
+
+
+@unittest.skipUnless(HAY_REPLICA, "Requiere un alias 'replica' (p. ej. MIRROR de default)")
+class ReplicaRealTest(TestCase):
+    databases = {'default', ALIAS_REPLICA} if HAY_REPLICA else {'default'}
+
+    def setUp(self):
+        reiniciar_estado_replica()
+        self.addCleanup(reiniciar_estado_replica)
+
+    def test_lecturas_marcadas_usan_la_conexion_replica(self):
+        with CaptureQueriesContext(connections[ALIAS_REPLICA]) as consultas:
+            with lecturas_en_replica():
+                list(Empresa.objects.all())
+        self.assertTrue(consultas.captured_queries)
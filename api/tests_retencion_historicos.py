@@ -0,0 +1,150 @@
+"""
+Tests de la retención por meses de los históricos: meses completos fuera de
+la retención de cada tenant, exportación .jsonl.gz, borrado por lotes,
+tombstones de notificaciones y reanudación.
+"""
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import date, datetime, time
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.models import (
+    Bitacora, Empresa, PoliticaRetencion, RegistroEliminado, SegmentoHistorico, Tipodeusuario, Usuario,
+)
+from api.models_notifications import CanalNotificacion, HistorialNotificacion, TipoNotificacion
+from api.services.retencion_historicos import HISTORICOS, aplicar_retencion, retirar_mes
+from chatbot.models import ConversacionChatbot, MensajeChatbot
+
+HOY = date(2026, 6, 15)
+
+
+def instante(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time(12, 0)))
+
+
+@override_settings(
+    RETENCION_HISTORICOS_DIAS={'bitacora': 365, 'notificaciones': 60, 'chatbot': 365},
+    RETENCION_HISTORICOS_LOTE=2,
+)
+class RetencionHistoricosTest(TestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        ajustes = self.settings(MEDIA_ROOT=media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.norte = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        self.sur = Empresa.objects.create(nombre="Clínica Sur", subdomain="sur", activo=True)
+        rol = Tipodeusuario.objects.create(rol="Paciente", empresa=self.norte)
+        self.usuario = Usuario.objects.create(
+            nombre="Ana", apellido="Test", correoelectronico="ana@test.com", idtipousuario=rol, empresa=self.norte
+        )
+        # La norte guarda la bitácora solo 30 días y no la exporta
+        PoliticaRetencion.objects.create(empresa=self.norte, historico='bitacora', dias=30, exportar=False)
+
+    def bitacora(self, empresa, fecha, cantidad=1):
+        filas = Bitacora.objects.bulk_create([
+            Bitacora(empresa=empresa, accion='LOGIN', ip_address='127.0.0.1', user_agent='test')
+            for _ in range(cantidad)
+        ])
+        Bitacora.objects.filter(pk__in=[b.pk for b in filas]).update(timestamp=instante(fecha))
+        return filas
+
+    def notificacion(self, fecha):
+        notificacion = HistorialNotificacion.objects.create(
+            usuario=self.usuario,
+            tipo_notificacion=TipoNotificacion.objects.get_or_create(nombre='recordatorio')[0],
+            canal_notificacion=CanalNotificacion.objects.get_or_create(nombre='push')[0],
+            titulo='Recordatorio', mensaje='Mañana tienes cita',
+        )
+        HistorialNotificacion.objects.filter(pk=notificacion.pk).update(fecha_creacion=instante(fecha))
+        return notificacion
+
+    def leer_exportacion(self, ruta):
+        with default_storage.open(ruta, 'rb') as archivo:
+            return [json.loads(linea) for linea in gzip.decompress(archivo.read()).splitlines()]
+
+    def test_retira_meses_completos_segun_politica_del_tenant(self):
+        viejas_norte = self.bitacora(self.norte, date(2026, 3, 10), cantidad=3)
+        recientes_norte = self.bitacora(self.norte, date(2026, 5, 20))  # mayo: parte dentro de los 30 días
+        viejas_sur = self.bitacora(self.sur, date(2025, 5, 2), cantidad=5)
+        vigentes_sur = self.bitacora(self.sur, date(2026, 3, 10))
+
+        resumen = aplicar_retencion(hoy=HOY, historicos=['bitacora'])
+
+        self.assertEqual(resumen['bitacora'], {'meses': 2, 'filas': 8})
+        self.assertEqual(
+            set(Bitacora.objects.values_list('pk', flat=True)),
+            {b.pk for b in recientes_norte + vigentes_sur},
+        )
+        segmento_norte = SegmentoHistorico.objects.get(historico='bitacora', empresa=self.norte)
+        self.assertEqual((segmento_norte.mes, segmento_norte.filas, segmento_norte.archivo), (date(2026, 3, 1), 3, ''))
+        self.assertEqual(segmento_norte.estado, SegmentoHistorico.ESTADO_COMPACTADO)
+
+        segmento_sur = SegmentoHistorico.objects.get(historico='bitacora', empresa=self.sur)
+        self.assertEqual(segmento_sur.archivo, f'historicos/bitacora/{self.sur.id}/2025-05.jsonl.gz')
+        exportadas = self.leer_exportacion(segmento_sur.archivo)
+        self.assertEqual([fila['id'] for fila in exportadas], [b.pk for b in viejas_sur])
+        self.assertEqual(exportadas[0]['accion'], 'LOGIN')
+        self.assertFalse(Bitacora.objects.filter(pk__in=[b.pk for b in viejas_norte]).exists())
+
+        # Una segunda pasada no encuentra nada
+        self.assertEqual(aplicar_retencion(hoy=HOY, historicos=['bitacora'])['bitacora']['filas'], 0)
+
+    def test_notificaciones_dejan_tombstone_y_chatbot_por_empresa(self):
+        vieja = self.notificacion(date(2026, 3, 31))
+        reciente = self.notificacion(date(2026, 4, 1))
+        conversacion = ConversacionChatbot.objects.create(empresa=self.norte, thread_id='th-1', assistant_id='as-1')
+        mensajes = MensajeChatbot.objects.bulk_create([
+            MensajeChatbot(conversacion=conversacion, role='user', contenido=f'hola {i}') for i in range(3)
+        ])
+        MensajeChatbot.objects.filter(pk__in=[m.pk for m in mensajes[:2]]).update(created_at=instante(date(2025, 1, 5)))
+
+        resumen = aplicar_retencion(hoy=HOY)
+
+        self.assertEqual(resumen['notificaciones'], {'meses': 1, 'filas': 1})
+        self.assertEqual(list(HistorialNotificacion.objects.values_list('pk', flat=True)), [reciente.pk])
+        tombstone = RegistroEliminado.objects.get(entidad='notificaciones')
+        self.assertEqual(
+            (tombstone.objeto_id, tombstone.empresa_id, tombstone.codusuario),
+            (vieja.pk, self.norte.id, self.usuario.codigo),
+        )
+        self.assertEqual(resumen['chatbot'], {'meses': 1, 'filas': 2})
+        self.assertEqual(list(MensajeChatbot.objects.values_list('pk', flat=True)), [mensajes[2].pk])
+
+    def test_reanuda_un_mes_exportado_sin_reexportar(self):
+        self.bitacora(self.sur, date(2025, 1, 8), cantidad=3)
+        segmento = SegmentoHistorico.objects.create(
+            historico='bitacora', empresa=self.sur, mes=date(2025, 1, 1), archivo='historicos/previo.jsonl.gz',
+        )
+
+        segmento, borradas = retirar_mes(HISTORICOS['bitacora'], self.sur.id, date(2025, 1, 1))
+
+        self.assertEqual(borradas, 3)
+        self.assertEqual(segmento.archivo, 'historicos/previo.jsonl.gz')
+        self.assertEqual(segmento.estado, SegmentoHistorico.ESTADO_COMPACTADO)
+        self.assertFalse(default_storage.exists(f'historicos/bitacora/{self.sur.id}/2025-01.jsonl.gz'))
+
+    def test_comando(self):
+        self.bitacora(None, date(2020, 1, 1), cantidad=2)
+        self.bitacora(self.sur, date(2020, 1, 1))
+        with self.assertRaises(CommandError):
+            call_command('mantener_historicos', '--empresa', 'no-existe')
+        call_command(
+            'mantener_historicos', '--fecha', str(HOY), '--historico', 'bitacora', '--sin-exportar', '--vacuum',
+            stdout=open('/dev/null', 'w'),
+        )
+        self.assertFalse(Bitacora.objects.exists())
+        self.assertEqual(
+            set(SegmentoHistorico.objects.values_list('empresa', 'archivo')),
+            {(None, ''), (self.sur.id, '')},
+        )
@@ -0,0 +1,155 @@
+"""
+Tests de la sincronización incremental (GET /api/sync/): marca de agua,
+tombstones y paginación por entidad.
+"""
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import (
+    Consulta, Empresa, Estado, Estadodeconsulta, Horario, Odontologo, Paciente,
+    Plandetratamiento, RegistroEliminado, Tipodeconsulta, Tipodeusuario, Usuario,
+)
+from api.services.sincronizacion import codificar_watermark
+
+
+@override_settings(SYNC_SOLAPE_SEGUNDOS=0)
+class SincronizacionTest(APITestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_admin = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        rol_odontologo = Tipodeusuario.objects.create(rol="Odontologo", empresa=self.empresa)
+        Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com",
+            idtipousuario=rol_admin, empresa=self.empresa
+        )
+        pacientes = [
+            Paciente.objects.get(codusuario=Usuario.objects.create(
+                nombre=nombre, apellido="Test", correoelectronico=f"{nombre.lower()}@test.com",
+                idtipousuario=rol_paciente, empresa=self.empresa
+            ))
+            for nombre in ("Ana", "Beto")
+        ]
+        self.ana, self.beto = pacientes
+        odontologo = Odontologo.objects.get(codusuario=Usuario.objects.create(
+            nombre="Luis", apellido="Rojas", correoelectronico="luis@test.com",
+            idtipousuario=rol_odontologo, empresa=self.empresa
+        ))
+        horario = Horario.objects.create(hora=time(9, 0))
+        tipo = Tipodeconsulta.objects.create(nombreconsulta="General")
+        estado = Estadodeconsulta.objects.create(estado="Pendiente")
+        # bulk_create: sin los signals de notificación de citas
+        self.consultas = Consulta.objects.bulk_create([
+            Consulta(
+                fecha=date(2026, 3, dia), codpaciente=pacientes[dia % 2], cododontologo=odontologo,
+                idhorario=horario, idtipoconsulta=tipo, idestadoconsulta=estado, empresa=self.empresa,
+            )
+            for dia in range(1, 5)
+        ])
+        self.plan = Plandetratamiento.objects.create(
+            codpaciente=self.ana, cododontologo=odontologo,
+            idestado=Estado.objects.create(estado="Activo"), fechaplan=date(2026, 3, 1),
+            empresa=self.empresa,
+        )
+
+        self.client = self.cliente_para('admin@test.com')
+
+    def cliente_para(self, email):
+        user = User.objects.create_user(username=email, password='testpass123', email=email)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key)
+        client.defaults['HTTP_X_TENANT_SUBDOMAIN'] = 'norte'
+        return client
+
+    def sync(self, client=None, **params):
+        response = (client or self.client).get('/api/sync/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return response.json()
+
+    @staticmethod
+    def ids(datos, entidad):
+        return sorted(fila['id'] for fila in datos[entidad]['cambios'])
+
+    def test_primera_sincronizacion_y_luego_solo_cambios(self):
+        datos = self.sync(entidades='consultas,planes')
+        self.assertTrue(datos['desde_cero'])
+        self.assertEqual(self.ids(datos, 'consultas'), sorted(c.pk for c in self.consultas))
+        self.assertEqual(self.ids(datos, 'planes'), [self.plan.pk])
+
+        vacio = self.sync(entidades='consultas,planes', watermark=datos['watermark'])
+        self.assertFalse(vacio['desde_cero'])
+        self.assertEqual(vacio['consultas']['cambios'], [])
+        self.assertEqual(vacio['planes']['cambios'], [])
+
+        consulta = Consulta.objects.get(pk=self.consultas[0].pk)
+        consulta.observaciones = 'Reprogramada'
+        consulta.save()
+        # save(update_fields=...) también mueve la marca de agua
+        self.plan.notas_plan = 'Nueva nota'
+        self.plan.save(update_fields=['notas_plan'])
+
+        cambios = self.sync(entidades='consultas,planes', watermark=vacio['watermark'])
+        self.assertEqual(self.ids(cambios, 'consultas'), [consulta.pk])
+        self.assertEqual(self.ids(cambios, 'planes'), [self.plan.pk])
+
+    def test_eliminados_como_tombstones(self):
+        datos = self.sync(entidades='consultas')
+        borrada = self.consultas[1].pk
+        Consulta.objects.filter(pk=borrada).delete()
+        self.assertTrue(RegistroEliminado.objects.filter(entidad='consultas', objeto_id=borrada).exists())
+
+        cambios = self.sync(entidades='consultas', watermark=datos['watermark'])
+        self.assertEqual(cambios['consultas']['eliminados'], [borrada])
+        self.assertEqual(cambios['consultas']['cambios'], [])
+
+    def test_eliminar_empresa_con_planes(self):
+        empresa_id = self.empresa.pk
+        self.empresa.delete()
+        self.assertFalse(Empresa.objects.filter(pk=empresa_id).exists())
+        self.assertTrue(RegistroEliminado.objects.filter(
+            entidad='planes', objeto_id=self.plan.pk, empresa_id=empresa_id
+        ).exists())
+
+    def test_paginacion_por_entidad(self):
+        vistos, watermark, llamadas = [], None, 0
+        while True:
+            params = {'entidades': 'consultas', 'limite': 3}
+            if watermark:
+                params['watermark'] = watermark
+            datos = self.sync(**params)
+            vistos += self.ids(datos, 'consultas')
+            watermark, llamadas = datos['watermark'], llamadas + 1
+            if datos['completo']:
+                break
+        self.assertEqual(sorted(vistos), sorted(c.pk for c in self.consultas))
+        self.assertEqual(llamadas, 2)
+
+    def test_paciente_solo_ve_lo_suyo(self):
+        cliente_ana = self.cliente_para('ana@test.com')
+        datos = self.sync(cliente_ana, entidades='consultas')
+        propias = sorted(c.pk for c in self.consultas if c.codpaciente_id == self.ana.pk)
+        self.assertEqual(self.ids(datos, 'consultas'), propias)
+
+        ajena = next(c.pk for c in self.consultas if c.codpaciente_id == self.beto.pk)
+        Consulta.objects.filter(pk=ajena).delete()
+        cambios = self.sync(cliente_ana, entidades='consultas', watermark=datos['watermark'])
+        self.assertEqual(cambios['consultas']['eliminados'], [])
+
+    def test_watermark_fuera_de_retencion_resincroniza_desde_cero(self):
+        viejo = codificar_watermark(
+            timezone.now() - timedelta(days=365), {'consultas': (timezone.now(), 0)}
+        )
+        datos = self.sync(entidades='consultas', watermark=viejo)
+        self.assertTrue(datos['desde_cero'])
+        self.assertEqual(len(datos['consultas']['cambios']), len(self.consultas))
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get('/api/sync/', {'watermark': 'basura'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/', {'entidades': 'facturas'}).status_code, 400)
@@ -0,0 +1,112 @@
+"""
+Tests del gateway S3 compartido y su caché de URLs firmadas.
+Usa un stand-in local de S3 (sin red) y un cliente boto3 real con credenciales ficticias.
+"""
+from datetime import date
+from unittest import mock
+
+import boto3
+from botocore.config import Config
+from django.test import TestCase, override_settings
+
+from api.models import Empresa, Usuario, Tipodeusuario, Paciente, DocumentoClinico
+from api.serializers import DocumentoClinicoSerializer
+from api.services import storage_gateway
+from api.services.storage_gateway import S3StorageGateway, get_storage_gateway, set_storage_gateway
+
+
+class S3LocalStandIn:
+    """Cliente S3 mínimo en memoria que registra las llamadas recibidas."""
+
+    def __init__(self):
+        self.objetos = {}
+        self.firmas = 0
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        self.firmas += 1
+        return f"https://local-s3/{Params['Bucket']}/{Params['Key']}?firma={self.firmas}&exp={ExpiresIn}"
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        self.objetos[(bucket, key)] = fileobj.read()
+
+    def delete_object(self, Bucket, Key):
+        self.objetos.pop((Bucket, Key), None)
+
+
+@override_settings(AWS_STORAGE_BUCKET_NAME='bucket-test', AWS_S3_REGION_NAME='us-east-2')
+class S3StorageGatewayTest(TestCase):
+
+    def setUp(self):
+        self.s3 = S3LocalStandIn()
+        self.gateway = S3StorageGateway(client=self.s3)
+
+    def test_reutiliza_url_vigente(self):
+        url1 = self.gateway.url_firmada('docs/a.pdf')
+        url2 = self.gateway.url_firmada('docs/a.pdf')
+        self.assertEqual(url1, url2)
+        self.assertEqual(self.s3.firmas, 1)
+
+    def test_refirma_cerca_de_expirar(self):
+        gateway = S3StorageGateway(client=self.s3, expiracion_url=60, margen_renovacion=120)
+        gateway.url_firmada('docs/a.pdf')
+        gateway.url_firmada('docs/a.pdf')
+        self.assertEqual(self.s3.firmas, 2)
+
+    def test_eliminar_invalida_cache(self):
+        from io import BytesIO
+        url_publica = self.gateway.subir_archivo(BytesIO(b'data'), 'docs/a.pdf', 'application/pdf')
+        self.assertEqual(url_publica, 'https://bucket-test.s3.us-east-2.amazonaws.com/docs/a.pdf')
+        self.gateway.url_firmada('docs/a.pdf')
+        self.gateway.eliminar('docs/a.pdf')
+        self.assertNotIn(('bucket-test', 'docs/a.pdf'), self.s3.objetos)
+        self.gateway.url_firmada('docs/a.pdf')
+        self.assertEqual(self.s3.firmas, 2)
+
+    def test_cache_acotada(self):
+        gateway = S3StorageGateway(client=self.s3, max_urls_cache=2)
+        for key in ('a', 'b', 'c'):
+            gateway.url_firmada(key)
+        gateway.url_firmada('a')
+        self.assertEqual(self.s3.firmas, 4)
+
+    def test_firma_real_sin_red(self):
+        client = boto3.client(
+            's3', aws_access_key_id='AKIATEST', aws_secret_access_key='secret',
+            region_name='us-east-2', config=Config(signature_version='s3v4')
+        )
+        url = S3StorageGateway(client=client).url_firmada('docs/a.pdf')
+        self.assertIn('X-Amz-Signature=', url)
+        self.assertIn('bucket-test', url)
+
+
+@override_settings(AWS_STORAGE_BUCKET_NAME='bucket-test', AWS_S3_REGION_NAME='us-east-2',
+                   AWS_ACCESS_KEY_ID='AKIATEST', AWS_SECRET_ACCESS_KEY='secret')
+class DocumentoClinicoSerializerS3Test(TestCase):
+
+    def setUp(self):
+        empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte")
+        rol = Tipodeusuario.objects.create(rol="Paciente", empresa=empresa)
+        usuario = Usuario.objects.create(
+            nombre="Ana", apellido="Pérez", correoelectronico="ana@test.com",
+            idtipousuario=rol, empresa=empresa
+        )
+        paciente = Paciente.objects.get(codusuario=usuario)
+        DocumentoClinico.objects.bulk_create([
+            DocumentoClinico(
+                codpaciente=paciente, tipo_documento='radiografia', nombre_archivo=f'rx{i}.png',
+                url_s3='', s3_key=f'documentos_clinicos/1/rx{i}.png', tamanio_bytes=10,
+                extension='png', fecha_documento=date.today(), empresa=empresa
+            )
+            for i in range(100)
+        ])
+        set_storage_gateway(None)
+        self.addCleanup(set_storage_gateway, None)
+
+    def test_un_solo_cliente_para_todo_el_listado(self):
+        documentos = DocumentoClinico.objects.select_related('codpaciente__codusuario', 'profesional_carga')
+        with mock.patch.object(storage_gateway.boto3.session, 'Session', wraps=boto3.session.Session) as session:
+            data = DocumentoClinicoSerializer(documentos, many=True).data
+            DocumentoClinicoSerializer(documentos, many=True).data
+        self.assertEqual(session.call_count, 1)
+        self.assertTrue(all('X-Amz-Signature=' in d['url_firmada'] for d in data))
+        self.assertEqual(len(get_storage_gateway()._urls), 100)
@@ -0,0 +1,101 @@
+"""
+Tests del contexto de validación de pagos (ContextoValidacionPago): mismas
+respuestas que las validaciones encadenadas, con consultas constantes.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from api.models import (
+    DetallePagoItem, Empresa, Estado, Itemplandetratamiento, Odontologo, PagoEnLinea, Paciente,
+    Plandetratamiento, Servicio, Tipodeusuario, Usuario,
+)
+from api.validators_pagos import ContextoValidacionPago, ValidadorComplejoPagos, validar_pago_duplicado
+
+
+class ContextoValidacionPagoTest(TestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol_paciente = Tipodeusuario.objects.create(rol="Paciente", empresa=self.empresa)
+        rol_odontologo = Tipodeusuario.objects.create(rol="Odontologo", empresa=self.empresa)
+        self.usuario = Usuario.objects.create(
+            nombre="Ana", apellido="Test", correoelectronico="ana@test.com",
+            idtipousuario=rol_paciente, empresa=self.empresa
+        )
+        odontologo = Odontologo.objects.get(codusuario=Usuario.objects.create(
+            nombre="Luis", apellido="Rojas", correoelectronico="luis@test.com",
+            idtipousuario=rol_odontologo, empresa=self.empresa
+        ))
+        estado = Estado.objects.create(estado="Activo")
+        self.plan = Plandetratamiento.objects.create(
+            codpaciente=Paciente.objects.get(codusuario=self.usuario), cododontologo=odontologo,
+            idestado=estado, fechaplan=date(2026, 3, 1), empresa=self.empresa,
+        )
+        servicio = Servicio.objects.create(nombre="Resina", costobase=Decimal('100.00'), empresa=self.empresa)
+        self.items = [
+            Itemplandetratamiento.objects.create(
+                idplantratamiento=self.plan, idservicio=servicio, idestado=estado,
+                empresa=self.empresa, costofinal=Decimal('100.00'),
+            )
+            for _ in range(4)
+        ]
+        Plandetratamiento.objects.filter(pk=self.plan.pk).update(
+            estado_plan=Plandetratamiento.ESTADO_PLAN_APROBADO, montototal=Decimal('400.00')
+        )
+
+        # El primer item ya está pagado
+        pago = self.crear_pago(Decimal('100.00'), 'aprobado', 'items_individuales')
+        DetallePagoItem.objects.create(
+            pago=pago, item_plan=self.items[0], monto_item_total=Decimal('100.00'),
+            monto_pagado_ahora=Decimal('100.00'), monto_pagado_total=Decimal('100.00'),
+            saldo_restante=Decimal('0'), item_completamente_pagado=True,
+        )
+
+    def crear_pago(self, monto, estado, origen):
+        return PagoEnLinea.objects.create(
+            empresa=self.empresa, usuario=self.usuario, plan_tratamiento=self.plan, origen_tipo=origen,
+            monto=monto, monto_original=Decimal('400.00'), estado=estado, metodo_pago='transferencia',
+        )
+
+    def validar(self, monto, items_ids=None):
+        return ValidadorComplejoPagos.validar_crear_pago_plan(
+            self.plan.pk, Decimal(monto), items_ids, 'transferencia', self.empresa
+        )
+
+    def test_consultas_constantes(self):
+        with self.assertNumQueries(3):
+            self.assertEqual(self.validar('50.00'), (True, {}))
+        with self.assertNumQueries(3):
+            self.assertEqual(self.validar('50.00', [i.pk for i in self.items[1:]]), (True, {}))
+
+    def test_reglas_sobre_la_foto(self):
+        es_valido, errores = self.validar('50.00', [self.items[0].pk])
+        self.assertFalse(es_valido)
+        self.assertIn('ya está completamente pagado', errores['items_seleccionados'])
+
+        es_valido, errores = self.validar('50.00', [999999])
+        self.assertEqual(errores['items_seleccionados'], "Items no encontrados o cancelados: [999999]")
+
+        es_valido, errores = self.validar('500.00')
+        self.assertIn('excede el saldo pendiente del plan ($400.00)', errores['monto'])
+
+        es_valido, errores = ValidadorComplejoPagos.validar_crear_pago_plan(
+            999999, Decimal('1.00'), None, 'transferencia', self.empresa
+        )
+        self.assertEqual(errores, {'plan_tratamiento_id': "Plan de tratamiento no encontrado"})
+
+    def test_duplicado_igual_que_la_validacion_individual(self):
+        self.crear_pago(Decimal('75.00'), 'pendiente', 'plan_completo')
+        es_valido, errores = self.validar('75.00')
+        self.assertFalse(es_valido)
+        self.assertIn('Ya existe un pago pendiente/procesando similar', errores['general'])
+        self.assertFalse(validar_pago_duplicado('plan_completo', self.plan.pk, Decimal('75.00'), self.empresa)[0])
+        self.assertEqual(self.validar('75.00', [self.items[1].pk]), (True, {}))
+
+    def test_distribucion_desde_la_foto(self):
+        contexto = ContextoValidacionPago.cargar(self.plan.pk, self.empresa)
+        with self.assertNumQueries(0):
+            distribucion = contexto.calcular_distribucion(Decimal('100.00'))
+        self.assertEqual([d['monto_a_pagar'] for d in distribucion['distribucion']], [33.34, 33.33, 33.33])
@@ -0,0 +1,140 @@
+"""
+Tests de la bandeja de webhooks de Stripe: recepción sin procesar,
+deduplicación, orden por Payment Intent, reintentos y reproceso.
+"""
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import ComprobanteDigital, Empresa, EventoWebhookStripe, PagoEnLinea, Tipodeusuario, Usuario
+from api.services.webhooks_stripe import procesar_pendientes, registrar_evento
+
+PAGOS = EventoWebhookStripe.ORIGEN_PAGOS
+
+
+def evento_stripe(event_id, tipo, intent, creado):
+    return {
+        'id': event_id, 'type': tipo, 'created': creado,
+        'data': {'object': {'id': intent, 'metadata': {}}},
+    }
+
+
+@override_settings(STRIPE_WEBHOOK_WORKERS=0, STRIPE_WEBHOOK_REINTENTO_SEGUNDOS=60)
+class WebhooksStripeTest(APITestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Clínica Norte", subdomain="norte", activo=True)
+        rol = Tipodeusuario.objects.create(rol="Administrador", empresa=self.empresa)
+        self.usuario = Usuario.objects.create(
+            nombre="Admin", apellido="Test", correoelectronico="admin@test.com",
+            idtipousuario=rol, empresa=self.empresa
+        )
+        self.client = APIClient()
+
+    def crear_pago(self, intent):
+        return PagoEnLinea.objects.create(
+            empresa=self.empresa, usuario=self.usuario, origen_tipo='plan_completo',
+            monto=Decimal('150.00'), monto_original=Decimal('150.00'), metodo_pago='tarjeta',
+            estado='procesando', stripe_payment_intent_id=intent,
+        )
+
+    def recibir(self, evento):
+        with patch(
+            'api.views_pagos.StripePaymentService.verificar_webhook_signature',
+            return_value=(True, 'Firma válida', evento),
+        ):
+            return self.client.post(
+                '/api/webhook/stripe/', data=json.dumps(evento), content_type='application/json',
+                HTTP_STRIPE_SIGNATURE='t=1,v1=firma',
+            )
+
+    def test_responde_sin_procesar_y_deduplica(self):
+        pago = self.crear_pago('pi_1')
+        evento = evento_stripe('evt_1', 'payment_intent.succeeded', 'pi_1', 1767225600)
+
+        with self.captureOnCommitCallbacks() as programados:
+            response = self.recibir(evento)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(programados), 1)
+        pago.refresh_from_db()
+        self.assertEqual(pago.estado, 'procesando')
+
+        repetido = self.recibir(evento)
+        self.assertEqual(repetido.status_code, 200)
+        self.assertEqual(repetido.content, b'Evento ya recibido')
+        guardado = EventoWebhookStripe.objects.get()
+        self.assertEqual((guardado.estado, guardado.payment_intent_id), ('pendiente', 'pi_1'))
+
+    def test_firma_invalida_no_guarda(self):
+        with patch(
+            'api.views_pagos.StripePaymentService.verificar_webhook_signature',
+            return_value=(False, 'Firma inválida', None),
+        ):
+            response = self.client.post(
+                '/api/webhook/stripe/', data='{}', content_type='application/json',
+                HTTP_STRIPE_SIGNATURE='t=1,v1=mala',
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(EventoWebhookStripe.objects.exists())
+
+    def test_orden_por_payment_intent(self):
+        pago = self.crear_pago('pi_2')
+        # Llega primero el evento más nuevo
+        registrar_evento(evento_stripe('evt_ok', 'payment_intent.succeeded', 'pi_2', 1767225700), PAGOS)
+        registrar_evento(evento_stripe('evt_fallo', 'payment_intent.payment_failed', 'pi_2', 1767225600), PAGOS)
+
+        resumen = procesar_pendientes()
+
+        self.assertEqual(resumen['procesado'], 2)
+        pago.refresh_from_db()
+        self.assertEqual(pago.estado, 'aprobado')
+        self.assertEqual(ComprobanteDigital.objects.filter(pago=pago).count(), 1)
+
+    def test_fallo_reintenta_y_bloquea_los_siguientes(self):
+        registrar_evento(evento_stripe('evt_a', 'payment_intent.payment_failed', 'pi_3', 1767225600), PAGOS)
+        registrar_evento(evento_stripe('evt_b', 'payment_intent.succeeded', 'pi_3', 1767225700), PAGOS)
+
+        # Aún no existe el pago: el primero falla y el segundo espera
+        resumen = procesar_pendientes()
+        self.assertEqual(resumen, {'reintentar': 1, 'en_espera': 1})
+        primero = EventoWebhookStripe.objects.get(event_id='evt_a')
+        self.assertEqual(primero.intentos, 1)
+        self.assertGreater(primero.proximo_intento, timezone.now() + timedelta(seconds=30))
+        self.assertIn('Pago no encontrado', primero.ultimo_error)
+
+        pago = self.crear_pago('pi_3')
+        EventoWebhookStripe.objects.filter(pk=primero.pk).update(proximo_intento=timezone.now())
+        self.assertEqual(procesar_pendientes()['procesado'], 2)
+        pago.refresh_from_db()
+        self.assertEqual(pago.estado, 'aprobado')
+
+    def test_evento_repetido_con_otro_id_es_idempotente(self):
+        pago = self.crear_pago('pi_4')
+        for event_id, creado in (('evt_x', 1767225600), ('evt_y', 1767225601)):
+            registrar_evento(evento_stripe(event_id, 'payment_intent.succeeded', 'pi_4', creado), PAGOS)
+        procesar_pendientes()
+        self.assertEqual(ComprobanteDigital.objects.filter(pago=pago).count(), 1)
+        self.assertEqual(EventoWebhookStripe.objects.filter(estado='procesado').count(), 2)
+
+    @override_settings(STRIPE_WEBHOOK_MAX_INTENTOS=1)
+    def test_reprocesar_fallidos_desde_el_comando(self):
+        registrar_evento(evento_stripe('evt_z', 'payment_intent.succeeded', 'pi_5', 1767225600), PAGOS)
+        procesar_pendientes()
+        self.assertEqual(EventoWebhookStripe.objects.get().estado, 'fallido')
+
+        pago = self.crear_pago('pi_5')
+        call_command('procesar_webhooks_stripe', '--reprocesar-fallidos', stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(EventoWebhookStripe.objects.get().estado, 'procesado')
+        pago.refresh_from_db()
+        self.assertEqual(pago.estado, 'aprobado')
+
+    def test_eventos_sin_manejador_se_ignoran(self):
+        registrar_evento(evento_stripe('evt_i', 'customer.created', 'cus_1', 1767225600), PAGOS)
+        self.assertEqual(procesar_pendientes(), {'ignorado': 1})
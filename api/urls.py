@@ -2,7 +2,9 @@ from django.urls import path, include
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.routers import DefaultRouter
 
-from . import views, views_auth, views_saas, views_stripe, views_user_creation
+from . import (
+    views, views_auth, views_batch, views_saas, views_sincronizacion, views_stripe, views_user_creation,
+)
 from .views import UserProfileView, ping
 from no_show_policies.views import PoliticaNoShowViewSet  # App externa
 
@@ -29,6 +31,9 @@ router.register(r"historias-clinicas", views.HistorialclinicoViewSet, basename="
 # Consentimiento Digital
 router.register(r"consentimientos", views.ConsentimientoViewSet, basename="consentimientos")
 
+# Documentos Clínicos (S3)
+router.register(r"documentos-clinicos", views.DocumentoClinicoViewSet, basename="documentos-clinicos")
+
 # Presupuestos y Aceptaciones (SP3-T003)
 from .views_presupuestos import PresupuestoViewSet, AceptacionPresupuestoViewSet
 router.register(r"presupuestos", PresupuestoViewSet, basename="presupuestos")
@@ -61,7 +66,10 @@ router.register(r"flujo-clinico/planes", PlanTratamientoFlujoClincoViewSet, base
 router.register(r"flujo-clinico/items", ItemPlanTratamientoFlujoClincoViewSet, basename="flujo-items")
 
 # Upload de Evidencias (SP3-T008 FASE 5)
-from .views_evidencias import upload_evidencia, delete_evidencia, listar_evidencias
+from .views_evidencias import (
+    upload_evidencia, delete_evidencia, listar_evidencias,
+    iniciar_carga_evidencia, completar_carga_evidencia
+)
 
 # Creación de Usuarios (Admin)
 router.register(r"crear-usuario", views_user_creation.CrearUsuarioViewSet, basename="crear-usuario")
@@ -70,6 +78,7 @@ urlpatterns = [
     # Health/basic
     path("health/", views.health),
     path("db/", views.db_info),
+    path("db/pool/", views.db_pool_metrics),
     path("users/count/", views.users_count),
     path("ping/", ping),
 
@@ -96,6 +105,11 @@ urlpatterns = [
     # Perfil legacy (si aún lo usan en frontend)
     path("usuario/me", views_auth.UsuarioMeView.as_view(), name="usuario-me"),
 
+    # Lote de GETs para el arranque de la app móvil
+    path("batch/", views_batch.batch, name="batch"),
+    # Sincronización incremental (watermark + tombstones)
+    path("sync/", views_sincronizacion.sincronizar, name="sincronizar"),
+
     # Reset de contraseña
     path("auth/password-reset/", views_auth.password_reset_request),
     path("auth/password-reset-confirm/", views_auth.password_reset_confirm),
@@ -107,6 +121,8 @@ urlpatterns = [
 
     # Upload de Evidencias (SP3-T008 FASE 5)
     path("upload/evidencias/", upload_evidencia, name="upload-evidencia"),
+    path("upload/evidencias/iniciar/", iniciar_carga_evidencia, name="iniciar-carga-evidencia"),
+    path("upload/evidencias/completar/", completar_carga_evidencia, name="completar-carga-evidencia"),
     path("upload/evidencias/<int:evidencia_id>/", delete_evidencia, name="delete-evidencia"),
     path("evidencias/", listar_evidencias, name="listar-evidencias"),
     
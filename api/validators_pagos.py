@@ -3,12 +3,20 @@ SP3-T009: Validadores Personalizados para Sistema de Pagos
 Validadores reutilizables para validaciones complejas de pagos.
 """
 
-from rest_framework import serializers
+from dataclasses import dataclass, field
+from datetime import timedelta
 from decimal import Decimal
+from typing import List, Optional
+
+from rest_framework import serializers
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from .models import Plandetratamiento, Itemplandetratamiento, Consulta, PagoEnLinea
-from .services.calculador_pagos import CalculadorPagos
+from .services.calculador_pagos import CalculadorPagos, SaldoItem, cargar_saldos_items
 
 
 def validar_monto_positivo(value):
@@ -162,7 +170,8 @@ def validar_items_plan(items_ids, plan_id, empresa):
     return True, "Items válidos", items
 
 
-def validar_distribucion_pago(monto, items_ids, plan_id, empresa):
+def validar_distribucion_pago(monto, items_ids, plan_id, empresa, saldos=None,
+                              estrategia='proporcional'):
     """
     Valida que el monto pueda distribuirse entre los items seleccionados.
     
@@ -171,6 +180,8 @@ def validar_distribucion_pago(monto, items_ids, plan_id, empresa):
         items_ids: list[int] - IDs de items (None = plan completo)
         plan_id: int - ID del plan
         empresa: Empresa - Empresa actual
+        saldos: list[SaldoItem] - Saldos ya cargados (cargar_saldos_items), opcional
+        estrategia: str - Estrategia de distribución de CalculadorPagos
     
     Returns:
         tuple: (es_valido: bool, mensaje: str, distribucion: dict)
@@ -184,7 +195,9 @@ def validar_distribucion_pago(monto, items_ids, plan_id, empresa):
     distribucion = CalculadorPagos.calcular_distribucion_pago(
         plan,
         monto,
-        items_ids
+        items_ids,
+        estrategia=estrategia,
+        saldos=saldos
     )
     
     # Verificar que el monto puede distribuirse
@@ -220,15 +233,12 @@ def validar_pago_duplicado(origen, origen_id, monto, empresa, ultimo_minutos=5):
     Returns:
         tuple: (es_valido: bool, mensaje: str)
     """
-    from django.utils import timezone
-    from datetime import timedelta
-    
     hace_n_minutos = timezone.now() - timedelta(minutes=ultimo_minutos)
     
     # Buscar pagos similares recientes
     filtros = {
         'empresa': empresa,
-        'origen': origen,
+        'origen_tipo': origen,
         'monto': monto,
         'estado__in': ['pendiente', 'procesando'],
         'fecha_creacion__gte': hace_n_minutos
@@ -351,20 +361,148 @@ def validar_saldo_suficiente_reembolso(pago):
     return True, "No hay pagos posteriores, el reembolso es seguro"
 
 
+@dataclass
+class ContextoValidacionPago:
+    """
+    Foto del plan para validar la creación de un pago: el plan (bloqueado
+    con select_for_update si hay una transacción abierta), lo pagado, los
+    saldos de sus items y los pagos recientes en curso, en tres consultas.
+    Las reglas se evalúan sobre esta foto sin volver a la base de datos.
+    
+    Para que el bloqueo sirva, cargarla dentro del mismo transaction.atomic()
+    que crea el pago: dos creaciones concurrentes sobre el mismo plan se
+    serializan en la fila del plan (items y pagos no se bloquean).
+    """
+    plan: Plandetratamiento
+    total_pagado: Decimal
+    saldos: List[SaldoItem]
+    pagos_recientes: List[PagoEnLinea] = field(default_factory=list)
+    
+    @classmethod
+    def cargar(cls, plan_id, empresa, ventana_minutos=5) -> Optional['ContextoValidacionPago']:
+        """Carga la foto del plan; None si no existe en la empresa."""
+        pagado = PagoEnLinea.objects.filter(
+            plan_tratamiento=OuterRef('pk'),
+            estado='aprobado',
+            origen_tipo='plan_completo'
+        ).order_by().values('plan_tratamiento').annotate(total=Sum('monto')).values('total')
+        
+        planes = Plandetratamiento.objects.filter(id=plan_id, empresa=empresa).annotate(
+            total_pagado_foto=Coalesce(
+                Subquery(pagado), Value(Decimal('0')),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+        if transaction.get_connection().in_atomic_block:
+            planes = planes.select_for_update(of=('self',))
+        
+        plan = planes.first()
+        if plan is None:
+            return None
+        
+        pagos_recientes = list(PagoEnLinea.objects.filter(
+            empresa=empresa,
+            plan_tratamiento=plan,
+            estado__in=['pendiente', 'procesando'],
+            fecha_creacion__gte=timezone.now() - timedelta(minutes=ventana_minutos)
+        ).order_by('-fecha_creacion'))
+        
+        return cls(
+            plan=plan,
+            total_pagado=Decimal(str(plan.total_pagado_foto)),
+            saldos=cargar_saldos_items(plan),
+            pagos_recientes=pagos_recientes,
+        )
+    
+    @property
+    def saldo_plan(self) -> Decimal:
+        return max(Decimal(str(self.plan.montototal or 0)) - self.total_pagado, Decimal('0'))
+    
+    def saldos_de(self, items_ids=None) -> List[SaldoItem]:
+        if not items_ids:
+            return self.saldos
+        ids = set(items_ids)
+        return [saldo for saldo in self.saldos if saldo.item_id in ids]
+    
+    # Reglas: mismas respuestas que las funciones validar_* de este módulo
+    def validar_estado(self):
+        """Como Plandetratamiento.puede_pagar_completo, con el saldo de la foto."""
+        if not self.plan.es_aprobado():
+            return False, "El plan debe estar aprobado para realizar pagos"
+        if self.saldo_plan <= 0:
+            return False, "El plan ya está completamente pagado"
+        return True, "Plan válido para pagos"
+    
+    def validar_items(self, items_ids):
+        if not items_ids:
+            return True, "Sin items seleccionados (pago de plan completo)"
+        
+        encontrados = {saldo.item_id for saldo in self.saldos}
+        no_encontrados = set(items_ids) - encontrados
+        if no_encontrados:
+            return False, f"Items no encontrados o cancelados: {list(no_encontrados)}"
+        
+        for saldo in self.saldos_de(items_ids):
+            if saldo.saldo_pendiente <= Decimal('0'):
+                return False, f"Item {saldo.item_id} ({saldo.servicio_nombre}): El item ya está completamente pagado"
+        
+        return True, "Items válidos"
+    
+    def validar_monto(self, monto):
+        if monto > self.saldo_plan:
+            return False, f"El monto (${monto}) excede el saldo pendiente del plan (${self.saldo_plan})"
+        return True, "Monto válido"
+    
+    def calcular_distribucion(self, monto, items_ids=None, estrategia='proporcional'):
+        return CalculadorPagos.calcular_distribucion_pago(
+            self.plan, monto, items_ids, estrategia=estrategia, saldos=self.saldos_de(items_ids)
+        )
+    
+    def validar_distribucion(self, monto, items_ids=None, estrategia='proporcional'):
+        distribucion = self.calcular_distribucion(monto, items_ids, estrategia)
+        if not distribucion['distribucion']:
+            return False, "No hay items disponibles para distribuir el pago", None
+        
+        monto_sobrante = Decimal(str(distribucion['monto_sobrante']))
+        if monto_sobrante > Decimal('0'):
+            return (
+                True,
+                f"Advertencia: ${monto_sobrante} no se distribuirá (todos los items están pagados)",
+                distribucion
+            )
+        
+        monto_distribuido = Decimal(str(distribucion['monto_distribuido']))
+        return True, f"Distribución válida: ${monto_distribuido} entre {len(distribucion['distribucion'])} items", distribucion
+    
+    def validar_duplicado(self, origen, monto):
+        for pago in self.pagos_recientes:
+            if pago.origen_tipo == origen and pago.monto == monto:
+                return (
+                    False,
+                    f"Ya existe un pago pendiente/procesando similar (#{pago.codigo_pago}) creado hace {(timezone.now() - pago.fecha_creacion).seconds // 60} minutos"
+                )
+        return True, "No hay pagos duplicados"
+
+
 class ValidadorComplejoPagos:
     """
     Clase helper para ejecutar múltiples validaciones de forma ordenada.
     """
     
     @staticmethod
-    def validar_crear_pago_plan(plan_id, monto, items_ids, metodo_pago, empresa):
+    def validar_crear_pago_plan(plan_id, monto, items_ids, metodo_pago, empresa, contexto=None):
         """
         Ejecuta todas las validaciones necesarias para crear un pago de plan.
         
+        Todas las reglas se evalúan sobre un ContextoValidacionPago (se carga
+        si no se pasa uno); llamarlo dentro del transaction.atomic() que crea
+        el pago para mantener el bloqueo del plan hasta el final.
+        
         Returns:
             tuple: (es_valido: bool, errores: dict)
         """
         errores = {}
+        origen = 'plan_completo' if not items_ids else 'items_individuales'
         
         # 1. Validar monto positivo
         try:
@@ -373,36 +511,30 @@ class ValidadorComplejoPagos:
             errores['monto'] = str(e.detail[0])
         
         # 2. Validar estado del origen
-        es_valido, mensaje, plan = validar_estado_origen(
-            'plan_completo' if not items_ids else 'items_individuales',
-            plan_id,
-            empresa
-        )
+        if contexto is None:
+            contexto = ContextoValidacionPago.cargar(plan_id, empresa)
+        if contexto is None:
+            errores['plan_tratamiento_id'] = "Plan de tratamiento no encontrado"
+            return False, errores
+        
+        es_valido, mensaje = contexto.validar_estado()
         if not es_valido:
             errores['plan_tratamiento_id'] = mensaje
             return False, errores
         
         # 3. Validar items (si aplica)
-        if items_ids:
-            es_valido, mensaje, items = validar_items_plan(items_ids, plan_id, empresa)
-            if not es_valido:
-                errores['items_seleccionados'] = mensaje
-                return False, errores
+        es_valido, mensaje = contexto.validar_items(items_ids)
+        if not es_valido:
+            errores['items_seleccionados'] = mensaje
+            return False, errores
         
         # 4. Validar monto vs saldo
-        es_valido, mensaje, saldo = validar_monto_no_excede_saldo(
-            monto,
-            'plan_completo' if not items_ids else 'items_individuales',
-            plan_id,
-            empresa
-        )
+        es_valido, mensaje = contexto.validar_monto(monto)
         if not es_valido:
             errores['monto'] = mensaje
         
         # 5. Validar distribución
-        es_valido, mensaje, distribucion = validar_distribucion_pago(
-            monto, items_ids, plan_id, empresa
-        )
+        es_valido, mensaje, distribucion = contexto.validar_distribucion(monto, items_ids)
         if not es_valido:
             errores['general'] = mensaje
         
@@ -412,12 +544,7 @@ class ValidadorComplejoPagos:
             errores['metodo_pago'] = mensaje
         
         # 7. Validar no duplicado
-        es_valido, mensaje = validar_pago_duplicado(
-            'plan_completo' if not items_ids else 'items_individuales',
-            plan_id,
-            monto,
-            empresa
-        )
+        es_valido, mensaje = contexto.validar_duplicado(origen, monto)
         if not es_valido:
             errores['general'] = mensaje
         
@@ -1,6 +1,6 @@
 from django.http import JsonResponse, HttpResponse
 from django.contrib.auth import get_user_model
-from django.db import connection, transaction  # Agregar transaction para atomicidad
+from django.db import connection, transaction, close_old_connections  # Agregar transaction para atomicidad
 from django.core.mail import send_mail
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
@@ -15,17 +15,17 @@ from io import BytesIO
 from rest_framework import status, serializers
 from rest_framework.generics import RetrieveUpdateAPIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.response import Response
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework import viewsets, mixins
 from rest_framework.viewsets import GenericViewSet
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import (
     Paciente, Consulta, Odontologo, Horario, Tipodeconsulta, Estadodeconsulta,
-    Usuario, Tipodeusuario, Bitacora, Historialclinico, Consentimiento
+    Usuario, Tipodeusuario, Bitacora, Historialclinico, Consentimiento, ConsultaArchivada
 )
 
 from .models_notifications import HistorialNotificacion, DispositivoMovil
@@ -33,6 +33,7 @@ from .models_notifications import HistorialNotificacion, DispositivoMovil
 from .serializers import (
     PacienteSerializer,
     ConsultaSerializer,
+    ConsultaArchivadaSerializer,
     CreateConsultaSerializer,
     ConsultaReporteSerializer,
     OdontologoMiniSerializer,
@@ -43,12 +44,18 @@ from .serializers import (
     UsuarioMeSerializer,
     TipodeusuarioSerializer,
     BitacoraSerializer,
+    BitacoraListSerializer,
     ReprogramarConsultaSerializer,
     HistorialclinicoCreateSerializer,
     HistorialclinicoListSerializer,
     ConsentimientoSerializer,
+    ConsentimientoListSerializer,
+    DocumentoClinicoSerializer,
+    DocumentoClinicoListSerializer,
     EstadodeconsultaSerializer,  # <-- añadido
 )
+from .mixins import CacheCatalogoMixin, CamposDinamicosViewMixin, LecturaReplicaMixin, ProyeccionListaMixin
+from .pagination import PaginacionHibrida
 
 
 # -------------------- Health / Utils --------------------
@@ -115,9 +122,6 @@ def db_info(request):
             cur.execute("SELECT current_database(), current_user, version()")
             db, user, version = cur.fetchone()
 
-        # Cerrar conexión explícitamente
-        connection.close()
-
         return JsonResponse({
             "database": db,
             "user": user,
@@ -125,11 +129,8 @@ def db_info(request):
             "status": "connected"
         })
     except Exception as e:
-        # Cerrar conexión en caso de error
-        try:
-            connection.close()
-        except:
-            pass
+        # Descartar la conexión solo si quedó inutilizable
+        close_old_connections()
 
         return JsonResponse({
             "error": str(e),
@@ -137,6 +138,22 @@ def db_info(request):
         }, status=500)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_pool_metrics(request):
+    """
+    Métricas de conexiones a la DB del proceso que atiende el request:
+    en uso / ociosas / en espera y tiempo de espera (pool de psycopg) o
+    estado de la conexión persistente, más las conexiones nuevas abiertas.
+    Solo staff: expone el pid del worker y el estado de la réplica.
+    """
+    from .db_router import estado_replica
+    from .services.db_pool import metricas_conexiones
+    metricas = metricas_conexiones()
+    metricas['replica'] = estado_replica()
+    return Response(metricas)
+
+
 def users_count(request):
     """
     Cuenta de usuarios de la tabla Usuario (modelo de negocio).
@@ -211,10 +228,10 @@ class PacienteViewSet(ReadOnlyModelViewSet):
 
 # -------------------- Consultas (Citas) --------------------
 
-class ConsultaViewSet(ModelViewSet):
+class ConsultaViewSet(CamposDinamicosViewMixin, ModelViewSet):
     """
     API para Consultas. Permite crear, leer, actualizar y eliminar.
-    Filtrado por tenant (multi-tenancy).
+    Filtrado por tenant (multi-tenancy). Admite `?fields=` y `?expand=`.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = ConsultaSerializer
@@ -222,6 +239,16 @@ class ConsultaViewSet(ModelViewSet):
     filterset_fields = ['codpaciente', 'cododontologo', 'idestadoconsulta']
     ordering_fields = ['fecha', 'id']
     ordering = ['-fecha', '-id']
+    pagination_class = PaginacionHibrida
+    orden_cursor = ('-fecha', '-id')  # ?paginacion=cursor
+    select_related_campos = {
+        'codpaciente': ('codpaciente__codusuario',),
+        'cododontologo': ('cododontologo__codusuario',),
+        'codrecepcionista': ('codrecepcionista__codusuario',),
+        'idhorario': ('idhorario',),
+        'idtipoconsulta': ('idtipoconsulta',),
+        'idestadoconsulta': ('idestadoconsulta',),
+    }
 
     def get_queryset(self):
         """Filtra consultas por empresa (multi-tenancy)"""
@@ -673,62 +700,85 @@ Si necesitas cancelar o reprogramar tu cita, ponte en contacto con nosotros.
             status=status.HTTP_200_OK
         )
 
-    # --- NUEVA ACCIÓN: Eliminar citas vencidas automáticamente ---
+    # --- Archivado de citas vencidas (por lotes, en segundo plano) ---
     @action(detail=False, methods=['delete'], url_path='eliminar-vencidas')
     def eliminar_vencidas(self, request):
         """
-        Elimina automáticamente todas las citas que ya pasaron de fecha.
-        Esta función puede ser llamada desde el frontend o desde un cron job.
+        Programa el archivado de las citas del tenant que ya pasaron de fecha.
+        No borra nada en el request: el trabajo las mueve por lotes a
+        ConsultaArchivada (ver api/services/archivo_consultas.py) y se puede
+        seguir con `archivar_consultas` o en GET /consultas/archivadas/.
         """
-        from datetime import date
-        from .models import Bitacora, Usuario
+        from .services.archivo_consultas import programar_archivo
 
-        citas_vencidas = Consulta.objects.filter(fecha__lt=date.today())
-        cantidad = citas_vencidas.count()
+        empresa = getattr(request, 'tenant', None)
+        if empresa is None:
+            return Response(
+                {"ok": False, "detail": "Se requiere el tenant (X-Tenant-Subdomain)."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        hoy = timezone.now().date()
+        cantidad = Consulta.objects.filter(empresa=empresa, fecha__lt=hoy).count()
         if cantidad == 0:
             return Response(
-                {"ok": True, "detail": "No hay citas vencidas para eliminar.", "cantidad": 0},
+                {"ok": True, "detail": "No hay citas vencidas para archivar.", "cantidad": 0},
                 status=status.HTTP_200_OK
             )
 
-        # Registrar en bitácora
-        try:
-            usuario = None
-            if request.user.is_authenticated:
-                try:
-                    usuario = Usuario.objects.get(correoelectronico=request.user.email)
-                except Usuario.DoesNotExist:
-                    pass
-
-            from api.middleware import get_client_ip
-            Bitacora.objects.create(
-                accion='LIMPIAR_CITAS_VENCIDAS',
-                usuario=usuario,
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', 'Unknown'),
-                tabla_afectada='consulta',
-                empresa=getattr(request, 'tenant', None),
-                valores_nuevos={
-                    'cantidad_eliminadas': cantidad,
-                    'fecha_limpieza': str(date.today())
-                }
-            )
-        except Exception as log_error:
-            print(f"[Bitacora] No se pudo guardar el log de limpieza: {log_error}")
-
-        # Eliminar todas las citas vencidas
-        citas_vencidas.delete()
+        usuario = Usuario.objects.filter(correoelectronico=request.user.email).first()
+        trabajo, creado = programar_archivo(empresa, fecha_corte=hoy, usuario=usuario)
 
         return Response(
             {
                 "ok": True,
-                "detail": f"Se eliminaron {cantidad} citas vencidas.",
-                "cantidad": cantidad
+                "detail": (
+                    f"Archivado de {cantidad} citas vencidas programado." if creado
+                    else "Ya hay un archivado de citas vencidas en curso."
+                ),
+                "cantidad": cantidad,
+                "trabajo": {
+                    "id": trabajo.id,
+                    "estado": trabajo.estado,
+                    "fecha_corte": str(trabajo.fecha_corte),
+                    "archivadas": trabajo.archivadas,
+                    "retenidas": trabajo.retenidas,
+                },
             },
-            status=status.HTTP_200_OK
+            status=status.HTTP_202_ACCEPTED
         )
 
+    @action(detail=False, methods=['get'], url_path='archivadas')
+    def archivadas(self, request):
+        """
+        Historial de citas archivadas del tenant.
+        Filtros: ?codpaciente=, ?desde=AAAA-MM-DD, ?hasta=AAAA-MM-DD
+        """
+        queryset = ConsultaArchivada.objects.filter(empresa=getattr(request, 'tenant', None))
+        codpaciente = request.query_params.get('codpaciente')
+        if codpaciente:
+            if not codpaciente.isdigit():
+                return Response(
+                    {"detail": "'codpaciente' debe ser un número entero."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            queryset = queryset.filter(codpaciente=int(codpaciente))
+        for parametro, lookup in (('desde', 'fecha__gte'), ('hasta', 'fecha__lte')):
+            valor = request.query_params.get(parametro)
+            if valor:
+                try:
+                    queryset = queryset.filter(**{lookup: datetime.strptime(valor, '%Y-%m-%d').date()})
+                except ValueError:
+                    return Response(
+                        {"detail": f"'{parametro}' debe tener el formato AAAA-MM-DD."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+        pagina = self.paginate_queryset(queryset)
+        if pagina is not None:
+            return self.get_paginated_response(ConsultaArchivadaSerializer(pagina, many=True).data)
+        return Response(ConsultaArchivadaSerializer(queryset, many=True).data)
+
     # ===== FASE 4: APPOINTMENT LIFECYCLE ENDPOINTS (Opción B - Realista) =====
     
     @action(detail=True, methods=['post'], url_path='confirmar-cita')
@@ -996,13 +1046,14 @@ class OdontologoViewSet(ReadOnlyModelViewSet):
         return queryset
 
 
-class HorarioViewSet(ReadOnlyModelViewSet):
+class HorarioViewSet(CacheCatalogoMixin, ReadOnlyModelViewSet):
     """
     API pública para horarios.
     No requiere autenticación para permitir agendamiento web.
     """
     permission_classes = [AllowAny]  # Público para agendamiento web
     serializer_class = HorarioSerializer
+    catalogo = 'horarios'  # ETag/304 en list y retrieve; `disponibles` no se cachea
 
     def get_queryset(self):
         """Filtra horarios por empresa (multi-tenancy)"""
@@ -1118,13 +1169,14 @@ class HorarioViewSet(ReadOnlyModelViewSet):
             )
 
 
-class TipodeconsultaViewSet(ReadOnlyModelViewSet):
+class TipodeconsultaViewSet(CacheCatalogoMixin, ReadOnlyModelViewSet):
     """
     API pública para tipos de consulta.
     No requiere autenticación para permitir agendamiento web.
     """
     permission_classes = [AllowAny]  # Público para agendamiento web
     serializer_class = TipodeconsultaSerializer
+    catalogo = 'tipos_consulta'
 
     def get_queryset(self):
         """Filtra tipos de consulta por empresa (multi-tenancy)"""
@@ -1137,13 +1189,14 @@ class TipodeconsultaViewSet(ReadOnlyModelViewSet):
         return queryset
 
 
-class EstadodeconsultaViewSet(ReadOnlyModelViewSet):
+class EstadodeconsultaViewSet(CacheCatalogoMixin, ReadOnlyModelViewSet):
     """
     Catálogo de estados de consulta (ej: Agendada, Confirmada, Atendida, Cancelada).
     """
     permission_classes = [IsAuthenticated]
     serializer_class = EstadodeconsultaSerializer
     pagination_class = None
+    catalogo = 'estados_consulta'
 
     def get_queryset(self):
         qs = Estadodeconsulta.objects.all()
@@ -1154,10 +1207,11 @@ class EstadodeconsultaViewSet(ReadOnlyModelViewSet):
 
 # -------------------- ADMIN: Roles y Usuarios --------------------
 
-class TipodeusuarioViewSet(ReadOnlyModelViewSet):
+class TipodeusuarioViewSet(CacheCatalogoMixin, ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = TipodeusuarioSerializer
     pagination_class = None
+    catalogo = 'tipos_usuario'
 
     def get_queryset(self):
         qs = Tipodeusuario.objects.all().order_by("id")
@@ -1243,8 +1297,11 @@ class HistorialclinicoViewSet(mixins.CreateModelMixin,
     Endpoints:
       - POST /api/historias-clinicas/                (crear HCE; calcula episodio siguiente y valida duplicado por día+motivo)
       - GET  /api/historias-clinicas/?paciente=<id>  (listar HCE por paciente; ordenado por fecha/episodio)
+      - GET  /api/historias-clinicas/?paginacion=cursor  (scroll infinito por fecha/id)
     """
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionHibrida
+    orden_cursor = ('-fecha', '-id')
 
     def get_serializer_class(self):
         return (HistorialclinicoCreateSerializer
@@ -1281,15 +1338,19 @@ from .utils_consentimiento import sellar_documento_consentimiento, calcular_hash
     generar_pdf_consentimiento  # <-- centraliza imports
 
 
-class ConsentimientoViewSet(ModelViewSet):
+class ConsentimientoViewSet(ProyeccionListaMixin, ModelViewSet):
     """
     API para gestionar los Consentimientos Digitales.
     - `GET /api/consentimientos/`: Lista todos los consentimientos del tenant.
     - `GET /api/consentimientos/?paciente=<id>`: Filtra consentimientos por paciente.
     - `POST /api/consentimientos/`: Crea un nuevo consentimiento.
+
+    El listado no carga texto, firma ni PDF; se obtienen en el detalle o en `/pdf/`.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = ConsentimientoSerializer
+    list_serializer_class = ConsentimientoListSerializer
+    campos_diferidos_lista = ('texto_contenido', 'firma_base64', 'pdf_firmado')
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['paciente']
     search_fields = ['paciente__codusuario__nombre', 'paciente__codusuario__apellido', 'titulo']
@@ -1322,7 +1383,7 @@ class ConsentimientoViewSet(ModelViewSet):
         Filtra los consentimientos para que solo se muestren los que pertenecen
         a la empresa (tenant) actual.
         """
-        queryset = Consentimiento.objects.select_related('paciente__codusuario', 'empresa')
+        queryset = Consentimiento.objects.select_related('paciente__codusuario', 'empresa', 'validado_por')
 
         if hasattr(self.request, 'tenant') and self.request.tenant:
             queryset = queryset.filter(empresa=self.request.tenant)
@@ -1445,13 +1506,20 @@ class ConsentimientoViewSet(ModelViewSet):
 
 # -------------------- Bitácora de Auditoría --------------------
 
-class BitacoraViewSet(ReadOnlyModelViewSet):
+class BitacoraViewSet(LecturaReplicaMixin, ProyeccionListaMixin, ReadOnlyModelViewSet):
     """
     API read-only para la Bitácora de auditoría.
     Solo usuarios admin pueden ver los registros.
+    El listado omite `valores_anteriores`/`valores_nuevos` (ver detalle).
+    Listado, estadísticas y exportación leen de la réplica si está configurada.
     """
+    acciones_replica = ('list', 'estadisticas', 'export')
+    pagination_class = PaginacionHibrida
+    orden_cursor = ('-timestamp', '-id')  # ?paginacion=cursor
     permission_classes = [IsAuthenticated]
     serializer_class = BitacoraSerializer
+    list_serializer_class = BitacoraListSerializer
+    campos_diferidos_lista = ('valores_anteriores', 'valores_nuevos')
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ['accion', 'usuario__nombre', 'usuario__apellido', 'ip_address']
     ordering_fields = ['timestamp', 'accion', 'usuario__nombre']
@@ -1724,17 +1792,21 @@ class BitacoraViewSet(ReadOnlyModelViewSet):
 # ============================================================================
 # DOCUMENTOS CLÍNICOS - S3
 # ============================================================================
-import boto3
 from botocore.exceptions import ClientError
 import os
 
+from .services.storage_gateway import get_storage_gateway
+
 
-class DocumentoClinicoViewSet(ModelViewSet):
+class DocumentoClinicoViewSet(ProyeccionListaMixin, ModelViewSet):
     """
     ViewSet para gestionar documentos clínicos almacenados en S3.
     Permite subir, listar, descargar y eliminar documentos vinculados a pacientes.
     """
     permission_classes = [IsAuthenticated]
+    serializer_class = DocumentoClinicoSerializer
+    list_serializer_class = DocumentoClinicoListSerializer
+    campos_diferidos_lista = ('notas',)
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ['nombre_archivo', 'tipo_documento', 'notas']
     ordering_fields = ['fecha_creacion', 'fecha_documento', 'tipo_documento']
@@ -1775,10 +1847,10 @@ class DocumentoClinicoViewSet(ModelViewSet):
         return queryset
 
     def get_serializer_class(self):
-        from .serializers import DocumentoClinicoSerializer, DocumentoClinicoUploadSerializer
+        from .serializers import DocumentoClinicoUploadSerializer
         if self.action == 'upload':
             return DocumentoClinicoUploadSerializer
-        return DocumentoClinicoSerializer
+        return super().get_serializer_class()
 
     @action(detail=False, methods=['post'])
     def upload(self, request):
@@ -1789,74 +1861,58 @@ class DocumentoClinicoViewSet(ModelViewSet):
         from .serializers import DocumentoClinicoUploadSerializer, DocumentoClinicoSerializer
         from .models import DocumentoClinico, Paciente
 
+        if not getattr(request, 'tenant', None):
+            return Response({'error': 'No se pudo identificar la empresa (tenant)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
         serializer = DocumentoClinicoUploadSerializer(data=request.data)
 
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+        from .services.blobs import obtener_o_subir_blob, liberar_blob
+
         archivo = serializer.validated_data['archivo']
         codpaciente = serializer.validated_data['codpaciente']
-
-        # Generar nombre único para S3
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         extension = os.path.splitext(archivo.name)[1]
-        nombre_s3 = f"documentos_clinicos/{codpaciente}/{timestamp}_{archivo.name}"
 
         try:
-            # Configurar cliente S3
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_S3_REGION_NAME
+            # Contenido direccionado por SHA-256: si el tenant ya tiene este
+            # archivo no se vuelve a subir, solo se suma una referencia
+            blob, duplicado = obtener_o_subir_blob(
+                empresa=request.tenant,
+                archivo=archivo,
+                content_type=archivo.content_type
             )
 
-            # Subir archivo a S3
-            s3_client.upload_fileobj(
-                archivo.file,
-                settings.AWS_STORAGE_BUCKET_NAME,
-                nombre_s3,
-                ExtraArgs={
-                    'ContentType': archivo.content_type
-                    # ACL removido - se maneja con políticas del bucket
-                }
-            )
-
-            # Generar URL del archivo
-            url_s3 = f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.{settings.AWS_S3_REGION_NAME}.amazonaws.com/{nombre_s3}"
-
-            # Buscar el Usuario (modelo de negocio) del usuario autenticado
-            usuario_profesional = None
-            if request.user.is_authenticated:
-                try:
-                    usuario_profesional = Usuario.objects.get(
-                        correoelectronico__iexact=request.user.email
-                    )
-                except Usuario.DoesNotExist:
-                    pass
-
             # Crear registro en la base de datos
-            documento = DocumentoClinico.objects.create(
-                codpaciente_id=codpaciente,
-                idconsulta_id=serializer.validated_data.get('idconsulta'),
-                idhistorialclinico_id=serializer.validated_data.get('idhistorialclinico'),
-                tipo_documento=serializer.validated_data['tipo_documento'],
-                nombre_archivo=archivo.name,
-                url_s3=url_s3,
-                s3_key=nombre_s3,
-                tamanio_bytes=archivo.size,
-                extension=extension.lstrip('.'),
-                profesional_carga=usuario_profesional,
-                fecha_documento=serializer.validated_data['fecha_documento'],
-                notas=serializer.validated_data.get('notas', ''),
-                empresa=getattr(request, 'tenant', None)
-            )
+            try:
+                documento = DocumentoClinico.objects.create(
+                    codpaciente_id=codpaciente,
+                    idconsulta_id=serializer.validated_data.get('idconsulta'),
+                    idhistorialclinico_id=serializer.validated_data.get('idhistorialclinico'),
+                    tipo_documento=serializer.validated_data['tipo_documento'],
+                    nombre_archivo=archivo.name,
+                    url_s3=get_storage_gateway().url_publica(blob.key),
+                    s3_key=blob.key,
+                    blob=blob,
+                    tamanio_bytes=archivo.size,
+                    extension=extension.lstrip('.'),
+                    profesional_carga=self._usuario_profesional(request),
+                    fecha_documento=serializer.validated_data['fecha_documento'],
+                    notas=serializer.validated_data.get('notas', ''),
+                    empresa=getattr(request, 'tenant', None)
+                )
+            except Exception:
+                liberar_blob(blob.id)
+                raise
 
             # Registrar en bitácora
             self._crear_bitacora(
                 request,
                 'SUBIDA_DOCUMENTO',
-                f"Documento '{archivo.name}' subido para paciente ID {codpaciente}",
+                f"Documento '{archivo.name}' subido para paciente ID {codpaciente}"
+                + (" (contenido ya almacenado)" if duplicado else ""),
                 'DocumentoClinico',
                 str(documento.id)
             )
@@ -1877,6 +1933,243 @@ class DocumentoClinicoViewSet(ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['post'], url_path='upload/iniciar')
+    def iniciar_carga(self, request):
+        """
+        Fase 1 de la carga directa a S3 (el archivo no pasa por el servidor).
+        POST /api/documentos-clinicos/upload/iniciar/
+
+        Body: codpaciente, tipo_documento, fecha_documento, nombre_archivo,
+              content_type, tamanio, sha256 (hex) y opcionales idconsulta,
+              idhistorialclinico, notas.
+        Response (201): carga_id, key, expira_en y `upload` ({url, fields})
+        para hacer el POST multipart directamente a S3.
+        """
+        from .serializers import DocumentoClinicoCargaDirectaSerializer
+        from .services.cargas_directas import iniciar_carga, CargaDirectaError
+
+        if not getattr(request, 'tenant', None):
+            return Response({'error': 'No se pudo identificar la empresa (tenant)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = DocumentoClinicoCargaDirectaSerializer(data=request.data, context={'empresa': request.tenant})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        datos = serializer.validated_data
+
+        try:
+            carga, post = iniciar_carga(**self._datos_carga_directa(request, datos))
+        except CargaDirectaError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ClientError as e:
+            return Response({'error': f'Error al firmar la carga en S3: {str(e)}'},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # upload=None y duplicado=True: el contenido ya existe, llamar a completar
+        return Response({
+            'carga_id': str(carga.id),
+            'key': carga.s3_key,
+            'expira_en': carga.fecha_expiracion,
+            'upload': post,
+            'duplicado': post is None,
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='upload/multipart/iniciar')
+    def iniciar_carga_multipart(self, request):
+        """
+        Inicia una carga reanudable por partes (S3 multipart) para archivos
+        grandes (escaneos intraorales, panorámicas).
+        POST /api/documentos-clinicos/upload/multipart/iniciar/
+
+        Body: el mismo que upload/iniciar.
+        Response (201): carga_id, key, tamanio_parte, total_partes y expira_en.
+        Luego: pedir URLs con upload/multipart/partes, subir las partes en
+        paralelo (PUT), consultar upload/multipart/estado para reanudar y
+        cerrar con upload/completar.
+        """
+        from .serializers import DocumentoClinicoCargaDirectaSerializer
+        from .services.cargas_directas import iniciar_carga_multipart, CargaDirectaError
+
+        if not getattr(request, 'tenant', None):
+            return Response({'error': 'No se pudo identificar la empresa (tenant)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = DocumentoClinicoCargaDirectaSerializer(data=request.data, context={'empresa': request.tenant})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            carga = iniciar_carga_multipart(**self._datos_carga_directa(request, serializer.validated_data))
+        except CargaDirectaError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ClientError as e:
+            return Response({'error': f'Error al iniciar la carga en S3: {str(e)}'},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response({
+            'carga_id': str(carga.id),
+            'key': carga.s3_key,
+            'tamanio_parte': carga.tamanio_parte,
+            'total_partes': carga.total_partes,
+            'expira_en': carga.fecha_expiracion,
+            'duplicado': bool(carga.blob_id),
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='upload/multipart/partes')
+    def urls_partes_multipart(self, request):
+        """
+        URLs PUT firmadas para subir partes directo a S3 (en paralelo).
+        POST /api/documentos-clinicos/upload/multipart/partes/
+        Body: {"carga_id": "<uuid>", "partes": [1, 2, 3]}
+        Response: {"urls": {"1": "...", ...}}. Cada PUT devuelve un ETag que S3
+        registra; no hace falta reportarlo a la API.
+        """
+        from .models import CargaDirecta
+        from .serializers import PartesCargaMultipartSerializer
+        from .services.cargas_directas import obtener_carga_pendiente, urls_partes, CargaDirectaError
+
+        serializer = PartesCargaMultipartSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            carga = obtener_carga_pendiente(
+                serializer.validated_data['carga_id'],
+                getattr(request, 'tenant', None),
+                CargaDirecta.DESTINO_DOCUMENTO
+            )
+            urls = urls_partes(carga, serializer.validated_data['partes'])
+        except CargaDirectaError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'urls': {str(numero): url for numero, url in urls.items()}})
+
+    @action(detail=False, methods=['get'], url_path='upload/multipart/estado')
+    def estado_carga_multipart(self, request):
+        """
+        Partes ya recibidas por S3 y las faltantes, para reanudar tras un corte.
+        GET /api/documentos-clinicos/upload/multipart/estado/?carga_id=<uuid>
+        """
+        from .models import CargaDirecta
+        from .serializers import CompletarCargaDirectaSerializer
+        from .services.cargas_directas import obtener_carga_pendiente, estado_partes, CargaDirectaError
+
+        serializer = CompletarCargaDirectaSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            carga = obtener_carga_pendiente(
+                serializer.validated_data['carga_id'],
+                getattr(request, 'tenant', None),
+                CargaDirecta.DESTINO_DOCUMENTO
+            )
+            estado = estado_partes(carga)
+        except CargaDirectaError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ClientError as e:
+            return Response({'error': f'Error al consultar las partes en S3: {str(e)}'},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response(dict(estado, carga_id=str(carga.id), expira_en=carga.fecha_expiracion))
+
+    @action(detail=False, methods=['post'], url_path='upload/abortar')
+    def abortar_carga(self, request):
+        """
+        Cancela una carga directa pendiente y descarta lo subido a S3.
+        POST /api/documentos-clinicos/upload/abortar/   Body: {"carga_id": "<uuid>"}
+        """
+        from .models import CargaDirecta
+        from .serializers import CompletarCargaDirectaSerializer
+        from .services.cargas_directas import obtener_carga_pendiente, abortar_carga, CargaDirectaError
+
+        serializer = CompletarCargaDirectaSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            carga = obtener_carga_pendiente(
+                serializer.validated_data['carga_id'],
+                getattr(request, 'tenant', None),
+                CargaDirecta.DESTINO_DOCUMENTO
+            )
+        except CargaDirectaError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        abortar_carga(carga)
+        return Response({'message': 'Carga cancelada'})
+
+    @action(detail=False, methods=['post'], url_path='upload/completar')
+    def completar_carga(self, request):
+        """
+        Fase 2 de la carga directa: valida tamaño, tipo y hash del objeto en S3
+        y crea el DocumentoClinico. En cargas por partes, primero ensambla las
+        partes en S3 (falla con 400 si aún falta alguna) y responde 202 mientras
+        el hash se calcula en segundo plano; el cliente repite la llamada.
+        POST /api/documentos-clinicos/upload/completar/   Body: {"carga_id": "<uuid>"}
+        """
+        from .models import CargaDirecta, DocumentoClinico
+        from .serializers import CompletarCargaDirectaSerializer, DocumentoClinicoSerializer
+        from .services.cargas_directas import (
+            obtener_carga_por_completar, finalizar_carga, blob_de_carga, marcar_completada,
+            CargaDirectaError, CargaEnVerificacion
+        )
+
+        serializer = CompletarCargaDirectaSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        carga_id = serializer.validated_data['carga_id']
+        try:
+            carga = obtener_carga_por_completar(
+                carga_id,
+                getattr(request, 'tenant', None),
+                CargaDirecta.DESTINO_DOCUMENTO
+            )
+            finalizar_carga(carga)
+        except CargaEnVerificacion as e:
+            return Response(
+                {'carga_id': str(carga_id), 'estado': CargaDirecta.ESTADO_VERIFICANDO, 'message': str(e)},
+                status=status.HTTP_202_ACCEPTED
+            )
+        except CargaDirectaError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        gateway = get_storage_gateway()
+        datos = carga.metadatos
+        try:
+            with transaction.atomic():
+                blob = blob_de_carga(carga)
+                documento = DocumentoClinico.objects.create(
+                    codpaciente_id=datos['codpaciente'],
+                    idconsulta_id=datos.get('idconsulta'),
+                    idhistorialclinico_id=datos.get('idhistorialclinico'),
+                    tipo_documento=datos['tipo_documento'],
+                    nombre_archivo=carga.nombre_original,
+                    url_s3=gateway.url_publica(blob.key),
+                    s3_key=blob.key,
+                    blob=blob,
+                    tamanio_bytes=carga.tamanio_declarado,
+                    extension=os.path.splitext(carga.nombre_original)[1].lstrip('.').lower(),
+                    profesional_carga=carga.usuario,
+                    fecha_documento=datos['fecha_documento'],
+                    notas=datos.get('notas', ''),
+                    empresa=carga.empresa
+                )
+                marcar_completada(carga, documento.id)
+        except CargaDirectaError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        self._crear_bitacora(
+            request,
+            'SUBIDA_DOCUMENTO',
+            f"Documento '{carga.nombre_original}' subido (carga directa) para paciente ID {datos['codpaciente']}",
+            'DocumentoClinico',
+            str(documento.id)
+        )
+
+        return Response(DocumentoClinicoSerializer(documento).data, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['get'])
     def download_url(self, request, pk=None):
         """
@@ -1886,22 +2179,8 @@ class DocumentoClinicoViewSet(ModelViewSet):
         documento = self.get_object()
 
         try:
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_S3_REGION_NAME
-            )
-
-            # Generar URL firmada válida por 1 hora
-            url = s3_client.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
-                    'Key': documento.s3_key
-                },
-                ExpiresIn=3600  # 1 hora
-            )
+            # Generar URL firmada válida por 1 hora (reutiliza la cacheada si sigue vigente)
+            url = get_storage_gateway().url_firmada(documento.s3_key, expiracion=3600)
 
             # Registrar acceso en bitácora
             self._crear_bitacora(
@@ -1928,18 +2207,13 @@ class DocumentoClinicoViewSet(ModelViewSet):
         documento = self.get_object()
 
         try:
-            # Eliminar de S3
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_S3_REGION_NAME
-            )
-
-            s3_client.delete_object(
-                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-                Key=documento.s3_key
-            )
+            # Eliminar de S3 (original y derivados). Si el contenido es
+            # compartido, el post_delete libera la referencia y lo elimina
+            # solo si era la última (api/signals_blobs.py).
+            from .services.derivados_imagen import eliminar_derivados
+            if not documento.blob_id:
+                get_storage_gateway().eliminar(documento.s3_key)
+                eliminar_derivados(documento)
 
             # Registrar en bitácora antes de eliminar
             self._crear_bitacora(
@@ -2068,6 +2342,41 @@ class DocumentoClinicoViewSet(ModelViewSet):
         except Exception:
             pass  # No fallar si hay error en bitácora
 
+    def _usuario_profesional(self, request):
+        """Usuario (modelo de negocio) del usuario autenticado, o None."""
+        if request.user.is_authenticated:
+            try:
+                return Usuario.objects.get(correoelectronico__iexact=request.user.email)
+            except Usuario.DoesNotExist:
+                pass
+        return None
+
+    def _datos_carga_directa(self, request, datos):
+        """Argumentos comunes para iniciar una carga directa (simple o por partes)."""
+        from .models import CargaDirecta
+
+        def pk(instancia):
+            return instancia.pk if instancia is not None else None
+
+        return {
+            'empresa': request.tenant,
+            'usuario': self._usuario_profesional(request),
+            'destino': CargaDirecta.DESTINO_DOCUMENTO,
+            'nombre': datos['nombre_archivo'],
+            'content_type': datos['content_type'],
+            'tamanio': datos['tamanio'],
+            'sha256': datos['sha256'],
+            'codpaciente': datos['codpaciente'].pk,
+            'metadatos': {
+                'codpaciente': datos['codpaciente'].pk,
+                'idconsulta': pk(datos.get('idconsulta')),
+                'idhistorialclinico': pk(datos.get('idhistorialclinico')),
+                'tipo_documento': datos['tipo_documento'],
+                'fecha_documento': str(datos['fecha_documento']),
+                'notas': datos.get('notas', ''),
+            },
+        }
+
     def _get_client_ip(self, request):
         """Obtener IP del cliente"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -2081,11 +2390,13 @@ class DocumentoClinicoViewSet(ModelViewSet):
 # ============================================================================
 # REPORTES
 # ============================================================================
-class ReporteViewSet(viewsets.ViewSet):
+class ReporteViewSet(LecturaReplicaMixin, viewsets.ViewSet):
     """
-    ViewSet para generar reportes administrativos
+    ViewSet para generar reportes administrativos (lecturas en la réplica si
+    está configurada)
     """
     permission_classes = [IsAuthenticated]
+    acciones_replica = ('list', 'estadisticas')
     
     def list(self, request):
         """Lista todas las consultas para reportes con filtros"""
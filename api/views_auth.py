@@ -8,7 +8,7 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.core.mail import EmailMultiAlternatives
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 from django.conf import settings
-from django.db import transaction, IntegrityError, DatabaseError, connection
+from django.db import transaction, IntegrityError, DatabaseError, close_old_connections
 from django.utils import timezone
 from django.db.models import Q
 
@@ -56,9 +56,12 @@ def _client_ip(request):
 
 
 def close_db_connection():
-    """Cerrar conexión de DB de forma segura"""
+    """
+    Descartar la conexión de DB solo si quedó inutilizable o superó su vida
+    útil. Las conexiones sanas se conservan (pool / CONN_MAX_AGE).
+    """
     try:
-        connection.close()
+        close_old_connections()
     except Exception:
         pass
 
@@ -253,9 +256,6 @@ def auth_login(request):
             logger.warning(f"❌ Login fallido: email o password vacío")
             return Response({"detail": "Email y contraseña son requeridos"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Cerrar cualquier conexión previa
-        close_db_connection()
-
         # Autenticación básica contra auth_user
         user = authenticate(username=email, password=password)
 
@@ -605,6 +605,8 @@ def password_reset_confirm(request):
             # Cambiar contraseña
             user.set_password(new_password)
             user.save()
+            # Cerrar las sesiones por token abiertas con la contraseña anterior
+            Token.objects.filter(user=user).delete()
 
             return Response({"detail": "Contraseña restablecida correctamente"})
 
@@ -0,0 +1,160 @@
+# api/views_batch.py
+"""
+Endpoint de lote para el arranque de la app móvil.
+
+La app pide al iniciar varios recursos (usuario, preferencias, consultas
+próximas, notificaciones, planes activos, catálogos). En vez de N peticiones
+HTTP que pasan cada una por todo el stack de middleware (tenant, routing,
+token), las agrupa en una:
+
+    POST /api/batch/
+    {"solicitudes": [
+        {"id": "yo", "url": "/api/usuario/me"},
+        {"id": "consultas", "url": "/api/consultas/?fields=id,fecha,estado"}
+    ]}
+
+    200 {"respuestas": [
+        {"id": "yo", "estado": 200, "cuerpo": {...}},
+        {"id": "consultas", "estado": 200, "cuerpo": {...}}
+    ]}
+
+Cada sub-petición se resuelve contra el URLconf del tenant y se ejecuta en
+proceso, en orden, con el tenant, el usuario y el token ya resueltos por la
+petición externa y sobre la misma conexión a la base. Solo se admiten GET:
+un error en una sub-petición queda en su `estado` y no afecta a las demás.
+"""
+import json
+import logging
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_API = '/api/'
+RUTA_BATCH = '/api/batch/'
+
+
+def construir_subpeticion(request, ruta, query_string):
+    """
+    HttpRequest GET para `ruta` que hereda de la petición externa las
+    cabeceras, el tenant, el URLconf y la autenticación (DRF usa el usuario y
+    el token forzados en vez de volver a buscar el token).
+    """
+    original = request._request
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = ruta
+    sub.META = {
+        **original.META,
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': ruta,
+        'QUERY_STRING': query_string,
+    }
+    sub.META.pop('CONTENT_TYPE', None)
+    sub.META.pop('CONTENT_LENGTH', None)
+    sub.GET = QueryDict(query_string)
+    sub.COOKIES = original.COOKIES
+    for atributo in ('tenant', 'urlconf', 'session'):
+        if hasattr(original, atributo):
+            setattr(sub, atributo, getattr(original, atributo))
+    sub.user = request.user
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def cuerpo_de_respuesta(response):
+    """Cuerpo de una respuesta de Django: JSON decodificado o texto."""
+    if getattr(response, 'streaming', False):
+        return None
+    contenido = response.content
+    if 'json' in response.get('Content-Type', ''):
+        try:
+            return json.loads(contenido)
+        except ValueError:
+            pass
+    return contenido.decode(response.charset or 'utf-8', errors='replace')
+
+
+def ejecutar_subpeticion(request, url):
+    """(estado, cuerpo) de un GET a `url` ejecutado en proceso."""
+    partes = urlsplit(url)
+    ruta = partes.path
+    if not ruta.startswith(PREFIJO_API) or ruta.rstrip('/') == RUTA_BATCH.rstrip('/'):
+        return status.HTTP_400_BAD_REQUEST, {'detail': f'URL no permitida en un lote: {url}'}
+
+    sub = construir_subpeticion(request, ruta, partes.query)
+    try:
+        match = resolve(ruta, urlconf=getattr(sub, 'urlconf', None))
+    except Resolver404:
+        return status.HTTP_404_NOT_FOUND, {'detail': 'No encontrado.'}
+    sub.resolver_match = match
+
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+    except Http404:
+        return status.HTTP_404_NOT_FOUND, {'detail': 'No encontrado.'}
+    except PermissionDenied:
+        return status.HTTP_403_FORBIDDEN, {'detail': 'Permiso denegado.'}
+    except Exception:
+        logger.exception("[batch] Error en sub-petición %s", url)
+        return status.HTTP_500_INTERNAL_SERVER_ERROR, {'detail': 'Error interno.'}
+
+    if hasattr(response, 'data'):
+        # No hace falta renderizar: el renderer de la respuesta del lote serializa `data`
+        return response.status_code, response.data
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return response.status_code, cuerpo_de_respuesta(response)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch(request):
+    """
+    Ejecuta una lista de GET en una sola petición (ver docstring del módulo).
+    """
+    if getattr(request, 'tenant', None) is None:
+        return Response(
+            {'detail': 'El lote requiere un tenant (X-Tenant-Subdomain).'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    solicitudes = request.data.get('solicitudes') if isinstance(request.data, dict) else None
+    if not isinstance(solicitudes, list) or not solicitudes:
+        return Response(
+            {'detail': "Se esperaba 'solicitudes': una lista de {id, url}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    maximo = settings.BATCH_MAX_SUBREQUESTS
+    if len(solicitudes) > maximo:
+        return Response(
+            {'detail': f'Máximo {maximo} sub-peticiones por lote.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    respuestas = []
+    for indice, solicitud in enumerate(solicitudes):
+        if not isinstance(solicitud, dict) or not isinstance(solicitud.get('url'), str):
+            respuestas.append({
+                'id': indice,
+                'estado': status.HTTP_400_BAD_REQUEST,
+                'cuerpo': {'detail': "Cada sub-petición necesita 'url'."},
+            })
+            continue
+        metodo = str(solicitud.get('metodo', 'GET')).upper()
+        if metodo != 'GET':
+            estado, cuerpo = status.HTTP_405_METHOD_NOT_ALLOWED, {'detail': 'Solo se admiten GET en un lote.'}
+        else:
+            estado, cuerpo = ejecutar_subpeticion(request, solicitud['url'])
+        respuestas.append({'id': solicitud.get('id', indice), 'estado': estado, 'cuerpo': cuerpo})
+
+    return Response({'respuestas': respuestas})
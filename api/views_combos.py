@@ -5,12 +5,13 @@ Implementa SP3-T007: Crear paquete o combo de servicios (web)
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication, SessionAuthentication
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db import transaction, models
 from decimal import Decimal
 
+from .auth_token import CachedTokenAuth
 from .models import ComboServicio, ComboServicioDetalle, Bitacora
 from .serializers_combos import (
     ComboServicioSerializer,
@@ -49,7 +50,7 @@ class ComboServicioViewSet(viewsets.ModelViewSet):
     - POST /combos/{id}/desactivar/ - Desactivar combo
     """
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuth, SessionAuthentication]
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['nombre', 'descripcion']
@@ -5,6 +5,8 @@ SP3-T008 - FASE 5: Backend Upload de Evidencias
 
 Endpoints:
 - POST /api/upload/evidencias/ - Subir archivo
+- POST /api/upload/evidencias/iniciar/ - Carga directa a S3 (fase 1: presigned POST)
+- POST /api/upload/evidencias/completar/ - Carga directa a S3 (fase 2: validar y registrar)
 - DELETE /api/upload/evidencias/<id>/ - Eliminar evidencia
 """
 from rest_framework import status
@@ -13,11 +15,25 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.core.files.uploadedfile import UploadedFile
 from django.conf import settings
-from .models import Evidencia, Bitacora
+from django.db import transaction
+from botocore.exceptions import ClientError
+from .models import Evidencia, Bitacora, BlobAlmacenado, CargaDirecta, Usuario
+from .serializers import CompletarCargaDirectaSerializer
 from .serializers_evidencias import (
     EvidenciaSerializer,
     EvidenciaUploadSerializer,
-    EvidenciaResponseSerializer
+    EvidenciaResponseSerializer,
+    EvidenciaCargaDirectaSerializer
+)
+from .services.blobs import obtener_o_subir_blob, liberar_blob
+from .services.cargas_directas import (
+    iniciar_carga,
+    obtener_carga_por_completar,
+    finalizar_carga,
+    blob_de_carga,
+    marcar_completada,
+    CargaDirectaError,
+    CargaEnVerificacion
 )
 import os
 
@@ -103,9 +119,8 @@ def upload_evidencia(request):
         )
     
     # Validar que existe usuario asociado
-    try:
-        usuario = request.user.usuario
-    except AttributeError:
+    usuario = obtener_usuario_negocio(request)
+    if usuario is None:
         return Response(
             {'error': 'Usuario no encontrado'},
             status=status.HTTP_400_BAD_REQUEST
@@ -131,17 +146,31 @@ def upload_evidencia(request):
         )
     
     try:
-        # Crear registro de evidencia
-        evidencia = Evidencia.objects.create(
-            archivo=file,
-            nombre_original=file.name,
-            tipo=tipo,
-            mimetype=file.content_type,
-            tamanio=file.size,
-            usuario=usuario,
+        # Contenido direccionado por SHA-256: un archivo repetido reutiliza
+        # el blob existente del tenant en lugar de guardarse otra vez
+        blob, duplicado = obtener_o_subir_blob(
             empresa=request.tenant,
-            ip_subida=obtener_ip_cliente(request)
+            archivo=file,
+            content_type=file.content_type,
+            ubicacion=BlobAlmacenado.UBICACION_LOCAL
         )
+
+        # Crear registro de evidencia
+        try:
+            evidencia = Evidencia.objects.create(
+                archivo=blob.key,
+                blob=blob,
+                nombre_original=file.name,
+                tipo=tipo,
+                mimetype=file.content_type,
+                tamanio=file.size,
+                usuario=usuario,
+                empresa=request.tenant,
+                ip_subida=obtener_ip_cliente(request)
+            )
+        except Exception:
+            liberar_blob(blob.id)
+            raise
         
         # Registrar en bitácora
         Bitacora.objects.create(
@@ -150,7 +179,10 @@ def upload_evidencia(request):
             accion="SUBIR_EVIDENCIA",
             tabla_afectada="evidencias",
             registro_id=evidencia.id,
-            valores_nuevos={'mensaje': f"Archivo: {file.name} ({file.size} bytes, {file.content_type})"},
+            valores_nuevos={'mensaje': (
+                f"Archivo: {file.name} ({file.size} bytes, {file.content_type})"
+                + (" - contenido ya almacenado" if duplicado else "")
+            )},
             ip_address=obtener_ip_cliente(request),
             user_agent=request.META.get('HTTP_USER_AGENT', '')
         )
@@ -185,6 +217,175 @@ def upload_evidencia(request):
         )
 
 
+def obtener_usuario_negocio(request):
+    """
+    Usuario (modelo de negocio) del request: perfil enlazado si existe,
+    si no, búsqueda por correo del usuario autenticado.
+    """
+    usuario = getattr(request.user, 'usuario', None)
+    if usuario is not None:
+        return usuario
+    email = getattr(request.user, 'email', None)
+    if not email:
+        return None
+    return Usuario.objects.filter(correoelectronico__iexact=email).first()
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def iniciar_carga_evidencia(request):
+    """
+    Fase 1 de la carga directa: devuelve un presigned POST para subir la
+    evidencia directamente a S3, sin pasar el archivo por el servidor.
+
+    POST /api/upload/evidencias/iniciar/
+
+    Body (JSON):
+        - nombre_archivo, content_type, tamanio (bytes), sha256 (hex)
+        - tipo (opcional, default: 'evidencia_sesion')
+
+    Response Success (201):
+        {
+            "carga_id": "<uuid>",
+            "key": "tenants/<empresa>/evidencias/...",
+            "expira_en": "...",
+            "upload": {"url": "...", "fields": {...}}
+        }
+    """
+    if not hasattr(request, 'tenant') or not request.tenant:
+        return Response(
+            {'error': 'No se pudo identificar la empresa (tenant)'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    usuario = obtener_usuario_negocio(request)
+    if usuario is None:
+        return Response(
+            {'error': 'Usuario no encontrado'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    serializer = EvidenciaCargaDirectaSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    datos = serializer.validated_data
+
+    try:
+        carga, post = iniciar_carga(
+            empresa=request.tenant,
+            usuario=usuario,
+            destino=CargaDirecta.DESTINO_EVIDENCIA,
+            nombre=datos['nombre_archivo'],
+            content_type=datos['content_type'],
+            tamanio=datos['tamanio'],
+            sha256=datos['sha256'],
+            metadatos={
+                'tipo': datos.get('tipo', 'evidencia_sesion'),
+                'ip_subida': obtener_ip_cliente(request),
+            },
+        )
+    except CargaDirectaError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ClientError as e:
+        return Response(
+            {'error': 'Error al firmar la carga en S3', 'detail': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    return Response(
+        {
+            'carga_id': str(carga.id),
+            'key': carga.s3_key,
+            'expira_en': carga.fecha_expiracion,
+            'upload': post,
+            'duplicado': post is None,
+        },
+        status=status.HTTP_201_CREATED
+    )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def completar_carga_evidencia(request):
+    """
+    Fase 2 de la carga directa: valida tamaño, tipo y hash del objeto en S3
+    y crea la Evidencia.
+
+    POST /api/upload/evidencias/completar/
+
+    Body (JSON): {"carga_id": "<uuid>"}
+
+    Response Success (201): mismo formato que POST /api/upload/evidencias/
+    Response (202): el hash se está calculando en segundo plano; repetir la llamada
+    """
+    if not hasattr(request, 'tenant') or not request.tenant:
+        return Response(
+            {'error': 'No se pudo identificar la empresa (tenant)'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    serializer = CompletarCargaDirectaSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    carga_id = serializer.validated_data['carga_id']
+    try:
+        carga = obtener_carga_por_completar(carga_id, request.tenant, CargaDirecta.DESTINO_EVIDENCIA)
+        finalizar_carga(carga)
+    except CargaEnVerificacion as e:
+        return Response(
+            {'carga_id': str(carga_id), 'estado': CargaDirecta.ESTADO_VERIFICANDO, 'message': str(e)},
+            status=status.HTTP_202_ACCEPTED
+        )
+    except CargaDirectaError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with transaction.atomic():
+            # El objeto ya está en S3: solo se registra su key en el FileField
+            blob = blob_de_carga(carga)
+            evidencia = Evidencia.objects.create(
+                archivo=blob.key,
+                blob=blob,
+                nombre_original=carga.nombre_original,
+                tipo=carga.metadatos.get('tipo', 'evidencia_sesion'),
+                mimetype=carga.content_type,
+                tamanio=carga.tamanio_declarado,
+                usuario=carga.usuario,
+                empresa=request.tenant,
+                ip_subida=carga.metadatos.get('ip_subida')
+            )
+            marcar_completada(carga, evidencia.id)
+
+            Bitacora.objects.create(
+                empresa=request.tenant,
+                usuario=carga.usuario,
+                accion="SUBIR_EVIDENCIA",
+                tabla_afectada="evidencias",
+                registro_id=evidencia.id,
+                valores_nuevos={'mensaje': (
+                    f"Archivo: {carga.nombre_original} ({carga.tamanio_declarado} bytes, "
+                    f"{carga.content_type}) - carga directa"
+                )},
+                ip_address=obtener_ip_cliente(request),
+                user_agent=request.META.get('HTTP_USER_AGENT', '')
+            )
+    except CargaDirectaError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    evidencia_serializer = EvidenciaSerializer(evidencia, context={'request': request})
+    return Response(
+        {
+            'url': evidencia_serializer.data['url'],
+            'filename': evidencia.nombre_original,
+            'size': evidencia.tamanio,
+            'type': evidencia.mimetype,
+            'id': evidencia.id,
+        },
+        status=status.HTTP_201_CREATED
+    )
+
+
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def delete_evidencia(request, evidencia_id):
@@ -210,9 +411,8 @@ def delete_evidencia(request, evidencia_id):
         )
     
     # Validar que existe usuario asociado
-    try:
-        usuario = request.user.usuario
-    except AttributeError:
+    usuario = obtener_usuario_negocio(request)
+    if usuario is None:
         return Response(
             {'error': 'Usuario no encontrado'},
             status=status.HTTP_400_BAD_REQUEST
@@ -20,6 +20,7 @@ from .serializers_notifications import (
     PreferenciasUsuarioSerializer, ActualizarPreferenciasSerializer,
     EnviarNotificacionSerializer
 )
+from .pagination import PaginacionHibrida
 from .services.notification_service import notification_service
 
 
@@ -130,9 +131,12 @@ class DispositivoMovilViewSet(ModelViewSet):
 class HistorialNotificacionViewSet(ReadOnlyModelViewSet):
     """
     ViewSet para consultar el historial de notificaciones del usuario
+    (`?paginacion=cursor` para scroll infinito)
     """
     serializer_class = HistorialNotificacionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionHibrida
+    orden_cursor = ('-fecha_creacion', '-id')
 
     def get_queryset(self):
         queryset = HistorialNotificacion.objects.filter(
@@ -195,7 +199,8 @@ class HistorialNotificacionViewSet(ReadOnlyModelViewSet):
                 estado__in=['enviado', 'entregado']
             ).update(
                 estado='leido',
-                fecha_lectura=notification_service._obtener_timezone_now()
+                fecha_lectura=notification_service._obtener_timezone_now(),
+                fecha_modificacion=notification_service._obtener_timezone_now(),
             )
 
             return Response(
@@ -15,7 +15,7 @@ from decimal import Decimal
 import json
 import logging
 
-from .models import PagoEnLinea, DetallePagoItem, ComprobanteDigital
+from .models import PagoEnLinea, DetallePagoItem, ComprobanteDigital, EventoWebhookStripe
 from .serializers_pagos import (
     PagoEnLineaSerializer,
     PagoEnLineaListSerializer,
@@ -26,6 +26,7 @@ from .serializers_pagos import (
 )
 from .services.stripe_payment_service import StripePaymentService
 from .services.calculador_pagos import CalculadorPagos
+from .services.webhooks_stripe import registrar_evento
 
 logger = logging.getLogger(__name__)
 
@@ -353,6 +354,10 @@ def stripe_webhook(request):
     """
     Endpoint para recibir webhooks de Stripe.
     
+    Solo verifica la firma, guarda el evento en la bandeja
+    (EventoWebhookStripe) y responde; el procesamiento es asíncrono
+    (api/services/webhooks_stripe.py). Un evento repetido no se reprocesa.
+    
     Eventos manejados:
     - payment_intent.succeeded: Pago exitoso
     - payment_intent.payment_failed: Pago fallido
@@ -374,36 +379,15 @@ def stripe_webhook(request):
         logger.warning(f"Webhook con firma inválida: {mensaje}")
         return HttpResponse(mensaje, status=400)
     
-    # Procesar evento
-    event_type = event['type']
-    event_data = event['data']['object']
-    
-    logger.info(f"Webhook recibido: {event_type} - {event_data.get('id')}")
+    # Guardar el JSON recibido tal cual (ya verificado) y responder
+    evento, creado = registrar_evento(json.loads(payload), EventoWebhookStripe.ORIGEN_PAGOS)
     
-    try:
-        if event_type == 'payment_intent.succeeded':
-            exito, mensaje = StripePaymentService.procesar_webhook_payment_intent_succeeded(event_data)
-            
-        elif event_type == 'payment_intent.payment_failed':
-            exito, mensaje = StripePaymentService.procesar_webhook_payment_intent_failed(event_data)
-            
-        elif event_type == 'charge.refunded':
-            exito, mensaje = StripePaymentService.procesar_webhook_charge_refunded(event_data)
-            
-        else:
-            logger.info(f"Evento no manejado: {event_type}")
-            return HttpResponse('Evento no manejado', status=200)
-        
-        if exito:
-            logger.info(f"Webhook procesado exitosamente: {mensaje}")
-            return HttpResponse(mensaje, status=200)
-        else:
-            logger.error(f"Error procesando webhook: {mensaje}")
-            return HttpResponse(mensaje, status=400)
+    if not creado:
+        logger.info(f"Webhook duplicado: {evento.tipo} - {evento.event_id}")
+        return HttpResponse('Evento ya recibido', status=200)
     
-    except Exception as e:
-        logger.exception(f"Error inesperado procesando webhook {event_type}")
-        return HttpResponse(f'Error: {str(e)}', status=500)
+    logger.info(f"Webhook recibido: {evento.tipo} - {evento.event_id}")
+    return HttpResponse('Evento recibido', status=200)
 
 
 @api_view(['GET'])
@@ -14,6 +14,8 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+from .mixins import CamposDinamicosViewMixin
+from .services.creacion_masiva import clonar_items_plan, notificar_odontologo
 from .models import (
     Plandetratamiento,
     Itemplandetratamiento,
@@ -49,7 +51,7 @@ def get_user_agent(request):
     return request.META.get('HTTP_USER_AGENT', '')
 
 
-class PlanTratamientoViewSet(viewsets.ModelViewSet):
+class PlanTratamientoViewSet(CamposDinamicosViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión completa de planes de tratamiento.
     
@@ -64,8 +66,23 @@ class PlanTratamientoViewSet(viewsets.ModelViewSet):
     - Odontólogos: Crear, editar (borrador), aprobar sus propios planes
     - Administradores: CRUD completo sobre todos los planes
     - Pacientes: Solo lectura de sus propios planes
+
+    Las lecturas admiten `?fields=` y `?expand=items`.
     """
     permission_classes = [IsAuthenticated]
+    select_related_campos = {
+        'paciente': ('codpaciente__codusuario',),
+        'paciente_nombre': ('codpaciente__codusuario',),
+        'odontologo': ('cododontologo__codusuario',),
+        'odontologo_nombre': ('cododontologo__codusuario',),
+        'usuario_aprueba_nombre': ('usuario_aprueba',),
+        'usuario_acepta_nombre': ('usuario_acepta',),
+    }
+    prefetch_related_campos = {
+        'items': ('itemplandetratamiento_set',),
+        'cantidad_items': ('itemplandetratamiento_set',),
+        'estadisticas': ('itemplandetratamiento_set',),
+    }
     
     def get_queryset(self):
         """Filtra planes según el usuario y empresa."""
@@ -980,32 +997,9 @@ class PlanTratamientoViewSet(viewsets.ModelViewSet):
             subtotal_calculado=0,
         )
         
-        # Clonar ítems si se solicita
-        items_clonados = 0
-        if clonar_items:
-            items_originales = plan_original.itemplandetratamiento_set.exclude(
-                estado_item__in=['Cancelado', 'cancelado']
-            )
-            
-            for item_orig in items_originales:
-                Itemplandetratamiento.objects.create(
-                    idplantratamiento=plan_nuevo,
-                    idservicio=item_orig.idservicio,
-                    idpiezadental=item_orig.idpiezadental,
-                    idestado=item_orig.idestado,
-                    empresa=request.tenant,
-                    costofinal=item_orig.costofinal,
-                    costo_base_servicio=item_orig.costo_base_servicio,
-                    fecha_objetivo=None,  # Resetear fecha
-                    tiempo_estimado=item_orig.tiempo_estimado,
-                    estado_item=Itemplandetratamiento.ESTADO_PENDIENTE,  # Resetear a pendiente
-                    notas_item=item_orig.notas_item,
-                    orden=item_orig.orden,
-                )
-                items_clonados += 1
-            
-            # Recalcular totales
-            plan_nuevo.calcular_totales()
+        # Clonar ítems si se solicita: un solo INSERT y un solo recálculo de totales
+        items_nuevos = clonar_items_plan(plan_original, plan_nuevo) if clonar_items else []
+        items_clonados = len(items_nuevos)
         
         # Registrar en bitácora
         Bitacora.objects.create(
@@ -1020,10 +1014,24 @@ class PlanTratamientoViewSet(viewsets.ModelViewSet):
                 'plan_original_id': plan_original.id,
                 'plan_nuevo_id': plan_nuevo.id,
                 'items_clonados': items_clonados,
+                'items_ids': [item.id for item in items_nuevos],
                 'paciente_nuevo': str(paciente.codusuario),
             }
         )
         
+        notificar_odontologo(
+            odontologo,
+            titulo='📋 Plan de tratamiento clonado',
+            mensaje=f'Se creó el plan #{plan_nuevo.id} a partir del plan #{plan_original.id} con {items_clonados} ítems.',
+            tipo_nombre='plan_clonado',
+            data={
+                'plan_id': plan_nuevo.id,
+                'plan_original_id': plan_original.id,
+                'items_clonados': items_clonados,
+                'total': str(plan_nuevo.montototal),
+            },
+        )
+        
         # Respuesta exitosa
         return Response({
             'success': True,
@@ -30,6 +30,7 @@ from .permissions_presupuesto import (
     PresupuestoListRateThrottle,
 )
 
+from .mixins import CamposDinamicosViewMixin
 from .models import (
     PresupuestoDigital,
     ItemPresupuestoDigital,
@@ -51,7 +52,7 @@ from .serializers_presupuesto_digital import (
 
 
 
-class PresupuestoDigitalViewSet(viewsets.ModelViewSet):
+class PresupuestoDigitalViewSet(CamposDinamicosViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar presupuestos digitales.
     
@@ -65,6 +66,8 @@ class PresupuestoDigitalViewSet(viewsets.ModelViewSet):
     - GET /api/presupuestos-digitales/{id}/vigencia/ - Verificar vigencia
     - POST /api/presupuestos-digitales/{id}/generar-pdf/ - Generar PDF del presupuesto
     - GET /api/presupuestos-digitales/planes-disponibles/ - Listar planes aprobados sin presupuesto
+
+    Las lecturas admiten `?fields=` y `?expand=items`.
     """
     permission_classes = [AllowAny]  # Por defecto AllowAny, se sobrescribe en get_permissions()
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -72,6 +75,21 @@ class PresupuestoDigitalViewSet(viewsets.ModelViewSet):
     search_fields = ['codigo_presupuesto', 'notas', 'terminos_condiciones']
     ordering_fields = ['fecha_emision', 'fecha_vigencia', 'total']
     ordering = ['-fecha_emision']
+    select_related_campos = {
+        'paciente': ('plan_tratamiento__codpaciente__codusuario',),
+        'paciente_nombre': ('plan_tratamiento__codpaciente__codusuario',),
+        'odontologo': ('plan_tratamiento__cododontologo__codusuario',),
+        'odontologo_nombre': ('plan_tratamiento__cododontologo__codusuario',),
+        'plan_detalle': ('plan_tratamiento',),
+        'usuario_emite_nombre': ('usuario_emite',),
+    }
+    prefetch_related_campos = {
+        'items': (
+            'items_presupuesto__item_plan__idservicio',
+            'items_presupuesto__item_plan__idpiezadental',
+        ),
+        'cantidad_items': ('items_presupuesto',),
+    }
     
     def get_permissions(self):
         """
@@ -0,0 +1,64 @@
+# api/views_sincronizacion.py
+"""
+Sincronización incremental para la app móvil (ver api/services/sincronizacion.py).
+
+    GET /api/sync/?entidades=consultas,planes&watermark=<token>&limite=200
+"""
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .models import Paciente, Usuario
+from .services.sincronizacion import (
+    ENTIDADES, ContextoSincronizacion, WatermarkInvalido, sincronizar as sincronizar_cambios,
+)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sincronizar(request):
+    """
+    Cambios y bajas desde la marca de agua del cliente. Sin `watermark`
+    devuelve todo (primera sincronización); sin `entidades`, todas.
+    """
+    empresa = getattr(request, 'tenant', None)
+    if empresa is None:
+        return Response(
+            {'detail': 'La sincronización requiere un tenant (X-Tenant-Subdomain).'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    usuario = Usuario.objects.filter(
+        correoelectronico__iexact=request.user.email, empresa=empresa
+    ).first()
+    if usuario is None:
+        return Response({'detail': 'Usuario no encontrado en la clínica.'}, status=status.HTTP_403_FORBIDDEN)
+
+    param = request.query_params.get('entidades')
+    nombres = [n.strip() for n in param.split(',') if n.strip()] if param else list(ENTIDADES)
+    desconocidas = [n for n in nombres if n not in ENTIDADES]
+    if desconocidas:
+        return Response(
+            {'detail': f"Entidades desconocidas: {', '.join(desconocidas)}", 'disponibles': list(ENTIDADES)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        limite = int(request.query_params.get('limite', 0)) or None
+    except ValueError:
+        return Response({'detail': "'limite' debe ser un entero."}, status=status.HTTP_400_BAD_REQUEST)
+
+    ctx = ContextoSincronizacion(
+        empresa=empresa,
+        usuario=usuario,
+        paciente=Paciente.objects.filter(codusuario=usuario).first(),
+    )
+    try:
+        datos = sincronizar_cambios(
+            ctx, nombres,
+            watermark=request.query_params.get('watermark') or None,
+            limite=limite,
+            serializer_context={'request': request},
+        )
+    except WatermarkInvalido:
+        return Response({'detail': 'Watermark inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(datos)
@@ -11,13 +11,15 @@ from django.conf import settings
 from django.db import transaction
 from django.contrib.auth.hashers import make_password
 from django.core.mail import send_mail
+import json
 import secrets
 import string
 import stripe
 
-from .models import Empresa, Usuario, Tipodeusuario
+from .models import Empresa, EventoWebhookStripe, Usuario, Tipodeusuario
 from .serializers import RegistroEmpresaSerializer, EmpresaPublicSerializer
 from .views_saas import generar_password_temporal
+from .services.webhooks_stripe import registrar_evento
 
 # Configurar Stripe con la clave secreta
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -396,12 +398,15 @@ def stripe_webhook(request):
     Webhook para recibir eventos de Stripe (pagos, suscripciones, etc.)
 
     POST /api/public/stripe-webhook/
+
+    Verifica la firma, guarda el evento en la bandeja y responde; los
+    eventos se procesan de forma asíncrona (api/services/webhooks_stripe.py).
     """
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
 
     try:
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
         )
     except ValueError:
@@ -409,26 +414,6 @@ def stripe_webhook(request):
     except stripe.SignatureVerificationError:
         return Response({"error": "Invalid signature"}, status=400)
 
-    # Manejar diferentes tipos de eventos
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-        # Aquí puedes actualizar el estado de la empresa si es necesario
-        print(f"Payment succeeded: {payment_intent['id']}")
-
-    elif event['type'] == 'customer.subscription.deleted':
-        subscription = event['data']['object']
-        # Desactivar empresa cuando se cancela la suscripción
-        try:
-            empresa = Empresa.objects.get(stripe_subscription_id=subscription['id'])
-            empresa.activo = False
-            empresa.save()
-            print(f"Suscripción cancelada para empresa: {empresa.nombre}")
-        except Empresa.DoesNotExist:
-            pass
-
-    elif event['type'] == 'invoice.payment_failed':
-        invoice = event['data']['object']
-        # Notificar al cliente que el pago falló
-        print(f"Payment failed: {invoice['id']}")
-
-    return Response({"status": "success"}, status=200)
\ No newline at end of file
+    _, creado = registrar_evento(json.loads(payload), EventoWebhookStripe.ORIGEN_SUSCRIPCIONES)
+
+    return Response({"status": "success" if creado else "duplicate"}, status=200)
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mensajechatbot',
+            index=models.Index(fields=['created_at'], name='idx_mensaje_fecha'),
+        ),
+    ]
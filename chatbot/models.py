@@ -160,6 +160,7 @@ class MensajeChatbot(models.Model):
         indexes = [
             models.Index(fields=['conversacion'], name='idx_mensaje_conv'),
             models.Index(fields=['role'], name='idx_mensaje_role'),
+            models.Index(fields=['created_at'], name='idx_mensaje_fecha'),
         ]
     
     def __str__(self):
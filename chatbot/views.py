@@ -19,10 +19,11 @@ from .serializers import (
     EstadisticasChatbotSerializer
 )
 from .services import OpenAIService, evaluar_urgencia
+from api.mixins import LecturaReplicaMixin
 from api.models import Paciente, Odontologo, Consulta
 
 
-class ChatbotViewSet(viewsets.ViewSet):
+class ChatbotViewSet(LecturaReplicaMixin, viewsets.ViewSet):
     """
     ViewSet para interactuar con el chatbot.
     
@@ -34,6 +35,7 @@ class ChatbotViewSet(viewsets.ViewSet):
     """
     
     permission_classes = []  # Permitir acceso público (anónimo)
+    acciones_replica = ('estadisticas',)  # lecturas en la réplica si está configurada
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
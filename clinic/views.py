@@ -15,6 +15,7 @@ from .serializers import (
     PiezadentalSerializer
 )
 from .filters import ServicioFilter
+from api.mixins import CacheCatalogoMixin
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -93,7 +94,7 @@ class OdontologoViewSet(viewsets.ModelViewSet):
         else:
             raise PermissionError("Tenant requerido para crear odontólogo")
 
-class ServicioViewSet(viewsets.ModelViewSet):
+class ServicioViewSet(CacheCatalogoMixin, viewsets.ModelViewSet):
     """
     ViewSet para catálogo de servicios - ACCESO PÚBLICO PARA CONSULTA
     
@@ -117,6 +118,7 @@ class ServicioViewSet(viewsets.ModelViewSet):
     search_fields = ['nombre', 'descripcion']
     ordering_fields = ['nombre', 'costobase', 'duracion', 'fecha_creacion']
     ordering = ['nombre']  # Ordenamiento por defecto
+    catalogo = 'servicios'  # ETag/304 y caché en list y retrieve (api/mixins.py)
 
     def get_permissions(self):
         """
@@ -172,6 +172,8 @@ MIDDLEWARE = [
     "api.middleware_admin_diagnostic.AdminTenantDiagnosticMiddleware",
     # Multi-tenancy: Enrutamiento dinámico (después de TenantMiddleware)
     "dental_clinic_backend.middleware_routing.TenantRoutingMiddleware",
+    # Read-your-writes de la réplica de lectura (api/db_router.py)
+    "api.middleware_replica.ReplicaStickinessMiddleware",
     # Auditoría (después de todo)
     # "users.middleware.AuditMiddleware",  # Migrar después
 ]
@@ -207,6 +209,10 @@ AWS_S3_REGION_NAME = 'us-east-2'
 AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
 AWS_S3_VERITY = True
+# Gateway S3 compartido (api/services/storage_gateway.py)
+AWS_S3_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_S3_MAX_POOL_CONNECTIONS', '32'))
+AWS_S3_PRESIGNED_EXPIRATION = 3600  # Vigencia de URLs firmadas (segundos)
+AWS_S3_PRESIGNED_RENEW_MARGIN = 300  # Re-firmar cuando falten menos de 5 min
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
 DATABASES = {
@@ -223,6 +229,68 @@ DATABASES = {
     }
 }
 
+# Reutilización de conexiones a PostgreSQL.
+# Con psycopg 3 + psycopg_pool: pool por proceso, dimensionado para que
+# GUNICORN_WORKERS procesos no superen DB_MAX_CONNECTIONS en el servidor.
+# Sin pool disponible: conexiones persistentes con health check.
+GUNICORN_WORKERS = int(os.environ.get('GUNICORN_WORKERS', '3'))
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', '30'))
+DB_POOL_ENABLED = os.environ.get('DB_POOL_ENABLED', 'True') == 'True'
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.environ.get(
+    'DB_POOL_MAX_SIZE', max(2, DB_MAX_CONNECTIONS // max(GUNICORN_WORKERS, 1))
+))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))  # espera máxima por una conexión
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '300'))
+
+try:
+    import psycopg  # noqa: F401
+    from psycopg_pool import ConnectionPool as _PsycopgConnectionPool
+except ImportError:
+    _PsycopgConnectionPool = None
+
+if DB_POOL_ENABLED and _PsycopgConnectionPool is not None:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": DB_POOL_MIN_SIZE,
+        "max_size": DB_POOL_MAX_SIZE,
+        "timeout": DB_POOL_TIMEOUT,
+        "max_idle": 300,
+        "max_lifetime": 1800,
+    }
+    # Django pasa check=ConnectionPool.check_connection al pool: verifica la
+    # conexión antes de entregarla (descarta las caídas)
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = DB_CONN_MAX_AGE
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Réplica de lectura (opcional) para reportes, bitácora y estadísticas.
+# Mismas credenciales y pool que el primario salvo que se indiquen
+# DB_REPLICA_*; en tests apunta al primario (MIRROR). Ver api/db_router.py.
+DB_REPLICA_HOST = os.environ.get('DB_REPLICA_HOST')
+if DB_REPLICA_HOST:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ.get('DB_REPLICA_NAME', DATABASES["default"]["NAME"]),
+        "USER": os.environ.get('DB_REPLICA_USER', DATABASES["default"]["USER"]),
+        "PASSWORD": os.environ.get('DB_REPLICA_PASSWORD', DATABASES["default"]["PASSWORD"]),
+        "HOST": DB_REPLICA_HOST,
+        "PORT": os.environ.get('DB_REPLICA_PORT', DATABASES["default"]["PORT"]),
+        "OPTIONS": {
+            **DATABASES["default"]["OPTIONS"],
+            "sslmode": "disable" if DB_REPLICA_HOST == 'localhost' else "require",
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["api.db_router.ReplicaRouter"]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', '5'))
+# Tras una mutación, el usuario lee del primario estos segundos. Con el cache
+# local por proceso solo aplica en el worker que atendió la escritura; con un
+# cache compartido (Redis) aplica en todos.
+REPLICA_READ_YOUR_WRITES_SECONDS = int(os.environ.get('REPLICA_READ_YOUR_WRITES_SECONDS', '15'))
+
 # ------------------------------------
 # Password validators
 # ------------------------------------
@@ -256,6 +324,22 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 
+# Cargas directas a S3 (presigned POST): el archivo no pasa por los workers
+DIRECT_UPLOAD_MAX_BYTES = 100 * 1024 * 1024  # 100MB
+DIRECT_UPLOAD_EXPIRATION = 900  # Vigencia del presigned POST (segundos)
+
+# Cargas reanudables por partes (S3 multipart) para escaneos y radiografías grandes
+DIRECT_UPLOAD_MULTIPART_MAX_BYTES = 5 * 1024 * 1024 * 1024  # 5GB
+DIRECT_UPLOAD_PART_SIZE = 8 * 1024 * 1024  # 8MB (S3 exige >= 5MB salvo la última)
+DIRECT_UPLOAD_MULTIPART_EXPIRATION = 24 * 3600  # Ventana para reanudar (segundos)
+# Hash de cargas multipart (S3 solo da un checksum compuesto) calculado fuera
+# del request. 0 = solo el comando verificar_cargas (cron).
+DIRECT_UPLOAD_VERIFICATION_WORKERS = int(os.getenv('DIRECT_UPLOAD_VERIFICATION_WORKERS', '1'))
+
+# Derivados de imagen (miniatura / versión web) generados fuera del request.
+# 0 = procesar en línea al confirmar la transacción (tests, depuración).
+IMAGE_DERIVATIVES_WORKERS = int(os.getenv('IMAGE_DERIVATIVES_WORKERS', '2'))
+
 # Tipos de archivo permitidos para evidencias
 ALLOWED_UPLOAD_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'pdf']
 ALLOWED_UPLOAD_MIMETYPES = [
@@ -269,14 +353,84 @@ ALLOWED_UPLOAD_MIMETYPES = [
 # ------------------------------------
 # DRF - CORREGIDO
 # ------------------------------------
+FAST_JSON_ENABLED = os.environ.get('FAST_JSON_ENABLED', 'True') == 'True'
+
+# Máximo de sub-peticiones GET en POST /api/batch/ (api/views_batch.py)
+BATCH_MAX_SUBREQUESTS = int(os.environ.get('BATCH_MAX_SUBREQUESTS', '20'))
+
+# Caché HTTP de catálogos por tenant (api/services/cache_catalogos.py)
+CATALOGO_CACHE_ENABLED = os.environ.get('CATALOGO_CACHE_ENABLED', 'True') == 'True'
+CATALOGO_CACHE_MAX_AGE = int(os.environ.get('CATALOGO_CACHE_MAX_AGE', '300'))  # segundos
+CATALOGO_CACHE_ENTRADAS = int(os.environ.get('CATALOGO_CACHE_ENTRADAS', '1000'))  # LRU por proceso
+
+# Sincronización incremental de la app móvil (api/services/sincronizacion.py)
+SYNC_MAX_REGISTROS = int(os.environ.get('SYNC_MAX_REGISTROS', '500'))  # por entidad y llamada
+SYNC_SOLAPE_SEGUNDOS = int(os.environ.get('SYNC_SOLAPE_SEGUNDOS', '5'))
+SYNC_RETENCION_DIAS = int(os.environ.get('SYNC_RETENCION_DIAS', '90'))  # tombstones
+
+# Archivado por lotes de consultas pasadas (api/services/archivo_consultas.py):
+# el endpoint programa el trabajo en un pool de hilos (0 = en línea) y
+# `archivar_consultas` lo ejecuta o retoma desde cron.
+CONSULTAS_ARCHIVO_LOTE = int(os.environ.get('CONSULTAS_ARCHIVO_LOTE', '500'))
+CONSULTAS_ARCHIVO_WORKERS = int(os.environ.get('CONSULTAS_ARCHIVO_WORKERS', '1'))
+CONSULTAS_ARCHIVO_RESERVA_SEGUNDOS = 600  # Tras esto un trabajo 'en_curso' sin avance se retoma
+
+# Retención de históricos de solo-inserción (api/services/retencion_historicos.py):
+# `mantener_historicos` exporta a .jsonl.gz y borra los meses completos más
+# viejos que la retención. PoliticaRetencion la ajusta por tenant.
+RETENCION_HISTORICOS_DIAS = {
+    'bitacora': int(os.environ.get('RETENCION_BITACORA_DIAS', '730')),
+    'notificaciones': int(os.environ.get('RETENCION_NOTIFICACIONES_DIAS', '180')),
+    'chatbot': int(os.environ.get('RETENCION_CHATBOT_DIAS', '365')),
+}
+RETENCION_HISTORICOS_LOTE = int(os.environ.get('RETENCION_HISTORICOS_LOTE', '2000'))  # filas por DELETE
+RETENCION_HISTORICOS_RUTA = 'historicos'  # prefijo de las exportaciones en el storage
+
+# Caché de Django. Con varios procesos (GUNICORN_WORKERS) debe ser un backend
+# compartido (p. ej. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# y CACHE_LOCATION=redis://...) para que las invalidaciones lleguen a todos;
+# LocMemCache (por defecto) es por proceso.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Políticas de no-show (no_show_policies/services.py): caché de políticas
+# activas por empresa en la caché de Django, invalidada por signals. Con un
+# backend compartido la invalidación alcanza a todos los procesos; con
+# LocMemCache solo al que escribe, y los demás siguen con la copia anterior
+# hasta NO_SHOW_POLITICAS_CACHE_SEGUNDOS. Con la evaluación en línea
+# desactivada, `aplicar_politicas_noshow` las aplica por lotes desde cron.
+NO_SHOW_POLITICAS_CACHE_SEGUNDOS = int(os.environ.get('NO_SHOW_POLITICAS_CACHE_SEGUNDOS', '300'))
+NO_SHOW_EVALUACION_EN_LINEA = os.environ.get('NO_SHOW_EVALUACION_EN_LINEA', 'True') == 'True'
+
+# Caché de tokens validados (api/auth_token.py, api/services/cache_tokens.py):
+# LRU por proceso + caché compartida. La revocación borra ambas; otro proceso
+# puede aceptar su copia local hasta TOKEN_AUTH_LRU_SEGUNDOS.
+TOKEN_AUTH_CACHE_SEGUNDOS = int(os.environ.get('TOKEN_AUTH_CACHE_SEGUNDOS', '300'))
+TOKEN_AUTH_LRU_SEGUNDOS = int(os.environ.get('TOKEN_AUTH_LRU_SEGUNDOS', '30'))
+TOKEN_AUTH_LRU_ENTRADAS = int(os.environ.get('TOKEN_AUTH_LRU_ENTRADAS', '10000'))
+
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.auth_token.CachedTokenAuth",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 25,
+    # JSON sobre orjson (api/renderers.py); FAST_JSON_ENABLED=False vuelve a los de DRF
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.ORJSONRenderer" if FAST_JSON_ENABLED else "rest_framework.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.renderers.ORJSONParser" if FAST_JSON_ENABLED else "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     'DEFAULT_THROTTLE_RATES': {
         'notifications': '100/hour',
         'device_registration': '10/day',
@@ -350,6 +504,14 @@ STRIPE_CAPTURE_METHOD = 'automatic'  # automatic o manual
 STRIPE_PRICE_ID = os.environ.get('STRIPE_PRICE_ID')
 STRIPE_PRICE_AMOUNT = 99  # Precio en USD del plan mensual (solo para mostrar al usuario)
 
+# Bandeja de webhooks (api/services/webhooks_stripe.py): el endpoint guarda el
+# evento y responde; se procesa en un pool de hilos al confirmar la
+# transacción (0 = en línea) y `procesar_webhooks_stripe` recoge reintentos.
+STRIPE_WEBHOOK_WORKERS = int(os.getenv('STRIPE_WEBHOOK_WORKERS', '2'))
+STRIPE_WEBHOOK_MAX_INTENTOS = 8
+STRIPE_WEBHOOK_REINTENTO_SEGUNDOS = 30  # Espera base, se duplica en cada intento
+STRIPE_WEBHOOK_RESERVA_SEGUNDOS = 300  # Tras esto un evento 'procesando' se retoma
+
 # Advertencia si Stripe no está configurado (no es error fatal)
 if not STRIPE_ENABLED:
     import warnings
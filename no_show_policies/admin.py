@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PoliticaNoShow, Multa
+from .models import BloqueoAplicado, PoliticaNoShow, Multa
 from dental_clinic_backend.admin_sites import tenant_admin_site, public_admin_site
 
 
@@ -16,4 +16,12 @@ class PoliticaNoShowAdmin(admin.ModelAdmin):
 class MultaAdmin(admin.ModelAdmin):
     list_display = ("id", "empresa", "usuario", "consulta", "monto", "estado", "creado_en")
     list_filter = ("empresa", "estado", "creado_en")
-    search_fields = ("usuario__nombre", "usuario__apellido", "consulta__id", "motivo")
\ No newline at end of file
+    search_fields = ("usuario__nombre", "usuario__apellido", "consulta__id", "motivo")
+
+
+@admin.register(BloqueoAplicado, site=tenant_admin_site)
+@admin.register(BloqueoAplicado, site=public_admin_site)
+class BloqueoAplicadoAdmin(admin.ModelAdmin):
+    list_display = ("id", "consulta", "politica", "bloqueo", "creado_en")
+    list_filter = ("politica", "creado_en")
+    search_fields = ("consulta__id",)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0035_consulta_fecha_cambio_estado'),
+        ('no_show_policies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloqueoAplicado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('bloqueo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.bloqueousuario')),
+                ('consulta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bloqueos_aplicados', to='api.consulta')),
+                ('politica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bloqueos_aplicados', to='no_show_policies.politicanoshow')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('consulta', 'politica'), name='uniq_bloqueo_por_consulta_y_politica')],
+            },
+        ),
+    ]
@@ -59,4 +59,28 @@ class Multa(models.Model):
         ordering = ["-creado_en"]
 
     def __str__(self):
-        return f"Multa #{self.pk} - Usuario {self.usuario_id} - {self.estado} - {self.monto}"
\ No newline at end of file
+        return f"Multa #{self.pk} - Usuario {self.usuario_id} - {self.estado} - {self.monto}"
+
+class BloqueoAplicado(models.Model):
+    """
+    Consulta/política ya evaluada para bloqueo. Evita volver a bloquear por
+    la misma consulta aunque el bloqueo se haya levantado o borrado: no se
+    decide por el estado actual de BloqueoUsuario.
+    """
+    consulta = models.ForeignKey('api.Consulta', on_delete=models.CASCADE, related_name='bloqueos_aplicados')
+    politica = models.ForeignKey('no_show_policies.PoliticaNoShow', on_delete=models.CASCADE, related_name='bloqueos_aplicados')
+    # Bloqueo que cubre la consulta (None si su período ya había vencido)
+    bloqueo = models.ForeignKey('api.BloqueoUsuario', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["consulta", "politica"],
+                name="uniq_bloqueo_por_consulta_y_politica",
+            )
+        ]
+
+    def __str__(self):
+        return f"Consulta {self.consulta_id} - Política {self.politica_id} - Bloqueo {self.bloqueo_id}"
@@ -1,117 +1,259 @@
 from datetime import timedelta
 import logging
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.utils import timezone
 from django.db.models import Q
 
-from .models import PoliticaNoShow, Multa
-from api.models import BloqueoUsuario  # tabla de bloqueos (en app api)
+from .models import BloqueoAplicado, PoliticaNoShow, Multa
+from api.models import BloqueoUsuario, Consulta, Usuario  # bloqueos y consultas (en app api)
+from api.services.cache_tokens import revocar_tokens_de_usuarios
 
 logger = logging.getLogger(__name__)
 
 
-def _get_usuario_from_consulta(consulta):
+# ----------------------------------------------------------------------
+# Caché de políticas activas por empresa
+# ----------------------------------------------------------------------
+def _clave_politicas(empresa_id):
+    return f"noshow:politicas:{empresa_id}"
+
+
+def politicas_activas(empresa_id, estado_id):
     """
-    Según tu modelo, el 'dueño' de la consulta es el paciente.
-    consulta.codpaciente -> api.Paciente
-    paciente.codusuario  -> api.Usuario
+    Políticas activas de la empresa para el estado de consulta. Se cachean
+    todas las de la empresa agrupadas por estado (NO_SHOW_POLITICAS_CACHE_SEGUNDOS);
+    los signals de PoliticaNoShow invalidan la entrada al guardar o borrar.
+    La invalidación solo llega a otros procesos si CACHES es compartida; con
+    LocMemCache ven el cambio cuando vence el TTL.
     """
-    try:
-        paciente = getattr(consulta, "codpaciente", None)
-        if not paciente:
-            return None
-        return getattr(paciente, "codusuario", None)
-    except Exception:
-        return None
+    por_estado = cache.get(_clave_politicas(empresa_id))
+    if por_estado is None:
+        por_estado = {}
+        for politica in PoliticaNoShow.objects.filter(activo=True, empresa_id=empresa_id).order_by("pk"):
+            por_estado.setdefault(politica.estado_consulta_id, []).append(politica)
+        cache.set(_clave_politicas(empresa_id), por_estado, settings.NO_SHOW_POLITICAS_CACHE_SEGUNDOS)
+    return por_estado.get(estado_id, [])
+
+
+def invalidar_politicas(empresa_id):
+    """Descarta la caché de políticas de la empresa (llamar tras updates masivos)."""
+    cache.delete(_clave_politicas(empresa_id))
 
 
-def _get_empresa_id(consulta, usuario):
+# ----------------------------------------------------------------------
+# Aplicación por conjuntos
+# ----------------------------------------------------------------------
+def _multas(filas, politicas_por_fila):
+    """Multas nuevas (una por consulta/política con penalización), sin duplicar las existentes."""
+    candidatas = {}
+    for (consulta_id, usuario_id, empresa_id, estado_id, _), politicas in zip(filas, politicas_por_fila):
+        for p in politicas:
+            monto = p.penalizacion_economica or 0
+            if float(monto) > 0:
+                candidatas[(consulta_id, p.pk)] = Multa(
+                    consulta_id=consulta_id,
+                    politica_id=p.pk,
+                    empresa_id=empresa_id,
+                    usuario_id=usuario_id,
+                    monto=monto,
+                    motivo=f"Aplicación automática por política #{p.pk} (estado_id={estado_id})"[:255],
+                    estado="pendiente",
+                )
+    if not candidatas:
+        return 0
+    existentes = set(
+        Multa.objects.filter(
+            consulta_id__in={consulta_id for consulta_id, _ in candidatas},
+            politica_id__in={politica_id for _, politica_id in candidatas},
+        ).values_list("consulta_id", "politica_id")
+    )
+    nuevas = [multa for clave, multa in candidatas.items() if clave not in existentes]
+    # ignore_conflicts: otra evaluación concurrente pudo insertarlas (uniq_multa_por_consulta_y_politica)
+    Multa.objects.bulk_create(nuevas, batch_size=500, ignore_conflicts=True)
+    return len(nuevas)
+
+
+def _bloqueos(filas, politicas_por_fila, ahora):
     """
-    Prioriza empresa de la consulta; si no, la del usuario.
+    Un bloqueo por usuario hasta el fin más lejano de sus políticas: extiende
+    el vigente (el más reciente) o crea uno nuevo. El fin se cuenta desde el
+    cambio de estado de la consulta y no desde `ahora`; los ya vencidos no se
+    crean. Cada consulta/política se aplica una sola vez (BloqueoAplicado):
+    reevaluarla no alarga el bloqueo ni recrea uno levantado a mano.
     """
-    eid = getattr(consulta, "empresa_id", None)
-    if eid:
-        return int(eid)
-    if usuario:
-        eid = getattr(usuario, "empresa_id", None)
-        if eid:
-            return int(eid)
-    return None
+    candidatas = {}
+    for (consulta_id, usuario_id, _, _, momento), politicas in zip(filas, politicas_por_fila):
+        for p in politicas:
+            if p.bloqueo_temporal and (p.dias_bloqueo or 0) > 0:
+                hasta = (momento or ahora) + timedelta(days=int(p.dias_bloqueo))
+                candidatas[(consulta_id, p.pk)] = (usuario_id, hasta, p)
+    if not candidatas:
+        return 0
+    aplicadas = set(
+        BloqueoAplicado.objects.filter(
+            consulta_id__in={consulta_id for consulta_id, _ in candidatas},
+            politica_id__in={politica_id for _, politica_id in candidatas},
+        ).values_list("consulta_id", "politica_id")
+    )
+    candidatas = {clave: valor for clave, valor in candidatas.items() if clave not in aplicadas}
+    if not candidatas:
+        return 0
+
+    hasta_por_usuario = {}
+    for usuario_id, hasta, p in candidatas.values():
+        if hasta <= ahora:
+            continue
+        motivo = f"Bloqueo automático por política #{p.pk} durante {p.dias_bloqueo} días."
+        if usuario_id not in hasta_por_usuario or hasta_por_usuario[usuario_id][0] < hasta:
+            hasta_por_usuario[usuario_id] = (hasta, motivo)
+
+    vigentes = {}
+    for bloqueo in (
+        BloqueoUsuario.objects
+        .filter(usuario_id__in=hasta_por_usuario, activo=True)
+        .filter(Q(fecha_fin__isnull=True) | Q(fecha_fin__gt=ahora))
+        .order_by("usuario_id", "-fecha_inicio")
+    ):
+        vigentes.setdefault(bloqueo.usuario_id, bloqueo)
+
+    extendidos, nuevos = [], []
+    for usuario_id, (hasta, motivo) in hasta_por_usuario.items():
+        bloqueo_vigente = vigentes.get(usuario_id)
+        if bloqueo_vigente is None:
+            nuevos.append(BloqueoUsuario(
+                usuario_id=usuario_id,
+                fecha_inicio=ahora,
+                fecha_fin=hasta,
+                motivo=motivo,
+                activo=True,
+            ))
+        elif bloqueo_vigente.fecha_fin is not None and bloqueo_vigente.fecha_fin < hasta:
+            # Solo se extiende; un bloqueo indefinido queda como está
+            bloqueo_vigente.fecha_fin = hasta
+            if not bloqueo_vigente.motivo:
+                bloqueo_vigente.motivo = motivo
+            extendidos.append(bloqueo_vigente)
+    BloqueoUsuario.objects.bulk_update(extendidos, ["fecha_fin", "motivo"], batch_size=500)
+    BloqueoUsuario.objects.bulk_create(nuevos, batch_size=500)
+
+    bloqueo_por_usuario = {bloqueo.usuario_id: bloqueo.pk for bloqueo in [*vigentes.values(), *nuevos]}
+    # ignore_conflicts: otra evaluación concurrente pudo registrarlas (uniq_bloqueo_por_consulta_y_politica)
+    BloqueoAplicado.objects.bulk_create(
+        [
+            BloqueoAplicado(
+                consulta_id=consulta_id,
+                politica_id=politica_id,
+                bloqueo_id=bloqueo_por_usuario.get(usuario_id),
+            )
+            for (consulta_id, politica_id), (usuario_id, _, _) in candidatas.items()
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    if nuevos or extendidos:
+        # bulk_create/bulk_update no disparan post_save: revocar a mano los
+        # tokens cacheados (llevan la fecha_fin anterior de los bloqueos)
+        usuarios = [bloqueo.usuario_id for bloqueo in nuevos + extendidos]
+        transaction.on_commit(lambda: revocar_tokens_de_usuarios(usuarios))
+    return len(extendidos) + len(nuevos)
 
 
 @transaction.atomic
+def aplicar_politicas_a_filas(filas, ahora=None):
+    """
+    Aplica las políticas a varias consultas a la vez. `filas` son tuplas
+    (consulta_id, usuario_id, empresa_id, estado_id, momento), donde `momento`
+    es el cambio de estado de la consulta (None: `ahora`). Las multas se insertan
+    en un bulk_create y los bloqueos se resuelven con una lectura y a lo sumo
+    un bulk_update y un bulk_create. Devuelve {'multas': n, 'bloqueos': n}.
+    """
+    ahora = ahora or timezone.now()
+    filas = [fila for fila in filas if fila[1] and fila[2]]
+    politicas_por_fila = [politicas_activas(empresa_id, estado_id) for _, _, empresa_id, estado_id, _ in filas]
+    return {
+        "multas": _multas(filas, politicas_por_fila),
+        "bloqueos": _bloqueos(filas, politicas_por_fila, ahora),
+    }
+
+
+def empresa_de_consulta(consulta):
+    """Empresa de la consulta o, si no tiene, la del paciente."""
+    if consulta.empresa_id:
+        return int(consulta.empresa_id)
+    eid = Usuario.objects.filter(pk=consulta.codpaciente_id).values_list("empresa_id", flat=True).first()
+    return int(eid) if eid else None
+
+
 def aplicar_politicas_para_estado(consulta, nuevo_estado_id):
     """
     Aplica políticas activas para (empresa, estado_consulta) cuando una consulta cambia de estado.
     - Crea Multa (única por consulta/política).
-    - Crea o extiende BloqueoUsuario si corresponde.
+    - Crea o extiende BloqueoUsuario si corresponde, contado desde `fecha_cambio_estado`.
     """
-    usuario = _get_usuario_from_consulta(consulta)
-    if not usuario:
+    # El paciente comparte la clave con su usuario (Paciente.codusuario es la PK)
+    usuario_id = getattr(consulta, "codpaciente_id", None)
+    if not usuario_id:
         logger.info("NoShowPolicies: no se pudo resolver usuario desde consulta id=%s", getattr(consulta, "id", None))
         return
 
-    empresa_id = _get_empresa_id(consulta, usuario)
+    empresa_id = empresa_de_consulta(consulta)
     if not empresa_id:
         logger.info("NoShowPolicies: no se pudo resolver empresa para consulta id=%s", getattr(consulta, "id", None))
         return
 
-    politicas = PoliticaNoShow.objects.filter(
-        activo=True,
-        empresa_id=empresa_id,
-        estado_consulta_id=nuevo_estado_id,
-    )
-
-    if not politicas.exists():
+    if not politicas_activas(empresa_id, nuevo_estado_id):
         return
 
-    ahora = timezone.now()
+    momento = getattr(consulta, "fecha_cambio_estado", None)
+    aplicar_politicas_a_filas([(consulta.pk, usuario_id, empresa_id, nuevo_estado_id, momento)])
 
-    for p in politicas:
-        # 1) Multa económica
-        monto = p.penalizacion_economica or 0
-        if float(monto) > 0:
-            Multa.objects.get_or_create(
-                consulta=consulta,
-                politica=p,
-                defaults={
-                    "empresa_id": empresa_id,
-                    "usuario": usuario,
-                    "monto": monto,
-                    "motivo": f"Aplicación automática por política #{p.pk} (estado_id={nuevo_estado_id})"[:255],
-                    "estado": "pendiente",
-                },
-            )
 
-        # 2) Bloqueo temporal (si está activo y con días > 0)
-        if p.bloqueo_temporal and (p.dias_bloqueo or 0) > 0:
-            hasta = ahora + timedelta(days=int(p.dias_bloqueo))
-
-            # Evitar duplicar bloqueos superpuestos: si hay uno activo, extenderlo si el nuevo fin es mayor.
-            bloqueo_vigente = (
-                BloqueoUsuario.objects
-                .filter(usuario=usuario, activo=True)
-                .filter(Q(fecha_fin__isnull=True) | Q(fecha_fin__gt=ahora))
-                .order_by("-fecha_inicio")
-                .first()
-            )
+def _sumar(resumen, filas, parcial):
+    resumen["consultas"] += len(filas)
+    resumen["multas"] += parcial["multas"]
+    resumen["bloqueos"] += parcial["bloqueos"]
+
+
+def aplicar_politicas_en_ventana(desde, hasta, empresa=None, lote=1000):
+    """
+    Evaluación por lotes: aplica las políticas a las consultas que cambiaron
+    de estado (`fecha_cambio_estado`, no `updated_at`: editar una consulta
+    vieja no la vuelve a penalizar) entre `desde` y `hasta` y están en un
+    estado con política activa. Es idempotente: las multas no se duplican y
+    cada consulta/política bloquea una sola vez (un bloqueo levantado no se
+    recrea).
+    Devuelve {'consultas': n, 'multas': n, 'bloqueos': n}.
+    """
+    politicas = PoliticaNoShow.objects.filter(activo=True, empresa__isnull=False)
+    if empresa is not None:
+        politicas = politicas.filter(empresa=empresa)
+    estados_por_empresa = {}
+    for empresa_id, estado_id in politicas.values_list("empresa_id", "estado_consulta_id").distinct():
+        estados_por_empresa.setdefault(empresa_id, set()).add(estado_id)
+
+    resumen = {"consultas": 0, "multas": 0, "bloqueos": 0}
+    if not estados_por_empresa:
+        return resumen
+    condicion = Q()
+    for empresa_id, estados in estados_por_empresa.items():
+        condicion |= Q(empresa_id=empresa_id, idestadoconsulta_id__in=estados)
 
-            motivo = f"Bloqueo automático por política #{p.pk} durante {p.dias_bloqueo} días."
-            if bloqueo_vigente:
-                # Si el existente termina antes que el nuevo, extiende
-                fin_actual = bloqueo_vigente.fecha_fin
-                if fin_actual is None or fin_actual < hasta:
-                    bloqueo_vigente.fecha_fin = hasta
-                    if not bloqueo_vigente.motivo:
-                        bloqueo_vigente.motivo = motivo
-                    bloqueo_vigente.save(update_fields=["fecha_fin", "motivo"])
-            else:
-                BloqueoUsuario.objects.create(
-                    usuario=usuario,
-                    fecha_inicio=ahora,
-                    fecha_fin=hasta,
-                    motivo=motivo,
-                    activo=True,
-                    # creado_por: opcional, se puede setear desde vistas/admin si aplica
-                )
\ No newline at end of file
+    consultas = (
+        Consulta.objects.filter(condicion, fecha_cambio_estado__gte=desde, fecha_cambio_estado__lt=hasta)
+        .order_by("pk")
+        .values_list("pk", "codpaciente_id", "empresa_id", "idestadoconsulta_id", "fecha_cambio_estado")
+    )
+    ahora = timezone.now()
+    filas = []
+    for fila in consultas.iterator(chunk_size=lote):
+        filas.append(fila)
+        if len(filas) == lote:
+            _sumar(resumen, filas, aplicar_politicas_a_filas(filas, ahora))
+            filas = []
+    if filas:
+        _sumar(resumen, filas, aplicar_politicas_a_filas(filas, ahora))
+    logger.info("NoShowPolicies: evaluación por lotes %s - %s: %s", desde, hasta, resumen)
+    return resumen
@@ -1,15 +1,19 @@
 import logging
 from django.apps import apps
-from django.db.models.signals import pre_save
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 
-from .services import aplicar_politicas_para_estado
+from .models import PoliticaNoShow
+from .services import aplicar_politicas_para_estado, empresa_de_consulta, invalidar_politicas, politicas_activas
 
 logger = logging.getLogger(__name__)
 
 
 def _connect_consulta_signal():
     """
-    Conecta pre_save de api.Consulta para detectar cambio en 'idestadoconsulta'.
+    Conecta pre_save de api.Consulta para aplicar las políticas cuando cambia
+    'idestadoconsulta' (Consulta.save() marca el cambio y su fecha_cambio_estado).
     """
     Consulta = apps.get_model("api", "Consulta")
     if Consulta is None:
@@ -17,28 +21,59 @@ def _connect_consulta_signal():
         return
 
     def handler(sender, instance, **kwargs):
-        # Solo al actualizar (si ya existe en BD)
-        if not instance.pk:
+        # Solo si cambió el estado de una consulta existente
+        if not getattr(instance, "_cambio_de_estado", False):
             return
-
-        try:
-            anterior = sender.objects.get(pk=instance.pk)
-        except sender.DoesNotExist:
+        # Con la evaluación diferida las aplica `aplicar_politicas_noshow` por lotes
+        if not settings.NO_SHOW_EVALUACION_EN_LINEA:
             return
 
-        prev_estado_id = getattr(anterior, "idestadoconsulta_id", None)
         new_estado_id = getattr(instance, "idestadoconsulta_id", None)
+        if not new_estado_id:
+            return
 
-        if new_estado_id and new_estado_id != prev_estado_id:
-            try:
-                aplicar_politicas_para_estado(instance, new_estado_id)
-            except Exception as e:
-                logger.exception("NoShowPolicies: error aplicando políticas para consulta id=%s: %s",
-                                 getattr(instance, "id", None), e)
+        try:
+            # Sin políticas para el estado nuevo (lo habitual) no se consulta nada más
+            empresa_id = empresa_de_consulta(instance)
+            if not empresa_id or not politicas_activas(empresa_id, new_estado_id):
+                return
+
+            aplicar_politicas_para_estado(instance, new_estado_id)
+        except Exception as e:
+            logger.exception("NoShowPolicies: error aplicando políticas para consulta id=%s: %s",
+                             getattr(instance, "id", None), e)
 
     pre_save.connect(handler, sender=Consulta, weak=False)
     logger.info("NoShowPolicies: señales conectadas para api.Consulta (pre_save, campo idestadoconsulta).")
 
 
 # Conectar en import (apps.py.ready() ya importa este módulo)
-_connect_consulta_signal()
\ No newline at end of file
+_connect_consulta_signal()
+
+
+def _invalidar_cache_politicas(sender, instance, **kwargs):
+    empresas = {instance.empresa_id}
+    # Si la política cambió de empresa, también la caché de la anterior
+    empresa_anterior = getattr(instance, "_empresa_id_anterior", None)
+    if empresa_anterior:
+        empresas.add(empresa_anterior)
+
+    def invalidar():
+        for empresa_id in empresas:
+            invalidar_politicas(empresa_id)
+
+    # Otra vez al confirmar: un proceso pudo cachear la versión previa entretanto
+    invalidar()
+    transaction.on_commit(invalidar)
+
+
+def _recordar_empresa_anterior(sender, instance, **kwargs):
+    if instance.pk:
+        instance._empresa_id_anterior = (
+            sender.objects.filter(pk=instance.pk).values_list("empresa_id", flat=True).first()
+        )
+
+
+pre_save.connect(_recordar_empresa_anterior, sender=PoliticaNoShow, dispatch_uid="noshow_politica_empresa_anterior")
+post_save.connect(_invalidar_cache_politicas, sender=PoliticaNoShow, dispatch_uid="noshow_politica_cache_save")
+post_delete.connect(_invalidar_cache_politicas, sender=PoliticaNoShow, dispatch_uid="noshow_politica_cache_delete")
@@ -1,13 +1,15 @@
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication, SessionAuthentication, get_authorization_header
+from rest_framework.authentication import SessionAuthentication, get_authorization_header
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.db.models.fields.related import ForeignKey, OneToOneField
 from django.utils.functional import cached_property
 import logging
 
+from api.auth_token import CachedTokenAuth
 from api.models import Estadodeconsulta, Empresa
+from api.services.cache_tokens import token_valido
 from .serializers import EstadodeconsultaSerializer, PoliticaNoShowSerializer
 from .models import PoliticaNoShow
 
@@ -210,8 +212,8 @@ class EmpresaFromRequestMixin:
             return None
 
         try:
-            tk = Token.objects.select_related("user").get(key=token_key)  # type: ignore
-            return self._empresa_id_from_user(tk.user)  # type: ignore
+            tk = token_valido(token_key, getattr(req, "tenant", None))
+            return self._empresa_id_from_user(tk.user) if tk else None
         except Exception:
             return None
 
@@ -251,7 +253,7 @@ class PoliticaNoShowViewSet(EmpresaFromRequestMixin, viewsets.ModelViewSet):
     """
     queryset = PoliticaNoShow.objects.all()
     serializer_class = PoliticaNoShowSerializer
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuth, SessionAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -294,7 +296,7 @@ class EstadodeconsultaViewSet(EmpresaFromRequestMixin, viewsets.ReadOnlyModelVie
     """
     Lista los estados de consulta filtrando SIEMPRE por empresa del usuario.
     """
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuth, SessionAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = EstadodeconsultaSerializer
 
@@ -2,7 +2,8 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import viewsets, permissions
-from rest_framework.authentication import TokenAuthentication, SessionAuthentication
+from rest_framework.authentication import SessionAuthentication
+from api.auth_token import CachedTokenAuth
 from api.models import Usuario, Tipodeusuario, Odontologo
 from api.serializers import OdontologoSerializer
 from .serializers import UsuarioSerializer, TipodeusuarioSerializer
@@ -23,7 +24,7 @@ class UsuarioViewSet(viewsets.ModelViewSet):
     """ViewSet para gestión de usuarios - REQUIERE AUTENTICACIÓN"""
     serializer_class = UsuarioSerializer
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuth, SessionAuthentication]
 
     def get_queryset(self):
         """Filtrar usuarios por tenant"""
@@ -42,7 +43,7 @@ class TipodeusuarioViewSet(viewsets.ModelViewSet):
     """ViewSet para gestión de tipos de usuario - REQUIERE AUTENTICACIÓN"""
     serializer_class = TipodeusuarioSerializer
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuth, SessionAuthentication]
 
     def get_queryset(self):
         """Filtrar tipos de usuario por tenant"""
@@ -66,7 +67,7 @@ class OdontologoViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = OdontologoSerializer
     permission_classes = [permissions.AllowAny]
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuth, SessionAuthentication]
 
     def get_queryset(self):
         """Filtrar odontólogos por tenant"""